@@ -0,0 +1,172 @@
+"""
+Priority-aware, per-car fair scheduler for analysis requests on the laptop.
+
+Flask request threads submit jobs and block until a worker has run them.
+- "urgent" jobs are always served before "normal" ones.
+- Within a priority class, cars are served by weighted fair queueing
+  (start-time virtual clock), so one chatty car cannot starve the others.
+- A newer frame from a car supersedes that car's frames of the same kind
+  still in the queue, and takes over their place and fair-share charge.
+Jobs run in a copy of the submitter's context variables (like the current
+trace span), so what the handler records belongs to the submitting request.
+"""
+
+import contextvars
+import heapq
+import itertools
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+PRIORITIES = {"urgent": 0, "normal": 1}
+DEFAULT_PRIORITY = "normal"
+
+
+class JobSuperseded(Exception):
+    """Raised by AnalysisJob.wait() when a newer frame replaced this one."""
+
+
+class AnalysisJob:
+    def __init__(self, car_id: str, priority: str, args: tuple, kind: str = "frame"):
+        self.car_id = car_id
+        self.priority = priority
+        self.kind = kind
+        self.args = args
+        self.context = contextvars.copy_context()
+        self.enqueued_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.superseded = False
+        self.start_tag = 0.0  # Virtual start time under fair queueing
+        self._done = threading.Event()
+
+    @property
+    def queue_wait(self) -> float:
+        """Seconds spent waiting in the queue (so far, if not started yet)."""
+        end = self.started_at if self.started_at is not None else time.monotonic()
+        return end - self.enqueued_at
+
+    @property
+    def run_time(self) -> float:
+        if self.started_at is None or self.finished_at is None:
+            return 0.0
+        return self.finished_at - self.started_at
+
+    def finish(self, result: Any = None, error: Optional[BaseException] = None):
+        self.finished_at = time.monotonic()
+        self.result = result
+        self.error = error
+        self._done.set()
+
+    def wait(self, timeout: Optional[float] = None) -> Any:
+        """Block until the job ran; return its result or raise its error."""
+        if not self._done.wait(timeout):
+            raise TimeoutError(f"Analysis for {self.car_id} not finished in {timeout}s")
+        if self.superseded:
+            raise JobSuperseded(f"Frame from {self.car_id} replaced by a newer frame")
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class AnalysisScheduler:
+    """
+    Runs handler(*job.args) on a pool of worker threads in scheduled order.
+
+    weights maps car IDs to their fair share (default 1.0 each); a car with
+    weight 2 gets twice the analyses of a weight-1 car under contention.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[..., Any],
+        workers: int = 1,
+        weights: Optional[Dict[str, float]] = None,
+    ):
+        self.handler = handler
+        self.weights = dict(weights or {})
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._pending: Dict[tuple, AnalysisJob] = {}  # (car_id, kind) -> queued job
+        self._finish_tags: Dict[tuple, float] = {}  # (class, car_id) -> last tag
+        self._virtual_time = {cls: 0.0 for cls in PRIORITIES.values()}
+        self.stats = {"submitted": 0, "completed": 0, "superseded": 0, "failed": 0}
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"analysis-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(
+        self, car_id: str, priority: str, *args, kind: str = "frame"
+    ) -> AnalysisJob:
+        """
+        Queue a job for car_id; an older queued job of that car and kind
+        (frame, sweep, roi, ...) is dropped and the new one takes its place.
+        """
+        if priority not in PRIORITIES:
+            priority = DEFAULT_PRIORITY
+
+        with self._cond:
+            stale = self._pending.pop((car_id, kind), None)
+            if stale is not None:
+                # An urgent request stays urgent even if its frame was replaced
+                if PRIORITIES[stale.priority] < PRIORITIES[priority]:
+                    priority = stale.priority
+                stale.superseded = True
+                stale.finish()
+                self.stats["superseded"] += 1
+
+            job = AnalysisJob(car_id, priority, args, kind)
+            cls = PRIORITIES[priority]
+            if stale is not None:
+                # Same class (see above): the car already paid for this turn
+                start_tag = stale.start_tag
+            else:
+                weight = self.weights.get(car_id, 1.0)
+                start_tag = max(
+                    self._virtual_time[cls], self._finish_tags.get((cls, car_id), 0.0)
+                )
+                self._finish_tags[(cls, car_id)] = start_tag + 1.0 / weight
+            job.start_tag = start_tag
+            heapq.heappush(self._heap, (cls, start_tag, next(self._seq), job))
+            self._pending[(car_id, kind)] = job
+            self.stats["submitted"] += 1
+            self._cond.notify()
+        return job
+
+    def queue_depth(self) -> int:
+        with self._cond:
+            return len(self._pending)
+
+    def _next_job(self) -> AnalysisJob:
+        with self._cond:
+            while True:
+                while self._heap:
+                    cls, start_tag, _, job = heapq.heappop(self._heap)
+                    if job.superseded:
+                        continue
+                    self._virtual_time[cls] = start_tag
+                    if self._pending.get((job.car_id, job.kind)) is job:
+                        del self._pending[(job.car_id, job.kind)]
+                    job.started_at = time.monotonic()
+                    return job
+                self._cond.wait()
+
+    def _worker(self):
+        while True:
+            job = self._next_job()
+            try:
+                result = job.context.run(self.handler, *job.args)
+            except Exception as e:
+                with self._cond:
+                    self.stats["failed"] += 1
+                job.finish(error=e)
+            else:
+                with self._cond:
+                    self.stats["completed"] += 1
+                job.finish(result=result)
@@ -0,0 +1,438 @@
+"""
+Analyzer cascade for the laptop server.
+
+Each stage looks at the image and either answers with an analysis in the
+Gemini response format plus a confidence, or declines. The cascade accepts
+the first answer at or above that stage's threshold and otherwise escalates
+to the next stage; the last stage (Gemini) is always accepted.
+
+ColorBlobDetector is the cheap first stage: for simple "<colour> <object>"
+goals such as "red keychain" it segments the colour in HSV with NumPy, keeps
+the largest blob and derives the action code and BOX line from it.
+"""
+
+import re
+import threading
+import time
+from collections import deque, namedtuple
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import logs
+import tracing
+from heading_controller import ControllerGains, resolve_target_height, size_to_distance
+from image_utils import decode_bmp, downscale, split_mosaic
+from navigation_analysis import (
+    TARGET_VISIBLE_CODES,
+    crop_box_to_frame,
+    parse_action_code,
+    parse_target_box,
+)
+
+StageResult = namedtuple("StageResult", ["text", "confidence"])
+log = logs.get("analyzer_cascade")
+
+# Hue ranges in degrees (a range may wrap through 0, like red)
+COLOR_HUES = {
+    "red": (345.0, 15.0),
+    "orange": (15.0, 40.0),
+    "yellow": (40.0, 70.0),
+    "green": (70.0, 170.0),
+    "blue": (190.0, 260.0),
+    "purple": (260.0, 300.0),
+    "pink": (300.0, 345.0),
+}
+COLOR_ALIASES = {"violet": "purple", "magenta": "pink", "lime": "green"}
+# Goals that depend on more than "the one thing of this colour" go to Gemini
+COMPLEX_WORDS = {
+    "behind",
+    "under",
+    "beside",
+    "between",
+    "near",
+    "next",
+    "inside",
+    "without",
+    "not",
+    "except",
+    "left",
+    "right",
+    "and",
+    "or",
+}
+MAX_GOAL_WORDS = 10
+
+MIN_SATURATION = 0.45
+MIN_VALUE = 0.25
+DETECT_WIDTH = 160  # Frames are downscaled to about this width before segmenting
+MIN_BLOB_PIXELS = 6  # At detection resolution; smaller blobs are noise
+CONFIDENT_BLOB_PIXELS = 12
+# Confidence of NOT_FOUND when no pixel has the colour. Lighting can push a
+# visible target's colour out of range, so this stays below the cascade
+# threshold (0.75) and Gemini still checks frames where the colour is absent
+ABSENT_CONFIDENCE = 0.6
+EDGE_PENALTY = 0.85  # A blob cut by the frame edge may be partly hidden
+TOO_CLOSE_DISTANCE = 0.15  # metres; closer than this is MOVE_BACKWARD
+# Most an arrived or too-close call may claim when the target's height (and
+# so its range) is only guessed; below the cascade threshold, Gemini decides
+GUESSED_RANGE_CONFIDENCE = 0.5
+LATENCY_SAMPLES = 500
+
+
+def parse_color_goal(goal: str) -> Optional[Tuple[str, str]]:
+    """
+    Split a simple goal like "Find a red keychain" into ("red", "keychain").
+    Returns None when the goal has no colour, several colours, or relational
+    wording the colour detector cannot judge.
+    """
+    words = re.findall(r"[a-z]+", goal.lower())
+    if not words or len(words) > MAX_GOAL_WORDS or COMPLEX_WORDS & set(words):
+        return None
+    found = [
+        (i, COLOR_ALIASES.get(w, w))
+        for i, w in enumerate(words)
+        if COLOR_ALIASES.get(w, w) in COLOR_HUES
+    ]
+    if len({color for _, color in found}) != 1:
+        return None
+    index, color = found[0]
+    return color, (words[index + 1] if index + 1 < len(words) else "object")
+
+
+def rgb_to_hsv(image: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Hue (degrees), saturation and value (0-1) of an (H, W, 3) RGB image."""
+    rgb = image.astype(np.float32) / 255.0
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    value = rgb.max(axis=-1)
+    chroma = value - rgb.min(axis=-1)
+    safe = np.where(chroma > 0, chroma, 1.0)
+    hue = np.where(
+        value == r,
+        (g - b) / safe,
+        np.where(value == g, 2.0 + (b - r) / safe, 4.0 + (r - g) / safe),
+    )
+    hue = (hue * 60.0) % 360.0
+    saturation = np.where(value > 0, chroma / np.where(value > 0, value, 1.0), 0.0)
+    return hue, saturation, value
+
+
+def color_mask(image: np.ndarray, color: str) -> np.ndarray:
+    """Boolean mask of saturated, reasonably bright pixels of a named colour."""
+    hue, saturation, value = rgb_to_hsv(image)
+    lo, hi = COLOR_HUES[color]
+    in_range = (hue >= lo) & (hue < hi) if lo < hi else (hue >= lo) | (hue < hi)
+    return in_range & (saturation >= MIN_SATURATION) & (value >= MIN_VALUE)
+
+
+def label_blobs(mask: np.ndarray) -> np.ndarray:
+    """
+    4-connected component labels (0 = background) by min-label propagation
+    with pointer jumping; vectorized, so it runs in a few dozen NumPy passes.
+    """
+    big = mask.size + 1
+    labels = np.where(mask, np.arange(1, mask.size + 1).reshape(mask.shape), big)
+    while True:
+        padded = np.pad(labels, 1, constant_values=big)
+        neighbours = np.minimum.reduce(
+            [
+                labels,
+                padded[:-2, 1:-1],
+                padded[2:, 1:-1],
+                padded[1:-1, :-2],
+                padded[1:-1, 2:],
+            ]
+        )
+        updated = np.where(mask, neighbours, big)
+        # Pointer jumping: adopt the label that our label's pixel now holds
+        flat = np.append(updated.ravel(), big)
+        updated = np.where(mask, flat[np.minimum(updated, big) - 1], big)
+        if np.array_equal(updated, labels):
+            break
+        labels = updated
+    return np.where(mask, labels, 0)
+
+
+class ColorBlobDetector:
+    """First cascade stage: colour segmentation and blob analysis."""
+
+    name = "color"
+
+    def __init__(self, gains: Optional[ControllerGains] = None):
+        self.gains = gains or ControllerGains()
+
+    def __call__(self, image_bytes: bytes, goal: str) -> Optional[StageResult]:
+        parsed = parse_color_goal(goal)
+        if parsed is None:
+            return None
+        try:
+            image = decode_bmp(image_bytes)
+        except (ValueError, IndexError):
+            return None  # Not a BMP we can read; let Gemini handle it
+        return self.detect(image, *parsed)
+
+    def detect(self, image: np.ndarray, color: str, thing: str) -> StageResult:
+        factor = max(1, image.shape[1] // DETECT_WIDTH)
+        small = downscale(image, factor)
+        mask = color_mask(small, color)
+        total = int(mask.sum())
+        if total < MIN_BLOB_PIXELS:
+            return StageResult(
+                f"NOT_FOUND\nNo {color} region in view (local colour detector).",
+                ABSENT_CONFIDENCE if total == 0 else ABSENT_CONFIDENCE / 2.0,
+            )
+
+        labels = label_blobs(mask)
+        ids, counts = np.unique(labels[labels > 0], return_counts=True)
+        blob = ids[np.argmax(counts)]
+        pixels = int(counts.max())
+        rows, cols = np.nonzero(labels == blob)
+        height, width = mask.shape
+        top, bottom = rows.min(), rows.max() + 1
+        left, right = cols.min(), cols.max() + 1
+
+        # Confident when one compact blob of decent size holds most of the colour
+        dominance = pixels / total
+        fill = pixels / float((bottom - top) * (right - left))
+        confidence = (
+            dominance
+            * min(1.0, fill / 0.5)
+            * min(1.0, pixels / float(CONFIDENT_BLOB_PIXELS))
+        )
+        if top == 0 or left == 0 or bottom == height or right == width:
+            confidence *= EDGE_PENALTY
+
+        box = (top / height, left / width, bottom / height, right / width)
+        return self.describe(box, float(confidence), color, thing)
+
+    def describe(
+        self, box: Sequence[float], confidence: float, color: str, thing: str
+    ) -> StageResult:
+        """Action code, explanation and BOX line for a target box (0-1)."""
+        offset = box[1] + box[3] - 1.0
+        height, given = resolve_target_height(self.gains.target_height)
+        distance = size_to_distance(box[2] - box[0], height)
+        if distance <= TOO_CLOSE_DISTANCE:
+            code = "MOVE_BACKWARD"
+        elif distance <= self.gains.goal_distance and abs(offset) < 0.5:
+            code = "GOAL_ACHIEVED"
+        elif offset < -0.5:
+            code = "MOVE_LEFT"
+        elif offset > 0.5:
+            code = "MOVE_RIGHT"
+        else:
+            code = "MOVE_FORWARD"
+        if code in ("GOAL_ACHIEVED", "MOVE_BACKWARD") and not given:
+            confidence = min(confidence, GUESSED_RANGE_CONFIDENCE)
+        ymin, xmin, ymax, xmax = (int(round(v * 1000)) for v in box)
+        return StageResult(
+            f"{code}\nLocal colour detector: {color} {thing} about "
+            f"{distance:.1f}m away (confidence {confidence:.2f}).\n"
+            f"BOX: [{ymin}, {xmin}, {ymax}, {xmax}]",
+            confidence,
+        )
+
+
+class SweepColorLocator:
+    """
+    First sweep-cascade stage: runs the colour detector on every mosaic tile
+    and names the tile where the target is most centred.
+    """
+
+    def __init__(self, detector: Optional[ColorBlobDetector] = None):
+        self.detector = detector or ColorBlobDetector()
+
+    def __call__(
+        self, image_bytes: bytes, goal: str, layout: dict
+    ) -> Optional[StageResult]:
+        parsed = parse_color_goal(goal)
+        if parsed is None:
+            return None
+        try:
+            mosaic = decode_bmp(image_bytes)
+        except (ValueError, IndexError):
+            return None
+        tiles = split_mosaic(
+            mosaic, layout["rows"], layout["columns"], layout.get("border", 4)
+        )[: layout.get("tiles")]
+        results = [self.detector.detect(tile, *parsed) for tile in tiles]
+        seen = [
+            (index, result)
+            for index, result in enumerate(results)
+            if parse_action_code(result.text) in TARGET_VISIBLE_CODES
+        ]
+        if not seen:
+            return StageResult(
+                f"TILE: NONE\nNo {parsed[0]} region in any tile (local colour detector).",
+                min(result.confidence for result in results),
+            )
+
+        # Neighbouring views overlap, so the target may show in two adjacent
+        # tiles; prefer the one where it is nearest the centre
+        index, best = min(
+            seen, key=lambda item: abs(parse_target_box(item[1].text)["offset"])
+        )
+        confidence = best.confidence
+        neighbours = {(index - 1) % len(tiles), index, (index + 1) % len(tiles)}
+        if any(i not in neighbours for i, _ in seen):
+            confidence *= 0.5  # The colour shows in unrelated directions
+        box_line = best.text.rsplit("\n", 1)[1]
+        return StageResult(
+            f"TILE: {index}\nLocal colour detector: {parsed[0]} {parsed[1]} in "
+            f"tile {index} (confidence {confidence:.2f}).\n{box_line}",
+            float(confidence),
+        )
+
+
+class RoiColorDetector:
+    """
+    First ROI-cascade stage: the colour detector on the full-resolution crop
+    around the predicted target, falling back to the shrunk overview when the
+    crop does not hold the whole target.
+    """
+
+    def __init__(self, detector: Optional[ColorBlobDetector] = None):
+        self.detector = detector or ColorBlobDetector()
+
+    def __call__(
+        self, image_bytes: bytes, goal: str, roi_bytes: bytes, region: Sequence[float]
+    ) -> Optional[StageResult]:
+        parsed = parse_color_goal(goal)
+        if parsed is None:
+            return None
+        try:
+            overview = decode_bmp(image_bytes)
+            crop = decode_bmp(roi_bytes)
+        except (ValueError, IndexError):
+            return None
+        result = self.detector.detect(crop, *parsed)
+        target = parse_target_box(result.text)
+        if parse_action_code(result.text) in TARGET_VISIBLE_CODES and target:
+            box = target["box"]
+            # A blob cut by the crop's edge may continue outside it
+            if min(box[0], box[1]) > 0.0 and max(box[2], box[3]) < 1.0:
+                return self.detector.describe(
+                    crop_box_to_frame(box, region), result.confidence, *parsed
+                )
+        return self.detector.detect(overview, *parsed)
+
+
+class _StageStats:
+    def __init__(self):
+        self.calls = 0
+        self.accepted = 0
+        self.escalated = 0
+        self.declined = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+
+    def report(self) -> dict:
+        recent = sorted(self.latencies)
+        return {
+            "calls": self.calls,
+            "accepted": self.accepted,
+            "escalated": self.escalated,
+            "declined": self.declined,
+            "errors": self.errors,
+            "hit_rate": round(self.accepted / self.calls, 3) if self.calls else 0.0,
+            "mean_ms": round(self.total_ms / self.calls, 2) if self.calls else 0.0,
+            "p95_ms": (
+                round(recent[min(len(recent) - 1, int(len(recent) * 0.95))], 2)
+                if recent
+                else 0.0
+            ),
+        }
+
+
+class AnalyzerCascade:
+    """
+    Runs stages in order until one answers confidently enough.
+
+    stages is a list of (name, analyze, threshold); analyze(image_bytes, goal,
+    *extra) returns a StageResult or None to decline. The last stage's answer
+    is always used, whatever its confidence.
+    """
+
+    def __init__(
+        self,
+        stages: Sequence[
+            Tuple[str, Callable[[bytes, str], Optional[StageResult]], float]
+        ],
+    ):
+        if not stages:
+            raise ValueError("An analyzer cascade needs at least one stage")
+        self.stages = list(stages)
+        self._stats: Dict[str, _StageStats] = {
+            name: _StageStats() for name, _, _ in stages
+        }
+        self._lock = threading.Lock()
+        self.analyses = 0
+
+    def analyze(self, image_bytes: bytes, goal: str, *extra) -> Tuple[str, str]:
+        """Return (analysis text, name of the stage that produced it)."""
+        last = len(self.stages) - 1
+        for index, (name, stage, threshold) in enumerate(self.stages):
+            started = time.perf_counter()
+            try:
+                with tracing.span(f"stage:{name}"):
+                    result = stage(image_bytes, goal, *extra)
+                failed = False
+            except Exception as e:
+                if index == last:
+                    raise
+                log.warning("Analyzer stage failed", stage=name, error=str(e))
+                result, failed = None, True
+            elapsed_ms = (time.perf_counter() - started) * 1000.0
+
+            accept = result is not None and (
+                index == last or result.confidence >= threshold
+            )
+            with self._lock:
+                stats = self._stats[name]
+                stats.calls += 1
+                stats.total_ms += elapsed_ms
+                stats.latencies.append(elapsed_ms)
+                if failed:
+                    stats.errors += 1
+                elif result is None:
+                    stats.declined += 1
+                elif accept:
+                    stats.accepted += 1
+                else:
+                    stats.escalated += 1
+                if accept:
+                    self.analyses += 1
+            if accept:
+                return result.text, name
+        raise RuntimeError("Last analyzer stage declined to answer")
+
+    def report(self) -> dict:
+        """Per-stage hit rate and latency, and how many analyses skipped Gemini."""
+        with self._lock:
+            stages = {name: self._stats[name].report() for name, _, _ in self.stages}
+            final = self.stages[-1][0]
+            avoided = self.analyses - self._stats[final].accepted
+            return {
+                "analyses": self.analyses,
+                "answered_before_" + final: avoided,
+                "avoided_fraction": (
+                    round(avoided / self.analyses, 3) if self.analyses else 0.0
+                ),
+                "stages": stages,
+            }
+
+
+def format_report(report: dict) -> List[str]:
+    """Human-readable lines for a cascade report."""
+    lines = [
+        f"{report['analyses']} analyses, "
+        f"{report['avoided_fraction'] * 100:.1f}% answered without the last stage"
+    ]
+    for name, stats in report["stages"].items():
+        lines.append(
+            f"{name:>8}: calls {stats['calls']:>5}  hit rate {stats['hit_rate'] * 100:5.1f}%  "
+            f"escalated {stats['escalated']:>4}  declined {stats['declined']:>4}  "
+            f"mean {stats['mean_ms']:8.2f} ms  p95 {stats['p95_ms']:8.2f} ms"
+        )
+    return lines
@@ -4,12 +4,27 @@ Example autonomous navigation workflow using the MCP server
 This demonstrates how an LLM would control the RC car to find a target object
 """
 
+import os
 import requests
 import time
 import json
 
+from heading_controller import HeadingController
+from navigation_analysis import parse_target_box
+from pose_tracker import PoseTracker
+from search_planner import SearchPlanner
+
 # Configuration
-BASE_URL = "http://10.33.35.1:5000"
+BASE_URL = os.environ.get("PI_URL", "http://10.33.35.1:5000")
+# Photos are served by the media service
+MEDIA_URL = os.environ.get("MEDIA_URL", "http://10.33.35.1:5001")
+LAPTOP_IP = os.environ.get("LAPTOP_IP", "10.33.49.88")  # Analyzer laptop
+MOVE_TOOLS = {
+    "forward": "move_forward",
+    "backward": "move_backward",
+    "left": "turn_left",
+    "right": "turn_right",
+}
 
 
 def simulate_mcp_call(tool_name: str, **kwargs):
@@ -148,11 +163,11 @@ def simulate_take_photo_and_analyze(goal_description: str):
     try:
         payload = {
             "goal": goal_description,
-            "laptop_ip": "10.33.49.88",
+            "laptop_ip": LAPTOP_IP,
             "laptop_port": 8000,
         }
 
-        response = requests.post(f"{BASE_URL}/photo", json=payload, timeout=15)
+        response = requests.post(f"{MEDIA_URL}/photo", json=payload, timeout=15)
         result = response.json()
 
         return {
@@ -230,6 +245,9 @@ def autonomous_navigation_example():
     print("🧭 Step 3: Starting autonomous navigation...")
     max_iterations = 20  # Safety limit
     iteration = 0
+    tracker = PoseTracker()  # Dead-reckoned pose, fed by every move
+    planner = SearchPlanner()  # Headings already photographed
+    controller = HeadingController()  # Turn/drive lengths from the target box
 
     while iteration < max_iterations:
         iteration += 1
@@ -241,39 +259,58 @@ def autonomous_navigation_example():
         )
         analysis = photo_result.get("analysis_result", "")
         print(f"📸 Photo analysis: {analysis}")
+        planner.record_observation(tracker.to_dict())
+        tracker.observe_analysis(analysis)
 
         # Check if goal is achieved
         if "GOAL_ACHIEVED" in analysis:
             print("🎉 SUCCESS: Goal achieved!")
             break
 
+        # Steer proportionally when the analysis located the target
+        target = parse_target_box(analysis)
+        if target is not None:
+            control = controller.command(target)
+            print(
+                f"🎯 Target {control['bearing']:+.0f}° off, ~{control['distance']}m away"
+            )
+            for move in control["moves"]:
+                result = simulate_mcp_call(
+                    MOVE_TOOLS[move["action"]], duration=move["duration"]
+                )
+                tracker.apply_command(move["action"], move["duration"])
+            time.sleep(0.5)
+            continue
+
         # Execute movement based on analysis
         if "MOVE_LEFT" in analysis:
             print("⬅️  Moving left (fine adjustment)...")
-            result = simulate_mcp_call("turn_left", duration=0.2)
+            direction, duration = "left", 0.2
         elif "MOVE_RIGHT" in analysis:
             print("➡️  Moving right (fine adjustment)...")
-            result = simulate_mcp_call("turn_right", duration=0.2)
+            direction, duration = "right", 0.2
         elif "MOVE_FORWARD" in analysis:
             print("⬆️  Moving forward...")
-            result = simulate_mcp_call("move_forward", duration=0.3)
+            direction, duration = "forward", 0.3
         elif "MOVE_BACKWARD" in analysis:
             print("⬇️  Moving backward...")
-            result = simulate_mcp_call("move_backward", duration=0.3)
-        elif "TURN_LEFT" in analysis:
-            print("🔄 Turning left (searching)...")
-            result = simulate_mcp_call("turn_left", duration=0.4)
-        elif "TURN_RIGHT" in analysis:
-            print("🔄 Turning right (searching)...")
-            result = simulate_mcp_call("turn_right", duration=0.4)
-        elif "NOT_FOUND" in analysis:
-            print("🔍 Target not found, searching systematically...")
-            result = simulate_mcp_call("turn_left", duration=0.5)
+            direction, duration = "backward", 0.3
+        elif any(c in analysis for c in ("TURN_LEFT", "TURN_RIGHT", "NOT_FOUND")):
+            # Go where the most not-yet-photographed view is, not a fixed turn
+            step = planner.next_action(tracker.to_dict())
+            direction, duration = step["action"], step["duration"]
+            print(
+                f"🔍 Target not visible, searching {direction} for {duration}s "
+                f"({step['expected_new_degrees']}° unseen)..."
+            )
         else:
             print("❓ Unknown analysis result, stopping...")
             simulate_mcp_call("stop_car")
             break
 
+        result = simulate_mcp_call(MOVE_TOOLS[direction], duration=duration)
+        tracker.apply_command(direction, duration)
+
         print(f"Movement result: {result.get('status', 'unknown')}")
 
         # Brief pause between movements
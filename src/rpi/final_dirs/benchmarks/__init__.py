@@ -0,0 +1,4 @@
+"""
+Simulator-backed benchmarks. Run from final_dirs, e.g.
+    python -m benchmarks.search_benchmark
+"""
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Steps-to-centre benchmark: fixed 0.2s nudges vs. the proportional controller.
+
+Each mission starts with the target visible somewhere in the frame. A
+strategy is done once it stops turning; it succeeded if the true heading
+error is then within the tolerance.
+"""
+
+import argparse
+import math
+import random
+import statistics
+
+from heading_controller import HeadingController
+from navigation_analysis import parse_action_code, parse_target_box
+from pose_tracker import CAMERA_HFOV_DEG
+from simulator.world import World
+
+CONTROLLER = HeadingController()
+MAX_PHOTOS = 12
+TOLERANCE = 5.0  # degrees of true heading error counted as centred
+
+
+def visible_target_world(seed: int) -> World:
+    rng = random.Random(seed)
+    bearing = math.radians(rng.uniform(-0.95, 0.95) * CAMERA_HFOV_DEG / 2.0)
+    distance = rng.uniform(1.0, 3.0)
+    return World(distance * math.cos(bearing), distance * math.sin(bearing), seed=seed)
+
+
+def search_turn(world: World, code: str):
+    """Recovery when the target was lost, as in autonomous_navigation_example.py."""
+    if code == "TURN_RIGHT":
+        world.execute("right", 0.4)
+    elif code == "TURN_LEFT":
+        world.execute("left", 0.4)
+    else:
+        world.execute("left", 0.5)
+
+
+def fixed_nudges(world: World, analysis: str) -> bool:
+    """Return False once the strategy considers the target centred."""
+    code = parse_action_code(analysis)
+    if code == "MOVE_LEFT":
+        world.execute("left", 0.2)
+    elif code == "MOVE_RIGHT":
+        world.execute("right", 0.2)
+    elif code in ("MOVE_FORWARD", "MOVE_BACKWARD", "GOAL_ACHIEVED"):
+        return False
+    else:
+        search_turn(world, code)
+    return True
+
+
+def proportional(world: World, analysis: str) -> bool:
+    target = parse_target_box(analysis)
+    if target is None:
+        search_turn(world, parse_action_code(analysis))
+        return True
+    turns = CONTROLLER.command(target, allow_forward=False)["moves"]
+    for move in turns:
+        world.execute(move["action"], move["duration"])
+    return bool(turns)
+
+
+def run(strategy, seeds):
+    steps, errors, flips, centred = [], [], [], 0
+    for seed in seeds:
+        world = visible_target_world(seed)
+        last_sign, sign_flips = 0, 0
+        while world.photos < MAX_PHOTOS:
+            if not strategy(world, world.analyze()):
+                break
+            sign = 1 if world.target_bearing() > 0 else -1
+            if last_sign and sign != last_sign:
+                sign_flips += 1
+            last_sign = sign
+        error = abs(world.target_bearing())
+        centred += error <= TOLERANCE
+        steps.append(world.photos)
+        errors.append(error)
+        flips.append(sign_flips)
+    return {
+        "centred": centred,
+        "mean_photos": statistics.mean(steps),
+        "mean_error": statistics.mean(errors),
+        "mean_overshoots": statistics.mean(flips),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--missions", type=int, default=300)
+    args = parser.parse_args()
+
+    seeds = list(range(args.missions))
+    print(f"Centering benchmark over {len(seeds)} simulated missions")
+    print("=" * 72)
+    for name, strategy in (("fixed", fixed_nudges), ("proportional", proportional)):
+        r = run(strategy, seeds)
+        print(
+            f"{name:>12}: centred {r['centred']:>3}/{len(seeds)}  "
+            f"photos {r['mean_photos']:.2f}  "
+            f"final error {r['mean_error']:5.1f}°  "
+            f"overshoots {r['mean_overshoots']:.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Bytes per upload: whole BMPs vs. delta-encoded frames (frame_codec).
+
+Each mission centres on and approaches a visible target with the
+proportional controller, rendering one frame per analysis as the Pi would
+photograph it. Every frame goes through a DeltaEncoder on the "Pi" and
+decode_delta on the "laptop"; the report shows bytes sent against the BMP
+size, how often a keyframe was needed, codec time and the largest pixel
+error the tile tolerance let through.
+"""
+
+import argparse
+import math
+import random
+import statistics
+import time
+
+import numpy as np
+
+from frame_codec import DeltaEncoder, decode_delta
+from heading_controller import HeadingController
+from image_utils import encode_bmp
+from navigation_analysis import parse_target_box
+from pose_tracker import CAMERA_HFOV_DEG
+from simulator.render import FrameRenderer
+from simulator.world import World
+
+CONTROLLER = HeadingController()
+MAX_PHOTOS = 12
+
+
+def mission_world(seed: int) -> World:
+    rng = random.Random(seed)
+    bearing = math.radians(rng.uniform(-0.8, 0.8) * CAMERA_HFOV_DEG / 2.0)
+    distance = rng.uniform(1.0, 3.0)
+    return World(distance * math.cos(bearing), distance * math.sin(bearing), seed=seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--missions", type=int, default=30)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    args = parser.parse_args()
+
+    sent = {"keyframe": [], "delta": []}
+    encode_ms, decode_ms, errors = [], [], []
+    bmp_bytes = 0
+    for seed in range(args.missions):
+        world = mission_world(seed)
+        renderer = FrameRenderer(args.width, args.height, seed=seed)
+        encoder = DeltaEncoder()
+        reference = None  # The laptop's copy
+        while world.photos < MAX_PHOTOS:
+            frame = renderer.render(world)
+            bmp = encode_bmp(frame)
+            bmp_bytes = len(bmp)
+            started = time.perf_counter()
+            delta = encoder.encode(frame)
+            encode_ms.append((time.perf_counter() - started) * 1000.0)
+            if delta is None:
+                reference = frame
+                sent["keyframe"].append(len(bmp))
+            else:
+                started = time.perf_counter()
+                reference = decode_delta(delta, reference)
+                decode_ms.append((time.perf_counter() - started) * 1000.0)
+                sent["delta"].append(len(delta))
+                errors.append(int(np.abs(reference.astype(np.int16) - frame).max()))
+            encoder.commit()
+
+            target = parse_target_box(world.analyze())
+            if target is None:
+                world.execute("left", 0.4)
+                continue
+            command = CONTROLLER.command(target)
+            if command["arrived"]:
+                break
+            for move in command["moves"]:
+                world.execute(move["action"], move["duration"])
+
+    uploads = len(sent["keyframe"]) + len(sent["delta"])
+    total = sum(sent["keyframe"]) + sum(sent["delta"])
+    print(f"Frame uploads over {args.missions} simulated approaches")
+    print("=" * 72)
+    print(
+        f"{uploads} uploads of {args.width}x{args.height} frames "
+        f"({bmp_bytes / 1024:.0f} KiB as BMP): "
+        f"{len(sent['keyframe'])} keyframes, {len(sent['delta'])} deltas"
+    )
+    if sent["delta"]:
+        print(
+            f"Delta size: median {statistics.median(sent['delta']) / 1024:.1f} KiB, "
+            f"max {max(sent['delta']) / 1024:.1f} KiB; largest pixel error {max(errors)}"
+        )
+        print(
+            f"Codec time: encode median {statistics.median(encode_ms):.1f}ms, "
+            f"decode median {statistics.median(decode_ms):.1f}ms"
+        )
+    print(
+        f"Bytes sent: {total / 1024:.0f} KiB vs {uploads * bmp_bytes / 1024:.0f} KiB "
+        f"of BMPs ({total / (uploads * bmp_bytes):.1%})"
+    )
+
+
+if __name__ == "__main__":
+    main()
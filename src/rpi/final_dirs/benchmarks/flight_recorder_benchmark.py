@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Flight recorder cost: what recording adds to a request, how large a mission
+log gets, and how fast it replays.
+
+A simulated mission of motor segments, photos (rendered frames, many of
+them repeats of the one before, as when the car has not moved), analysis
+requests and results, and trace spans is recorded. The report shows the
+time the recording calls take on the caller's thread (they only enqueue),
+the file size against the raw frames, and the time to index the file with
+mmap, decode every record and pull frames back out at random.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from flight_recorder import FlightLog, FlightRecorder
+from simulator.render import FrameRenderer
+from simulator.world import World
+
+REPEAT_CHANCE = 0.6  # Photos taken without the car having moved
+
+
+class _FakeTrace:
+    def __init__(self, index: int):
+        self.trace_id = f"{index:016x}"
+
+    def export(self):
+        names = ("burst", "frame_check", "encode", "upload", "queue_wait", "gemini")
+        return [
+            {
+                "id": f"{i:08x}",
+                "parent": None,
+                "name": name,
+                "process": "pi_media",
+                "start_ms": 10.0 * i,
+                "duration_ms": 9.5,
+            }
+            for i, name in enumerate(names)
+        ]
+
+
+def record_mission(recorder: FlightRecorder, photos: int, width: int, height: int):
+    """Record a mission; returns (microseconds per call by kind, raw frame bytes)."""
+    rng = random.Random(0)
+    renderer = FrameRenderer(width, height, seed=0)
+    world = World(2.0, 0.3, seed=0)
+    frame = renderer.render(world)
+    timings = {"motor": [], "frame": [], "analysis": [], "spans": []}
+    raw = 0
+    clock = time.monotonic()
+    for index in range(photos):
+        if rng.random() > REPEAT_CHANCE:
+            action = rng.choice(("forward", "left", "right"))
+            duration = rng.uniform(0.2, 1.1)
+            world.execute(action, duration)
+            frame = renderer.render(world)
+            segment = {
+                "action": action,
+                "duty": 25.0,
+                "requested": duration,
+                "start": clock,
+                "end": clock + duration + rng.uniform(0.0, 0.002),
+            }
+            clock += duration + 0.5
+            started = time.perf_counter()
+            recorder.motor(segment)
+            timings["motor"].append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        frame_id = recorder.frame(frame)
+        timings["frame"].append(time.perf_counter() - started)
+        raw += frame.nbytes
+        started = time.perf_counter()
+        recorder.analysis(
+            goal="find the red ball",
+            car_id="car1",
+            status="success",
+            frame=frame_id,
+            annotation="MOVE_FORWARD\nThe red ball is ahead, slightly left.",
+            queue_wait_ms=1.2,
+        )
+        timings["analysis"].append(time.perf_counter() - started)
+        started = time.perf_counter()
+        recorder.spans(_FakeTrace(index))
+        timings["spans"].append(time.perf_counter() - started)
+        # Photos are seconds apart on the car; let the writer keep up
+        recorder.flush()
+    per_call = {
+        kind: statistics.median(values) * 1e6 for kind, values in timings.items()
+    }
+    return per_call, raw
+
+
+def replay(path: str, lookups: int):
+    """(index ms, ms to decode every record, ms per random frame lookup)."""
+    started = time.perf_counter()
+    log = FlightLog(path)
+    indexed = time.perf_counter()
+    for _ in log.records():
+        pass
+    decoded = time.perf_counter()
+    frame_ids = list(log._frames)
+    rng = random.Random(1)
+    for _ in range(lookups):
+        log.frame(rng.choice(frame_ids))
+    looked_up = time.perf_counter()
+    log.close()
+    return (
+        (indexed - started) * 1000.0,
+        (decoded - indexed) * 1000.0,
+        (looked_up - decoded) * 1000.0 / lookups,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--photos", type=int, default=200)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--lookups", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        recorder = FlightRecorder("benchmark", directory)
+        per_call, raw = record_mission(recorder, args.photos, args.width, args.height)
+        recorder.close()
+        path = recorder.path
+        size = os.path.getsize(path)
+        log = FlightLog(path)
+        records = len(log)
+        log.close()
+
+        print(f"Flight recorder, {args.photos} photos at {args.width}x{args.height}")
+        print("=" * 72)
+        print(
+            "Caller's cost per record (median): "
+            + ", ".join(f"{kind} {us:.1f}us" for kind, us in per_call.items())
+        )
+        print(
+            f"File: {records} records, {size / 1e6:.1f}MB "
+            f"for {raw / 1e6:.1f}MB of raw frames ({raw / size:.0f}x smaller), "
+            f"{recorder.dropped} dropped"
+        )
+        index_ms, decode_ms, frame_ms = replay(path, args.lookups)
+        print(
+            f"Replay: index {index_ms:.1f}ms, decode all {decode_ms:.1f}ms, "
+            f"random frame {frame_ms:.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
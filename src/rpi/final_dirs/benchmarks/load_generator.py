@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+Load generator for the Pi's control and media services and the analyzer
+laptop: how many cars one laptop can serve, and how /stop holds up.
+
+Requests arrive open-loop: a Poisson process at the offered rate picks an
+endpoint from the mix and hands it to a pool of --concurrency clients. A
+request's latency runs from when it was due, not when a client got to it,
+so a backed-up client pool shows up as latency instead of a lower rate.
+Each rate in --rate is one stage of --duration seconds; per stage the
+report shows throughput, p50/p95/p99 latency and errors per endpoint, the
+analyzer's queue depth (polled from /health) and a /stop probe sent every
+--stop-interval seconds on its own connection. The first stage where
+fewer than 90% of the /receive_image requests are answered (failed or
+superseded by a newer frame of the same car), or their p95 passes --slo,
+is reported as the saturation point.
+
+    python -m benchmarks.load_generator --sim --rate 1 2 4 8
+    python -m benchmarks.load_generator --mix receive_image=1 --cars 4 --rate 0.5 1 2
+    PI_URL=http://10.33.35.1:5000 python -m benchmarks.load_generator --mix forward=1,stop=1
+
+Without --sim the URLs come from PI_URL, MEDIA_URL and LAPTOP_IP, as for
+sample_requests.py. Motor requests move a real car: keep it on a stand.
+"""
+
+import argparse
+import itertools
+import os
+import random
+import statistics
+import threading
+import time
+from collections import Counter, defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from car_registry import MEDIA_PORT
+from image_utils import encode_bmp
+
+PI_URL = os.environ.get("PI_URL", "http://10.33.35.1:5000")
+MEDIA_URL = os.environ.get("MEDIA_URL", "http://10.33.35.1:5001")
+LAPTOP_IP = os.environ.get("LAPTOP_IP", "10.33.49.88")
+LAPTOP_PORT = 8000
+
+MOTIONS = ("forward", "backward", "left", "right")
+ENDPOINTS = MOTIONS + ("stop", "photo", "receive_image")
+DEFAULT_MIX = "forward=1,left=1,right=1,photo=1,receive_image=3"
+GOAL = "the charging station"  # Not a colour goal: every analysis reaches Gemini
+MOVE_DURATION = 0.2  # seconds per motor request
+TIMEOUT = 30  # seconds per request
+QUEUE_POLL = 0.25  # seconds between /health polls
+SATURATED = 0.9  # Fewer of the offered requests answered than this: saturated
+
+# due: when the arrival process scheduled it; sent: when a client sent it
+Sample = namedtuple("Sample", ["endpoint", "due", "sent", "done", "status"])
+
+
+def parse_mix(text: str) -> dict:
+    """'forward=1,photo=2' -> {"forward": 1.0, "photo": 2.0}"""
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip().lstrip("/")
+        if name not in ENDPOINTS:
+            raise ValueError(
+                f"Unknown endpoint {name!r} (one of {', '.join(ENDPOINTS)})"
+            )
+        mix[name] = float(weight or 1.0)
+    return mix
+
+
+def test_image() -> bytes:
+    """A rendered simulator frame, BMP-encoded like the Pi's uploads."""
+    from simulator.render import FrameRenderer
+    from simulator.world import World
+
+    return encode_bmp(FrameRenderer(seed=0).render(World(2.0, 0.3, seed=0)))
+
+
+class Client:
+    """Sends one request per endpoint name; one HTTP session per thread."""
+
+    def __init__(self, pi_url, media_url, laptop_ip, laptop_port, image, cars, goal):
+        self.pi_url = pi_url
+        self.media_url = media_url
+        self.laptop_ip = laptop_ip
+        self.laptop_port = laptop_port
+        self.image = image
+        self.cars = [f"car{n}" for n in range(1, cars + 1)]
+        self.goal = goal
+        self._local = threading.local()
+        self._car_ids = itertools.cycle(self.cars)
+        self._lock = threading.Lock()
+
+    @property
+    def session(self) -> requests.Session:
+        if not hasattr(self._local, "session"):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def car_id(self) -> str:
+        """Round-robin over the simulated cars sharing the laptop."""
+        with self._lock:
+            return next(self._car_ids)
+
+    def send(self, endpoint: str) -> int:
+        """HTTP status of one request; 0 when it failed to complete."""
+        try:
+            if endpoint in MOTIONS:
+                response = self.session.post(
+                    f"{self.pi_url}/{endpoint}",
+                    json={"duration": MOVE_DURATION},
+                    timeout=TIMEOUT,
+                )
+            elif endpoint == "stop":
+                response = self.session.post(f"{self.pi_url}/stop", timeout=TIMEOUT)
+            elif endpoint == "photo":
+                response = self.session.post(
+                    f"{self.media_url}/photo",
+                    json={
+                        "goal": self.goal,
+                        "laptop_ip": self.laptop_ip,
+                        "laptop_port": self.laptop_port,
+                        "car_id": self.cars[0],
+                    },
+                    timeout=TIMEOUT,
+                )
+            else:
+                response = self.session.post(
+                    f"http://{self.laptop_ip}:{self.laptop_port}/receive_image",
+                    files={"image": ("frame.bmp", self.image, "image/bmp")},
+                    data={"goal": self.goal, "car_id": self.car_id()},
+                    timeout=TIMEOUT,
+                )
+            return response.status_code
+        except requests.RequestException:
+            return 0
+
+    def queue_depth(self):
+        try:
+            response = requests.get(
+                f"http://{self.laptop_ip}:{self.laptop_port}/health", timeout=2
+            )
+            return response.json().get("queue_depth")
+        except (requests.RequestException, ValueError):
+            return None
+
+
+def run_stage(client, mix, rate, duration, concurrency, stop_interval, seed):
+    """
+    Offer `rate` requests/s for `duration` seconds. Returns the samples, the
+    queue depths seen and the number of requests offered per endpoint.
+    """
+    rng = random.Random(seed)
+    names, weights = list(mix), list(mix.values())
+    samples, depths = [], []
+    lock = threading.Lock()
+    running = threading.Event()
+    running.set()
+
+    def timed(endpoint, due):
+        sent = time.monotonic()
+        status = client.send(endpoint)
+        with lock:
+            samples.append(Sample(endpoint, due, sent, time.monotonic(), status))
+
+    def probe_stop():
+        probe = Client(
+            client.pi_url, None, client.laptop_ip, client.laptop_port, b"", 1, ""
+        )
+        while running.is_set():
+            due = time.monotonic()
+            status = probe.send("stop")
+            with lock:
+                samples.append(Sample("stop probe", due, due, time.monotonic(), status))
+            time.sleep(stop_interval)
+
+    def poll_queue():
+        while running.is_set():
+            depth = client.queue_depth()
+            if depth is not None:
+                depths.append(depth)
+            time.sleep(QUEUE_POLL)
+
+    helpers = [threading.Thread(target=poll_queue, daemon=True)]
+    if stop_interval:
+        helpers.append(threading.Thread(target=probe_stop, daemon=True))
+    for thread in helpers:
+        thread.start()
+
+    offered = Counter()
+    with ThreadPoolExecutor(concurrency, thread_name_prefix="load") as pool:
+        started = time.monotonic()
+        due = started
+        while True:
+            due += rng.expovariate(rate)
+            if due >= started + duration:
+                break
+            time.sleep(max(0.0, due - time.monotonic()))
+            endpoint = rng.choices(names, weights)[0]
+            pool.submit(timed, endpoint, due)
+            offered[endpoint] += 1
+        # Leaving the pool waits for the requests still queued or in flight
+    running.clear()
+    for thread in helpers:
+        thread.join()
+    return samples, depths, offered
+
+
+def percentile(values: list, q: float):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def report(samples: list, duration: float) -> dict:
+    """Per endpoint: count, throughput, errors and latency percentiles (ms)."""
+    by_endpoint = defaultdict(list)
+    for sample in samples:
+        by_endpoint[sample.endpoint].append(sample)
+    stats = {}
+    for endpoint, done in sorted(by_endpoint.items()):
+        latency = [(s.done - s.due) * 1000.0 for s in done]
+        ok = [s for s in done if 200 <= s.status < 300]
+        stats[endpoint] = {
+            "count": len(done),
+            "ok": len(ok),
+            "throughput": len(ok) / duration,
+            "errors": sum(not 200 <= s.status < 300 for s in done) / len(done),
+            "superseded": sum(s.status == 409 for s in done),
+            "client_wait_ms": statistics.mean((s.sent - s.due) * 1000.0 for s in done),
+            **{
+                f"p{int(q * 100)}_ms": percentile(latency, q) for q in (0.5, 0.95, 0.99)
+            },
+        }
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        nargs="+",
+        default=[1.0, 2.0, 4.0, 8.0],
+        help="Offered requests/s, one stage each",
+    )
+    parser.add_argument(
+        "--duration", type=float, default=20.0, help="Seconds per stage"
+    )
+    parser.add_argument("--concurrency", type=int, default=16, help="Client threads")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="endpoint=weight,...")
+    parser.add_argument(
+        "--cars", type=int, default=4, help="Car IDs for /receive_image"
+    )
+    parser.add_argument("--stop-interval", type=float, default=0.5, help="0: no probe")
+    parser.add_argument(
+        "--slo", type=float, default=5000.0, help="/receive_image p95 ms"
+    )
+    parser.add_argument(
+        "--photo-interval", type=float, default=3.0, help="Seconds per car photo"
+    )
+    parser.add_argument("--goal", default=GOAL)
+    parser.add_argument("--image", help="Image file for /receive_image")
+    parser.add_argument("--sim", action="store_true", help="Serve the simulator first")
+    parser.add_argument(
+        "--latency", type=float, default=1.0, help="--sim Gemini seconds"
+    )
+    parser.add_argument("--error-rate", type=float, default=0.0, help="--sim Gemini")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.image:
+        with open(args.image, "rb") as f:
+            image = f.read()
+    else:
+        image = test_image()
+
+    stack = None
+    pi_url, media_url, laptop_ip = PI_URL, MEDIA_URL, LAPTOP_IP
+    if args.sim:
+        from simulator.analyzer import StubGemini
+        from simulator.stack import CONTROL_PORT, SimulatedStack
+
+        stack = SimulatedStack(
+            analyzer=StubGemini(args.latency, 0.1, args.error_rate, args.seed)
+        ).start()
+        pi_url = f"http://{stack.host}:{CONTROL_PORT}"
+        media_url = f"http://{stack.host}:{MEDIA_PORT}"
+        laptop_ip = stack.host
+    client = Client(
+        pi_url, media_url, laptop_ip, LAPTOP_PORT, image, args.cars, args.goal
+    )
+
+    print(
+        f"Load: {', '.join(f'{k}={v:g}' for k, v in mix.items())}; "
+        f"{args.concurrency} clients, {args.cars} car(s), {args.duration:.0f}s stages"
+    )
+    print(f"Pi {pi_url}, media {media_url}, laptop {laptop_ip}:{LAPTOP_PORT}")
+    print("=" * 78)
+    share = mix.get("receive_image", 0.0) / sum(mix.values())
+    saturation = sustained = None
+    try:
+        for stage, rate in enumerate(args.rate):
+            samples, depths, offered = run_stage(
+                client,
+                mix,
+                rate,
+                args.duration,
+                args.concurrency,
+                args.stop_interval,
+                args.seed + stage,
+            )
+            stats = report(samples, args.duration)
+            print(
+                f"offered {rate:g} req/s ({sum(offered.values())} requests): analyzer queue depth "
+                f"max {max(depths, default=0)}, "
+                f"mean {statistics.mean(depths) if depths else 0:.1f}"
+            )
+            for endpoint, s in stats.items():
+                p = [s[f"p{q}_ms"] for q in (50, 95, 99)]
+                print(
+                    f"  {endpoint:<14} n={s['count']:<5} {s['throughput']:6.2f}/s  "
+                    f"p50 {p[0]:7.1f}  p95 {p[1]:7.1f}  p99 {p[2]:7.1f} ms  "
+                    f"errors {s['errors'] * 100:4.1f}%"
+                    + (f" ({s['superseded']} superseded)" if s["superseded"] else "")
+                    + f"  client wait {s['client_wait_ms']:.0f}ms"
+                )
+            analyses = stats.get("receive_image")
+            if analyses and saturation is None:
+                behind = analyses["ok"] < SATURATED * offered["receive_image"]
+                if not behind and analyses["p95_ms"] <= args.slo:
+                    sustained = rate
+                else:
+                    saturation = rate
+                    print(
+                        f"  -> saturated: {analyses['ok']} of "
+                        f"{offered['receive_image']} /receive_image answered, "
+                        f"p95 {analyses['p95_ms']:.0f}ms"
+                    )
+    finally:
+        if stack is not None:
+            stack.stop()
+
+    print("-" * 78)
+    if not share:
+        return
+    if saturation is None:
+        print(f"No saturation up to {max(args.rate) * share:.2f} /receive_image/s")
+    if sustained is None:
+        print("The analyzer kept up with none of the stages")
+        return
+    print(
+        f"The analyzer keeps up with {sustained * share:.2f} /receive_image/s: "
+        f"~{sustained * share * args.photo_interval:.1f} car(s) at one photo "
+        f"every {args.photo_interval:g}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Per-command logging overhead: print() vs. the queued structured logs.
+
+A Flask /forward handler with a no-op motor writes what the control
+service logs for each command (the command and werkzeug's request line),
+and the test client times whole requests:
+- print to a file (a fast terminal)
+- print to a simulated serial console: writes block for as long as the
+  bytes take at --baud, as on the Pi's UART
+- logs.info through the queue to a rotating file (what the servers do now),
+  with rate limiting off and then at its default (most records dropped)
+- logs.debug below the configured level (filtered before any formatting)
+"""
+
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from flask import Flask, jsonify
+
+import logs
+
+REQUEST_LINE = '127.0.0.1 - - [%s] "POST /forward HTTP/1.1" 200 -'
+
+
+class SerialConsole:
+    """A text stream whose writes take as long as the bytes do on a UART."""
+
+    def __init__(self, baud: int):
+        self.seconds_per_byte = 10.0 / baud  # 8N1: ten bits per byte
+
+    def write(self, text: str) -> int:
+        time.sleep(len(text) * self.seconds_per_byte)
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+def make_app(mode: str, stream) -> Flask:
+    app = Flask(f"logging-{mode}")
+    log = logs.get("pi-control")
+    request_log = logging.getLogger("werkzeug")
+
+    @app.route("/forward", methods=["POST"])
+    def forward():
+        duration, actual = 0.3, 0.3004  # The motor pulse itself is not timed here
+        stamp = time.strftime("%d/%b/%Y %H:%M:%S")
+        if mode == "print":
+            print(f"Motor command forward {duration}s (actual {actual}s)", file=stream)
+            print(REQUEST_LINE % stamp, file=stream)
+        elif mode == "logs":
+            log.info(
+                "Motor command", action="forward", duration=duration, actual=actual
+            )
+            request_log.info(REQUEST_LINE, stamp)
+        else:
+            log.debug(
+                "Motor command", action="forward", duration=duration, actual=actual
+            )
+            request_log.debug(REQUEST_LINE, stamp)
+        return jsonify({"status": "success", "duration": duration})
+
+    return app
+
+
+def time_requests(app: Flask, count: int) -> list:
+    client = app.test_client()
+    for _ in range(20):  # Warm up
+        client.post("/forward")
+    times = []
+    for _ in range(count):
+        started = time.perf_counter()
+        client.post("/forward")
+        times.append((time.perf_counter() - started) * 1e6)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--commands", type=int, default=2000)
+    parser.add_argument("--baud", type=int, default=115200)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="ht6-logs-")
+    logs.LOG_DIR = directory
+    logs.setup("pi-control")
+    root = logging.getLogger()
+
+    print(f"{args.commands} /forward requests per setup (test client, no-op motor)")
+    print("=" * 72)
+    fast = open(os.path.join(directory, "stdout.txt"), "w")
+    setups = [
+        ("print, fast terminal", "print", fast, logging.INFO),
+        (f"print, {args.baud} baud console", "print", SerialConsole(args.baud), None),
+        ("logs.info, queued", "logs", None, logging.INFO),
+        ("logs.info, rate limited", "logs", None, logging.INFO),
+        ("logs.debug, filtered", "debug", None, logging.INFO),
+    ]
+    baseline = None
+    limit = logs.rate_limit.limit
+    for name, mode, stream, level in setups:
+        logs.rate_limit.limit = limit if "rate limited" in name else sys.maxsize
+        if level is not None:
+            root.setLevel(level)
+            logging.getLogger("werkzeug").setLevel(level)
+        count = (
+            args.commands if mode != "print" or stream is fast else args.commands // 10
+        )
+        times = time_requests(make_app(mode, stream), count)
+        p50 = statistics.median(times)
+        p99 = sorted(times)[int(len(times) * 0.99)]
+        extra = (
+            "" if baseline is None else f"  ({p50 - baseline:+8.1f}us vs. fast print)"
+        )
+        baseline = p50 if baseline is None else baseline
+        print(f"{name:<28} p50 {p50:8.1f}us  p99 {p99:8.1f}us{extra}")
+    fast.close()
+
+    logs.stop()  # Waits for the writer to drain the queue
+    written = sum(
+        1 for _ in open(os.path.join(directory, "pi-control.log"), encoding="utf-8")
+    )
+    print("-" * 72)
+    print(
+        f"Log file: {written} lines written by the background writer; "
+        f"{logs.QUEUE_FULL.value} dropped (queue full), "
+        f"{logs.RATE_LIMITED.value} rate limited"
+    )
+
+
+if __name__ == "__main__":
+    main()
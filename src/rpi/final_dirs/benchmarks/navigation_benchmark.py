@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+End-to-end navigation benchmark: time-to-goal through the whole stack.
+
+Scripted, LLM-free drivers call the real MCP tools (mcp_server.py) against
+the simulated stack (simulator.stack): the Pi's control and media services
+and the laptop analyzer on simulated hardware, with a stub Gemini of fixed
+latency. Every mission starts from a seeded world, so runs are comparable:
+- scripted: the system prompt's rules (photo, then a fixed move per code)
+- assisted: a sweep search while the target is out of view, then photos
+  and proportional steering (steer_to_target), with a short nudge forward
+  once the controller has no move left to make
+
+Per strategy the report shows success rate, time-to-goal, motor commands,
+photos, analyses and Gemini calls, bytes sent over HTTP, and p50/p95/p99
+per stage from the services' latency histograms. Each run is appended to a
+JSON history file and compared with the previous run of the same settings;
+changes beyond the tolerance are flagged (--fail-on-regression exits 1).
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from car_registry import load_registry
+import metrics
+from navigation_analysis import TARGET_VISIBLE_CODES, parse_action_code
+from simulator.analyzer import StubGemini
+from simulator.stack import CARS_CONFIG, SimulatedStack
+from simulator.world import World
+
+HISTORY_FILE = os.path.join(os.path.dirname(__file__), "navigation_history.json")
+GOAL = "the charging station"  # Not a colour goal: every analysis reaches Gemini
+MAX_STEPS = 25  # Tool calls per mission before it counts as failed
+MAX_SECONDS = 180.0
+TOLERANCE = 0.10  # Relative change flagged as a regression or improvement
+NOISE_MS = 5.0  # Stage p95 changes smaller than this are not flagged
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class ByteCounter:
+    """WSGI middleware counting request and response body bytes."""
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+        self.received = self.sent = 0
+
+    def __call__(self, environ, start_response):
+        self.received += int(environ.get("CONTENT_LENGTH") or 0)
+        for chunk in self.wsgi_app(environ, start_response):
+            self.sent += len(chunk)
+            yield chunk
+
+    @property
+    def total(self) -> int:
+        return self.received + self.sent
+
+
+def scripted(mcp, goal: str) -> bool:
+    """The system prompt's rules, as autonomous_navigation_example.py plays them."""
+    for _ in range(MAX_STEPS // 2):
+        result = mcp.take_photo_and_analyze(goal)
+        code = parse_action_code(result.get("analysis_result"))
+        if code == "GOAL_ACHIEVED":
+            return True
+        if code == "MOVE_FORWARD":
+            mcp.move_forward()
+        elif code == "MOVE_BACKWARD":
+            mcp.move_backward(mcp.MIN_DURATION)
+        elif code in ("MOVE_LEFT", "TURN_LEFT", "NOT_FOUND"):
+            mcp.turn_left(mcp.MIN_DURATION)
+        else:  # MOVE_RIGHT, TURN_RIGHT, or no answer
+            mcp.turn_right(mcp.MIN_DURATION)
+    return False
+
+
+def assisted(mcp, goal: str) -> bool:
+    """Sweep search until the target is in view, then steer at its box."""
+    for _ in range(MAX_STEPS // 2):
+        result = mcp.take_photo_and_analyze(goal)
+        code = parse_action_code(result.get("analysis_result"))
+        if code == "GOAL_ACHIEVED":
+            return True
+        if code in TARGET_VISIBLE_CODES and result.get("target"):
+            steered = mcp.steer_to_target()
+            if steered.get("arrived") or not steered.get("executed"):
+                # The controller stops short of where the analyzer calls it reached
+                mcp.move_forward(mcp.MIN_DURATION)
+        else:
+            mcp.sweep_search(goal)
+    return False
+
+
+STRATEGIES = {"scripted": scripted, "assisted": assisted}
+
+
+def run_mission(stack, mcp, counters, strategy, world: World, goal: str) -> dict:
+    stack.reset(world)
+    mcp.reset_pose()
+    mcp.last_targets.clear()
+    for counter in counters:
+        counter.received = counter.sent = 0
+    calls = stack.analyzer.calls
+    before = metrics.render()
+    started = time.monotonic()
+    reached = strategy(mcp, goal)
+    elapsed = time.monotonic() - started
+    state = stack.state()
+    after = metrics.render()
+    return {
+        "reached": reached and elapsed <= MAX_SECONDS,
+        "seconds": round(elapsed, 2),
+        "final_distance": state["target_distance"],
+        "motor_commands": state["commands"],
+        "photos": _observed(before, after, "ht6_pi_stage_seconds", stage="photo"),
+        "sweeps": _observed(
+            before, after, "ht6_mcp_round_trip_seconds", endpoint="sweep"
+        ),
+        "analyses": _observed(
+            before, after, "ht6_laptop_stage_seconds", stage="queue_wait"
+        ),
+        "gemini_calls": stack.analyzer.calls - calls,
+        "bytes": sum(counter.total for counter in counters),
+    }
+
+
+def _observed(before: str, after: str, name: str, **labels) -> int:
+    """Observations between two metrics pages in the series with these labels."""
+
+    def count(page: str) -> int:
+        return sum(
+            entry["count"]
+            for (series, series_labels), entry in metrics.parse(page).items()
+            if series == name and labels.items() <= dict(series_labels).items()
+        )
+
+    return count(after) - count(before)
+
+
+def stage_latency(before: str, after: str) -> dict:
+    """p50/p95/p99 ms per histogram series, for observations between two pages."""
+    old = metrics.parse(before)
+    stages = {}
+    for key, entry in sorted(metrics.parse(after).items()):
+        if not entry["buckets"]:
+            continue  # A counter
+        previous = old.get(key, {"buckets": [], "count": 0})
+        earlier = dict(previous["buckets"])
+        buckets = [(b, c - earlier.get(b, 0.0)) for b, c in entry["buckets"]]
+        count = entry["count"] - previous["count"]
+        if not count:
+            continue
+        name, labels = key
+        label = name + "".join(f"[{value}]" for _, value in labels)
+        stages[label] = {"count": count}
+        for q in QUANTILES:
+            value = metrics.quantile(buckets, q)
+            stages[label][f"p{int(q * 100)}_ms"] = (
+                round(value * 1000.0, 1) if value is not None else None
+            )
+    return stages
+
+
+def summarize(missions: list) -> dict:
+    reached = [m for m in missions if m["reached"]]
+    summary = {
+        "missions": len(missions),
+        "success_rate": round(len(reached) / len(missions), 3),
+        "time_to_goal_s": (
+            round(statistics.mean(m["seconds"] for m in reached), 2)
+            if reached
+            else None
+        ),
+    }
+    for field in (
+        "motor_commands",
+        "photos",
+        "sweeps",
+        "analyses",
+        "gemini_calls",
+        "bytes",
+    ):
+        summary[field] = round(statistics.mean(m[field] for m in missions), 1)
+    return summary
+
+
+def compare(current: dict, previous: dict) -> list:
+    """Lines for every metric that moved by more than TOLERANCE."""
+    lines = []
+    for name, result in current["strategies"].items():
+        before = previous["strategies"].get(name)
+        if before is None:
+            continue
+        pairs = [
+            (field, result["summary"][field], before["summary"].get(field))
+            for field in result["summary"]
+            if field != "missions"
+        ]
+        pairs += [
+            (
+                f"{stage} p95",
+                stats["p95_ms"],
+                before["stages"].get(stage, {}).get("p95_ms"),
+            )
+            for stage, stats in result["stages"].items()
+        ]
+        for field, now, then in pairs:
+            if now is None or then is None or now == then:
+                continue
+            change = (now - then) / then if then else float("inf")
+            if abs(change) <= TOLERANCE:
+                continue
+            if field.endswith(" p95") and abs(now - then) < NOISE_MS:
+                continue
+            better = change > 0 if field == "success_rate" else change < 0
+            lines.append(
+                f"  {'improved  ' if better else 'REGRESSION'} {name:>8} {field}: "
+                f"{then} -> {now} ({change * 100:+.0f}%)"
+            )
+    return lines
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--missions", type=int, default=4, help="Per strategy")
+    parser.add_argument("--strategy", choices=sorted(STRATEGIES), action="append")
+    parser.add_argument("--goal", default=GOAL)
+    parser.add_argument("--latency", type=float, default=1.0, help="Gemini seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--history", default=HISTORY_FILE)
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    config = {
+        "missions": args.missions,
+        "goal": args.goal,
+        "latency": args.latency,
+        "error_rate": args.error_rate,
+    }
+    stack = SimulatedStack(analyzer=StubGemini(args.latency, 0.1, args.error_rate))
+    stack.start()
+    import mcp_server
+
+    mcp_server.registry = load_registry(CARS_CONFIG)
+
+    counters = []
+    for module in (stack.control, stack.media, stack.laptop):
+        module.app.wsgi_app = ByteCounter(module.app.wsgi_app)
+        counters.append(module.app.wsgi_app)
+
+    run = {
+        "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": git_commit(),
+        "config": config,
+        "strategies": {},
+    }
+    print(
+        f"Navigation benchmark: {args.missions} missions per strategy, "
+        f"Gemini {args.latency:.1f}s, goal '{args.goal}'"
+    )
+    print("=" * 72)
+    try:
+        for name in args.strategy or sorted(STRATEGIES):
+            before = metrics.render()
+            missions = [
+                run_mission(
+                    stack,
+                    mcp_server,
+                    counters,
+                    STRATEGIES[name],
+                    World.random(seed, min_range=1.0, max_range=3.0),
+                    args.goal,
+                )
+                for seed in range(args.missions)
+            ]
+            summary = summarize(missions)
+            stages = stage_latency(before, metrics.render())
+            run["strategies"][name] = {
+                "summary": summary,
+                "stages": stages,
+                "missions": missions,
+            }
+            ttg = summary["time_to_goal_s"]
+            print(
+                f"{name:>9}: reached {summary['success_rate'] * 100:3.0f}%  "
+                f"time-to-goal {ttg if ttg is not None else '-':>6}s  "
+                f"moves {summary['motor_commands']:5.1f}  "
+                f"photos {summary['photos']:4.1f}  "
+                f"sweeps {summary['sweeps']:3.1f}  "
+                f"analyses {summary['analyses']:4.1f}  "
+                f"gemini {summary['gemini_calls']:4.1f}  "
+                f"{summary['bytes'] / 1e6:5.2f}MB"
+            )
+            for stage, stats in stages.items():
+                print(
+                    f"    {stage:<48} n={stats['count']:<4} "
+                    f"p50 {stats['p50_ms']}  p95 {stats['p95_ms']}  "
+                    f"p99 {stats['p99_ms']} ms"
+                )
+    finally:
+        stack.stop()
+
+    history = []
+    if os.path.exists(args.history):
+        with open(args.history) as f:
+            history = json.load(f)
+    previous = next((r for r in reversed(history) if r.get("config") == config), None)
+    history.append(run)
+    with open(args.history, "w") as f:
+        json.dump(history, f, indent=1)
+
+    print("-" * 72)
+    if previous is None:
+        print(f"No earlier run with these settings in {args.history}")
+        return
+    changes = compare(run, previous)
+    print(
+        f"Against {previous['recorded_at']} ({previous['commit']}): "
+        + ("no change beyond ±{:.0f}%".format(TOLERANCE * 100) if not changes else "")
+    )
+    print("\n".join(changes))
+    if args.fail_on_regression and any("REGRESSION" in line for line in changes):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
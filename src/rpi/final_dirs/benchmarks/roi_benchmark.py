@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Bytes sent and small-target accuracy: whole frame, shrunk frame, and
+shrunk frame plus a full-resolution crop around the predicted target.
+
+Each scene puts a distant target in view, takes the "previous analysis"
+(the simulator's noisy box), turns the car by a random pulse and renders
+the next frame at full camera resolution. The crop is planned from the
+previous box and the executed turn, as on the Pi. All three uploads go
+through the local colour detector; the report shows how often the target
+was found, how far its box centre was off and how far off the range
+estimate from its apparent size was.
+"""
+
+import argparse
+import math
+import random
+import statistics
+
+from analyzer_cascade import ColorBlobDetector, RoiColorDetector
+from heading_controller import DEFAULT_TARGET_HEIGHT, size_to_distance
+from image_utils import downscale, encode_bmp
+from navigation_analysis import TARGET_VISIBLE_CODES, parse_action_code
+from navigation_analysis import parse_target_box
+from pose_tracker import CAMERA_HFOV_DEG
+from roi_crop import OVERVIEW_WIDTH, make_roi_upload, plan_roi
+from simulator.render import FrameRenderer
+from simulator.world import VISIBLE_RANGE, World
+
+GOAL = "Find a red ball on the ground"
+CAMERA_WIDTH = 1280
+CAMERA_HEIGHT = 960
+MAX_TURN = 0.08  # seconds of turning between the two photos
+
+
+def scene(seed: int):
+    """A world with a distant target in view, after a turn that keeps it in view."""
+    rng = random.Random(seed)
+    distance = rng.uniform(1.5, VISIBLE_RANGE - 0.2)
+    bearing = math.radians(rng.uniform(-0.3, 0.3) * CAMERA_HFOV_DEG)
+    world = World(distance * math.cos(bearing), distance * math.sin(bearing), seed=seed)
+    previous = parse_target_box(world.analyze())
+    action = rng.choice(("left", "right"))
+    duration = rng.uniform(0.0, MAX_TURN)
+    actual = world.execute(action, duration)
+    segment = {
+        "action": action,
+        "duty": world.calibration.turn_duty,
+        "start": 1.0,
+        "end": 1.0 + actual,
+    }
+    return world, previous, [segment]
+
+
+def score(world: World, text: str, errors: dict):
+    target = parse_target_box(text)
+    if parse_action_code(text) not in TARGET_VISIBLE_CODES or target is None:
+        return False
+    truth = world.target_box(noisy=False)
+    errors["centre"].append(
+        abs((target["box"][1] + target["box"][3]) - (truth[1] + truth[3])) / 2.0
+    )
+    distance = size_to_distance(target["size"], DEFAULT_TARGET_HEIGHT)
+    errors["range"].append(abs(distance - world.target_distance()))
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--scenes", type=int, default=100)
+    args = parser.parse_args()
+
+    detector = ColorBlobDetector()
+    roi_detector = RoiColorDetector(detector)
+    renderer = FrameRenderer(CAMERA_WIDTH, CAMERA_HEIGHT, seed=3)
+    rows = {
+        label: {"found": 0, "bytes": [], "centre": [], "range": []}
+        for label in ("whole frame", "shrunk frame", "shrunk + crop")
+    }
+    planned = 0
+    for seed in range(args.scenes):
+        world, previous, segments = scene(seed)
+        if not world.target_visible():
+            continue
+        frame = renderer.render(world)
+        factor = CAMERA_WIDTH // OVERVIEW_WIDTH
+        uploads = {
+            "whole frame": [encode_bmp(frame)],
+            "shrunk frame": [encode_bmp(downscale(frame, factor))],
+        }
+        region = plan_roi(previous, 0.0, 2.0, segments, world.calibration)
+        if region is not None:
+            planned += 1
+            roi = make_roi_upload(frame, region)
+            uploads["shrunk + crop"] = [
+                encode_bmp(roi["overview"]),
+                encode_bmp(roi["crop"]),
+                roi["region"],
+            ]
+        else:
+            uploads["shrunk + crop"] = uploads["whole frame"]
+        for label, upload in uploads.items():
+            row = rows[label]
+            row["bytes"].append(sum(len(part) for part in upload[:2]))
+            if len(upload) == 3:
+                result = roi_detector(upload[0], GOAL, upload[1], upload[2])
+            else:
+                result = detector(upload[0], GOAL)
+            row["found"] += score(world, result.text, row)
+
+    scenes = len(rows["whole frame"]["bytes"])
+    print(
+        f"ROI uploads over {scenes} simulated scenes ({CAMERA_WIDTH}x{CAMERA_HEIGHT})"
+    )
+    print(f"Crop planned for {planned}/{scenes} scenes (the rest sent the whole frame)")
+    print("=" * 72)
+    for label, row in rows.items():
+        print(
+            f"{label:>13}: found {row['found']:>3}/{scenes}  "
+            f"bytes {statistics.mean(row['bytes']) / 1024:7.1f} KiB  "
+            f"centre error {statistics.mean(row['centre'] or [0]):.4f}  "
+            f"range error {statistics.mean(row['range'] or [0]):.2f}m"
+        )
+
+
+if __name__ == "__main__":
+    main()
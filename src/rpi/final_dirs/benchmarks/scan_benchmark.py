@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Target acquisition time: turn + photo, panoramic sweep, and scan-while-rotating.
+
+Same missions as the sweep benchmark (target anywhere around the car). The
+scan turns continuously at the scan duty while rendered frames stream into
+the local colour detector, stops at the first candidate and sends only that
+frame for confirmation (the simulator's ground truth standing in for
+Gemini, charged the full photo + analysis time).
+"""
+
+import argparse
+import statistics
+
+from benchmarks.sweep_benchmark import (
+    GOAL,
+    ground_truth_stage,
+    mission_world,
+    step_search,
+    sweep_search,
+)
+from analyzer_cascade import AnalyzerCascade, SweepColorLocator
+from frame_buffer import Frame
+from motor_scheduler import MotorScheduler
+from rotation_scan import color_candidate_detector, scan_for_target
+from simulator.render import FrameRenderer
+from simulator.world import World
+
+FRAME_INTERVAL = 0.15  # seconds between streamed frames on the Pi
+DETECT_TIME = 0.01  # seconds for the colour detector on one frame
+
+
+class SimulatedMotors:
+    """Continuous motion of the simulated car between drive() and halt()."""
+
+    def __init__(self, world: World):
+        self.world = world
+        self.motion = None
+
+    def drive(self, action, duty):
+        cal = self.world.calibration
+        noise = 1.0 + self.world.rng.gauss(0.0, self.world.motion_noise)
+        rate = cal.turn_rate * duty / cal.turn_duty * noise
+        sign = 1.0 if action == "left" else -1.0
+        self.motion = (sign * rate, self.world.clock, self.world.heading)
+
+    def advance(self):
+        if self.motion is not None:
+            rate, since, heading = self.motion
+            self.world.heading = heading + rate * (self.world.clock - since)
+
+    def halt(self):
+        self.advance()
+        self.motion = None
+
+
+def scan_search(world: World, renderer: FrameRenderer):
+    motors = SimulatedMotors(world)
+    scheduler = MotorScheduler(motors.drive, motors.halt, clock=lambda: world.clock)
+    truth = {}
+    seq = [0]
+
+    def next_frame():
+        world.clock += FRAME_INTERVAL / 2.0
+        motors.advance()
+        image = renderer.render(world)
+        seq[0] += 1
+        frame = Frame(seq[0], world.clock, image)
+        truth[id(image)] = world.target_visible()
+        world.clock += FRAME_INTERVAL / 2.0 + DETECT_TIME
+        motors.advance()
+        return frame
+
+    def confirm(image):
+        world.clock += world.photo_time
+        world.photos += 1
+        return {} if truth.get(id(image)) else None
+
+    cal = world.calibration
+    result = scan_for_target(
+        scheduler,
+        next_frame,
+        color_candidate_detector(GOAL),
+        confirm,
+        lambda action, duration: world.execute(action, duration, cal.turn_duty),
+        cal.turn_rate,
+        cal.turn_duty,
+        clock=lambda: world.clock,
+    )
+    return result["found"] and world.target_visible(), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--missions", type=int, default=100)
+    parser.add_argument("--stops", type=int, default=8)
+    args = parser.parse_args()
+
+    views = []
+    cascade = AnalyzerCascade(
+        [
+            ("color", SweepColorLocator(), 0.75),
+            ("gemini", ground_truth_stage(views), 0.0),
+        ]
+    )
+    rows = {"turn + photo": [], "panoramic sweep": [], "scan while rotating": []}
+    to_candidate = []
+    for seed in range(args.missions):
+        world = mission_world(seed)
+        rows["turn + photo"].append((step_search(world, args.stops), world))
+        world = mission_world(seed)
+        found, _ = sweep_search(
+            world, FrameRenderer(seed=seed), cascade, views, args.stops
+        )
+        rows["panoramic sweep"].append((found, world))
+        world = mission_world(seed)
+        found, result = scan_search(world, FrameRenderer(seed=seed))
+        rows["scan while rotating"].append((found, world))
+        if result["found"]:
+            to_candidate.append(result["time_to_candidate"])
+
+    print(f"Target acquisition over {args.missions} simulated missions")
+    print("=" * 72)
+    for label, results in rows.items():
+        times = [w.clock for _, w in results]
+        print(
+            f"{label:>19}: facing target {sum(f for f, _ in results):>3}/{len(results)}  "
+            f"analyses {statistics.mean(w.photos for _, w in results):5.2f}  "
+            f"time {statistics.mean(times):5.1f}s  worst {max(times):5.1f}s"
+        )
+    if to_candidate:
+        print(
+            f"Scan: rotation start to candidate frame median "
+            f"{statistics.median(to_candidate):.2f}s, max {max(to_candidate):.2f}s "
+            f"(plus one confirmation)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Time-to-find benchmark: hard-coded search turns vs. the coverage planner.
+
+Both strategies search the same seeded simulated worlds, starting with the
+target out of view, and stop at the first analysis that sees the target.
+"""
+
+import argparse
+import statistics
+
+from navigation_analysis import TARGET_VISIBLE_CODES, parse_action_code
+from pose_tracker import PoseTracker
+from search_planner import SearchPlanner
+from simulator.world import World
+
+MAX_PHOTOS = 40
+
+
+def hidden_target_world(seed: int) -> World:
+    """A random world whose target starts outside the camera's view."""
+    offset = 0
+    while True:
+        world = World.random(seed * 1000 + offset)
+        if not world.target_visible():
+            return world
+        offset += 1
+
+
+def baseline_search(world: World):
+    """The fixed turns from autonomous_navigation_example.py."""
+    for _ in range(MAX_PHOTOS):
+        code = parse_action_code(world.analyze())
+        if code in TARGET_VISIBLE_CODES:
+            return True
+        if code == "TURN_RIGHT":
+            world.execute("right", 0.4)
+        elif code == "TURN_LEFT":
+            world.execute("left", 0.4)
+        else:  # NOT_FOUND
+            world.execute("left", 0.5)
+    return False
+
+
+def planner_search(world: World):
+    """Turns and moves chosen by the SearchPlanner from the dead-reckoned pose."""
+    tracker = PoseTracker(world.calibration)
+    planner = SearchPlanner(world.calibration, photo_cost=world.photo_time)
+    for _ in range(MAX_PHOTOS):
+        code = parse_action_code(world.analyze())
+        if code in TARGET_VISIBLE_CODES:
+            return True
+        pose = tracker.to_dict()
+        planner.record_observation(pose)
+        step = planner.next_action(pose)
+        actual = world.execute(step["action"], step["duration"])
+        tracker.apply_command(step["action"], actual)
+    return False
+
+
+def run(strategy, seeds):
+    """Run every mission; missed targets count as MAX_PHOTOS worth of time."""
+    results = {}
+    for seed in seeds:
+        world = hidden_target_world(seed)
+        found = strategy(world)
+        results[seed] = (found, world.clock, world.photos)
+    return results
+
+
+def summarize(results, seeds):
+    times = [results[s][1] for s in seeds]
+    photos = [results[s][2] for s in seeds]
+    return {
+        "found": sum(1 for s in seeds if results[s][0]),
+        "median_time": statistics.median(times),
+        "mean_time": statistics.mean(times),
+        "mean_photos": statistics.mean(photos),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--missions", type=int, default=200)
+    args = parser.parse_args()
+
+    seeds = list(range(args.missions))
+    strategies = {"baseline": baseline_search, "planner": planner_search}
+    results = {name: run(strategy, seeds) for name, strategy in strategies.items()}
+    both = [s for s in seeds if all(r[s][0] for r in results.values())]
+
+    print(f"Search benchmark over {len(seeds)} simulated missions")
+    print("=" * 72)
+    for label, subset in (("all missions", seeds), ("found by both", both)):
+        print(f"{label} ({len(subset)}):")
+        for name, r in results.items():
+            summary = summarize(r, subset)
+            print(
+                f"  {name:>9}: found {summary['found']:>3}  "
+                f"median {summary['median_time']:6.1f}s  "
+                f"mean {summary['mean_time']:6.1f}s  "
+                f"photos {summary['mean_photos']:.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Frame hand-off from capture to the Flask server: a BMP file vs. the
+shared-memory ring of a separate capture process.
+
+The file path is what the Pi did before: the capture side encodes and
+writes screenshot.bmp, the server reads and decodes it. The ring path runs
+a CaptureProcess whose grabber returns rendered frames; the server waits
+for each new frame and reads it in place. The report shows the per-frame
+cost on the server side, the delay from publishing a frame to the server
+seeing it, and that the server survives the capture process being killed.
+"""
+
+import argparse
+import os
+import signal
+import statistics
+import tempfile
+import time
+
+from image_utils import decode_bmp, encode_bmp
+from shared_frames import CaptureProcess, SharedFrameRing
+from simulator.render import FrameRenderer
+from simulator.world import World
+
+GRAB_INTERVAL = 0.02  # seconds between frames from the fake camera
+_frames = []
+
+
+def fake_grabber():
+    """Cycle through the pre-rendered frames, like a camera at ~50 fps."""
+    _frames.append(_frames.pop(0))
+    return _frames[-1]
+
+
+def file_handoff(frames, repeats):
+    path = os.path.join(tempfile.gettempdir(), "benchmark_screenshot.bmp")
+    write_ms, read_ms = [], []
+    for i in range(repeats):
+        started = time.perf_counter()
+        with open(path, "wb") as f:
+            f.write(encode_bmp(frames[i % len(frames)]))
+        write_ms.append((time.perf_counter() - started) * 1000.0)
+        started = time.perf_counter()
+        with open(path, "rb") as f:
+            decode_bmp(f.read())
+        read_ms.append((time.perf_counter() - started) * 1000.0)
+    os.remove(path)
+    return statistics.median(write_ms), statistics.median(read_ms)
+
+
+def ring_handoff(ring, repeats):
+    read_ms, delay_ms = [], []
+    seq = ring.latest().seq
+    while len(read_ms) < repeats:
+        frame = ring.wait_newer(seq, 2.0)
+        delay_ms.append((time.monotonic() - frame.timestamp) * 1000.0)
+        started = time.perf_counter()
+        frame = ring.latest()
+        frame.image.mean()  # Touch the pixels, as a detector would
+        read_ms.append((time.perf_counter() - started) * 1000.0)
+        seq = frame.seq
+    return statistics.median(read_ms), statistics.median(delay_ms), max(delay_ms)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeats", type=int, default=100)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    args = parser.parse_args()
+
+    renderer = FrameRenderer(args.width, args.height, seed=0)
+    world = World(2.0, 0.3, seed=0)
+    for _ in range(4):
+        _frames.append(renderer.render(world))
+        world.execute("left", 0.1)
+
+    print(f"Frame hand-off, {args.width}x{args.height}, median of {args.repeats}")
+    print("=" * 72)
+    write_ms, read_ms = file_handoff(_frames, args.repeats)
+    print(f"BMP file:     capture side {write_ms:6.2f}ms  server side {read_ms:6.2f}ms")
+
+    ring = SharedFrameRing.create(capacity=8)
+    capture = CaptureProcess(
+        ring, fake_grabber, interval=GRAB_INTERVAL, start_viewfinder=False
+    )
+    try:
+        capture.start()
+        read_ms, delay_ms, worst_ms = ring_handoff(ring, args.repeats)
+        print(
+            f"Shared ring:  server side {read_ms:6.3f}ms  publish -> seen "
+            f"median {delay_ms:.2f}ms, max {worst_ms:.2f}ms"
+        )
+
+        os.kill(capture._process.pid, signal.SIGKILL)
+        capture._process.join()
+        before = ring.latest()
+        print(
+            f"Capture process killed: server still reads frame {before.seq}; "
+            f"restarted: {capture.start()} (restarts: {capture.restarts}), "
+            f"now at frame {ring.latest().seq}"
+        )
+    finally:
+        capture.stop()
+        ring.close()
+
+
+if __name__ == "__main__":
+    main()
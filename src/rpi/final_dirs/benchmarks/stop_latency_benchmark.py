@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+/stop latency under a saturated photo load: one Pi server process vs. the
+control service plus a separate media service.
+
+Each setup runs real Flask servers on localhost with a MotorScheduler on
+fake pins. The photo handler does the Pi's CPU work for one photo: it
+picks the sharpest of a burst with frame_quality, delta-encodes the frame
+and BMP-encodes it, streams the upload chunks and asks the motors when
+they last moved. In the split setup it asks over motor_ipc and runs at
+the media service's lower CPU priority. A load process keeps several
+photos in flight while /stop requests are timed.
+"""
+
+import argparse
+import multiprocessing
+import os
+import socket
+import statistics
+import threading
+import time
+
+import requests
+from flask import Flask, jsonify
+from werkzeug.serving import make_server
+
+from frame_codec import encode_delta
+from frame_quality import BURST_SIZE, pick_sharpest
+from image_utils import encode_bmp
+from motor_ipc import MEDIA_NICENESS, MotorClient, MotorServer
+from motor_scheduler import MotorScheduler
+from simulator.render import FrameRenderer
+from simulator.world import World
+from upload_protocol import iter_chunks
+
+DUTIES = {"forward": 25, "backward": 25, "left": 45, "right": 45}
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def fake_motors() -> MotorScheduler:
+    return MotorScheduler(lambda action, duty: None, lambda: None)
+
+
+def add_stop(app: Flask, motors):
+    @app.route("/stop", methods=["POST"])
+    def stop():
+        motors.stop()
+        return jsonify({"status": "success", "message": "Stopped"})
+
+
+def add_photo(app: Flask, motors, width: int, height: int):
+    renderer = FrameRenderer(width, height, seed=0)
+    world = World(2.0, 0.3, seed=0)
+    burst = [renderer.render(world) for _ in range(BURST_SIZE)]
+
+    @app.route("/photo", methods=["POST"])
+    def photo():
+        motors.last_motion_end()
+        index, quality = pick_sharpest(burst, burst[-1])
+        frame = burst[index]
+        encode_delta(frame, burst[(index + 1) % len(burst)])
+        payload = encode_bmp(frame)
+        sent = sum(len(chunk) for chunk in iter_chunks(b"", payload))
+        return jsonify({"status": "success", "bytes": sent, "ok": quality["ok"]})
+
+
+def serve(app: Flask, port: int):
+    make_server("127.0.0.1", port, app, threaded=True).serve_forever()
+
+
+def single_process(port: int, width: int, height: int):
+    """Before: motors and photos in one Flask process."""
+    app = Flask("single")
+    motors = fake_motors()
+    add_stop(app, motors)
+    add_photo(app, motors, width, height)
+    serve(app, port)
+
+
+def control_service(port: int, ipc_port: int, authkey: bytes):
+    app = Flask("control")
+    motors = fake_motors()
+    add_stop(app, motors)
+    MotorServer(motors, DUTIES, authkey, address=("127.0.0.1", ipc_port)).start()
+    serve(app, port)
+
+
+def media_service(port: int, ipc_port: int, authkey: bytes, width: int, height: int):
+    os.nice(MEDIA_NICENESS)  # As media_server.py does
+    app = Flask("media")
+    motors = MotorClient(address=("127.0.0.1", ipc_port), authkey=authkey)
+    add_photo(app, motors, width, height)
+    serve(app, port)
+
+
+def photo_load(url: str, clients: int, stop):
+    """Keep `clients` photo requests in flight until stop is set."""
+    os.nice(MEDIA_NICENESS)  # Stands in for the laptop; keep it off the timings
+
+    def client():
+        session = requests.Session()
+        while not stop.is_set():
+            try:
+                session.post(url, timeout=30)
+            except requests.RequestException:
+                time.sleep(0.05)
+
+    threads = [threading.Thread(target=client, daemon=True) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    stop.wait()
+
+
+def wait_for(url: str):
+    for _ in range(200):
+        try:
+            requests.post(url, timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.05)
+    raise RuntimeError(f"{url} did not come up")
+
+
+def time_stops(url: str, count: int, interval: float):
+    session = requests.Session()
+    times = []
+    for _ in range(count):
+        started = time.perf_counter()
+        session.post(url, timeout=30).raise_for_status()
+        times.append((time.perf_counter() - started) * 1000.0)
+        time.sleep(interval)
+    return times
+
+
+def measure(label, processes, stop_url, photo_url, args):
+    for process in processes:
+        process.start()
+    try:
+        wait_for(stop_url)
+        wait_for(photo_url)
+        idle = time_stops(stop_url, args.stops // 2, args.interval)
+        stop = multiprocessing.Event()
+        load = multiprocessing.Process(
+            target=photo_load, args=(photo_url, args.clients, stop), daemon=True
+        )
+        load.start()
+        time.sleep(1.0)  # Let the photo load build up
+        loaded = time_stops(stop_url, args.stops, args.interval)
+        stop.set()
+        load.join(timeout=5)
+    finally:
+        for process in processes:
+            process.terminate()
+            process.join()
+    for name, times in (("idle", idle), ("photo load", loaded)):
+        times = sorted(times)
+        print(
+            f"{label:>26} {name:>10}: median {statistics.median(times):6.1f}ms  "
+            f"p95 {times[int(len(times) * 0.95) - 1]:6.1f}ms  max {times[-1]:6.1f}ms"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--stops", type=int, default=60)
+    parser.add_argument("--interval", type=float, default=0.05)
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    args = parser.parse_args()
+
+    print(f"/stop latency, {args.clients} photo requests in flight")
+    print("=" * 72)
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    measure(
+        "one process",
+        [
+            multiprocessing.Process(
+                target=single_process, args=(port, args.width, args.height)
+            )
+        ],
+        f"{url}/stop",
+        f"{url}/photo",
+        args,
+    )
+
+    control_port, media_port, ipc_port = free_port(), free_port(), free_port()
+    authkey = os.urandom(16)
+    measure(
+        "control + media processes",
+        [
+            multiprocessing.Process(
+                target=control_service, args=(control_port, ipc_port, authkey)
+            ),
+            multiprocessing.Process(
+                target=media_service,
+                args=(media_port, ipc_port, authkey, args.width, args.height),
+            ),
+        ],
+        f"http://127.0.0.1:{control_port}/stop",
+        f"http://127.0.0.1:{media_port}/photo",
+        args,
+    )
+
+
+if __name__ == "__main__":
+    main()
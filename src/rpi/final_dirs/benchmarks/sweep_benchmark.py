@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Full-circle search: turn + photo + analysis per step vs. one panoramic sweep.
+
+The target is placed anywhere around the car. The step strategy turns left
+by the same step as the sweep and analyzes one photo per stop until the
+target is in view. The sweep strategy grabs a streamed frame at every stop,
+sends one mosaic through the sweep analyzer cascade (local colour locator,
+then the simulator's ground truth standing in for Gemini) and turns to the
+chosen tile's heading. Both finish facing the target or give up after a
+full circle.
+"""
+
+import argparse
+import math
+import random
+import statistics
+
+from analyzer_cascade import AnalyzerCascade, StageResult, SweepColorLocator
+from image_utils import build_mosaic, encode_bmp
+from navigation_analysis import TARGET_VISIBLE_CODES, parse_action_code
+from navigation_analysis import parse_sweep_tile, parse_target_box
+from panoramic_sweep import (
+    MOSAIC_COLUMNS,
+    TILE_BORDER,
+    TILE_WIDTH,
+    capture_sweep,
+    sweep_step_duration,
+    target_heading,
+    turn_to_heading,
+)
+from pose_tracker import CAMERA_HFOV_DEG
+from simulator.render import FrameRenderer
+from simulator.world import VISIBLE_RANGE, World
+
+GOAL = "Find a red ball on the ground"
+FRAME_TIME = 0.15  # seconds to grab a streamed frame
+
+
+def mission_world(seed: int) -> World:
+    rng = random.Random(seed)
+    distance = rng.uniform(0.8, VISIBLE_RANGE - 0.3)
+    bearing = math.radians(rng.uniform(-180.0, 180.0))
+    return World(distance * math.cos(bearing), distance * math.sin(bearing), seed=seed)
+
+
+def step_search(world: World, stops: int) -> bool:
+    step = sweep_step_duration(stops, world.calibration.turn_rate)
+    for stop in range(stops):
+        if parse_action_code(world.analyze()) in TARGET_VISIBLE_CODES:
+            return True
+        if stop < stops - 1:
+            world.execute("left", step)
+    return False
+
+
+def ground_truth_stage(views):
+    """Stand-in for Gemini: the tile where the target was nearest the centre."""
+
+    def analyze(image_bytes, goal, layout):
+        best = min(range(len(views)), key=views.__getitem__)
+        if views[best] == math.inf:
+            return StageResult("TILE: NONE\nNot visible in any tile.", 1.0)
+        return StageResult(f"TILE: {best}\nTarget in tile {best}.", 1.0)
+
+    return analyze
+
+
+def sweep_search(
+    world: World,
+    renderer: FrameRenderer,
+    cascade: AnalyzerCascade,
+    views: list,
+    stops: int,
+):
+    views.clear()
+
+    def grab_after(timestamp):
+        world.clock = max(world.clock, timestamp) + FRAME_TIME
+        # Ground truth for the stand-in analyzer: is the target in this view?
+        views.append(
+            abs(world.target_bearing()) if world.target_visible() else math.inf
+        )
+        return renderer.render(world)
+
+    turn_rate = world.calibration.turn_rate
+    frames, headings, _ = capture_sweep(
+        grab_after,
+        world.execute,
+        stops,
+        sweep_step_duration(stops, turn_rate),
+        turn_rate,
+        clock=lambda: world.clock,
+    )
+
+    columns = min(MOSAIC_COLUMNS, stops)
+    layout = {
+        "rows": (stops + columns - 1) // columns,
+        "columns": columns,
+        "tiles": stops,
+        "border": TILE_BORDER,
+    }
+    mosaic = encode_bmp(build_mosaic(frames, columns, TILE_WIDTH, TILE_BORDER))
+    analysis, stage = cascade.analyze(mosaic, GOAL, layout)
+    world.clock += world.photo_time  # Count every sweep as a full analysis
+    world.photos += 1
+    tile = parse_sweep_tile(analysis)
+    if tile is None:
+        return False, stage
+    heading = target_heading(headings, tile, parse_target_box(analysis))
+    turn_to_heading(world.execute, headings[-1], heading, turn_rate)
+    return world.target_visible(), stage
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--missions", type=int, default=100)
+    parser.add_argument("--stops", type=int, default=8)
+    args = parser.parse_args()
+
+    views = []
+    cascade = AnalyzerCascade(
+        [
+            ("color", SweepColorLocator(), 0.75),
+            ("gemini", ground_truth_stage(views), 0.0),
+        ]
+    )
+    rows = []
+    for seed in range(args.missions):
+        world_a = mission_world(seed)
+        found_a = step_search(world_a, args.stops)
+        world_b = mission_world(seed)
+        found_b, _ = sweep_search(
+            world_b, FrameRenderer(seed=seed), cascade, views, args.stops
+        )
+        rows.append((found_a, world_a, found_b, world_b))
+
+    print(
+        f"Full-circle search over {args.missions} simulated missions, "
+        f"{args.stops} stops ({360.0 / args.stops:.0f} deg steps, "
+        f"{CAMERA_HFOV_DEG} deg camera)"
+    )
+    print("=" * 72)
+    for label, found_idx, world_idx in (
+        ("turn + photo", 0, 1),
+        ("panoramic sweep", 2, 3),
+    ):
+        found = [r for r in rows if r[found_idx]]
+        print(
+            f"{label:>16}: facing target {len(found):>3}/{len(rows)}  "
+            f"analyses {statistics.mean(r[world_idx].photos for r in rows):5.2f}  "
+            f"time {statistics.mean(r[world_idx].clock for r in rows):6.1f}s  "
+            f"worst {max(r[world_idx].clock for r in rows):5.1f}s"
+        )
+    errors = [abs(r[3].target_bearing()) for r in rows if r[2]]
+    if errors:
+        print(
+            f"Sweep heading error after turning to the tile: median "
+            f"{statistics.median(errors):.1f} deg, max {max(errors):.1f} deg"
+        )
+    report = cascade.report()
+    print(
+        f"Sweep mosaics answered by the local colour locator: "
+        f"{report['stages']['color']['accepted']}/{report['analyses']}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Gemini calls per mission: analysis after every step vs. local visual servoing.
+
+Both strategies start with the target somewhere in view and finish at the
+first GOAL_ACHIEVED. The servoing strategy follows the target on rendered
+frames between analyses and only asks the analyzer again when tracking is
+lost or the target looks reached.
+"""
+
+import argparse
+import math
+import random
+import statistics
+
+from heading_controller import HeadingController
+from navigation_analysis import parse_action_code, parse_target_box
+from pose_tracker import CAMERA_HFOV_DEG
+from simulator.render import FrameRenderer
+from simulator.world import World
+from visual_servo import track_and_servo
+
+MAX_ANALYSES = 30
+FRAME_INTERVAL = 0.15  # seconds between streamed frames on the Pi
+CONTROLLER = HeadingController()
+
+
+def mission_world(seed: int) -> World:
+    rng = random.Random(seed)
+    bearing = math.radians(rng.uniform(-0.8, 0.8) * CAMERA_HFOV_DEG / 2.0)
+    distance = rng.uniform(1.5, 4.0)
+    return World(distance * math.cos(bearing), distance * math.sin(bearing), seed=seed)
+
+
+def recover(world: World, code: str):
+    if code == "TURN_RIGHT":
+        world.execute("right", 0.4)
+    else:
+        world.execute("left", 0.4)
+
+
+def analysis_every_step(world: World) -> bool:
+    while world.photos < MAX_ANALYSES:
+        analysis = world.analyze()
+        if parse_action_code(analysis) == "GOAL_ACHIEVED":
+            return True
+        target = parse_target_box(analysis)
+        if target is None:
+            recover(world, parse_action_code(analysis))
+            continue
+        for move in CONTROLLER.command(target)["moves"]:
+            world.execute(move["action"], move["duration"])
+    return False
+
+
+def visual_servoing(world: World, renderer: FrameRenderer) -> bool:
+    def next_frame():
+        world.clock += FRAME_INTERVAL
+        return renderer.render(world)
+
+    while world.photos < MAX_ANALYSES:
+        analysis = world.analyze()
+        if parse_action_code(analysis) == "GOAL_ACHIEVED":
+            return True
+        target = parse_target_box(analysis)
+        if target is None:
+            recover(world, parse_action_code(analysis))
+            continue
+        track_and_servo(
+            next_frame,
+            world.execute,
+            target["box"],
+            controller=CONTROLLER,
+            clock=lambda: world.clock,
+        )
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--missions", type=int, default=40)
+    args = parser.parse_args()
+
+    rows = []
+    for seed in range(args.missions):
+        world_a = mission_world(seed)
+        found_a = analysis_every_step(world_a)
+        world_b = mission_world(seed)
+        found_b = visual_servoing(world_b, FrameRenderer(seed=seed))
+        rows.append((found_a, world_a, found_b, world_b))
+
+    print(f"Visual servoing benchmark over {args.missions} simulated missions")
+    print("=" * 72)
+    for label, found_idx, world_idx in (
+        ("gemini every step", 0, 1),
+        ("visual servoing", 2, 3),
+    ):
+        reached = sum(1 for r in rows if r[found_idx])
+        calls = [r[world_idx].photos for r in rows]
+        times = [r[world_idx].clock for r in rows]
+        print(
+            f"{label:>18}: reached {reached:>3}/{len(rows)}  "
+            f"gemini calls {statistics.mean(calls):5.2f}  "
+            f"time {statistics.mean(times):6.1f}s"
+        )
+    both = [r for r in rows if r[0] and r[2]]
+    if both:
+        saved = [r[1].photos - r[3].photos for r in both]
+        print(
+            f"Gemini calls saved per mission (reached by both, n={len(both)}): "
+            f"mean {statistics.mean(saved):.2f}, median {statistics.median(saved):.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
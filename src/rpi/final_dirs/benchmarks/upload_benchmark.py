@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Request parsing on the laptop: multipart form uploads vs. the binary format.
+
+Builds the exact bodies the Pi sends (requests' multipart encoding for
+/receive_image, upload_protocol for /upload_frame) for a whole 640x480
+frame and for a typical delta, and times how long Flask takes to turn each
+into the goal text and payload buffer. No analysis is run.
+"""
+
+import argparse
+import statistics
+import time
+
+import numpy as np
+import requests
+from flask import Flask, request
+
+from image_utils import encode_bmp
+from upload_protocol import HEADER_SIZE, pack_header, parse_header, read_exact
+
+GOAL = "Find the red keychain next to the chair"
+
+app = Flask(__name__)
+
+
+@app.route("/receive_image", methods=["POST"])
+def receive_image():
+    image_bytes = request.files["image"].read()
+    return f"{request.form['goal']}:{len(image_bytes)}"
+
+
+@app.route("/upload_frame", methods=["POST"])
+def upload_frame():
+    header = parse_header(read_exact(request.stream, HEADER_SIZE))
+    goal = read_exact(request.stream, header.goal_length).decode("utf-8")
+    payload = read_exact(request.stream, header.payload_length)
+    return f"{goal}:{len(payload)}"
+
+
+def multipart_body(payload: bytes):
+    prepared = requests.Request(
+        "POST",
+        "http://laptop/receive_image",
+        files={"image": ("screenshot.bmp", payload, "image/bmp")},
+        data={"goal": GOAL, "car_id": "car1", "priority": "normal"},
+    ).prepare()
+    return prepared.body, prepared.headers["Content-Type"]
+
+
+def binary_body(payload: bytes, goal: bytes):
+    header = pack_header(
+        "car1", 1, time.time(), 640, 480, "rgb24", 1, goal, len(payload)
+    )
+    return header + payload, "application/octet-stream"
+
+
+def time_requests(client, path, body, content_type, repeats):
+    times = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        response = client.post(path, data=body, content_type=content_type)
+        times.append((time.perf_counter() - started) * 1000.0)
+        assert response.status_code == 200, response.get_data(as_text=True)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeats", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 255, (480, 640, 3), dtype=np.uint8)
+    payloads = {
+        "whole frame": encode_bmp(frame),
+        "delta": rng.integers(0, 255, 30 * 1024, dtype=np.uint8).tobytes(),
+    }
+    client = app.test_client()
+    print(f"Upload parsing, median of {args.repeats} requests")
+    print("=" * 72)
+    for label, payload in payloads.items():
+        rows = [
+            ("multipart", "/receive_image", *multipart_body(payload)),
+            ("binary", "/upload_frame", *binary_body(payload, GOAL.encode())),
+            # Later frames of the same goal send only its interned ID
+            ("binary, goal ID", "/upload_frame", *binary_body(payload, b"")),
+        ]
+        for name, path, body, content_type in rows:
+            ms = time_requests(client, path, body, content_type, args.repeats)
+            print(
+                f"{label:>12} {name:>16}: overhead {len(body) - len(payload):5d} B  "
+                f"parse {ms:6.2f}ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Car registry for running several RC cars from one MCP server.
+Maps each car ID to its Pi Flask servers (motor control and media), its
+analyzer laptop and its motion calibration, and keeps one pooled HTTP
+session per car.
+"""
+
+import json
+import os
+import threading
+from dataclasses import dataclass, field, asdict
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+# Configuration
+CARS_CONFIG_PATH = os.environ.get("CARS_CONFIG", "cars.json")
+DEFAULT_CAR_ID = "car1"
+DEFAULT_PI_URL = "http://10.33.35.1:5000"  # Flask server on QNX Pi
+MEDIA_PORT = 5001  # The Pi's media service (photos, tracking, sweeps, scans)
+DEFAULT_LAPTOP_IP = "10.33.49.88"  # Laptop IP for processing
+DEFAULT_LAPTOP_PORT = 8000
+POOL_SIZE = 4  # Connections kept open per car
+
+ROUND_TRIP_SECONDS = metrics.histogram(
+    "ht6_mcp_round_trip_seconds",
+    "Requests from the MCP server to each car, until the response headers",
+    ("car_id", "endpoint"),
+)
+
+
+@dataclass
+class Calibration:
+    """Duration-to-motion model for one car (measured on the floor)."""
+
+    forward_speed: float = 0.35  # metres per second at slow_speed
+    backward_speed: float = 0.35  # metres per second at slow_speed
+    turn_rate: float = 250.0  # degrees per second at fast_speed (0.4s turn ≈ 100°)
+    drift_rate: float = 0.0  # degrees of heading drift per metre driven (+ = left)
+    forward_duty: float = 25.0  # duty cycle the speeds above were measured at
+    turn_duty: float = 45.0  # duty cycle the turn rate above was measured at
+    distance_noise: float = 0.15  # 1-sigma distance error as a fraction of distance
+    turn_noise: float = 0.2  # 1-sigma turn error as a fraction of the turn angle
+
+
+@dataclass
+class CarConfig:
+    car_id: str
+    pi_url: str = DEFAULT_PI_URL
+    media_url: str = ""  # Defaults to pi_url's host on MEDIA_PORT
+    laptop_ip: str = DEFAULT_LAPTOP_IP
+    laptop_port: int = DEFAULT_LAPTOP_PORT
+    calibration: Calibration = field(default_factory=Calibration)
+    controller_gains: dict = field(default_factory=dict)  # ControllerGains overrides
+
+    def __post_init__(self):
+        if not self.media_url:
+            self.media_url = media_url_for(self.pi_url)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+class CarRegistry:
+    """Thread-safe lookup of car configs and their per-car HTTP sessions."""
+
+    def __init__(self, cars: List[CarConfig], default_car_id: Optional[str] = None):
+        if not cars:
+            raise ValueError("Car registry needs at least one car")
+        self._cars: Dict[str, CarConfig] = {car.car_id: car for car in cars}
+        self.default_car_id = default_car_id or cars[0].car_id
+        self.get(self.default_car_id)
+        self._sessions: Dict[str, requests.Session] = {}
+        self._lock = threading.Lock()
+
+    def car_ids(self) -> List[str]:
+        return list(self._cars)
+
+    def get(self, car_id: Optional[str] = None) -> CarConfig:
+        """Return the config for car_id (default car if None), raising KeyError if unknown."""
+        if car_id is None:
+            car_id = self.default_car_id
+        try:
+            return self._cars[car_id]
+        except KeyError:
+            raise KeyError(
+                f"Unknown car_id '{car_id}'. Known cars: {', '.join(self._cars)}"
+            ) from None
+
+    def session(self, car_id: Optional[str] = None) -> requests.Session:
+        """Return the pooled session for car_id, creating it on first use."""
+        car_id = self.get(car_id).car_id
+        with self._lock:
+            session = self._sessions.get(car_id)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                session.hooks["response"].append(_round_trip_recorder(car_id))
+                self._sessions[car_id] = session
+            return session
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+
+def _round_trip_recorder(car_id: str):
+    """requests response hook timing every request a car's session makes."""
+
+    def record(response, *args, **kwargs):
+        endpoint = urlsplit(response.url).path.strip("/") or "/"
+        ROUND_TRIP_SECONDS.observe(response.elapsed.total_seconds(), car_id, endpoint)
+
+    return record
+
+
+def media_url_for(pi_url: str) -> str:
+    """The media service's URL on the same Pi as the motor control server."""
+    parts = urlsplit(pi_url)
+    return parts._replace(netloc=f"{parts.hostname}:{MEDIA_PORT}").geturl()
+
+
+def _car_from_dict(car_id: str, data: dict) -> CarConfig:
+    calibration = Calibration(**data.get("calibration", {}))
+    return CarConfig(
+        car_id=car_id,
+        pi_url=data.get("pi_url", DEFAULT_PI_URL).rstrip("/"),
+        media_url=data.get("media_url", "").rstrip("/"),
+        laptop_ip=data.get("laptop_ip", DEFAULT_LAPTOP_IP),
+        laptop_port=int(data.get("laptop_port", DEFAULT_LAPTOP_PORT)),
+        calibration=calibration,
+        controller_gains=data.get("controller_gains", {}),
+    )
+
+
+def load_registry(path: Optional[str] = None) -> CarRegistry:
+    """
+    Load the car registry from a JSON file shaped like
+    {"default": "car1",
+     "cars": {"car1": {"pi_url": ..., "media_url": ... (optional),
+                       "laptop_ip": ..., "laptop_port": ...,
+                       "calibration": {"turn_rate": ...},
+                       "controller_gains": {"turn_gain": ...}}}}
+    Falls back to the single hard-wired car when the file does not exist.
+    """
+    path = path or CARS_CONFIG_PATH
+    if not os.path.exists(path):
+        return CarRegistry([CarConfig(car_id=DEFAULT_CAR_ID)])
+
+    with open(path) as f:
+        config = json.load(f)
+    cars = [_car_from_dict(car_id, data) for car_id, data in config["cars"].items()]
+    return CarRegistry(cars, default_car_id=config.get("default"))
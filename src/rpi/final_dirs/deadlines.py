@@ -0,0 +1,135 @@
+"""
+Request deadlines, carried from the MCP server to the Pi and the laptop so
+that work nobody will wait for is abandoned at every stage.
+
+The MCP server gives a photo request the time it will wait for it
+(deadlines.budget). Each outgoing call carries the time left in the
+X-Deadline-Ms header (deadlines.inject). A budget is sent rather than a
+wall-clock time because the Pi's and the laptop's clocks need not agree.
+Each service turns the header back into an absolute time.monotonic()
+deadline for the request (deadlines.bounded).
+
+Before an expensive stage, code calls deadlines.check(stage). Once the
+deadline has passed, or too little of it is left for that stage, the
+check raises DeadlineExceeded and counts the skipped stage in the
+ht6_deadline_abandoned_total counter. bounded turns the exception into a
+504 {"status": "deadline_exceeded"} reply, so every hop answers early. A
+request without a deadline is never cut short.
+"""
+
+import contextvars
+import functools
+import time
+from typing import Dict, Optional
+
+import logs
+import metrics
+
+DEADLINE_HEADER = "X-Deadline-Ms"
+
+# Stages skipped because the request's deadline had passed: the work saved
+ABANDONED = metrics.counter(
+    "ht6_deadline_abandoned",
+    "Stages skipped because their request's deadline had passed",
+    ("stage",),
+)
+
+_deadline = contextvars.ContextVar("ht6_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """The request's deadline leaves no time for a stage."""
+
+    def __init__(self, stage: str, left: float):
+        super().__init__(
+            f"Deadline exceeded before {stage} "
+            + (f"({left * 1000:.0f}ms left)" if left >= 0 else f"({-left:.2f}s late)")
+        )
+        self.stage = stage
+
+
+def remaining() -> Optional[float]:
+    """Seconds left until the current request's deadline; None without one."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def check(stage: str, needed: float = 0.0):
+    """Raise DeadlineExceeded (and count it) unless `needed` seconds are left."""
+    left = remaining()
+    if left is not None and left <= needed:
+        ABANDONED.inc(stage)
+        raise DeadlineExceeded(stage, left)
+
+
+def timeout(default: float) -> float:
+    """A call's timeout: default, but no later than the deadline."""
+    left = remaining()
+    return default if left is None else max(0.001, min(default, left))
+
+
+def inject(headers: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """headers plus the time left until the current deadline, if any."""
+    headers = dict(headers or {})
+    left = remaining()
+    if left is not None:
+        headers[DEADLINE_HEADER] = str(max(0, int(left * 1000)))
+    return headers
+
+
+class budget:
+    """Context manager: the code inside must finish within `seconds`."""
+
+    def __init__(self, seconds: Optional[float]):
+        self.seconds = seconds
+
+    def __enter__(self):
+        deadline = None
+        if self.seconds is not None:
+            deadline = time.monotonic() + self.seconds
+            outer = _deadline.get()
+            if outer is not None:
+                deadline = min(deadline, outer)  # Never extend an outer deadline
+        self._token = _deadline.set(deadline)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _deadline.reset(self._token)
+
+
+def exceeded_response(error: DeadlineExceeded):
+    from flask import jsonify
+
+    return (
+        jsonify(
+            {"status": "deadline_exceeded", "stage": error.stage, "message": str(error)}
+        ),
+        504,
+    )
+
+
+def bounded(view):
+    """
+    Flask view decorator: run the view under the deadline in the request's
+    X-Deadline-Ms header and answer 504 if a stage found it exceeded.
+    """
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        from flask import request
+
+        header = request.headers.get(DEADLINE_HEADER)
+        seconds = None
+        if header:
+            try:
+                seconds = int(header) / 1000.0
+            except ValueError:
+                pass
+        try:
+            with budget(seconds):
+                return view(*args, **kwargs)
+        except DeadlineExceeded as e:
+            log.info("Deadline exceeded", stage=e.stage, error=str(e))
+            return exceeded_response(e)
+
+    return wrapper
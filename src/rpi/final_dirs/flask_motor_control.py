@@ -1,11 +1,32 @@
-from flask import Flask, jsonify, request
+"""
+Motor control service for the QNX Pi (control plane).
+
+Owns the GPIO pins and answers the latency-critical move and stop
+requests on port 5000. Capture, preprocessing and uploads run in the
+separate media service (media_server.py, port 5001), which this script
+starts. The media service drives the motors through the MotorServer below
+(see motor_ipc), so a photo pipeline stuck on the camera or on the laptop
+can never hold up a /stop.
+"""
+
+from flask import Flask, Response, jsonify, request
 import rpi_gpio as GPIO
-import time
-import subprocess
+import atexit
 import os
-import requests
+import subprocess
+import sys
+
+import flight_recorder
+import logs
+import metrics
+from motor_ipc import MotorServer, make_authkey
+from motor_scheduler import MotorScheduler
+import profiler
 
 app = Flask(__name__)
+# Queued JSON lines in logs/pi-control.log (request lines too), written off
+# the request threads so a slow serial console never delays a motor command
+log = logs.setup("pi-control")
 
 # GPIO Pin Configuration
 IN1, IN2, ENA = 17, 27, 22
@@ -30,49 +51,21 @@ pwm2.start(0)
 slow_speed = 25
 fast_speed = 45
 
+# Direction pin levels (IN1, IN2, IN3, IN4) for each motion
+MOTOR_PINS = {
+    "forward": (GPIO.HIGH, GPIO.LOW, GPIO.LOW, GPIO.HIGH),
+    "backward": (GPIO.LOW, GPIO.HIGH, GPIO.HIGH, GPIO.LOW),
+    "right": (GPIO.LOW, GPIO.HIGH, GPIO.LOW, GPIO.HIGH),
+    "left": (GPIO.HIGH, GPIO.LOW, GPIO.HIGH, GPIO.LOW),
+}
 
-def move_forward(duration=0.3):
-    pwm.ChangeDutyCycle(slow_speed)
-    pwm2.ChangeDutyCycle(slow_speed)
-    GPIO.output(IN1, GPIO.HIGH)
-    GPIO.output(IN2, GPIO.LOW)
-    GPIO.output(IN3, GPIO.LOW)
-    GPIO.output(IN4, GPIO.HIGH)
-    time.sleep(duration)
-    stop_motor()
 
-
-def move_backward(duration=0.3):
-    pwm.ChangeDutyCycle(slow_speed)
-    pwm2.ChangeDutyCycle(slow_speed)
-    GPIO.output(IN1, GPIO.LOW)
-    GPIO.output(IN2, GPIO.HIGH)
-    GPIO.output(IN3, GPIO.HIGH)
-    GPIO.output(IN4, GPIO.LOW)
-    time.sleep(duration)
-    stop_motor()
-
-
-def move_right(duration=0.3):
-    pwm2.ChangeDutyCycle(fast_speed)
-    GPIO.output(IN3, GPIO.LOW)
-    GPIO.output(IN4, GPIO.HIGH)
-    pwm.ChangeDutyCycle(fast_speed)
-    GPIO.output(IN1, GPIO.LOW)
-    GPIO.output(IN2, GPIO.HIGH)
-    time.sleep(duration)
-    stop_motor()
-
-
-def move_left(duration=0.3):
-    pwm2.ChangeDutyCycle(fast_speed)
-    GPIO.output(IN3, GPIO.HIGH)
-    GPIO.output(IN4, GPIO.LOW)
-    pwm.ChangeDutyCycle(fast_speed)
-    GPIO.output(IN1, GPIO.HIGH)
-    GPIO.output(IN2, GPIO.LOW)
-    time.sleep(duration)
-    stop_motor()
+def drive_motors(action, duty):
+    """Set both motors running for an action at a duty cycle; returns at once."""
+    pwm.ChangeDutyCycle(duty)
+    pwm2.ChangeDutyCycle(duty)
+    for pin, level in zip((IN1, IN2, IN3, IN4), MOTOR_PINS[action]):
+        GPIO.output(pin, level)
 
 
 def stop_motor():
@@ -84,106 +77,83 @@ def stop_motor():
     GPIO.output(IN4, GPIO.LOW)
 
 
-def take_photo():
-    """
-    Take a photo using the camera_example3_viewfinder application
-    Opens the camera app and takes a screenshot
-    """
-    try:
-        # Open the camera application
-        print("Opening camera application...")
-        camera_process = subprocess.Popen(
-            ["camera_example3_viewfinder"],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-        )
-
-        # Give the camera app time to start up
-        time.sleep(5)  # QNX needs more time for framebuffer setup
-
-        # Take screenshot using the screenshot command
-        print("Taking screenshot...")
-        screenshot_result = subprocess.run(
-            ["screenshot"], capture_output=True, text=True, timeout=10
-        )
-
-        # After taking the screenshot, terminate the camera application
-        if camera_process.poll() is None:
-            print("Closing camera application...")
-            camera_process.terminate()
+# Every motor segment with its actual timing goes to the flight recorder
+recorder = flight_recorder.open_recorder("pi-control")
+atexit.register(recorder.close)
+
+# Every motion goes through the scheduler: serialized, logged, watchdog-guarded
+motors = MotorScheduler(drive_motors, stop_motor, on_segment=recorder.motor)
+
+
+def move_forward(duration=0.3):
+    return motors.run("forward", duration, slow_speed)  # Actual motor on-time
+
+
+def move_backward(duration=0.3):
+    return motors.run("backward", duration, slow_speed)
+
+
+def move_right(duration=0.3):
+    return motors.run("right", duration, fast_speed)
+
+
+def move_left(duration=0.3):
+    return motors.run("left", duration, fast_speed)
+
+
+# The media service's motor commands (tracking, sweeps, scans) arrive here
+motor_server = MotorServer(
+    motors,
+    {
+        "forward": slow_speed,
+        "backward": slow_speed,
+        "left": fast_speed,
+        "right": fast_speed,
+    },
+    make_authkey(),  # Random per run; the media service inherits it
+)
+motor_server.start()
+
+
+def start_media_service():
+    """Run media_server.py as a child process; it is stopped when this one exits."""
+    # The child inherits MOTOR_IPC_KEY, the motor socket's key for this run
+    media = subprocess.Popen(
+        [sys.executable, os.path.join(os.path.dirname(__file__), "media_server.py")]
+    )
+
+    def stop_media():
+        if media.poll() is None:
+            media.terminate()
             try:
-                camera_process.wait(timeout=2)
+                media.wait(timeout=5)
             except subprocess.TimeoutExpired:
-                print("Camera app did not close in time, killing...")
-                camera_process.kill()
-
-        if screenshot_result.returncode == 0:
-            print("Photo taken successfully!")
-            time.sleep(2)
-            # After taking screenshot, verify file exists and has content:
-            if os.path.exists("screenshot.bmp"):
-                file_size = os.path.getsize("screenshot.bmp")
-                if file_size > 1000:  # Basic content check
-                    return True
-                else:
-                    print("Screenshot file is too small, may be invalid")
-                    return False
-            else:
-                print("Screenshot file not found after taking photo.")
-                return False
-        else:
-            print(f"Screenshot failed: {screenshot_result.stderr}")
-            return False
-
-    except Exception as e:
-        print(f"Error taking photo: {e}")
-        return False
-
-
-def send_image_to_laptop(
-    image_path, goal_description, laptop_ip="10.33.49.88", laptop_port=8000
-):
-    """
-    Send the captured image to the laptop via HTTP POST
-    Returns the annotation string from the server response
-    """
-    try:
-        if not os.path.exists(image_path):
-            print(f"Image file not found: {image_path}")
-            return None
-
-        # Prepare the file for upload
-        with open(image_path, "rb") as f:
-            files = {"image": ("screenshot.bmp", f, "image/bmp")}
-            data = {"goal": goal_description}
-
-            # Send to laptop
-            laptop_url = f"http://{laptop_ip}:{laptop_port}/receive_image"
-            print(f"Sending image to: {laptop_url}")
-            print(f"Goal: {goal_description}")
-
-            response = requests.post(laptop_url, files=files, data=data, timeout=10)
-
-            if response.status_code == 200:
-                print("Image sent successfully to laptop")
-                # Return the annotation string from the response
-                return response.text
-            else:
-                print(f"Failed to send image. Status: {response.status_code}")
-                return None
-
-    except Exception as e:
-        print(f"Error sending image to laptop: {e}")
-        return None
+                media.kill()
+
+    atexit.register(stop_media)
+    return media
 
 
 @app.route("/forward", methods=["POST"])
 def forward():
     data = request.get_json(silent=True) or {}
     duration = float(data.get("duration", 0.3))
-    move_forward(duration)
+    actual_duration = move_forward(duration)
+    log.info(
+        "Motor command",
+        action="forward",
+        duration=duration,
+        actual=round(actual_duration, 4),
+    )
     return jsonify(
-        {"status": "success", "message": f"Moved forward for {duration} seconds"}
+        {
+            "status": "success",
+            "message": f"Moved forward for {duration} seconds",
+            "direction": "forward",
+            "duration": duration,
+            "actual_duration": round(actual_duration, 4),
+            "duty_cycle": slow_speed,
+        }
     )
 
 
@@ -191,9 +161,22 @@ def forward():
 def backward():
     data = request.get_json(silent=True) or {}
     duration = float(data.get("duration", 0.3))
-    move_backward(duration)
+    actual_duration = move_backward(duration)
+    log.info(
+        "Motor command",
+        action="backward",
+        duration=duration,
+        actual=round(actual_duration, 4),
+    )
     return jsonify(
-        {"status": "success", "message": f"Moved backward for {duration} seconds"}
+        {
+            "status": "success",
+            "message": f"Moved backward for {duration} seconds",
+            "direction": "backward",
+            "duration": duration,
+            "actual_duration": round(actual_duration, 4),
+            "duty_cycle": slow_speed,
+        }
     )
 
 
@@ -201,9 +184,22 @@ def backward():
 def left():
     data = request.get_json(silent=True) or {}
     duration = float(data.get("duration", 0.3))
-    move_left(duration)
+    actual_duration = move_left(duration)
+    log.info(
+        "Motor command",
+        action="left",
+        duration=duration,
+        actual=round(actual_duration, 4),
+    )
     return jsonify(
-        {"status": "success", "message": f"Turned left for {duration} seconds"}
+        {
+            "status": "success",
+            "message": f"Turned left for {duration} seconds",
+            "direction": "left",
+            "duration": duration,
+            "actual_duration": round(actual_duration, 4),
+            "duty_cycle": fast_speed,
+        }
     )
 
 
@@ -211,60 +207,42 @@ def left():
 def right():
     data = request.get_json(silent=True) or {}
     duration = float(data.get("duration", 0.3))
-    move_right(duration)
+    actual_duration = move_right(duration)
+    log.info(
+        "Motor command",
+        action="right",
+        duration=duration,
+        actual=round(actual_duration, 4),
+    )
     return jsonify(
-        {"status": "success", "message": f"Turned right for {duration} seconds"}
+        {
+            "status": "success",
+            "message": f"Turned right for {duration} seconds",
+            "direction": "right",
+            "duration": duration,
+            "actual_duration": round(actual_duration, 4),
+            "duty_cycle": fast_speed,
+        }
     )
 
 
 @app.route("/stop", methods=["POST"])
 def stop():
-    stop_motor()
+    motors.stop()
+    log.info("Motor stop")
     return jsonify({"status": "success", "message": "Stopped"})
 
 
-@app.route("/photo", methods=["POST"])
-def photo():
-    try:
-        data = request.get_json()
-        goal_description = data.get("goal", "Find the target object")
-        laptop_ip = data.get("laptop_ip", "10.33.49.88")  # Default laptop IP
-        laptop_port = data.get("laptop_port", 8000)  # Default laptop port
-
-        print(f"Goal description: {goal_description}")
-        print(f"Sending to laptop: {laptop_ip}:{laptop_port}")
-
-        success = take_photo()
-        if success:
-            # Send image to laptop
-            annotation_string = send_image_to_laptop(
-                "screenshot.bmp", goal_description, laptop_ip, laptop_port
-            )
-
-            if annotation_string:
-                return jsonify(
-                    {
-                        "status": "success",
-                        "message": "Photo taken and sent to laptop",
-                        "goal": goal_description,
-                        "image_sent": True,
-                        "annotation": annotation_string,
-                    }
-                )
-            else:
-                return jsonify(
-                    {
-                        "status": "partial_success",
-                        "message": "Photo taken but failed to send to laptop",
-                        "goal": goal_description,
-                        "image_sent": False,
-                    }
-                )
-        else:
-            return jsonify({"status": "error", "message": "Failed to take photo"}), 500
-
-    except Exception as e:
-        return jsonify({"status": "error", "message": f"Error: {str(e)}"}), 500
+@app.route("/metrics", methods=["GET"])
+def metrics_page():
+    """Motor pulse histograms in the Prometheus text format"""
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@app.route("/debug/profile", methods=["GET"])
+def debug_profile():
+    """Collapsed stacks of this process for flame graphs (see profiler)"""
+    return profiler.flask_response(request)
 
 
 if __name__ == "__main__":
@@ -275,6 +253,10 @@ if __name__ == "__main__":
     print('  POST /left     - Turn left (optional JSON: {"duration": seconds})')
     print('  POST /right    - Turn right (optional JSON: {"duration": seconds})')
     print("  POST /stop     - Stop motors")
-    print("  POST /photo    - Take a photo and send to laptop")
+    print("  GET  /metrics  - Requested vs. actual pulse durations (Prometheus text)")
+    print("  GET  /debug/profile - Sampled stacks (?seconds=N, X-Profile-Key header)")
+    print("Photo, track, stream, sweep and scan are served by media_server.py on 5001")
+    if os.environ.get("MEDIA_SERVICE", "1") != "0":
+        start_media_service()
     print("\nServer running on http://0.0.0.0:5000")
     app.run(host="0.0.0.0", port=5000, debug=False)
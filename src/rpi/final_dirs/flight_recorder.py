@@ -0,0 +1,509 @@
+#!/usr/bin/env python3
+"""
+Append-only binary flight recorder for the Pi's and the laptop's services.
+
+The recorder logs motor segments with their requested and actual on-time,
+the frames that were analyzed, analysis requests and results, and trace
+spans. This way a slow or failed mission can be replayed and analyzed
+afterwards.
+
+Recording only puts the record on a queue, so the hot path does no
+encoding, hashing, compression or I/O. A background thread does that work
+and appends to the current file. It starts a new file past max_bytes and
+deletes the oldest beyond max_files. If the writer falls behind, records
+are dropped and counted, and the caller is never blocked.
+
+File layout: the MAGIC bytes, then records. Each record has a fixed
+header (payload length, CRC-32 of the payload, kind, wall-clock time and
+time.monotonic()) followed by the payload:
+- MOTOR: action, duty, requested and actual seconds, monotonic start and end
+- FRAME: frame ID, BLAKE2 digest, height, width, format, and the zlib-
+  compressed pixels. The pixels are stored only the first time the digest
+  appears in the file; repeated frames refer to that copy.
+- ANALYSIS, SPANS, EVENT: compact JSON
+Other records refer to a frame by its ID. Each file holds every frame its
+records refer to, so a rotated file can be read on its own.
+
+FlightLog reads a file through mmap. It indexes the record offsets in one
+pass over the headers and decodes a payload only when it is asked for.
+Summarize or dump files with:
+
+    python -m flight_recorder flight_logs/pi-media-*.flt [--dump] [--kind analysis]
+    python -m flight_recorder <file> --frame 12 --out frame12.bmp
+"""
+
+import argparse
+import glob
+import hashlib
+import itertools
+import json
+import math
+import mmap
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+from collections import Counter, namedtuple
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+import metrics
+
+MAGIC = b"HT6FLT01"
+HEADER = struct.Struct("<IIBdd")  # payload length, CRC-32, kind, wall time, monotonic
+MOTOR = struct.Struct("<Bfffdd")  # action, duty, requested, actual, start, end
+FRAME = struct.Struct("<I16sHHBB")  # frame ID, digest, height, width, format, stored
+
+KIND_MOTOR, KIND_FRAME, KIND_ANALYSIS, KIND_SPANS, KIND_EVENT = range(1, 6)
+KIND_NAMES = {
+    KIND_MOTOR: "motor",
+    KIND_FRAME: "frame",
+    KIND_ANALYSIS: "analysis",
+    KIND_SPANS: "spans",
+    KIND_EVENT: "event",
+}
+ACTIONS = ("forward", "backward", "left", "right")
+FORMAT_RGB, FORMAT_ENCODED = 0, 1  # Raw RGB pixels or an encoded image (BMP)
+
+RECORDER_DIR = os.environ.get("RECORDER_DIR", "flight_logs")
+RECORDER_ENABLED = os.environ.get("RECORDER", "1") != "0"
+MAX_BYTES = int(float(os.environ.get("RECORDER_MAX_MB", "64")) * 1024 * 1024)
+MAX_FILES = int(os.environ.get("RECORDER_MAX_FILES", "20"))
+QUEUE_SIZE = 4096  # Records waiting for the writer before new ones are dropped
+MAX_PENDING_FRAMES = 8  # Frames waiting for the writer (each is ~1 MB)
+COMPRESS_LEVEL = 1  # zlib: fast enough for the Pi; frames still shrink a lot
+
+RECORDS = metrics.counter(
+    "ht6_flight_records",
+    "Flight recorder records by kind: written, or dropped because the writer lagged",
+    ("kind", "outcome"),
+)
+
+Record = namedtuple("Record", ["kind", "wall_time", "monotonic", "data"])
+
+
+class FlightRecorder:
+    """Queues records for a background thread that appends them to rotating files."""
+
+    def __init__(
+        self,
+        name: str,
+        directory: str = RECORDER_DIR,
+        max_bytes: int = MAX_BYTES,
+        max_files: int = MAX_FILES,
+        queue_size: int = QUEUE_SIZE,
+    ):
+        """
+        Args:
+            name: File name prefix, one per process ("pi-control", "laptop", ...)
+        """
+        self.name = name
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.path: Optional[str] = None
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._frame_ids = itertools.count(1)
+        self._pending_frames = 0
+        self._pending_lock = threading.Lock()
+        self._file = None
+        self._size = 0
+        self._stored: Dict[bytes, int] = {}  # Digests stored in the current file
+        self._file_seq = itertools.count()
+        os.makedirs(directory, exist_ok=True)
+        self._thread = threading.Thread(
+            target=self._run, name=f"recorder-{name}", daemon=True
+        )
+        self._thread.start()
+
+    # Hot path: only enqueue
+
+    def _put(self, kind: int, data) -> bool:
+        try:
+            self._queue.put_nowait((kind, time.time(), time.monotonic(), data))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            RECORDS.inc(KIND_NAMES[kind], "dropped")
+            return False
+
+    def motor(self, segment: dict):
+        """A finished motor segment (MotorScheduler's on_segment callback)."""
+        self._put(KIND_MOTOR, segment)
+
+    def frame(self, image) -> Optional[int]:
+        """
+        Queue a frame (an RGB array the caller will not change, or encoded
+        image bytes) and return the ID that other records use to refer to it.
+        None if it was dropped.
+        """
+        with self._pending_lock:
+            if self._pending_frames >= MAX_PENDING_FRAMES:
+                self.dropped += 1
+                RECORDS.inc("frame", "dropped")
+                return None
+            self._pending_frames += 1
+        frame_id = next(self._frame_ids)
+        if not self._put(KIND_FRAME, (frame_id, image)):
+            with self._pending_lock:
+                self._pending_frames -= 1
+            return None
+        return frame_id
+
+    def analysis(self, **fields):
+        self._put(KIND_ANALYSIS, fields)
+
+    def spans(self, trace):
+        """
+        A finished trace (a tracing.Trace, exported by the writer); usable as
+        a tracing.on_finish hook.
+        """
+        self._put(KIND_SPANS, trace)
+
+    def event(self, name: str, **fields):
+        self._put(KIND_EVENT, {"event": name, **fields})
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until everything queued so far is on disk."""
+        done = threading.Event()
+        try:
+            self._queue.put((None, 0.0, 0.0, done), timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def close(self):
+        self.flush()
+        self._queue.put((None, 0.0, 0.0, None))
+        self._thread.join(timeout=5)
+
+    # Writer thread
+
+    def _run(self):
+        while True:
+            kind, wall, mono, data = self._queue.get()
+            if kind is None:
+                if self._file is not None:
+                    self._file.flush()
+                if data is None:
+                    break
+                data.set()
+                continue
+            try:
+                self._write(kind, wall, mono, data)
+                RECORDS.inc(KIND_NAMES[kind], "written")
+            except Exception as e:
+                print(
+                    f"Flight recorder: could not write a {KIND_NAMES[kind]} record: {e}"
+                )
+            if self._queue.empty() and self._file is not None:
+                self._file.flush()  # Idle: keep the file current for readers
+        if self._file is not None:
+            self._file.close()
+
+    def _write(self, kind: int, wall: float, mono: float, data):
+        frame = None
+        if kind == KIND_FRAME:
+            with self._pending_lock:
+                self._pending_frames -= 1
+            frame = _Frame(*data)
+            payload = frame.payload(self._stored)
+        elif kind == KIND_MOTOR:
+            payload = _pack_motor(data)
+        else:
+            if kind == KIND_SPANS:
+                data = {"trace_id": data.trace_id, "spans": data.export()}
+            payload = json.dumps(data, separators=(",", ":"), default=str).encode()
+        if (
+            self._file is None
+            or self._size + HEADER.size + len(payload) > self.max_bytes
+        ):
+            self._rotate()
+            if frame is not None:
+                payload = frame.payload(self._stored)  # Its own copy in the new file
+        self._file.write(
+            HEADER.pack(len(payload), zlib.crc32(payload), kind, wall, mono)
+        )
+        self._file.write(payload)
+        self._size += HEADER.size + len(payload)
+        if frame is not None and frame.digest not in self._stored:
+            self._stored[frame.digest] = frame.frame_id
+
+    def _rotate(self):
+        if self._file is not None:
+            self._file.close()
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        self.path = os.path.join(
+            self.directory, f"{self.name}-{stamp}-{next(self._file_seq):03d}.flt"
+        )
+        self._file = open(self.path, "ab")
+        if self._file.tell() == 0:
+            self._file.write(MAGIC)
+        self._size = self._file.tell()
+        self._stored.clear()  # Each file keeps its own copy of the frames it uses
+        old = sorted(
+            glob.glob(os.path.join(self.directory, f"{self.name}-*.flt")),
+            key=os.path.getmtime,
+        )
+        for path in old[: max(0, len(old) - self.max_files)]:
+            if path != self.path:
+                os.remove(path)
+
+
+class _Frame:
+    """A queued frame; hashed and compressed by the writer thread."""
+
+    def __init__(self, frame_id: int, image):
+        self.frame_id = frame_id
+        if isinstance(image, np.ndarray):
+            self.height, self.width = image.shape[:2]
+            self.format = FORMAT_RGB
+            self.raw = np.ascontiguousarray(image, dtype=np.uint8).data
+        else:
+            self.height = self.width = 0
+            self.format = FORMAT_ENCODED
+            self.raw = image
+        self.digest = hashlib.blake2b(self.raw, digest_size=16).digest()
+        self._compressed = None
+
+    def payload(self, stored: Dict[bytes, int]) -> bytes:
+        """Header plus pixels, or just the header if stored has the digest."""
+        known = self.digest in stored
+        header = FRAME.pack(
+            self.frame_id, self.digest, self.height, self.width, self.format, not known
+        )
+        if known:
+            return header
+        if self._compressed is None:
+            self._compressed = zlib.compress(self.raw, COMPRESS_LEVEL)
+        return header + self._compressed
+
+
+class NullRecorder:
+    """FlightRecorder's interface when recording is turned off."""
+
+    path = None
+    dropped = 0
+
+    def motor(self, segment):
+        pass
+
+    def frame(self, image):
+        return None
+
+    def analysis(self, **fields):
+        pass
+
+    def spans(self, trace):
+        pass
+
+    def event(self, name, **fields):
+        pass
+
+    def flush(self, timeout=5.0):
+        return True
+
+    def close(self):
+        pass
+
+
+def open_recorder(name: str):
+    """A FlightRecorder for this process, or a NullRecorder with RECORDER=0."""
+    if not RECORDER_ENABLED:
+        return NullRecorder()
+    return FlightRecorder(name)
+
+
+def _pack_motor(segment: dict) -> bytes:
+    requested = segment.get("requested")
+    end = segment["end"] if segment["end"] is not None else math.nan
+    return MOTOR.pack(
+        ACTIONS.index(segment["action"]),
+        segment["duty"],
+        math.nan if requested is None else requested,
+        end - segment["start"],
+        segment["start"],
+        end,
+    )
+
+
+def _unpack_motor(payload: bytes) -> dict:
+    action, duty, requested, actual, start, end = MOTOR.unpack(payload)
+    return {
+        "action": ACTIONS[action],
+        "duty": round(duty, 3),
+        "requested": None if math.isnan(requested) else round(requested, 6),
+        "actual": round(actual, 6),
+        "start": start,
+        "end": end,
+    }
+
+
+class FlightLog:
+    """Random access to one recorder file through mmap."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[: len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a flight recorder file")
+        self.offsets: List[int] = []  # Record header offsets, in file order
+        self.kinds = bytearray()
+        self.truncated = False  # A torn last record (the writer was cut off)
+        self._frames: Dict[int, int] = {}  # Frame ID -> record index
+        self._stored: Dict[bytes, int] = {}  # Digest -> index of the stored copy
+        self._index()
+
+    def _index(self):
+        buf, size, offset = self._map, len(self._map), len(MAGIC)
+        while offset + HEADER.size <= size:
+            length, _, kind, _, _ = HEADER.unpack_from(buf, offset)
+            if offset + HEADER.size + length > size:
+                self.truncated = True
+                break
+            if kind == KIND_FRAME:
+                frame_id, digest, _, _, _, stored = FRAME.unpack_from(
+                    buf, offset + HEADER.size
+                )
+                self._frames[frame_id] = len(self.offsets)
+                if stored:
+                    self._stored[digest] = len(self.offsets)
+            self.offsets.append(offset)
+            self.kinds.append(kind)
+            offset += HEADER.size + length
+        else:
+            self.truncated = offset != size
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def _payload(self, index: int):
+        offset = self.offsets[index]
+        length, crc, kind, wall, mono = HEADER.unpack_from(self._map, offset)
+        start = offset + HEADER.size
+        payload = self._map[start : start + length]
+        if zlib.crc32(payload) != crc:
+            raise ValueError(f"Record {index} of {self.path} is corrupt")
+        return kind, wall, mono, payload
+
+    def __getitem__(self, index: int) -> Record:
+        kind, wall, mono, payload = self._payload(index)
+        if kind == KIND_MOTOR:
+            data = _unpack_motor(payload)
+        elif kind == KIND_FRAME:
+            frame_id, digest, height, width, fmt, stored = FRAME.unpack_from(payload)
+            data = {
+                "frame_id": frame_id,
+                "digest": digest.hex(),
+                "height": height,
+                "width": width,
+                "encoded": fmt == FORMAT_ENCODED,
+                "stored": bool(stored),
+                "bytes": len(payload) - FRAME.size,
+            }
+        else:
+            data = json.loads(payload)
+        return Record(KIND_NAMES.get(kind, str(kind)), wall, mono, data)
+
+    def records(self, kind: Optional[str] = None) -> Iterator[Record]:
+        """All records in file order, or those of one kind ("motor", "frame", ...)."""
+        codes = {code for code, name in KIND_NAMES.items() if kind in (None, name)}
+        for index, code in enumerate(self.kinds):
+            if code in codes:
+                yield self[index]
+
+    def frame(self, frame_id: int):
+        """A recorded frame: an RGB array, or the encoded image bytes."""
+        _, _, _, payload = self._payload(self._frames[frame_id])
+        _, digest, height, width, fmt, stored = FRAME.unpack_from(payload)
+        if not stored:
+            _, _, _, payload = self._payload(self._stored[digest])
+        raw = zlib.decompress(payload[FRAME.size :])
+        if fmt == FORMAT_ENCODED:
+            return raw
+        return np.frombuffer(raw, dtype=np.uint8).reshape(height, width, 3)
+
+    def close(self):
+        self._map.close()
+
+
+def summarize(log: FlightLog) -> List[str]:
+    """A few lines on what a file holds: records, motors, frames and analyses."""
+    counts = Counter(KIND_NAMES.get(k, str(k)) for k in log.kinds)
+    lines = [
+        f"{log.path}: {len(log)} records"
+        + (" (torn last record)" if log.truncated else ""),
+        "  " + ", ".join(f"{name} {count}" for name, count in sorted(counts.items())),
+    ]
+    if len(log):
+        first, last = log[0], log[len(log) - 1]
+        started = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(first.wall_time))
+        lines.append(f"  {started}, {last.wall_time - first.wall_time:.1f}s recorded")
+    motors = [r.data for r in log.records("motor")]
+    if motors:
+        overrun = [m["actual"] - m["requested"] for m in motors if m["requested"]]
+        lines.append(
+            f"  motors: {len(motors)} segments, "
+            f"{sum(m['actual'] for m in motors):.2f}s on"
+            + (
+                f", pulses {1000 * sum(overrun) / len(overrun):+.1f}ms vs requested"
+                if overrun
+                else ""
+            )
+        )
+    frames = [r.data for r in log.records("frame")]
+    if frames:
+        stored = [f for f in frames if f["stored"]]
+        raw = sum(f["height"] * f["width"] * 3 for f in stored if not f["encoded"])
+        lines.append(
+            f"  frames: {len(frames)} ({len(frames) - len(stored)} deduplicated), "
+            f"{sum(f['bytes'] for f in stored) / 1e6:.1f}MB stored"
+            + (f" of {raw / 1e6:.1f}MB raw" if raw else "")
+        )
+    analyses = [r.data for r in log.records("analysis")]
+    if analyses:
+        by_status = Counter(a.get("status", a.get("phase", "?")) for a in analyses)
+        lines.append(
+            f"  analyses: {len(analyses)} ("
+            + ", ".join(f"{s} {n}" for s, n in sorted(by_status.items()))
+            + ")"
+        )
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Read flight recorder files.")
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--dump", action="store_true", help="Print every record")
+    parser.add_argument("--kind", choices=sorted(KIND_NAMES.values()))
+    parser.add_argument("--frame", type=int, help="Export this frame ID")
+    parser.add_argument("--out", default="frame.bmp", help="Where --frame writes")
+    args = parser.parse_args()
+
+    for path in args.files:
+        log = FlightLog(path)
+        if args.frame is not None:
+            image = log.frame(args.frame)
+            if isinstance(image, np.ndarray):
+                from image_utils import encode_bmp
+
+                image = encode_bmp(image)
+            with open(args.out, "wb") as f:
+                f.write(image)
+            print(f"Frame {args.frame} written to {args.out}")
+        elif args.dump or args.kind:
+            for record in log.records(args.kind):
+                when = time.strftime("%H:%M:%S", time.localtime(record.wall_time))
+                print(f"{when} {record.kind:<8} {json.dumps(record.data)}")
+        else:
+            print("\n".join(summarize(log)))
+        log.close()
+
+
+if __name__ == "__main__":
+    main()
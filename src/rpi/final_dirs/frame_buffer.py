@@ -0,0 +1,161 @@
+"""
+Frame ring buffer and continuous camera capture for the Pi.
+
+CameraStream keeps camera_example3_viewfinder open and grabs screenshots in
+a background thread, so consumers (the visual tracker, photo requests) get
+the latest frame without paying the camera start-up time on every request.
+"""
+
+import os
+import subprocess
+import threading
+import time
+from collections import deque, namedtuple
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from image_utils import decode_bmp
+import logs
+
+Frame = namedtuple("Frame", ["seq", "timestamp", "image"])
+
+CAMERA_STARTUP_DELAY = 5  # QNX needs time for framebuffer setup
+SCREENSHOT_PATH = "screenshot.bmp"
+GRAB_LOG_WINDOW = 10.0  # seconds between "Frame grab failed" lines
+
+log = logs.get("frame_buffer")
+# A stopped camera fails every grab, ten times a second: one line per window
+grab_log = logs.get("frame_buffer.grab")
+grab_log.logger.addFilter(logs.RateLimit(limit=1, window=GRAB_LOG_WINDOW))
+
+
+class FrameRing:
+    """Fixed-capacity buffer of the most recent frames, safe across threads."""
+
+    def __init__(self, capacity: int = 16):
+        self._frames = deque(maxlen=capacity)
+        self._cond = threading.Condition()
+        self._seq = 0
+
+    def push(self, image: np.ndarray, timestamp: Optional[float] = None) -> Frame:
+        with self._cond:
+            self._seq += 1
+            frame = Frame(self._seq, timestamp or time.monotonic(), image)
+            self._frames.append(frame)
+            self._cond.notify_all()
+        return frame
+
+    def latest(self) -> Optional[Frame]:
+        with self._cond:
+            return self._frames[-1] if self._frames else None
+
+    def wait_newer(self, seq: int, timeout: float) -> Optional[Frame]:
+        """Block until a frame newer than seq arrives; None on timeout."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while not self._frames or self._frames[-1].seq <= seq:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+            return self._frames[-1]
+
+    def frames(self) -> List[Frame]:
+        """All buffered frames, oldest first."""
+        with self._cond:
+            return list(self._frames)
+
+
+def screenshot_grabber(
+    path: str = SCREENSHOT_PATH, cwd: Optional[str] = None
+) -> Optional[np.ndarray]:
+    """
+    Grab one frame from the running viewfinder with the screenshot tool,
+    which writes screenshot.bmp into its working directory (cwd).
+    """
+    result = subprocess.run(["screenshot"], capture_output=True, timeout=10, cwd=cwd)
+    if result.returncode != 0 or not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        return decode_bmp(f.read())
+
+
+class CameraStream:
+    """Background capture of viewfinder frames into a FrameRing."""
+
+    def __init__(
+        self,
+        ring: FrameRing,
+        grabber: Callable[[], Optional[np.ndarray]] = screenshot_grabber,
+        interval: float = 0.0,
+        start_viewfinder: bool = True,
+    ):
+        self.ring = ring
+        self.grabber = grabber
+        self.interval = interval  # Extra pause between grabs, seconds
+        self.start_viewfinder = start_viewfinder
+        self.errors = 0
+        self._process = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, wait_for_frame: float = 10.0) -> bool:
+        """Start capturing (idempotent); wait until the first frame is in."""
+        with self._lock:
+            if not self.running:
+                self._stop.clear()
+                if self.start_viewfinder:
+                    log.info("Opening camera application for streaming")
+                    self._process = subprocess.Popen(
+                        ["camera_example3_viewfinder"],
+                        stdout=subprocess.DEVNULL,
+                        stderr=subprocess.DEVNULL,
+                    )
+                    time.sleep(CAMERA_STARTUP_DELAY)
+                self._thread = threading.Thread(
+                    target=self._loop, name="camera-stream", daemon=True
+                )
+                self._thread.start()
+        latest = self.ring.latest()
+        return (
+            self.ring.wait_newer(latest.seq if latest else 0, wait_for_frame)
+            is not None
+        )
+
+    def stop(self):
+        with self._lock:
+            self._stop.set()
+            if self._thread is not None:
+                self._thread.join(timeout=5)
+                self._thread = None
+            if self._process is not None and self._process.poll() is None:
+                log.info("Closing camera application")
+                self._process.terminate()
+                try:
+                    self._process.wait(timeout=2)
+                except subprocess.TimeoutExpired:
+                    self._process.kill()
+            self._process = None
+
+    def _loop(self):
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                image = self.grabber()
+            except Exception as e:
+                grab_log.warning("Frame grab failed", error=str(e))
+                image = None
+            if image is None:
+                self.errors += 1
+                self._stop.wait(0.1)
+                continue
+            # Timestamp the middle of the grab, closest to the exposure
+            self.ring.push(image, (started + time.monotonic()) / 2.0)
+            if self.interval:
+                self._stop.wait(self.interval)
@@ -0,0 +1,187 @@
+"""
+Delta-encoded frame uploads between the Pi and the analyzer laptop.
+
+While the car centres on a target, consecutive frames share most of their
+pixels. The laptop keeps the last frame it received from each car; the Pi
+keeps the same reference and, instead of the whole BMP, sends only the
+tiles that changed, XORed with the reference tile and zlib-compressed.
+Tiles whose mean absolute difference stays within TILE_TOLERANCE, and
+where no pixel changed by more than PIXEL_TOLERANCE, keep the reference
+pixels (sensor noise alone would otherwise "change" every tile), so the Pi
+tracks the laptop's reconstruction rather than the raw frame.
+
+A delta carries CRC32s of the reference it was made against and of the
+reconstruction; the laptop refuses a delta whose reference it does not
+have, and the Pi then falls back to a full keyframe. A keyframe is also
+sent every KEYFRAME_INTERVAL frames and whenever most tiles changed.
+"""
+
+import struct
+import zlib
+from typing import Optional, Tuple
+
+import numpy as np
+
+TILE_SIZE = 16  # pixels
+TILE_TOLERANCE = 6.0  # Mean absolute difference (0-255) below which a tile is kept
+PIXEL_TOLERANCE = 40  # ...as long as no pixel in it changed by more than this
+KEYFRAME_INTERVAL = 10  # Deltas between keyframes
+MAX_CHANGED_FRACTION = 0.6  # More changed tiles than this: send a keyframe instead
+ZLIB_LEVEL = 1  # Fast; the XORed tiles are mostly zero bits anyway
+MAX_PENDING = 4  # Uploads awaiting commit; older ones are forgotten
+
+_MAGIC = b"FDL1"
+_HEADER = struct.Struct("<4sHHHII")  # magic, width, height, tile, base CRC, frame CRC
+
+
+class FrameMismatch(ValueError):
+    """A delta cannot be applied: wrong, missing or corrupted reference."""
+
+
+def frame_crc(frame: np.ndarray) -> int:
+    return zlib.crc32(np.ascontiguousarray(frame).tobytes())
+
+
+def _tiles(frame: np.ndarray, tile: int) -> np.ndarray:
+    """(rows, columns, tile, tile, 3) view of a frame padded to whole tiles."""
+    height, width = frame.shape[:2]
+    rows, columns = -(-height // tile), -(-width // tile)
+    padded = np.zeros((rows * tile, columns * tile, 3), dtype=np.uint8)
+    padded[:height, :width] = frame
+    return padded.reshape(rows, tile, columns, tile, 3).swapaxes(1, 2)
+
+
+def _untile(tiles: np.ndarray, height: int, width: int) -> np.ndarray:
+    rows, columns, tile = tiles.shape[:3]
+    frame = tiles.swapaxes(1, 2).reshape(rows * tile, columns * tile, 3)
+    return np.ascontiguousarray(frame[:height, :width])
+
+
+def encode_delta(
+    frame: np.ndarray,
+    reference: np.ndarray,
+    reference_crc: Optional[int] = None,
+    tolerance: float = TILE_TOLERANCE,
+    tile: int = TILE_SIZE,
+) -> Tuple[bytes, np.ndarray, float]:
+    """
+    Encode a frame against a reference of the same size.
+
+    Returns:
+        (delta bytes, the frame the receiver will reconstruct, fraction of
+        tiles that changed)
+    """
+    height, width = frame.shape[:2]
+    new, old = _tiles(frame, tile), _tiles(reference, tile)
+    difference = np.abs(new.astype(np.int16) - old)
+    changed = (difference.mean(axis=(2, 3, 4)) > tolerance) | (
+        difference.max(axis=(2, 3, 4)) > PIXEL_TOLERANCE
+    )
+    payload = np.bitwise_xor(new[changed], old[changed])
+    reconstruction = old.copy()
+    reconstruction[changed] = new[changed]
+    reconstruction = _untile(reconstruction, height, width)
+
+    if reference_crc is None:
+        reference_crc = frame_crc(reference)
+    header = _HEADER.pack(
+        _MAGIC, width, height, tile, reference_crc, frame_crc(reconstruction)
+    )
+    body = np.packbits(changed.ravel()).tobytes() + payload.tobytes()
+    data = header + zlib.compress(body, ZLIB_LEVEL)
+    return data, reconstruction, float(changed.mean())
+
+
+def decode_delta(data: bytes, reference: Optional[np.ndarray]) -> np.ndarray:
+    """Apply a delta to the receiver's reference frame, verifying both CRCs."""
+    if len(data) < _HEADER.size:
+        raise FrameMismatch("Truncated delta")
+    magic, width, height, tile, base_crc, crc = _HEADER.unpack_from(data)
+    if magic != _MAGIC:
+        raise FrameMismatch("Not a frame delta")
+    if reference is None:
+        raise FrameMismatch("No reference frame for this car")
+    if reference.shape[:2] != (height, width) or frame_crc(reference) != base_crc:
+        raise FrameMismatch("Reference frame differs from the sender's")
+    try:
+        body = zlib.decompress(data[_HEADER.size :])
+    except zlib.error as e:
+        raise FrameMismatch(f"Corrupted delta: {e}")
+
+    tiles = _tiles(reference, tile).copy()
+    rows, columns = tiles.shape[:2]
+    mask_size = (rows * columns + 7) // 8
+    changed = np.unpackbits(
+        np.frombuffer(body, dtype=np.uint8, count=mask_size), count=rows * columns
+    ).astype(bool)
+    changed = changed.reshape(rows, columns)
+    payload = np.frombuffer(body, dtype=np.uint8, offset=mask_size)
+    if payload.size != int(changed.sum()) * tile * tile * 3:
+        raise FrameMismatch("Delta payload does not match its tile mask")
+    tiles[changed] ^= payload.reshape(-1, tile, tile, 3)
+    frame = _untile(tiles, height, width)
+    if frame_crc(frame) != crc:
+        raise FrameMismatch("Reconstructed frame fails its checksum")
+    return frame
+
+
+class DeltaEncoder:
+    """
+    The Pi's side of one car -> laptop link: tracks the laptop's reference
+    frame and decides between a delta and a keyframe.
+
+    encode() returns the delta to send, or None for "send the whole frame";
+    call commit() with the same frame ID once the laptop accepted the upload,
+    or reset() if it did not (the next frame is then a keyframe). Several
+    uploads may be in flight at once: each waits for its commit under its own
+    frame ID, and committing one drops the ones encoded before it.
+    """
+
+    def __init__(
+        self,
+        keyframe_interval: int = KEYFRAME_INTERVAL,
+        tolerance: float = TILE_TOLERANCE,
+    ):
+        self.keyframe_interval = keyframe_interval
+        self.tolerance = tolerance
+        self._reference = None  # (frame, crc) the laptop holds
+        self._pending = {}  # Frame ID -> (frame, crc, keyframe), oldest first
+        self._deltas = 0  # Since the last keyframe
+
+    def encode(
+        self, frame: np.ndarray, frame_id: Optional[int] = None
+    ) -> Optional[bytes]:
+        reference = self._reference
+        self._pending.pop(frame_id, None)  # Re-encoding moves it to the end
+        while len(self._pending) >= MAX_PENDING:  # Uploads that died on the way
+            del self._pending[next(iter(self._pending))]
+        if (
+            reference is None
+            or reference[0].shape != frame.shape
+            or self._deltas >= self.keyframe_interval
+        ):
+            self._pending[frame_id] = (frame, frame_crc(frame), True)
+            return None
+        data, reconstruction, changed = encode_delta(
+            frame, reference[0], reference[1], self.tolerance
+        )
+        if changed > MAX_CHANGED_FRACTION:
+            self._pending[frame_id] = (frame, frame_crc(frame), True)
+            return None
+        self._pending[frame_id] = (reconstruction, frame_crc(reconstruction), False)
+        return data
+
+    def commit(self, frame_id: Optional[int] = None):
+        if frame_id not in self._pending:
+            return  # Reset, or overtaken by a newer frame already committed
+        older = list(self._pending)
+        for pending_id in older[: older.index(frame_id)]:
+            del self._pending[pending_id]
+        frame, crc, keyframe = self._pending.pop(frame_id)
+        self._reference = (frame, crc)
+        self._deltas = 0 if keyframe else self._deltas + 1
+
+    def reset(self):
+        self._reference = None
+        self._pending.clear()
+        self._deltas = 0
@@ -0,0 +1,95 @@
+"""
+Cheap quality checks for camera frames, run on the Pi before an upload.
+
+A frame grabbed right after the motors stop is often motion-blurred; one
+grabbed in a dark corner or from a stalled viewfinder is useless too. Each
+costs a full upload and a Gemini call that comes back "image not
+available", so such frames are recaptured locally instead:
+- sharpness: variance of the Laplacian of the (half resolution) luma
+- brightness: mean luma
+- frozen: practically identical to the previous frame although it should not be
+"""
+
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from image_utils import downscale, to_gray
+
+MIN_SHARPNESS = 15.0  # Laplacian variance; lower is blurred (or a blank wall)
+MIN_BRIGHTNESS = 25.0  # Mean luma 0-255
+MAX_BRIGHTNESS = 235.0
+FROZEN_DIFF = 0.5  # Mean absolute luma difference of two identical frames
+BURST_SIZE = 3  # Frames per burst; the sharpest one is used
+MAX_BURSTS = 3  # Bursts before giving up on a good frame
+
+
+def laplacian_variance(gray: np.ndarray) -> float:
+    """Variance of the 4-neighbour Laplacian; high for sharp edges."""
+    lap = (
+        gray[:-2, 1:-1]
+        + gray[2:, 1:-1]
+        + gray[1:-1, :-2]
+        + gray[1:-1, 2:]
+        - 4.0 * gray[1:-1, 1:-1]
+    )
+    return float(lap.var())
+
+
+def _luma(image: np.ndarray) -> np.ndarray:
+    # Half resolution: averages sensor noise away so it does not pass as detail
+    return downscale(to_gray(image), 2)
+
+
+def assess(image: np.ndarray, previous: Optional[np.ndarray] = None) -> dict:
+    """
+    Score one frame.
+
+    Args:
+        image: (H, W, 3) RGB frame
+        previous: The frame before it, if it should differ (checked for freezing)
+
+    Returns:
+        Dict with sharpness, brightness, frozen, ok, and the list of problems
+    """
+    luma = _luma(image)
+    sharpness = laplacian_variance(luma)
+    brightness = float(luma.mean())
+    frozen = False
+    if previous is not None and previous.shape == image.shape:
+        frozen = float(np.abs(luma - _luma(previous)).mean()) < FROZEN_DIFF
+    problems = []
+    if sharpness < MIN_SHARPNESS:
+        problems.append("blurred")
+    if brightness < MIN_BRIGHTNESS:
+        problems.append("dark")
+    elif brightness > MAX_BRIGHTNESS:
+        problems.append("overexposed")
+    if frozen:
+        problems.append("frozen")
+    return {
+        "sharpness": round(sharpness, 1),
+        "brightness": round(brightness, 1),
+        "frozen": frozen,
+        "ok": not problems,
+        "problems": problems,
+    }
+
+
+def pick_sharpest(
+    images: Sequence[np.ndarray], previous: Optional[np.ndarray] = None
+) -> Tuple[int, dict]:
+    """
+    Assess a burst (each frame against the one before it) and return the
+    index and quality of the sharpest acceptable frame, or of the sharpest
+    frame overall if none is acceptable.
+    """
+    qualities: List[dict] = []
+    for image in images:
+        qualities.append(assess(image, previous))
+        previous = image
+    candidates = [i for i, q in enumerate(qualities) if q["ok"]] or list(
+        range(len(qualities))
+    )
+    best = max(candidates, key=lambda i: qualities[i]["sharpness"])
+    return best, qualities[best]
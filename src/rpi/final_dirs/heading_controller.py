@@ -0,0 +1,137 @@
+"""
+Proportional heading and range control from the analyzer's target box.
+
+Turns the target's horizontal offset into a turn of the right length, and
+its apparent size into a forward distance, using the car's calibrated turn
+rate and speed instead of fixed 0.2s / 0.4s nudges.
+"""
+
+import math
+import os
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from car_registry import Calibration
+from pose_tracker import CAMERA_HFOV_DEG, CAMERA_VFOV_DEG
+
+# Real height of the target in metres, which a range from its box scales
+# with. A goal can give its own (target_height), a process all of them
+# (TARGET_HEIGHT); without either DEFAULT_TARGET_HEIGHT is a guess
+TARGET_HEIGHT = float(os.environ.get("TARGET_HEIGHT", "0")) or None
+DEFAULT_TARGET_HEIGHT = 0.1
+RANGE_SIGMA = 0.25  # Relative 1-sigma of a box range for a target of given height
+GUESSED_RANGE_SIGMA = 0.6  # ... and for one of guessed height (half or double)
+
+
+@dataclass
+class ControllerGains:
+    turn_gain: float = 0.85  # Fraction of the heading error corrected per step
+    forward_gain: float = 0.6  # Fraction of the remaining distance driven per step
+    heading_deadband: float = 4.0  # degrees; no turn for smaller errors
+    min_pulse: float = 0.03  # seconds; shortest motor pulse that reliably moves
+    max_turn: float = 1.0  # seconds
+    max_forward: float = 2.2  # seconds
+    target_height: Optional[float] = None  # metres; None: resolve_target_height()
+    goal_distance: float = 0.35  # metres at which the car has arrived
+
+
+def offset_to_bearing(offset: float, fov: float = CAMERA_HFOV_DEG) -> float:
+    """Bearing in degrees (left positive) of a frame offset in [-1, 1]."""
+    half = math.radians(fov / 2.0)
+    return -math.degrees(math.atan(offset * math.tan(half)))
+
+
+def bearing_to_offset(bearing: float, fov: float = CAMERA_HFOV_DEG) -> float:
+    """Inverse of offset_to_bearing (not clamped to the frame)."""
+    half = math.radians(fov / 2.0)
+    return -math.tan(math.radians(bearing)) / math.tan(half)
+
+
+def size_to_distance(
+    size: float, target_height: float, vfov: float = CAMERA_VFOV_DEG
+) -> float:
+    """Pinhole range estimate from the target's height as a fraction of the frame."""
+    return target_height / (2.0 * max(size, 1e-3) * math.tan(math.radians(vfov / 2.0)))
+
+
+def resolve_target_height(height: Optional[float] = None) -> Tuple[float, bool]:
+    """(height in metres, whether it was given rather than guessed)."""
+    height = height or TARGET_HEIGHT
+    return (height, True) if height else (DEFAULT_TARGET_HEIGHT, False)
+
+
+def range_estimate(size: float, height: Optional[float] = None) -> Tuple[float, float]:
+    """Distance and its 1-sigma, metres, from the box height (frame fraction)."""
+    height, given = resolve_target_height(height)
+    distance = size_to_distance(size, height)
+    return distance, distance * (RANGE_SIGMA if given else GUESSED_RANGE_SIGMA)
+
+
+class HeadingController:
+    def __init__(
+        self,
+        calibration: Optional[Calibration] = None,
+        gains: Optional[ControllerGains] = None,
+    ):
+        self.calibration = calibration or Calibration()
+        self.gains = gains or ControllerGains()
+
+    def estimate(self, target: dict) -> dict:
+        """
+        Bearing (degrees), distance and its 1-sigma (metres) of a
+        parse_target_box() result; a "target_height" in it overrides the gains'.
+        """
+        distance, sigma = range_estimate(
+            target["size"], target.get("target_height") or self.gains.target_height
+        )
+        return {
+            "bearing": offset_to_bearing(target["offset"]),
+            "distance": distance,
+            "distance_sigma": sigma,
+        }
+
+    def command(self, target: dict, allow_forward: bool = True) -> dict:
+        """
+        Compute the next moves for a visible target.
+
+        Args:
+            target: parse_target_box() result with "offset" and "size"
+            allow_forward: Also drive towards the target once it is centred
+
+        Returns:
+            Dict with the estimated bearing/distance, whether the goal is reached,
+            and a list of {"action", "duration"} moves (turn first, then forward).
+        """
+        cal, gains = self.calibration, self.gains
+        est = self.estimate(target)
+        bearing, distance = est["bearing"], est["distance"]
+        moves: List[dict] = []
+
+        if abs(bearing) > gains.heading_deadband:
+            turn = gains.turn_gain * bearing
+            duration = min(abs(turn) / cal.turn_rate, gains.max_turn)
+            if duration >= gains.min_pulse:
+                moves.append(
+                    {
+                        "action": "left" if turn > 0 else "right",
+                        "duration": round(duration, 3),
+                    }
+                )
+
+        remaining = distance - gains.goal_distance
+        arrived = remaining <= 0.0 and abs(bearing) <= gains.heading_deadband
+        # Only drive when roughly facing the target so the turn is not undone
+        if allow_forward and remaining > 0.0 and abs(bearing) < CAMERA_HFOV_DEG / 4.0:
+            duration = min(
+                gains.forward_gain * remaining / cal.forward_speed, gains.max_forward
+            )
+            if duration >= gains.min_pulse:
+                moves.append({"action": "forward", "duration": round(duration, 3)})
+
+        return {
+            "bearing": round(bearing, 1),
+            "distance": round(distance, 3),
+            "distance_sigma": round(est["distance_sigma"], 3),
+            "arrived": arrived,
+            "moves": moves,
+        }
@@ -0,0 +1,130 @@
+"""
+NumPy helpers for the camera frames: BMP decode/encode and cheap resampling.
+The QNX `screenshot` tool writes uncompressed 24/32-bit BMPs.
+"""
+
+import struct
+
+import numpy as np
+
+
+def decode_bmp(data: bytes) -> np.ndarray:
+    """Decode an uncompressed 24/32-bit BMP into an (H, W, 3) RGB uint8 array."""
+    if data[:2] != b"BM":
+        raise ValueError("Not a BMP file")
+    pixel_offset = struct.unpack_from("<I", data, 10)[0]
+    width, height = struct.unpack_from("<ii", data, 18)
+    bits = struct.unpack_from("<H", data, 28)[0]
+    compression = struct.unpack_from("<I", data, 30)[0]
+    if bits not in (24, 32) or compression not in (0, 3):
+        raise ValueError(f"Unsupported BMP: {bits} bpp, compression {compression}")
+
+    channels = bits // 8
+    row_size = (width * channels + 3) & ~3
+    rows = np.frombuffer(
+        data, dtype=np.uint8, count=row_size * abs(height), offset=pixel_offset
+    ).reshape(abs(height), row_size)
+    pixels = rows[:, : width * channels].reshape(abs(height), width, channels)
+    if height > 0:  # Bottom-up rows
+        pixels = pixels[::-1]
+    return np.ascontiguousarray(pixels[:, :, 2::-1])  # BGR(A) -> RGB
+
+
+def bmp_size(height: int, width: int) -> int:
+    """Size in bytes of encode_bmp's output for a frame of this size."""
+    return 54 + height * ((width * 3 + 3) & ~3)
+
+
+def encode_bmp(image: np.ndarray) -> bytes:
+    """Encode an (H, W, 3) RGB uint8 array as a bottom-up 24-bit BMP."""
+    height, width = image.shape[:2]
+    row_size = (width * 3 + 3) & ~3
+    rows = np.zeros((height, row_size), dtype=np.uint8)
+    rows[:, : width * 3] = image[::-1, :, ::-1].reshape(height, width * 3)
+    header = struct.pack(
+        "<2sIHHIIiiHHIIiiII",
+        b"BM",
+        54 + rows.size,
+        0,
+        0,
+        54,
+        40,
+        width,
+        height,
+        1,
+        24,
+        0,
+        rows.size,
+        2835,
+        2835,
+        0,
+        0,
+    )
+    return header + rows.tobytes()
+
+
+def to_gray(image: np.ndarray) -> np.ndarray:
+    """Luma (BT.601) as float32 in 0-255."""
+    if image.ndim == 2:
+        return image.astype(np.float32)
+    rgb = image.astype(np.float32)
+    return rgb[..., 0] * 0.299 + rgb[..., 1] * 0.587 + rgb[..., 2] * 0.114
+
+
+def downscale(image: np.ndarray, factor: int) -> np.ndarray:
+    """Shrink by an integer factor by averaging factor x factor blocks."""
+    if factor <= 1:
+        return image
+    height = image.shape[0] // factor * factor
+    width = image.shape[1] // factor * factor
+    blocks = image[:height, :width].reshape(
+        height // factor, factor, width // factor, factor, *image.shape[2:]
+    )
+    return blocks.mean(axis=(1, 3)).astype(image.dtype)
+
+
+def resize_nearest(image: np.ndarray, height: int, width: int) -> np.ndarray:
+    """Nearest-neighbour resize to (height, width)."""
+    rows = (np.arange(height) * image.shape[0] / height).astype(np.intp)
+    cols = (np.arange(width) * image.shape[1] / width).astype(np.intp)
+    return image[rows[:, None], cols]
+
+
+def build_mosaic(
+    frames, columns: int, tile_width: int = 160, border: int = 4
+) -> np.ndarray:
+    """
+    Shrink frames to tile_width (keeping the first frame's aspect ratio) and
+    tile them left to right, top to bottom, separated by black borders.
+    """
+    height, width = frames[0].shape[:2]
+    tile_height = max(1, int(round(tile_width * height / width)))
+    rows = (len(frames) + columns - 1) // columns
+    mosaic = np.zeros(
+        (
+            rows * tile_height + (rows - 1) * border,
+            columns * tile_width + (columns - 1) * border,
+            3,
+        ),
+        dtype=np.uint8,
+    )
+    for index, frame in enumerate(frames):
+        factor = max(1, frame.shape[1] // tile_width)
+        tile = resize_nearest(downscale(frame, factor), tile_height, tile_width)
+        top = (index // columns) * (tile_height + border)
+        left = (index % columns) * (tile_width + border)
+        mosaic[top : top + tile_height, left : left + tile_width] = tile
+    return mosaic
+
+
+def split_mosaic(mosaic: np.ndarray, rows: int, columns: int, border: int = 4):
+    """Inverse of build_mosaic: the list of tiles, left to right, top to bottom."""
+    tile_height = (mosaic.shape[0] - (rows - 1) * border) // rows
+    tile_width = (mosaic.shape[1] - (columns - 1) * border) // columns
+    tiles = []
+    for row in range(rows):
+        for column in range(columns):
+            top = row * (tile_height + border)
+            left = column * (tile_width + border)
+            tiles.append(mosaic[top : top + tile_height, left : left + tile_width])
+    return tiles
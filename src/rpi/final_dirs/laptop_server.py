@@ -1,24 +1,90 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
+import atexit
 import os
-from google.genai import types
-from google import genai
+import time
+import threading
+import numpy as np
 
-client = genai.Client()
+try:
+    from google.genai import types
+    from google import genai
+except ImportError:  # The simulator answers with a stub client instead
+    genai = types = None
+
+from analysis_scheduler import AnalysisScheduler, JobSuperseded
+from analyzer_cascade import (
+    AnalyzerCascade,
+    ColorBlobDetector,
+    RoiColorDetector,
+    StageResult,
+    SweepColorLocator,
+)
+import deadlines
+from deadlines import DeadlineExceeded
+import flight_recorder
+from frame_codec import FrameMismatch, decode_delta
+from image_utils import decode_bmp, encode_bmp
+import logs
+import metrics
+import tracing
+from navigation_analysis import crop_analysis_to_frame
+import profiler
+from upload_protocol import FLAG_CONFIRM, FLAG_URGENT, HEADER_SIZE
+from upload_protocol import parse_header, read_exact
+
+# Created on first use (get_client), so importing needs no API key; the
+# simulator puts its stub here before the first request
+client = None
+_client_lock = threading.Lock()
 
 app = Flask(__name__)
+# Queued JSON lines in logs/laptop.log, written off the request threads
+log = logs.setup("laptop")
+
+# Scheduler configuration
+ANALYZER_WORKERS = int(os.environ.get("ANALYZER_WORKERS", "1"))  # Parallel Gemini calls
+ANALYSIS_TIMEOUT = 60  # Seconds a request waits for its queued analysis
+# A Gemini call is not started with less than this left before the deadline
+MIN_GEMINI_SECONDS = float(os.environ.get("MIN_GEMINI_SECONDS", "1.0"))
+
+# Last frame from each car on /upload_frame; the reference its deltas apply to
+reference_frames = {}
+# Car ID -> {goal ID: goal text} for binary uploads, which send each goal once
+goal_tables = {}
+
+# Where each analysis request's time goes on the laptop
+STAGE_SECONDS = metrics.histogram(
+    "ht6_laptop_stage_seconds",
+    "Time spent in each stage of an analysis request on the laptop",
+    ("stage",),
+)
+UPLOAD_PARSE_SECONDS = STAGE_SECONDS.labels("upload_parse")
+GEMINI_SECONDS = STAGE_SECONDS.labels("gemini_request")
+
+# Analyzer cascade: answers below this confidence escalate to Gemini
+LOCAL_DETECTOR = os.environ.get("LOCAL_DETECTOR", "1") != "0"
+CASCADE_THRESHOLD = float(os.environ.get("CASCADE_THRESHOLD", "0.75"))
 
 
-def process_image_with_gemini(image_file, goal_description):
+def process_image_with_gemini(image_bytes, goal_description):
     """
     Process the received image with Gemini API based on the goal description.
     """
 
-    prompt = f"""
+    log.info("Gemini frame analysis", goal=goal_description)
+    return ask_gemini(image_bytes, frame_prompt(goal_description))
+
+
+def frame_prompt(goal_description):
+    return f"""
 You are an image analysis function for a motor car with a camera. Your goal: "{goal_description}"
 
 Analyze the image and respond with:
 - The best action code (see below) on the first line.
 - A brief explanation (1-2 sentences) on the next line, including any uncertainty or nuance.
+- If the target is visible, a third line with its bounding box as
+  BOX: [ymin, xmin, ymax, xmax]
+  using coordinates normalized to 0-1000 (0,0 is the top-left corner). Omit this line if the target is not visible.
 
 Action codes (choose one):
 1. GOAL_ACHIEVED: Target is clearly visible and centered (car has reached goal).
@@ -40,40 +106,241 @@ Instructions:
 Keep your response concise and focused on helping the car center and approach the target safely.
 """
 
-    try:
-        # Always read the image from disk, as in the working example
-        with open('received_screenshot.bmp', 'rb') as f:
-            image_bytes = f.read()
 
-        print(f"Processing image with Gemini API for goal: {goal_description}")
+def process_roi_with_gemini(image_bytes, goal_description, roi_bytes, region):
+    """
+    Analyze a shrunk full view plus a full-resolution crop of it (region is
+    the crop's ymin, xmin, ymax, xmax in the view, 0-1).
+    """
+    ymin, xmin, ymax, xmax = (int(round(v * 1000)) for v in region)
+    prompt = f"""
+You get two images of the same camera view. The first is the whole view at low resolution.
+The second is a full-resolution close-up of the region [{ymin}, {xmin}, {ymax}, {xmax}] of the first
+(ymin, xmin, ymax, xmax normalized to 0-1000), where the target was last seen.
+Judge them together as one frame, using the close-up for detail.
+{frame_prompt(goal_description)}
+If the target is visible in the close-up, give its bounding box relative to the close-up instead, as
+  CROP_BOX: [ymin, xmin, ymax, xmax]
+  normalized to 0-1000 within the close-up. Otherwise use the BOX line relative to the whole view.
+"""
 
-        # Use the same model and prompt as the working minimal example
-        response = client.models.generate_content(
-            model='gemini-2.5-flash',
-            contents=[
-                types.Part.from_bytes(
-                    data=image_bytes,
-                    mime_type='image/jpeg',
-                ),
-                prompt,
-            ]
+    log.info("Gemini view + close-up analysis", goal=goal_description)
+    return crop_analysis_to_frame(ask_gemini(image_bytes, prompt, roi_bytes), region)
+
+
+def process_sweep_with_gemini(image_bytes, goal_description, layout):
+    """
+    Find the goal in a sweep mosaic: one tile per heading the car looked at.
+    """
+
+    prompt = f"""
+You are an image analysis function for a motor car with a camera. Your goal: "{goal_description}"
+
+The image is a mosaic of {layout["tiles"]} camera views taken while the car turned on the spot,
+arranged in {layout["rows"]} rows of {layout["columns"]} tiles separated by black lines. Tiles are numbered
+from 0, left to right and then top to bottom; the last row may have empty (black) slots.
+
+Respond with:
+- On the first line, the tile that shows the target as TILE: <number>, or TILE: NONE if no tile shows it.
+  If it shows in more than one tile, pick the tile where it is closest to the centre.
+- A brief explanation (1 sentence) on the next line.
+- If a tile was chosen, a third line with the target's bounding box inside that tile as
+  BOX: [ymin, xmin, ymax, xmax]
+  using coordinates normalized to 0-1000 relative to the tile (0,0 is the tile's top-left corner).
+"""
+
+    log.info("Gemini sweep analysis", goal=goal_description)
+    return ask_gemini(image_bytes, prompt)
+
+
+def get_client():
+    """The Gemini client, genai.Client() unless one was set already."""
+    global client
+    with _client_lock:
+        if client is None:
+            if genai is None:
+                raise RuntimeError("google-genai is not installed")
+            client = genai.Client()
+        return client
+
+
+def ask_gemini(image_bytes, prompt, *more_images):
+    """
+    Send the image(s) and prompt to Gemini and return its text answer.
+    Under a request deadline the call is skipped when too little time is
+    left and otherwise times out with the deadline.
+    """
+    deadlines.check("gemini", MIN_GEMINI_SECONDS)
+    config = None
+    left = deadlines.remaining()
+    if left is not None and types is not None:
+        config = types.GenerateContentConfig(
+            http_options=types.HttpOptions(timeout=int(left * 1000))
         )
+    try:
+        # Use the same model and prompt as the working minimal example
+        with GEMINI_SECONDS.time(), tracing.span("gemini_request"):
+            response = get_client().models.generate_content(
+                model='gemini-2.5-flash',
+                contents=[
+                    types.Part.from_bytes(
+                        data=data,
+                        mime_type='image/jpeg',
+                    )
+                    if types is not None
+                    else data
+                    for data in (image_bytes, *more_images)
+                ]
+                + [prompt],
+                config=config,
+            )
 
-        print(f"Gemini response: {response.text}")
+        log.info("Gemini response", text=response.text)
         return response.text.strip()
 
     except Exception as e:
-        print(f"Error processing image with Gemini: {e}")
+        log.error("Gemini request failed", error=str(e))
         return f"ERROR: {str(e)}"
 
+
+def gemini_stage(image_bytes, goal_description):
+    """Final cascade stage: Gemini's answer is always accepted."""
+    return StageResult(process_image_with_gemini(image_bytes, goal_description), 1.0)
+
+
+def gemini_roi_stage(image_bytes, goal_description, roi_bytes, region):
+    return StageResult(
+        process_roi_with_gemini(image_bytes, goal_description, roi_bytes, region), 1.0
+    )
+
+
+def gemini_sweep_stage(image_bytes, goal_description, layout):
+    return StageResult(
+        process_sweep_with_gemini(image_bytes, goal_description, layout), 1.0
+    )
+
+
+# Simple colour goals are answered locally; everything else goes to Gemini
+stages = [("gemini", gemini_stage, 0.0)]
+sweep_stages = [("gemini", gemini_sweep_stage, 0.0)]
+roi_stages = [("gemini", gemini_roi_stage, 0.0)]
+if LOCAL_DETECTOR:
+    stages.insert(0, ("color", ColorBlobDetector(), CASCADE_THRESHOLD))
+    sweep_stages.insert(0, ("color", SweepColorLocator(), CASCADE_THRESHOLD))
+    roi_stages.insert(0, ("color", RoiColorDetector(), CASCADE_THRESHOLD))
+cascades = {
+    "frame": AnalyzerCascade(stages),
+    "sweep": AnalyzerCascade(sweep_stages),
+    # A shrunk full view plus a full-resolution crop around the predicted target
+    "roi": AnalyzerCascade(roi_stages),
+    # Candidates found by the car's own detector are confirmed by Gemini itself
+    "confirm": AnalyzerCascade([("gemini", gemini_stage, 0.0)]),
+}
+
+
+def run_analysis(kind, image_bytes, goal_description, *extra):
+    deadlines.check("analysis")  # Its requester gave up while it was queued
+    return cascades[kind].analyze(image_bytes, goal_description, *extra)
+
+
+# Urgent requests jump the queue; cars share Gemini fairly; stale frames are dropped
+scheduler = AnalysisScheduler(run_analysis, workers=ANALYZER_WORKERS)
+
+# Every uploaded image, its analysis and the request's spans, for replay
+recorder = flight_recorder.open_recorder("laptop")
+atexit.register(recorder.close)
+tracing.on_finish.append(recorder.spans)
+
+
+def queued_analysis(kind, car_id, priority, image_bytes, goal_description, *extra):
+    """
+    Queue an analysis, wait for it and build the Flask response. Under a
+    request deadline (see deadlines) nothing is queued once it has passed,
+    and the wait ends with it.
+    """
+    deadlines.check("queue")
+    frame_id = recorder.frame(image_bytes)
+    recorder.analysis(
+        phase="request",
+        car_id=car_id,
+        kind=kind,
+        priority=priority,
+        goal=goal_description,
+        frame=frame_id,
+    )
+    job = scheduler.submit(
+        car_id, priority, kind, image_bytes, goal_description, *extra, kind=kind
+    )
+    try:
+        analysis, stage = job.wait(timeout=deadlines.timeout(ANALYSIS_TIMEOUT))
+    except TimeoutError:
+        recorder.analysis(
+            phase="result", car_id=car_id, frame=frame_id, status="timeout"
+        )
+        if deadlines.remaining() is None:
+            raise
+        # The worker skips the job when it gets to it (and counts that)
+        raise DeadlineExceeded("analysis", deadlines.remaining())
+    except JobSuperseded as e:
+        STAGE_SECONDS.observe(job.queue_wait, "queue_wait")
+        tracing.record("queue_wait", job.enqueued_at, time.monotonic(), superseded=True)
+        recorder.analysis(
+            phase="result",
+            car_id=car_id,
+            frame=frame_id,
+            status="superseded",
+            queue_wait_ms=round(job.queue_wait * 1000, 1),
+        )
+        return (
+            jsonify(
+                {
+                    "status": "superseded",
+                    "message": str(e),
+                    "queue_wait_ms": round(job.queue_wait * 1000, 1),
+                }
+            ),
+            409,
+        )
+
+    STAGE_SECONDS.observe(job.queue_wait, "queue_wait")
+    STAGE_SECONDS.observe(job.run_time, f"analysis_{stage}")
+    tracing.record("queue_wait", job.enqueued_at, job.started_at)
+    recorder.analysis(
+        phase="result",
+        car_id=car_id,
+        frame=frame_id,
+        status="success",
+        stage=stage,
+        annotation=analysis,
+        queue_wait_ms=round(job.queue_wait * 1000, 1),
+        run_ms=round(job.run_time * 1000, 1),
+    )
+    headers = {
+        "X-Queue-Wait-Ms": f"{job.queue_wait * 1000:.1f}",
+        "X-Analysis-Ms": f"{job.run_time * 1000:.1f}",
+        "X-Priority": job.priority,
+        "X-Analyzer-Stage": stage,
+    }
+    return analysis, 200, headers
+
+
 @app.route("/receive_image", methods=["POST"])
+@tracing.traced("laptop")
+@deadlines.bounded
 def receive_image():
     """
     Receive image from Pi and process with Gemini API.
-    This version saves the image to disk and then processes it from disk,
-    just like the working minimal example.
+    The image is queued on the analysis scheduler under its car ID and
+    priority; the time spent queued is returned in the X-Queue-Wait-Ms header
+    and the cascade stage that answered in X-Analyzer-Stage. A "confirm"
+    form field skips the local detector (the car's own detector found it).
+    An optional second file "roi" is a full-resolution crop of the (shrunk)
+    image at "roi_box" (ymin,xmin,ymax,xmax, 0-1); both are analyzed together.
+    The Pi sends whole frames to /upload_frame; this form upload remains for
+    ROI pairs and other clients.
     """
     try:
+        parse_started = time.monotonic()
         if "image" not in request.files:
             return (
                 jsonify({"status": "error", "message": "No image file received"}),
@@ -82,25 +349,193 @@ def receive_image():
 
         image_file = request.files["image"]
         goal_description = request.form.get("goal", "Find the target object")
+        car_id = request.form.get("car_id", "car1")
+        priority = request.form.get("priority", "normal")
+
+        image_bytes = image_file.read()
+        parsed = time.monotonic()
+        UPLOAD_PARSE_SECONDS.observe(parsed - parse_started)
+        tracing.record("upload_parse", parse_started, parsed)
+        # Keep the latest image on disk for debugging
+        with open("received_screenshot.bmp", "wb") as f:
+            f.write(image_bytes)
+
+        if "roi" in request.files and not request.form.get("confirm"):
+            region = [float(v) for v in request.form["roi_box"].split(",")]
+            return queued_analysis(
+                "roi",
+                car_id,
+                priority,
+                image_bytes,
+                goal_description,
+                request.files["roi"].read(),
+                region,
+            )
+        kind = "confirm" if request.form.get("confirm") else "frame"
+        return queued_analysis(kind, car_id, priority, image_bytes, goal_description)
+
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        log.error("Error processing received image", error=str(e))
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
+@app.route("/upload_frame", methods=["POST"])
+@tracing.traced("laptop")
+@deadlines.bounded
+def upload_frame():
+    """
+    Receive a frame in the binary format of upload_protocol: a fixed header,
+    the goal text the first time its ID is used, and raw RGB, BMP or delta
+    pixels. The body is read straight into buffers, so chunked uploads work
+    and nothing is spooled to disk. 412 asks for the goal text
+    ("goal_required") or a keyframe ("keyframe_required").
+    """
+    try:
+        parse_started = time.monotonic()
+        stream = request.stream
+        header = parse_header(read_exact(stream, HEADER_SIZE))
+        goals = goal_tables.setdefault(header.car_id, {})
+        if header.goal_length:
+            goal = read_exact(stream, header.goal_length)
+            goals[header.goal_id] = goal.decode("utf-8")
+        payload = read_exact(stream, header.payload_length)
+        goal_description = goals.get(header.goal_id)
+        if goal_description is None:
+            return (
+                jsonify(
+                    {
+                        "status": "goal_required",
+                        "message": f"Unknown goal ID {header.goal_id}",
+                    }
+                ),
+                412,
+            )
+
+        car_id = header.car_id
+        if header.pixel_format == "delta":
+            try:
+                frame = decode_delta(payload, reference_frames.get(car_id))
+            except FrameMismatch as e:
+                reference_frames.pop(car_id, None)
+                log.warning("Delta frame rejected", car_id=car_id, error=str(e))
+                return (
+                    jsonify({"status": "keyframe_required", "message": str(e)}),
+                    412,
+                )
+        elif header.pixel_format == "bmp":
+            frame = decode_bmp(payload)
+        else:
+            frame = np.frombuffer(payload, dtype=np.uint8).reshape(
+                header.height, header.width, 3
+            )
+        reference_frames[car_id] = frame
+        image_bytes = encode_bmp(frame)
+        parsed = time.monotonic()
+        UPLOAD_PARSE_SECONDS.observe(parsed - parse_started)
+        tracing.record("upload_parse", parse_started, parsed, format=header.pixel_format)
+        with open("received_screenshot.bmp", "wb") as f:
+            f.write(image_bytes)
 
-        # Save the image to disk as 'received_screenshot.bmp'
-        image_file.save("received_screenshot.bmp")
+        kind = "confirm" if header.flags & FLAG_CONFIRM else "frame"
+        priority = "urgent" if header.flags & FLAG_URGENT else "normal"
+        response = queued_analysis(kind, car_id, priority, image_bytes, goal_description)
+        if len(response) == 3:
+            response[2]["X-Frame-Id"] = str(header.frame_id)
+        return response
 
-        # Process the image with Gemini (from disk)
-        gemini_response = process_image_with_gemini(image_file, goal_description)
+    except DeadlineExceeded:
+        raise
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    except Exception as e:
+        log.error("Error processing uploaded frame", error=str(e))
+        return jsonify({"status": "error", "message": str(e)}), 500
 
-        return gemini_response, 200
 
+@app.route("/receive_sweep", methods=["POST"])
+@tracing.traced("laptop")
+@deadlines.bounded
+def receive_sweep():
+    """
+    Receive a sweep mosaic from the Pi (form fields rows, columns, tiles) and
+    answer which tile shows the goal, as "TILE: <n>" or "TILE: NONE".
+    """
+    try:
+        if "image" not in request.files:
+            return (
+                jsonify({"status": "error", "message": "No mosaic image received"}),
+                400,
+            )
+        layout = {
+            "rows": int(request.form.get("rows", 1)),
+            "columns": int(request.form.get("columns", 1)),
+            "tiles": int(request.form.get("tiles", 1)),
+            "border": int(request.form.get("border", 4)),
+        }
+        image_bytes = request.files["image"].read()
+        with open("received_sweep.bmp", "wb") as f:
+            f.write(image_bytes)
+        return queued_analysis(
+            "sweep",
+            request.form.get("car_id", "car1"),
+            request.form.get("priority", "normal"),
+            image_bytes,
+            request.form.get("goal", "Find the target object"),
+            layout,
+        )
+    except DeadlineExceeded:
+        raise
     except Exception as e:
-        print(f"Error processing received image: {e}")
+        log.error("Error processing sweep mosaic", error=str(e))
         return jsonify({"status": "error", "message": str(e)}), 500
 
+
 @app.route("/health", methods=["GET"])
 def health():
     """Health check endpoint"""
-    return jsonify({"status": "healthy", "message": "Laptop server is running"})
+    return jsonify(
+        {
+            "status": "healthy",
+            "message": "Laptop server is running",
+            "queue_depth": scheduler.queue_depth(),
+            "scheduler": scheduler.stats,
+            "analyzer": {kind: c.report() for kind, c in cascades.items()},
+        }
+    )
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics_page():
+    """Stage latency histograms in the Prometheus text format"""
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@app.route("/debug/profile", methods=["GET"])
+def debug_profile():
+    """Collapsed stacks of this process for flame graphs (see profiler)"""
+    return profiler.flask_response(request)
+
+
+@app.route("/analyzer_stats", methods=["GET"])
+def analyzer_stats():
+    """Per-stage hit rate and latency of the analyzer cascade"""
+    return jsonify(
+        {
+            "status": "success",
+            **cascades["frame"].report(),
+            "sweep": cascades["sweep"].report(),
+            "roi": cascades["roi"].report(),
+        }
+    )
 
 if __name__ == "__main__":
     print("  POST /receive_image - Receive and process images from Pi")
+    print("  POST /upload_frame  - Receive a binary (optionally delta) frame from Pi")
+    print("  POST /receive_sweep - Find the goal in a sweep mosaic from the Pi")
     print("  GET  /health        - Health check")
+    print("  GET  /analyzer_stats - Analyzer cascade hit rates and latency")
+    print("  GET  /metrics       - Stage latency histograms (Prometheus text format)")
+    print("  GET  /debug/profile - Sampled stacks (?seconds=N, X-Profile-Key header)")
     app.run(host="0.0.0.0", port=8000, debug=True)
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Structured logging off the request threads, for the Pi's control service
+and the analyzer laptop.
+
+    log = logs.setup("laptop")  # Once per process; logs.get(name) elsewhere
+    log.info("Gemini response", car_id=car_id, text=response.text)
+
+A call below the configured level (LOG_LEVEL, default INFO) returns after
+one cached level check, before a record or a message exists. Otherwise the
+record goes onto a bounded queue as it is: nothing is formatted and nothing
+is written on the calling thread. A background writer (logging's
+QueueListener) turns each record into one JSON line in a rotating file,
+<LOG_DIR>/<name>.log (LOG_MAX_MB, LOG_BACKUPS). Warnings and errors also go
+to stderr (LOG_CONSOLE_LEVEL). When the queue is full, the record is dropped
+rather than blocking the request, and counted in ht6_log_dropped_total.
+Werkzeug's per-request lines take the same path.
+
+Repeated messages are rate limited per logger and message: at most
+RATE_LIMIT records per RATE_WINDOW seconds each. The first one let through
+after that carries a "suppressed" count. So keep the message a fixed string
+and put the values in fields. Fields are formatted in the writer thread,
+so pass values that will not change afterwards (numbers, strings, tuples).
+
+python -m benchmarks.logging_benchmark compares the per-command cost with
+print() on a slow console.
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Optional
+
+import metrics
+
+LOG_DIR = os.environ.get("LOG_DIR", "logs")  # Empty: no log file, stderr only
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+CONSOLE_LEVEL = os.environ.get("LOG_CONSOLE_LEVEL", "WARNING").upper()
+MAX_BYTES = int(float(os.environ.get("LOG_MAX_MB", "10")) * 1024 * 1024)
+BACKUPS = int(os.environ.get("LOG_BACKUPS", "5"))
+QUEUE_SIZE = 10000  # Records waiting for the writer before new ones are dropped
+RATE_LIMIT = 50  # Records per logger and message in each window
+RATE_WINDOW = 10.0  # seconds
+
+DROPPED = metrics.counter(
+    "ht6_log_dropped",
+    "Log records not written: queue_full or rate_limited",
+    ("reason",),
+)
+QUEUE_FULL = DROPPED.labels("queue_full")
+RATE_LIMITED = DROPPED.labels("rate_limited")
+
+_listener: Optional[QueueListener] = None
+_handlers = []  # The root logger's queue handler, while the writer runs
+_setup_lock = threading.Lock()
+
+
+class RateLimit(logging.Filter):
+    """At most `limit` records per (logger, message) in each `window` seconds."""
+
+    def __init__(self, limit: int = RATE_LIMIT, window: float = RATE_WINDOW):
+        super().__init__()
+        self.limit = limit
+        self.window = window
+        self._windows = {}  # (logger, message) -> [start, passed, suppressed]
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            state = self._windows.get(key)
+            if state is None or now - state[0] >= self.window:
+                suppressed = state[2] if state is not None else 0
+                state = self._windows[key] = [now, 0, 0]
+                if suppressed:
+                    record.suppressed = suppressed
+            if state[1] >= self.limit:
+                state[2] += 1
+                RATE_LIMITED.inc()
+                return False
+            state[1] += 1
+            return True
+
+
+rate_limit = RateLimit()  # Shared by every logger of the process
+
+
+class _Enqueue(QueueHandler):
+    """Hands records to the writer unformatted, and never waits for it."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record  # The writer formats; the queue never leaves the process
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            QUEUE_FULL.inc()
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, message and fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created))
+            + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", ()))
+        if getattr(record, "suppressed", 0):
+            entry["suppressed"] = record.suppressed
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class ConsoleFormatter(logging.Formatter):
+    """'LEVEL logger: message key=value ...' for stderr."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = dict(getattr(record, "fields", ()))
+        if getattr(record, "suppressed", 0):
+            fields["suppressed"] = record.suppressed
+        line = f"{record.levelname} {record.name}: {record.getMessage()}"
+        line += "".join(f" {k}={v}" for k, v in fields.items())
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+class EventLogger:
+    """A logger taking a fixed message plus keyword fields."""
+
+    def __init__(self, logger: logging.Logger):
+        self.logger = logger
+
+    def _log(self, level: int, message: str, exc_info, fields: dict):
+        if self.logger.isEnabledFor(level):
+            self.logger.log(level, message, exc_info=exc_info, extra={"fields": fields})
+
+    def debug(self, message: str, exc_info=False, **fields):
+        self._log(logging.DEBUG, message, exc_info, fields)
+
+    def info(self, message: str, exc_info=False, **fields):
+        self._log(logging.INFO, message, exc_info, fields)
+
+    def warning(self, message: str, exc_info=False, **fields):
+        self._log(logging.WARNING, message, exc_info, fields)
+
+    def error(self, message: str, exc_info=False, **fields):
+        self._log(logging.ERROR, message, exc_info, fields)
+
+
+def get(name: str) -> EventLogger:
+    return EventLogger(logging.getLogger(name))
+
+
+def setup(name: str) -> EventLogger:
+    """
+    Send this process's log records (the root logger's, werkzeug's included)
+    through the queue to <LOG_DIR>/<name>.log and stderr. Later calls only
+    return a logger, so a process hosting several services logs to one file.
+    """
+    global _listener
+    with _setup_lock:
+        if _listener is None:
+            handlers = []
+            if LOG_DIR:
+                os.makedirs(LOG_DIR, exist_ok=True)
+                file_handler = RotatingFileHandler(
+                    os.path.join(LOG_DIR, f"{name}.log"),
+                    maxBytes=MAX_BYTES,
+                    backupCount=BACKUPS,
+                    delay=True,
+                )
+                file_handler.setFormatter(JsonFormatter())
+                handlers.append(file_handler)
+            console = logging.StreamHandler(sys.stderr)
+            console.setLevel(CONSOLE_LEVEL)
+            console.setFormatter(ConsoleFormatter())
+            handlers.append(console)
+
+            records = queue.Queue(QUEUE_SIZE)
+            enqueue = _Enqueue(records)
+            enqueue.addFilter(rate_limit)
+            root = logging.getLogger()
+            root.setLevel(LOG_LEVEL)
+            root.addHandler(enqueue)
+            _handlers.append(enqueue)
+            # Werkzeug sets INFO on its logger unless it has a level already
+            logging.getLogger("werkzeug").setLevel(LOG_LEVEL)
+            _listener = QueueListener(records, *handlers, respect_handler_level=True)
+            _listener.start()
+            atexit.register(stop)
+    return get(name)
+
+
+def _after_fork():
+    """A forked child inherits the queue handler but not the writer thread."""
+    global _listener, _setup_lock
+    _setup_lock = threading.Lock()
+    _listener = None
+    while _handlers:
+        logging.getLogger().removeHandler(_handlers.pop())
+
+
+if hasattr(os, "register_at_fork"):
+    # So a forked worker (the Pi's capture process) can call setup() itself
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+def stop():
+    """Write what is still queued and stop the writer."""
+    global _listener
+    with _setup_lock:
+        while _handlers:
+            logging.getLogger().removeHandler(_handlers.pop())
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
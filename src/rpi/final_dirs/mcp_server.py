@@ -2,16 +2,63 @@ from mcp.server.fastmcp import FastMCP
 import requests
 import time
 import json
-from typing import Optional, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List
+
+import deadlines
+import metrics
+import profiler
+import tracing
+from car_registry import load_registry
+from heading_controller import ControllerGains, HeadingController
+from navigation_analysis import parse_target_box
+from pose_tracker import CAMERA_HFOV_DEG, PoseTracker
+from search_planner import SearchPlanner
 
 # Initialize FastMCP server
 mcp = FastMCP("car-mcp")
 
 # Configuration
-BASE_URL = "http://10.33.35.1:5000"  # Flask server on QNX Pi
+registry = load_registry()  # Car ID -> Pi URL, analyzer laptop, calibration
+# Parallel fan-out to cars, one worker per car. Stops get workers of their
+# own so they never queue behind a photo fan-out (up to PHOTO_TIMEOUT each)
+fleet_executor = ThreadPoolExecutor(
+    max_workers=max(1, len(registry.car_ids())), thread_name_prefix="fleet"
+)
+stop_executor = ThreadPoolExecutor(
+    max_workers=max(1, len(registry.car_ids())), thread_name_prefix="fleet-stop"
+)
+pose_trackers = {
+    car_id: PoseTracker(registry.get(car_id).calibration)
+    for car_id in registry.car_ids()
+}  # Dead-reckoning pose per car
+controllers = {
+    car_id: HeadingController(
+        registry.get(car_id).calibration,
+        ControllerGains(**registry.get(car_id).controller_gains),
+    )
+    for car_id in registry.car_ids()
+}  # Proportional steering from target boxes
+last_targets: Dict[str, dict] = {}  # Latest target box per car
+MOVE_TIMEOUT = 7
+PHOTO_TIMEOUT = 30  # Increased timeout for photo processing
+SWEEP_TIMEOUT = 60  # Full-circle turn, frame grabs and one analysis
+METRICS_TIMEOUT = 3
+PROFILE_TOP = 15  # Hottest functions a profile_service answer lists
+PROFILE_STACKS = 40  # Collapsed stacks it returns (the hottest)
+# Left of a tool's timeout for a deadline-exceeded answer to come back in
+DEADLINE_MARGIN = 1.0
 DEFAULT_DURATION = 1.1  # Default movement duration in seconds (slightly slower)
 MAX_DURATION = 2.2      # Max duration for bold moves (reduced)
 MIN_DURATION = 0.5      # Minimum duration for any movement
+search_planners = {
+    car_id: SearchPlanner(registry.get(car_id).calibration, min_duration=MIN_DURATION)
+    for car_id in registry.car_ids()
+}  # Heading coverage per car, for systematic search
+STAGE_SECONDS = metrics.histogram(
+    "ht6_mcp_stage_seconds", "Time spent in MCP-side steps of a tool", ("stage",)
+)
+ANALYSIS_PARSE_SECONDS = STAGE_SECONDS.labels("analysis_parse")
 
 # System prompt for autonomous navigation (short, with camera retry logic)
 SYSTEM_PROMPT = """
@@ -34,34 +81,97 @@ You are an autonomous RC car navigation system. Your goal is to find and reach s
 - Only turn if you can't see the object.
 - Don't stop until you are very close to the target. If you see even a partial section of the target (e.g., a banner) in the frame, you are likely already there—be generous about stopping when this happens!
 
+## Steering
+- When a photo returns a "target" box, call steer_to_target to turn and drive by exactly the right amount.
+- Or call track_target to follow the target on the car's camera without new photos; take a photo when it returns.
+
+## Searching
+- If the target is not visible (NOT_FOUND, TURN_LEFT, TURN_RIGHT) and the goal is a simple colour + object ("red ball"), call scan_for_target: it spins until the car's own detector sees the target and confirms it with one analysis.
+- Otherwise call sweep_search: it looks all the way around with one analysis and turns to the target.
+- If the sweep does not find it, call plan_search and make the move it suggests (usually forward to a new spot), then sweep again.
+
 ## If photo/analysis is not available (e.g. Gemini output says image not available):
 - Do NOT move forward to scan.
 - Just try the camera again until you get a valid image.
+- The car already retakes blurred, dark or frozen frames itself. If a photo still fails with
+  "dark", retrying will not help: turn a little (e.g. 0.2s) towards a brighter area first.
+- A photo result with "unchanged": true means the car has not moved and the view is the same,
+  so the previous analysis was reused. Move before taking another photo; do not retry in place.
 
 Be safe, keep moving toward the goal, and retry the camera if needed.
 """
 
+def unknown_car_error(error: KeyError) -> Dict[str, Any]:
+    return {
+        "status": "error",
+        "message": error.args[0],
+        "known_cars": registry.car_ids(),
+    }
+
+
 def make_request(
-    endpoint: str, method: str = "POST", json_data: Optional[dict] = None
+    endpoint: str,
+    method: str = "POST",
+    json_data: Optional[dict] = None,
+    car_id: Optional[str] = None,
 ) -> Dict[str, Any]:
-    """Make HTTP request to Flask server with error handling."""
+    """Make HTTP request to a car's Flask server with error handling."""
     try:
-        url = f"{BASE_URL}/{endpoint}"
-        response = requests.request(method, url, timeout=7, json=json_data)
+        car = registry.get(car_id)
+        url = f"{car.pi_url}/{endpoint}"
+        response = registry.session(car.car_id).request(
+            method, url, timeout=MOVE_TIMEOUT, json=json_data
+        )
         response.raise_for_status()
         return {"status": "success", "data": response.json()}
+    except KeyError as e:
+        return unknown_car_error(e)
     except requests.exceptions.RequestException as e:
         return {"status": "error", "message": f"Request failed: {str(e)}"}
 
 
+def run_move(
+    endpoint: str, duration: float, message: str, car_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """Clamp the duration, send one movement command and wrap the result."""
+    try:
+        car = registry.get(car_id)
+    except KeyError as e:
+        return unknown_car_error(e)
+    duration = max(MIN_DURATION, min(duration, MAX_DURATION))
+    result = make_request(
+        endpoint, method="POST", json_data={"duration": duration}, car_id=car.car_id
+    )
+    pose = None
+    if result["status"] == "success":
+        # Integrate what the motors actually did, not what was asked for
+        data = result["data"]
+        pose = pose_trackers[car.car_id].apply_command(
+            endpoint,
+            float(data.get("actual_duration", duration)),
+            data.get("duty_cycle"),
+        )
+    return {
+        "status": "success",
+        "message": message.format(duration=duration),
+        "car_id": car.car_id,
+        "duration_used": duration,
+        "result": result,
+        "pose": pose,
+    }
+
+
 @mcp.tool()
-def move_forward(duration: float = DEFAULT_DURATION) -> Dict[str, Any]:
+def move_forward(
+    duration: float = DEFAULT_DURATION, car_id: Optional[str] = None
+) -> Dict[str, Any]:
     """
     Move the RC car forward for a specified duration (default 1.1s, up to 2.2s).
     Prefer the default duration for most moves unless a shorter/longer move is clearly needed.
 
     Args:
         duration: Movement duration in seconds (0.2–2.2, default 1.1)
+        car_id: Which car to move (default: the registry's default car)
 
     Returns:
         Dict with status and response from the car's movement system
@@ -70,23 +180,24 @@ def move_forward(duration: float = DEFAULT_DURATION) -> Dict[str, Any]:
         - Prefer moving forward whenever the object is visible, even if not perfectly centered.
         - When locating an object, do NOT stop until the car is very close!
     """
-    duration = max(MIN_DURATION, min(duration, MAX_DURATION))
-    result = make_request("forward", method="POST", json_data={"duration": duration})
-    return {
-        "status": "success",
-        "message": f"Moved forward for {duration} seconds (confidently approaching the object).",
-        "duration_used": duration,
-        "result": result,
-    }
+    return run_move(
+        "forward",
+        duration,
+        "Moved forward for {duration} seconds (confidently approaching the object).",
+        car_id,
+    )
 
 
 @mcp.tool()
-def move_backward(duration: float = DEFAULT_DURATION) -> Dict[str, Any]:
+def move_backward(
+    duration: float = DEFAULT_DURATION, car_id: Optional[str] = None
+) -> Dict[str, Any]:
     """
     Move the RC car backward for a specified duration (default 1.1s, up to 2.2s).
 
     Args:
         duration: Movement duration in seconds (0.2–2.2, default 1.1)
+        car_id: Which car to move (default: the registry's default car)
 
     Returns:
         Dict with status and response from the car's movement system
@@ -94,23 +205,21 @@ def move_backward(duration: float = DEFAULT_DURATION) -> Dict[str, Any]:
     Notes:
         - Use to back away from obstacles or reposition.
     """
-    duration = max(MIN_DURATION, min(duration, MAX_DURATION))
-    result = make_request("backward", method="POST", json_data={"duration": duration})
-    return {
-        "status": "success",
-        "message": f"Moved backward for {duration} seconds",
-        "duration_used": duration,
-        "result": result,
-    }
+    return run_move(
+        "backward", duration, "Moved backward for {duration} seconds", car_id
+    )
 
 
 @mcp.tool()
-def turn_left(duration: float = DEFAULT_DURATION) -> Dict[str, Any]:
+def turn_left(
+    duration: float = DEFAULT_DURATION, car_id: Optional[str] = None
+) -> Dict[str, Any]:
     """
     Turn the RC car left for a specified duration (default 1.1s, up to 2.2s).
 
     Args:
         duration: Turn duration in seconds (0.2–2.2, default 1.1)
+        car_id: Which car to turn (default: the registry's default car)
 
     Returns:
         Dict with status and response from the car's movement system
@@ -119,23 +228,19 @@ def turn_left(duration: float = DEFAULT_DURATION) -> Dict[str, Any]:
         - Use for changing direction or aligning with targets, but prefer forward movement if the object is visible.
         - For context, a turn of 0.4s is about 100 degrees.
     """
-    duration = max(MIN_DURATION, min(duration, MAX_DURATION))
-    result = make_request("left", method="POST", json_data={"duration": duration})
-    return {
-        "status": "success",
-        "message": f"Turned left for {duration} seconds",
-        "duration_used": duration,
-        "result": result,
-    }
+    return run_move("left", duration, "Turned left for {duration} seconds", car_id)
 
 
 @mcp.tool()
-def turn_right(duration: float = DEFAULT_DURATION) -> Dict[str, Any]:
+def turn_right(
+    duration: float = DEFAULT_DURATION, car_id: Optional[str] = None
+) -> Dict[str, Any]:
     """
     Turn the RC car right for a specified duration (default 1.1s, up to 2.2s).
 
     Args:
         duration: Turn duration in seconds (0.2–2.2, default 1.1)
+        car_id: Which car to turn (default: the registry's default car)
 
     Returns:
         Dict with status and response from the car's movement system
@@ -144,14 +249,7 @@ def turn_right(duration: float = DEFAULT_DURATION) -> Dict[str, Any]:
         - Use for changing direction or aligning with targets, but prefer forward movement if the object is visible.
         - For context, a turn of 0.4s is about 100 degrees.
     """
-    duration = max(MIN_DURATION, min(duration, MAX_DURATION))
-    result = make_request("right", method="POST", json_data={"duration": duration})
-    return {
-        "status": "success",
-        "message": f"Turned right for {duration} seconds",
-        "duration_used": duration,
-        "result": result,
-    }
+    return run_move("right", duration, "Turned right for {duration} seconds", car_id)
 
 
 @mcp.tool()
@@ -176,11 +274,21 @@ def get_navigation_system_prompt() -> Dict[str, Any]:
             "photo_frequency": "Take photos every 2 or 3 moves (rarely just 1, only if very unsure or can't see object)",
             "navigation_strategy": "Prefer forward movement when the object is visible, even if not centered. Only turn if you can't see the object. When locating an object, do NOT stop until the car is very close! If you see even a partial section of the target (e.g., a banner) in the frame, you are likely already there—be generous about stopping when this happens!",
             "available_tools": [
-                "move_forward(duration)",
-                "move_backward(duration)",
-                "turn_left(duration)",
-                "turn_right(duration)",
-                "take_photo_and_analyze(goal_description)",
+                "move_forward(duration, car_id)",
+                "move_backward(duration, car_id)",
+                "turn_left(duration, car_id)",
+                "turn_right(duration, car_id)",
+                "stop_car(car_id)",
+                "take_photo_and_analyze(goal_description, car_id)",
+                "steer_to_target(car_id)",
+                "track_target(car_id)",
+                "plan_search(car_id)",
+                "sweep_search(goal_description, stops, car_id)",
+                "scan_for_target(goal_description, car_id)",
+                "get_pose(car_id)",
+                "reset_pose(car_id)",
+                "list_cars()",
+                "fleet_dispatch(command, car_ids)",
             ],
             "turn_context": "A turn of 0.4 seconds is about 100 degrees.",
             "camera_retry": "If the image is not available, do not move forward to scan. Just try the camera again until you get a valid image.",
@@ -188,39 +296,94 @@ def get_navigation_system_prompt() -> Dict[str, Any]:
     }
 
 
-@mcp.tool()
-def take_photo_and_analyze(goal_description: str, frequency_hint: str = "normal") -> Dict[str, Any]:
+def run_photo(
+    goal_description: str,
+    frequency_hint: str = "normal",
+    car_id: Optional[str] = None,
+    force: bool = False,
+    change_threshold: Optional[float] = None,
+    target_height: Optional[float] = None,
+) -> Dict[str, Any]:
     """
-    Take a photo with the car's camera and analyze it for navigation.
-    Use this every 2 or 3 moves to verify the car's position and orientation.
-    Only use after a single move if you are very unsure or cannot see the object at all.
+    Ask a car's Pi to take a photo and have its analyzer laptop analyze it.
+    The request is traced through the Pi and the laptop (see tracing); the
+    span tree goes to the trace file and "trace" sums it up.
+    """
+    try:
+        car = registry.get(car_id)
+    except KeyError as e:
+        return unknown_car_error(e)
+    with tracing.start_trace(
+        "take_photo_and_analyze", "mcp", car_id=car.car_id, goal=goal_description
+    ) as root, deadlines.budget(PHOTO_TIMEOUT - DEADLINE_MARGIN):
+        result = photo_request(
+            car, goal_description, frequency_hint, force, change_threshold, target_height
+        )
+    if root.trace is not None:
+        result["trace"] = trace_summary(root.trace)
+    return result
 
-    Args:
-        goal_description: Description of what the car is trying to find or achieve.
-        frequency_hint: "normal" (default, for every 2-3 moves), or "urgent" (use after a single move if very unsure/can't see object)
 
-    Returns:
-        Dict with photo analysis results and recommended next actions
+def trace_summary(trace) -> Dict[str, Any]:
+    """Trace ID, total time and the slowest steps of a finished photo trace."""
+    spans = trace.export()
+    parents = {s["parent"] for s in spans}
+    steps = sorted(
+        (s for s in spans if s["id"] not in parents),
+        key=lambda s: s["duration_ms"],
+        reverse=True,
+    )
+    summary = {
+        "trace_id": trace.trace_id,
+        "total_ms": round(trace.root.duration * 1000.0, 1),
+        "slowest": [
+            {
+                "step": s["name"],
+                "process": s["process"],
+                "ms": round(s["duration_ms"], 1),
+            }
+            for s in steps[:3]
+        ],
+    }
+    try:
+        summary["file"] = tracing.save(trace)
+    except OSError as e:
+        summary["file_error"] = str(e)
+    return summary
 
-    Notes:
-        - Captures current view from car's camera
-        - AI analyzes the image based on the goal description
-        - Returns specific action recommendations (MOVE_LEFT, MOVE_RIGHT, MOVE_FORWARD, etc.)
-        - Use every 2 or 3 moves to maintain situational awareness and verify you are facing the objective
-        - Only use after a single move if you are very unsure or cannot see the object at all
-        - If the object is visible, prefer moving forward, even if not perfectly centered.
-        - When locating an object, do NOT stop until the car is very close!
-    """
+
+def photo_request(
+    car,
+    goal_description: str,
+    frequency_hint: str,
+    force: bool,
+    change_threshold: Optional[float],
+    target_height: Optional[float] = None,
+) -> Dict[str, Any]:
     try:
         payload = {
             "goal": goal_description,
-            "laptop_ip": "10.33.49.88",  # Laptop IP for processing
-            "laptop_port": 8000,
+            "laptop_ip": car.laptop_ip,  # Laptop IP for processing
+            "laptop_port": car.laptop_port,
+            "car_id": car.car_id,
+            "priority": "urgent" if frequency_hint == "urgent" else "normal",
+            "force": force,
+            # Predicts where the last located target is now, for the ROI crop
+            "calibration": car.to_dict()["calibration"],
         }
-        url = f"{BASE_URL}/photo"
-        response = requests.post(
-            url, json=payload, timeout=30
-        )  # Increased timeout for photo processing
+        if change_threshold is not None:
+            payload["change_threshold"] = change_threshold
+        if target_height:
+            payload["target_height"] = target_height  # Sizes the ROI prediction
+        url = f"{car.media_url}/photo"
+        with tracing.span("pi_photo") as hop:
+            response = registry.session(car.car_id).post(
+                url,
+                json=payload,
+                headers=deadlines.inject(tracing.inject()),
+                timeout=PHOTO_TIMEOUT,
+            )
+        hop.adopt(response.headers)  # The Pi's spans, with the laptop's inside
         try:
             result = response.json()
         except Exception as json_err:
@@ -228,6 +391,7 @@ def take_photo_and_analyze(goal_description: str, frequency_hint: str = "normal"
                 "status": "error",
                 "message": f"Photo endpoint did not return valid JSON: {json_err}",
                 "goal": goal_description,
+                "car_id": car.car_id,
                 "http_status": response.status_code,
                 "raw_response": response.text,
             }
@@ -236,14 +400,53 @@ def take_photo_and_analyze(goal_description: str, frequency_hint: str = "normal"
                 "status": "error",
                 "message": f"Photo endpoint returned error: {result.get('message', 'Unknown error')}",
                 "goal": goal_description,
+                "car_id": car.car_id,
                 "http_status": response.status_code,
                 "full_response": result,
             }
+        analysis = result.get("annotation", "No analysis available")
+        tracker = pose_trackers[car.car_id]
+        unchanged = bool(result.get("unchanged"))
+        if not unchanged:
+            search_planners[car.car_id].record_observation(tracker.to_dict())
+        with ANALYSIS_PARSE_SECONDS.time(), tracing.span("analysis_parse"):
+            target = parse_target_box(analysis)
+        if target is not None and target_height:
+            # Ranges from this box, and steer_to_target's, use the real height
+            target["target_height"] = target_height
+        control = None
+        if unchanged:
+            # Same view as the last analysis: its fix is already applied
+            control = controllers[car.car_id].command(target) if target else None
+            pose = tracker.to_dict()
+        elif target is not None:
+            # A box gives a precise bearing and range; codes only a rough bearing
+            control = controllers[car.car_id].command(target)
+            last_targets[car.car_id] = target
+            pose = tracker.observe_target(
+                control["bearing"],
+                control["distance"],
+                bearing_sigma=3.0,
+                distance_sigma=control["distance_sigma"],
+            )
+        else:
+            last_targets.pop(car.car_id, None)
+            pose = tracker.observe_analysis(analysis) or tracker.to_dict()
         return {
             "status": "success",
             "message": "Photo taken and analyzed",
             "goal": goal_description,
-            "analysis_result": result.get("annotation", "No analysis available"),
+            "car_id": car.car_id,
+            "analysis_result": analysis,
+            "queue_wait_ms": result.get("queue_wait_ms"),
+            "analyzer": result.get("analyzer"),
+            "frame_quality": result.get("frame_quality"),
+            "unchanged": unchanged,
+            "roi": result.get("roi"),
+            "upload": result.get("upload"),
+            "target": target,
+            "control": control,
+            "pose": pose,
             "full_response": result,
         }
     except requests.exceptions.RequestException as e:
@@ -251,7 +454,684 @@ def take_photo_and_analyze(goal_description: str, frequency_hint: str = "normal"
             "status": "error",
             "message": f"Failed to take photo: {str(e)}",
             "goal": goal_description,
+            "car_id": car.car_id,
+        }
+
+
+@mcp.tool()
+def take_photo_and_analyze(
+    goal_description: str,
+    frequency_hint: str = "normal",
+    car_id: Optional[str] = None,
+    force_new_analysis: bool = False,
+    change_threshold: Optional[float] = None,
+    target_height: Optional[float] = None,
+) -> Dict[str, Any]:
+    """
+    Take a photo with the car's camera and analyze it for navigation.
+    Use this every 2 or 3 moves to verify the car's position and orientation.
+    Only use after a single move if you are very unsure or cannot see the object at all.
+
+    Args:
+        goal_description: Description of what the car is trying to find or achieve.
+        frequency_hint: "normal" (default, for every 2-3 moves), or "urgent" (use after a single move if very unsure/can't see object)
+        car_id: Which car's camera to use (default: the registry's default car)
+        force_new_analysis: Analyze even if the view has not changed since the last photo
+        change_threshold: How different (0-1, default 0.02) the view must be to re-analyze
+        target_height: The target's real height in metres, if known; distances
+            from its apparent size are a rough guess without it (0.1m assumed)
+
+    Returns:
+        Dict with photo analysis results and recommended next actions;
+        "unchanged": True means the car did not move, the view is the same and
+        the previous analysis was returned without a new AI call
+        "trace" has the request's trace ID, total time and slowest steps;
+        `python -m tracing <trace_id>` shows where the time went, hop by hop
+
+    Notes:
+        - Captures current view from car's camera
+        - AI analyzes the image based on the goal description
+        - Returns specific action recommendations (MOVE_LEFT, MOVE_RIGHT, MOVE_FORWARD, etc.)
+        - Use every 2 or 3 moves to maintain situational awareness and verify you are facing the objective
+        - Only use after a single move if you are very unsure or cannot see the object at all
+        - If the object is visible, prefer moving forward, even if not perfectly centered.
+        - When locating an object, do NOT stop until the car is very close!
+    """
+    return run_photo(
+        goal_description,
+        frequency_hint,
+        car_id,
+        force_new_analysis,
+        change_threshold,
+        target_height,
+    )
+
+
+@mcp.tool()
+def stop_car(car_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Immediately stop all movement of a car.
+
+    Args:
+        car_id: Which car to stop (default: the registry's default car)
+
+    Returns:
+        Dict with status and response from the car's movement system
+    """
+    try:
+        car = registry.get(car_id)
+    except KeyError as e:
+        return unknown_car_error(e)
+    result = make_request("stop", method="POST", car_id=car.car_id)
+    return {
+        "status": "success",
+        "message": "Car stopped",
+        "car_id": car.car_id,
+        "result": result,
+    }
+
+
+@mcp.tool()
+def list_cars() -> Dict[str, Any]:
+    """
+    List the cars this MCP server can control.
+
+    Returns:
+        Dict with the default car ID and each car's Pi URL, analyzer laptop and calibration
+    """
+    return {
+        "status": "success",
+        "default_car_id": registry.default_car_id,
+        "cars": [registry.get(car_id).to_dict() for car_id in registry.car_ids()],
+    }
+
+
+@mcp.tool()
+def get_pose(car_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Get the car's dead-reckoned pose without taking a photo.
+
+    Args:
+        car_id: Which car (default: the registry's default car)
+
+    Returns:
+        Dict with x/y in metres and heading in degrees (left turns positive)
+        relative to where tracking started, their 1-sigma uncertainty, and the
+        estimated target position, distance and bearing once it has been seen.
+
+    Notes:
+        - Uncertainty grows with every move; take a photo when it gets large.
+        - Use the target bearing/distance to plan several moves between photos.
+    """
+    try:
+        car = registry.get(car_id)
+    except KeyError as e:
+        return unknown_car_error(e)
+    return {
+        "status": "success",
+        "car_id": car.car_id,
+        "pose": pose_trackers[car.car_id].to_dict(),
+    }
+
+
+@mcp.tool()
+def reset_pose(car_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Reset the car's pose to the origin and forget which headings were searched,
+    e.g. when starting a new goal.
+
+    Args:
+        car_id: Which car (default: the registry's default car)
+    """
+    try:
+        car = registry.get(car_id)
+    except KeyError as e:
+        return unknown_car_error(e)
+    pose_trackers[car.car_id].reset()
+    search_planners[car.car_id].reset()
+    return {
+        "status": "success",
+        "car_id": car.car_id,
+        "pose": pose_trackers[car.car_id].to_dict(),
+    }
+
+
+@mcp.tool()
+def plan_search(car_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Suggest the next search move when the target is not visible.
+    Picks the turn or forward move that reveals the most not-yet-photographed
+    view per second, based on the headings already covered by photos.
+
+    Args:
+        car_id: Which car (default: the registry's default car)
+
+    Returns:
+        Dict with "action" (left/right/forward), "duration" to pass to the
+        matching move tool, and the fraction of the surroundings already searched
+
+    Notes:
+        - Use instead of fixed turns after NOT_FOUND / TURN_LEFT / TURN_RIGHT.
+        - Take a photo after each suggested move; that photo updates coverage.
+    """
+    try:
+        car = registry.get(car_id)
+    except KeyError as e:
+        return unknown_car_error(e)
+    pose = pose_trackers[car.car_id].to_dict()
+    step = search_planners[car.car_id].next_action(pose)
+    tool = {"left": "turn_left", "right": "turn_right", "forward": "move_forward"}
+    return {
+        "status": "success",
+        "car_id": car.car_id,
+        "suggested_tool": f"{tool[step['action']]}(duration={step['duration']})",
+        "plan": step,
+        "pose": pose,
+    }
+
+
+@mcp.tool()
+def sweep_search(
+    goal_description: str, stops: int = 8, car_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Turn a full circle in steps, photograph every heading and find the target
+    in all of them with ONE analysis, then turn straight to the target's heading.
+    Much faster than turning and taking a photo at each step.
+
+    Args:
+        goal_description: What the car is looking for
+        stops: Number of headings to photograph around the circle (default 8)
+        car_id: Which car (default: the registry's default car)
+
+    Returns:
+        Dict with the analysis, the tile (heading) that showed the target, or
+        "found": False, and the pose after turning to it
+
+    Notes:
+        - Use when the target is not in view, instead of repeated turn + photo.
+        - Take a photo afterwards to centre and approach the target.
+    """
+    try:
+        car = registry.get(car_id)
+    except KeyError as e:
+        return unknown_car_error(e)
+    payload = {
+        "goal": goal_description,
+        "stops": stops,
+        "calibration": car.to_dict()["calibration"],
+        "laptop_ip": car.laptop_ip,
+        "laptop_port": car.laptop_port,
+        "car_id": car.car_id,
+    }
+    try:
+        response = registry.session(car.car_id).post(
+            f"{car.media_url}/sweep", json=payload, timeout=SWEEP_TIMEOUT
+        )
+        result = response.json()
+    except (requests.exceptions.RequestException, ValueError) as e:
+        return {
+            "status": "error",
+            "message": f"Sweep failed: {str(e)}",
+            "car_id": car.car_id,
+        }
+
+    # Replay the sweep on the pose tracker: every stop is a searched view
+    tracker = pose_trackers[car.car_id]
+    planner = search_planners[car.car_id]
+    sweep_moves = result.get("sweep_moves", [])
+    tile = result.get("tile")
+    for stop in range(len(result.get("tile_headings", []))):
+        planner.record_observation(tracker.to_dict())
+        if stop == tile:
+            target = result.get("target")
+            if target is not None:
+                est = controllers[car.car_id].estimate(target)
+                tracker.observe_target(
+                    est["bearing"],
+                    est["distance"],
+                    bearing_sigma=5.0,
+                    distance_sigma=est["distance_sigma"],
+                )
+            else:
+                tracker.observe_target(0.0, bearing_sigma=CAMERA_HFOV_DEG / 4.0)
+        if stop < len(sweep_moves):
+            move = sweep_moves[stop]
+            tracker.apply_command(move["action"], move["actual"], move.get("duty_cycle"))
+    for move in result.get("turn_moves", []):
+        tracker.apply_command(move["action"], move["actual"], move.get("duty_cycle"))
+
+    if response.status_code >= 400:
+        return {
+            "status": "error",
+            "message": f"Sweep endpoint returned error: {result.get('message', 'Unknown error')}",
+            "car_id": car.car_id,
+            "pose": tracker.to_dict(),
+        }
+    return {
+        "status": "success",
+        "car_id": car.car_id,
+        "goal": goal_description,
+        "found": tile is not None,
+        "analysis_result": result.get("annotation"),
+        "analyzer": result.get("analyzer"),
+        "tile": tile,
+        "target_heading": result.get("target_heading"),
+        "turned_to_target": bool(result.get("turn_moves")),
+        "pose": tracker.to_dict(),
+    }
+
+
+@mcp.tool()
+def scan_for_target(
+    goal_description: str, car_id: Optional[str] = None, max_angle: float = 360.0
+) -> Dict[str, Any]:
+    """
+    Rotate slowly while the car's own colour detector watches the camera
+    stream, stop the moment the target shows up, confirm that one frame with
+    the AI analyzer and turn back to face it. Usually takes a couple of
+    seconds plus one analysis. Only for simple colour goals ("red ball").
+
+    Args:
+        goal_description: What the car is looking for, with its colour
+        car_id: Which car (default: the registry's default car)
+        max_angle: Degrees to scan before giving up (default a full circle)
+
+    Returns:
+        Dict with "found", the confirmed heading, the candidates checked and the pose
+
+    Notes:
+        - Use instead of sweep_search for simple colour goals.
+        - For other goals the car answers with an error; use sweep_search.
+    """
+    try:
+        car = registry.get(car_id)
+    except KeyError as e:
+        return unknown_car_error(e)
+    payload = {
+        "goal": goal_description,
+        "max_angle": max_angle,
+        "calibration": car.to_dict()["calibration"],
+        "laptop_ip": car.laptop_ip,
+        "laptop_port": car.laptop_port,
+        "car_id": car.car_id,
+    }
+    try:
+        response = registry.session(car.car_id).post(
+            f"{car.media_url}/scan", json=payload, timeout=SWEEP_TIMEOUT
+        )
+        result = response.json()
+    except (requests.exceptions.RequestException, ValueError) as e:
+        return {
+            "status": "error",
+            "message": f"Scan failed: {str(e)}",
+            "car_id": car.car_id,
+        }
+    if response.status_code >= 400:
+        return {
+            "status": "error",
+            "message": f"Scan endpoint returned error: {result.get('message', 'Unknown error')}",
+            "car_id": car.car_id,
+        }
+
+    tracker = pose_trackers[car.car_id]
+    for move in result.get("moves", []):
+        tracker.apply_command(move["action"], move["actual"], move.get("duty_cycle"))
+    target = result.get("target")
+    if result.get("found") and target and target.get("offset") is not None:
+        # The car turned to face the target; only the range is new information
+        est = controllers[car.car_id].estimate(target)
+        tracker.observe_target(
+            0.0,
+            est["distance"],
+            bearing_sigma=5.0,
+            distance_sigma=est["distance_sigma"],
+        )
+    return {
+        "status": "success",
+        "car_id": car.car_id,
+        "goal": goal_description,
+        "found": result.get("found", False),
+        "reason": result.get("reason"),
+        "time_to_candidate": result.get("time_to_candidate"),
+        "candidates": result.get("candidates", []),
+        "analysis_result": (result.get("annotations") or [None])[-1],
+        "pose": tracker.to_dict(),
+    }
+
+
+@mcp.tool()
+def steer_to_target(
+    car_id: Optional[str] = None, allow_forward: bool = True
+) -> Dict[str, Any]:
+    """
+    Turn precisely towards the target seen in the last photo, then drive towards it.
+    The turn length is proportional to how far off-centre the target was, and
+    the forward distance to how far away its apparent size says it is.
+
+    Args:
+        car_id: Which car (default: the registry's default car)
+        allow_forward: Also drive forward once facing the target (default True)
+
+    Returns:
+        Dict with the moves executed, the estimated bearing/distance and the new pose
+
+    Notes:
+        - Use right after a take_photo_and_analyze that returned a "target".
+        - Prefer this over fixed-duration turns when the target is visible.
+    """
+    try:
+        car = registry.get(car_id)
+    except KeyError as e:
+        return unknown_car_error(e)
+    target = last_targets.pop(car.car_id, None)
+    if target is None:
+        return {
+            "status": "error",
+            "message": "No target box from the last photo; take a photo first",
+            "car_id": car.car_id,
+        }
+
+    control = controllers[car.car_id].command(target, allow_forward)
+    executed = []
+    for move in control["moves"]:
+        # Controller pulses may be shorter than MIN_DURATION; that is the point
+        result = make_request(
+            move["action"], json_data={"duration": move["duration"]}, car_id=car.car_id
+        )
+        if result["status"] != "success":
+            return {
+                "status": "error",
+                "message": f"{move['action']} failed: {result['message']}",
+                "car_id": car.car_id,
+                "executed": executed,
+            }
+        data = result["data"]
+        pose_trackers[car.car_id].apply_command(
+            move["action"],
+            float(data.get("actual_duration", move["duration"])),
+            data.get("duty_cycle"),
+        )
+        executed.append(move)
+
+    return {
+        "status": "success",
+        "car_id": car.car_id,
+        "bearing": control["bearing"],
+        "distance": control["distance"],
+        "arrived": control["arrived"],
+        "executed": executed,
+        "pose": pose_trackers[car.car_id].to_dict(),
+    }
+
+
+@mcp.tool()
+def track_target(car_id: Optional[str] = None, max_seconds: float = 15.0) -> Dict[str, Any]:
+    """
+    Follow the target from the last photo on the car's own camera stream and
+    steer towards it with small corrections, without calling the AI analyzer.
+    Returns when tracking is lost, the target reaches the frame edge, or the
+    car may have reached the goal.
+
+    Args:
+        car_id: Which car (default: the registry's default car)
+        max_seconds: Longest time to servo before handing back (default 15)
+
+    Returns:
+        Dict with why tracking stopped ("reason"), frames used, moves made and the new pose
+
+    Notes:
+        - Use right after a take_photo_and_analyze that returned a "target".
+        - Take a photo afterwards to confirm the goal or re-acquire the target.
+    """
+    try:
+        car = registry.get(car_id)
+    except KeyError as e:
+        return unknown_car_error(e)
+    # Kept until tracking ran, so a failed request can be retried
+    target = last_targets.get(car.car_id)
+    if target is None:
+        return {
+            "status": "error",
+            "message": "No target box from the last photo; take a photo first",
+            "car_id": car.car_id,
+        }
+    payload = {
+        "box": target["box"],
+        "max_seconds": max_seconds,
+        "calibration": car.to_dict()["calibration"],
+        "controller_gains": car.controller_gains,
+    }
+    try:
+        response = registry.session(car.car_id).post(
+            f"{car.media_url}/track", json=payload, timeout=max_seconds + PHOTO_TIMEOUT
+        )
+        result = response.json()
+    except (requests.exceptions.RequestException, ValueError) as e:
+        return {
+            "status": "error",
+            "message": f"Tracking failed: {str(e)}",
+            "car_id": car.car_id,
+        }
+    if response.status_code >= 400:
+        return {
+            "status": "error",
+            "message": f"Track endpoint returned error: {result.get('message', 'Unknown error')}",
+            "car_id": car.car_id,
+        }
+
+    if last_targets.get(car.car_id) is target:  # Not replaced by a newer photo
+        del last_targets[car.car_id]
+    tracker = pose_trackers[car.car_id]
+    for move in result.get("moves", []):
+        tracker.apply_command(move["action"], move["actual"], move.get("duty_cycle"))
+    advice = {
+        "arrived": "The goal may be reached; take a photo to confirm.",
+        "distance": "Drove most of the estimated distance; take a photo to confirm.",
+        "settled": "Centred on the target; take a photo to confirm or re-estimate.",
+    }.get(result["reason"], "Tracking ended; take a photo to re-acquire the target.")
+    return {
+        "status": "success",
+        "car_id": car.car_id,
+        "reason": result["reason"],
+        "advice": advice,
+        "frames": result["frames"],
+        "moves": len(result.get("moves", [])),
+        "tracked_target": result.get("target"),
+        "pose": tracker.to_dict(),
+    }
+
+
+FLEET_COMMANDS = {
+    "forward": lambda car_id, args: run_move(
+        "forward", args["duration"], "Moved forward for {duration} seconds", car_id
+    ),
+    "backward": lambda car_id, args: run_move(
+        "backward", args["duration"], "Moved backward for {duration} seconds", car_id
+    ),
+    "left": lambda car_id, args: run_move(
+        "left", args["duration"], "Turned left for {duration} seconds", car_id
+    ),
+    "right": lambda car_id, args: run_move(
+        "right", args["duration"], "Turned right for {duration} seconds", car_id
+    ),
+    "stop": lambda car_id, args: stop_car(car_id),
+    "photo": lambda car_id, args: run_photo(
+        args["goal_description"],
+        args["frequency_hint"],
+        car_id,
+        target_height=args["target_height"],
+    ),
+}
+
+
+@mcp.tool()
+def fleet_dispatch(
+    command: str,
+    car_ids: Optional[List[str]] = None,
+    duration: float = DEFAULT_DURATION,
+    goal_description: str = "Find the target object",
+    frequency_hint: str = "normal",
+    target_height: Optional[float] = None,
+) -> Dict[str, Any]:
+    """
+    Send the same command to several cars at once and gather all results.
+    Cars are contacted in parallel, so a fleet-wide stop or photo survey
+    takes one round trip instead of one per car.
+
+    Args:
+        command: One of "forward", "backward", "left", "right", "stop", "photo"
+        car_ids: Cars to address (default: every registered car)
+        duration: Movement duration for movement commands (0.2–2.2, default 1.1)
+        goal_description: Goal for "photo" commands
+        frequency_hint: "normal" or "urgent" for "photo" commands
+        target_height: The target's real height in metres for "photo", if known
+
+    Returns:
+        Dict with one result per car, keyed by car ID
+    """
+    handler = FLEET_COMMANDS.get(command)
+    if handler is None:
+        return {
+            "status": "error",
+            "message": f"Unknown fleet command '{command}'. Use one of: {', '.join(FLEET_COMMANDS)}",
+        }
+    car_ids = car_ids or registry.car_ids()
+    args = {
+        "duration": duration,
+        "goal_description": goal_description,
+        "frequency_hint": frequency_hint,
+        "target_height": target_height,
+    }
+
+    start = time.monotonic()
+    executor = stop_executor if command == "stop" else fleet_executor
+    futures = {car_id: executor.submit(handler, car_id, args) for car_id in car_ids}
+    results = {}
+    for car_id, future in futures.items():
+        try:
+            results[car_id] = future.result()
+        except Exception as e:
+            results[car_id] = {"status": "error", "message": str(e)}
+
+    failed = [
+        car_id
+        for car_id, r in results.items()
+        if r.get("status") != "success"
+        or r.get("result", {}).get("status") == "error"
+    ]
+    return {
+        "status": "success" if not failed else "partial_success",
+        "command": command,
+        "failed_cars": failed,
+        "elapsed_seconds": round(time.monotonic() - start, 3),
+        "results": results,
+    }
+
+
+@mcp.tool()
+def get_latency_metrics(car_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    See where a navigation step's time goes: latency per stage on this MCP
+    server, the car's motor control and media services and its analyzer laptop.
+
+    Args:
+        car_id: Which car (default: the registry's default car)
+
+    Returns:
+        Dict keyed by process ("mcp", "pi_control", "pi_media", "laptop"); each
+        timed stage has its count, mean, estimated p50/p95 in ms and total seconds.
+        A process that could not be reached has an "error" entry instead.
+
+    Notes:
+        - Pi stages: camera_start, screenshot, frame_check, encode, upload, photo
+        - Motor pulses: requested vs. actual on-time per action
+        - Laptop stages: upload_parse, queue_wait, gemini_request, analysis_<stage>
+        - ht6_deadline_abandoned[<stage>]: photo stages skipped because the
+          request's deadline had passed (capture, upload, queue, analysis, gemini)
+    """
+    try:
+        car = registry.get(car_id)
+    except KeyError as e:
+        return unknown_car_error(e)
+    sources = {
+        "pi_control": f"{car.pi_url}/metrics",
+        "pi_media": f"{car.media_url}/metrics",
+        "laptop": f"http://{car.laptop_ip}:{car.laptop_port}/metrics",
+    }
+    processes = {"mcp": metrics.summarize(metrics.render())}
+    for name, url in sources.items():
+        try:
+            response = registry.session(car.car_id).get(url, timeout=METRICS_TIMEOUT)
+            response.raise_for_status()
+            processes[name] = metrics.summarize(response.text)
+        except requests.exceptions.RequestException as e:
+            processes[name] = {"error": f"Could not read {url}: {e}"}
+    return {"status": "success", "car_id": car.car_id, "processes": processes}
+
+
+@mcp.tool()
+def profile_service(
+    service: str = "pi_media",
+    seconds: float = 5.0,
+    recent: bool = False,
+    car_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    See where a sluggish service spends its CPU time: sample its threads'
+    stacks for a few seconds (its /debug/profile endpoint).
+
+    Args:
+        service: "pi_control", "pi_media" or "laptop"
+        seconds: How long to sample (at most 60)
+        recent: Instead of sampling now, return the last `seconds` of the
+                service's always-on sampling (if PROFILE_RING_HZ is set there)
+        car_id: Which car (default: the registry's default car)
+
+    Returns:
+        Dict with the number of samples, the functions most samples were in
+        ("top", with their share) and the collapsed stacks of the hottest
+        paths, ready for flamegraph.pl or speedscope
+
+    Notes:
+        - Needs the same PROFILE_KEY here and on the service
+        - Call it while the slow step is running, or right after it with recent=True
+    """
+    try:
+        car = registry.get(car_id)
+    except KeyError as e:
+        return unknown_car_error(e)
+    bases = {
+        "pi_control": car.pi_url,
+        "pi_media": car.media_url,
+        "laptop": f"http://{car.laptop_ip}:{car.laptop_port}",
+    }
+    if service not in bases:
+        return {
+            "status": "error",
+            "message": f"Unknown service '{service}'. One of: {', '.join(bases)}",
         }
+    url = f"{bases[service]}/debug/profile"
+    try:
+        response = registry.session(car.car_id).get(
+            url,
+            params={"seconds": seconds, "recent": int(recent)},
+            headers={profiler.KEY_HEADER: profiler.PROFILE_KEY},
+            timeout=min(seconds, profiler.MAX_SECONDS) + METRICS_TIMEOUT,
+        )
+        response.raise_for_status()
+    except requests.exceptions.RequestException as e:
+        return {"status": "error", "message": f"Could not profile {url}: {e}"}
+    stacks = profiler.parse_collapsed(response.text)
+    return {
+        "status": "success",
+        "car_id": car.car_id,
+        "service": service,
+        "samples": int(response.headers.get("X-Profile-Samples", 0)),
+        "seconds": float(response.headers.get("X-Profile-Seconds", seconds)),
+        "top": profiler.top(stacks, PROFILE_TOP),
+        "collapsed": profiler.format_collapsed(stacks, PROFILE_STACKS),
+    }
 
 
 # The system prompt is now available as a tool: get_navigation_system_prompt()
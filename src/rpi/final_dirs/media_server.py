@@ -0,0 +1,904 @@
+"""
+Media service for the QNX Pi (media plane).
+
+Capture, frame preprocessing and uploads to the laptop, on port 5001, in a
+process of its own, so a photo stuck on the camera or on the laptop never
+delays the control service's move and stop requests (flask_motor_control.py,
+which starts this one). Motor pulses for tracking, sweeps and scans go to
+the control service through a MotorClient (see motor_ipc).
+"""
+
+from flask import Flask, Response, jsonify, request
+import atexit
+import os
+import time
+import numpy as np
+import requests
+
+from car_registry import Calibration
+import deadlines
+from deadlines import DeadlineExceeded
+import flight_recorder
+import logs
+from frame_quality import BURST_SIZE, MAX_BURSTS, pick_sharpest
+from heading_controller import ControllerGains, HeadingController
+from image_utils import bmp_size, build_mosaic, encode_bmp
+import metrics
+from motor_ipc import MEDIA_NICENESS, MotorClient
+import tracing
+from navigation_analysis import (
+    TARGET_VISIBLE_CODES,
+    parse_action_code,
+    parse_sweep_tile,
+    parse_target_box,
+)
+from panoramic_sweep import (
+    MOSAIC_COLUMNS,
+    SWEEP_STOPS,
+    TILE_BORDER,
+    TILE_WIDTH,
+    capture_sweep,
+    sweep_step_duration,
+    target_heading,
+    turn_to_heading,
+)
+import profiler
+from roi_crop import make_roi_upload, plan_roi
+from rotation_scan import SCAN_DUTY, color_candidate_detector, scan_for_target
+from upload_protocol import UploadLink, iter_chunks, pack_header
+from scene_gate import SceneGate
+from shared_frames import CaptureProcess, SharedFrameRing
+from visual_servo import track_and_servo
+
+app = Flask(__name__)
+# Queued JSON lines in logs/pi-media.log, written off the request threads
+log = logs.setup("pi-media")
+
+# Where a photo's time goes; shared so the capture process can record into it
+STAGE_SECONDS = metrics.histogram(
+    "ht6_pi_stage_seconds",
+    "Time spent in each stage of taking and sending a photo on the Pi",
+    ("stage",),
+    shared=True,
+)
+FRAME_CHECK_SECONDS = STAGE_SECONDS.labels("frame_check")
+ENCODE_SECONDS = STAGE_SECONDS.labels("encode")
+UPLOAD_SECONDS = STAGE_SECONDS.labels("upload")
+PHOTO_SECONDS = STAGE_SECONDS.labels("photo")
+
+# Camera capture runs in its own process (started on demand) and hands frames
+# over through shared memory; consumers read them in place, without copies
+frame_ring = SharedFrameRing.create(capacity=16)
+atexit.register(frame_ring.close)
+camera_stream = CaptureProcess(frame_ring, stage_seconds=STAGE_SECONDS)
+FRAME_TIMEOUT = 2.0  # seconds to wait for the next streamed frame
+
+# The motors belong to the control service; this is its scheduler over IPC
+motors = MotorClient()
+atexit.register(motors.close)
+
+# Analyzed frames, their results and the spans of traced requests, for replay
+recorder = flight_recorder.open_recorder("pi-media")
+atexit.register(recorder.close)
+tracing.on_finish.append(recorder.spans)
+
+
+PHOTO_SETTLE = 0.15  # seconds after the motors stop before a frame counts
+last_photo = {"image": None, "time": 0.0}  # Last frame that passed the quality gate
+# Reuses the last analysis of a goal when the car has not moved and the view is the same
+scene_gate = SceneGate()
+# Goal -> (target box, frame time) of its last analysis that located the target
+roi_targets = {}
+# (laptop IP, port, car ID) -> delta reference and interned goals of that link
+upload_links = {}
+
+
+def stream_burst(size):
+    """The next `size` streamed frames taken after the car last stopped moving."""
+    settled = (motors.last_motion_end() or 0.0) + PHOTO_SETTLE
+    images = []
+    frame = frame_ring.latest()
+    if frame is not None and frame.timestamp >= settled:
+        images.append(frame.image)
+    while len(images) < size:
+        frame = frame_ring.wait_newer(frame.seq if frame else 0, FRAME_TIMEOUT)
+        if frame is None:
+            break
+        if frame.timestamp >= settled:
+            images.append(frame.image)
+    return images
+
+
+def capture_good_frame(grab_burst):
+    """
+    Take bursts until one has a frame that passes the quality gate and keep
+    a copy of the sharpest such frame in last_photo.
+    Returns its quality dict ("ok" False if every burst failed), or None if
+    no frame could be captured at all
+    """
+    quality = None
+    for attempt in range(1, MAX_BURSTS + 1):
+        deadlines.check("capture")
+        with tracing.span("burst", attempt=attempt):
+            images = grab_burst(BURST_SIZE)
+        if not images:
+            continue
+        # A frame identical to the last photo although the car moved is stale
+        moved = (motors.last_motion_end() or 0.0) > last_photo["time"]
+        with FRAME_CHECK_SECONDS.time(), tracing.span("frame_check"):
+            index, quality = pick_sharpest(
+                images, last_photo["image"] if moved else None
+            )
+        quality["attempts"] = attempt
+        if quality["ok"]:
+            # Copy out of the shared ring before the capture process reuses the slot
+            last_photo.update(image=np.array(images[index]), time=time.monotonic())
+            return quality
+        log.info("Frame rejected, recapturing", problems=tuple(quality["problems"]))
+    return quality
+
+
+def take_photo():
+    """
+    Take a photo with the camera capture process
+    Starts capturing if it is not running yet (the viewfinder takes a few
+    seconds to open), keeps the sharpest of a short burst that passes the
+    quality check (see capture_good_frame) and lets capturing stop again
+    once no other request or /stream needs it
+    """
+    started_here = not camera_stream.running
+    try:
+        if started_here:
+            log.info("Starting camera capture")
+        with tracing.span("camera_start", started_here=started_here):
+            started = camera_stream.acquire()
+        if not started:
+            log.error("Camera capture produced no frames")
+            return None
+        quality = capture_good_frame(stream_burst)
+        if quality is not None and quality["ok"]:
+            log.info("Photo taken", attempts=quality["attempts"])
+        return quality
+
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        log.error("Error taking photo", error=str(e))
+        return None
+    finally:
+        camera_stream.release()
+
+
+def send_image_to_laptop(
+    frame,
+    goal_description,
+    laptop_ip="10.33.49.88",
+    laptop_port=8000,
+    car_id="car1",
+    priority="normal",
+    confirm=False,
+    roi=None,
+):
+    """
+    Send a captured frame (RGB array) to the laptop via HTTP POST
+    Returns a dict with the annotation string and the analyzer's queue wait,
+    or None if the upload failed
+    confirm=True asks for Gemini itself, skipping the laptop's local detector
+    roi (a roi_upload() result) sends its overview and crop instead of the image
+    Whole frames are streamed to /upload_frame in the binary format of
+    upload_protocol, as a delta against the laptop's last frame from this car
+    when possible (see frame_codec); "upload" in the result reports the bytes
+    """
+    try:
+        frame_bytes = bmp_size(*frame.shape[:2])  # What a whole BMP would have cost
+        deadlines.check("upload")
+        if roi is not None:
+            return send_roi_to_laptop(
+                roi,
+                goal_description,
+                laptop_ip,
+                laptop_port,
+                car_id,
+                priority,
+                frame_bytes,
+            )
+
+        taken_at = time.time()
+        laptop_url = f"http://{laptop_ip}:{laptop_port}/upload_frame"
+        link = upload_links.setdefault((laptop_ip, laptop_port, car_id), UploadLink())
+        log.info("Sending image", url=laptop_url, goal=goal_description)
+
+        # The lock covers the encoder and goal table only: the POST waits for
+        # the analysis, and a newer frame must be able to supersede this one
+        with link.lock:
+            frame_id = link.next_frame_id()
+            with ENCODE_SECONDS.time(), tracing.span("encode"):
+                delta = link.encoder.encode(frame, frame_id)
+        for attempt in range(3):
+            with link.lock:
+                goal_id, goal = link.goals.lookup(goal_description)
+            # Only the tiles that changed since the laptop's last frame, if possible
+            encoding = "keyframe" if delta is None else "delta"
+            payload = memoryview(frame).cast("B") if delta is None else delta
+            header = pack_header(
+                car_id,
+                frame_id,
+                taken_at,
+                frame.shape[1],
+                frame.shape[0],
+                "rgb24" if delta is None else "delta",
+                goal_id,
+                goal,
+                len(payload),
+                urgent=priority == "urgent",
+                confirm=confirm,
+            )
+            with UPLOAD_SECONDS.time(), tracing.span(
+                "upload", encoding=encoding, bytes=len(header) + len(payload)
+            ) as upload:
+                response = requests.post(
+                    laptop_url,
+                    data=iter_chunks(header, payload),  # Streamed chunked
+                    headers=deadlines.inject(
+                        tracing.inject({"Content-Type": "application/octet-stream"})
+                    ),
+                    timeout=deadlines.timeout(10),
+                )
+            upload.adopt(response.headers)  # The laptop's spans
+            laptop_deadline_check(response)
+            if response.status_code != 412:
+                break
+            if response.json().get("status") == "goal_required":
+                with link.lock:
+                    link.goals.forget()  # The laptop restarted; resend goal texts
+            else:
+                # The laptop lacks our reference frame: fall back to a keyframe
+                log.info("Laptop cannot apply the delta, sending a keyframe")
+                with link.lock:
+                    link.encoder.reset()
+                    frame_id = link.next_frame_id()
+                    with ENCODE_SECONDS.time(), tracing.span("encode", retry=True):
+                        delta = link.encoder.encode(frame, frame_id)
+
+        if response.status_code not in (200, 409):
+            # Unknown state on the laptop: next is a keyframe with the goal text
+            with link.lock:
+                link.encoder.reset()
+                link.goals.forget()
+            log.error("Failed to send image", status=response.status_code)
+            return None
+        with link.lock:
+            link.encoder.commit(frame_id)
+            link.goals.confirm(goal_description)
+        if response.status_code != 200:
+            log.info("Analysis superseded by a newer frame")
+            return None
+
+        log.info("Image sent", encoding=encoding, bytes=len(header) + len(payload))
+        # Return the annotation string from the response
+        return {
+            "annotation": response.text,
+            "queue_wait_ms": float(response.headers.get("X-Queue-Wait-Ms", 0.0)),
+            "analyzer": response.headers.get("X-Analyzer-Stage", "gemini"),
+            "upload": {
+                "encoding": encoding,
+                "bytes": len(header) + len(payload),
+                "frame_bytes": frame_bytes,
+            },
+        }
+
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        log.error("Error sending image to laptop", error=str(e))
+        return None
+
+
+def laptop_deadline_check(response):
+    """Pass on a laptop's deadline-exceeded reply (it counted the saved work)."""
+    if response.status_code == 504:
+        reply = response.json()
+        if reply.get("status") == "deadline_exceeded":
+            raise DeadlineExceeded(
+                reply.get("stage", "analysis"), deadlines.remaining() or 0.0
+            )
+
+
+def send_roi_to_laptop(
+    roi,
+    goal_description,
+    laptop_ip="10.33.49.88",
+    laptop_port=8000,
+    car_id="car1",
+    priority="normal",
+    frame_bytes=0,
+):
+    """Send a roi_upload() overview and crop as a multipart POST to /receive_image."""
+    files = {
+        "image": ("overview.bmp", roi["overview"], "image/bmp"),
+        "roi": ("roi.bmp", roi["crop"], "image/bmp"),
+    }
+    data = {
+        "goal": goal_description,
+        "car_id": car_id,
+        "priority": priority,
+        "roi_box": ",".join(str(v) for v in roi["region"]),
+    }
+    laptop_url = f"http://{laptop_ip}:{laptop_port}/receive_image"
+    log.info("Sending overview + crop", url=laptop_url, goal=goal_description)
+    with UPLOAD_SECONDS.time(), tracing.span("upload", encoding="roi") as upload:
+        response = requests.post(
+            laptop_url,
+            files=files,
+            data=data,
+            headers=deadlines.inject(tracing.inject()),
+            timeout=deadlines.timeout(10),
+        )
+    upload.adopt(response.headers)
+    laptop_deadline_check(response)
+    if response.status_code != 200:
+        log.error("Failed to send image", status=response.status_code)
+        return None
+    return {
+        "annotation": response.text,
+        "queue_wait_ms": float(response.headers.get("X-Queue-Wait-Ms", 0.0)),
+        "analyzer": response.headers.get("X-Analyzer-Stage", "gemini"),
+        "upload": {
+            "encoding": "roi",
+            "bytes": len(roi["overview"]) + len(roi["crop"]),
+            "frame_bytes": frame_bytes,
+        },
+    }
+
+
+def roi_upload(goal_description, frame, taken_at, calibration, target_height=None):
+    """
+    BMPs of a shrunk overview and a full-resolution crop around where the
+    goal's last located target should be in this frame, given the motion run
+    since; None if there is no recent target or it should be out of view.
+    target_height is the target's real height in metres, if the goal gave it.
+    """
+    last = roi_targets.get(goal_description)
+    if last is None:
+        return None
+    target, seen_at = last
+    region = plan_roi(
+        target,
+        seen_at,
+        taken_at,
+        motors.history(seen_at),
+        calibration,
+        target_height,
+    )
+    if region is None:
+        return None
+    with ENCODE_SECONDS.time(), tracing.span("encode", encoding="roi"):
+        upload = make_roi_upload(frame, region)
+        return {
+            "overview": encode_bmp(upload["overview"]),
+            "crop": encode_bmp(upload["crop"]),
+            "region": upload["region"],
+        }
+
+
+def send_sweep_to_laptop(
+    mosaic_bytes,
+    goal_description,
+    layout,
+    laptop_ip="10.33.49.88",
+    laptop_port=8000,
+    car_id="car1",
+    priority="normal",
+):
+    """
+    Send a sweep mosaic to the laptop via HTTP POST
+    Returns a dict with the annotation string and the analyzer's queue wait,
+    or None if the upload failed
+    """
+    try:
+        files = {"image": ("sweep.bmp", mosaic_bytes, "image/bmp")}
+        data = {"goal": goal_description, "car_id": car_id, "priority": priority}
+        data.update({key: str(value) for key, value in layout.items()})
+        laptop_url = f"http://{laptop_ip}:{laptop_port}/receive_sweep"
+        log.info("Sending sweep mosaic", url=laptop_url, goal=goal_description)
+        with UPLOAD_SECONDS.time(), tracing.span("upload", encoding="mosaic") as upload:
+            response = requests.post(
+                laptop_url, files=files, data=data, headers=tracing.inject(), timeout=30
+            )
+        upload.adopt(response.headers)
+        if response.status_code == 200:
+            return {
+                "annotation": response.text,
+                "queue_wait_ms": float(response.headers.get("X-Queue-Wait-Ms", 0.0)),
+                "analyzer": response.headers.get("X-Analyzer-Stage", "gemini"),
+            }
+        log.error("Failed to send sweep mosaic", status=response.status_code)
+        return None
+    except Exception as e:
+        log.error("Error sending sweep mosaic to laptop", error=str(e))
+        return None
+
+
+def run_pulse(action, duration):
+    """Run one motor pulse by name and return its actual on-time."""
+    return motors.run(action, duration, pulse_duty(action))
+
+
+def pulse_duty(action):
+    return motors.duties()[action]
+
+
+@app.route("/track", methods=["POST"])
+def track():
+    """
+    Follow the target boxed by the last analysis on streamed frames, steering
+    with small pulses, until tracking is lost or the goal may be reached.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        box = data.get("box")
+        if not box or len(box) != 4:
+            return (
+                jsonify(
+                    {
+                        "status": "error",
+                        "message": "box [ymin, xmin, ymax, xmax] required",
+                    }
+                ),
+                400,
+            )
+        controller = HeadingController(
+            Calibration(**data.get("calibration", {})),
+            ControllerGains(**data.get("controller_gains", {})),
+        )
+        try:
+            if not camera_stream.acquire():
+                return (
+                    jsonify(
+                        {"status": "error", "message": "Camera stream has no frames"}
+                    ),
+                    500,
+                )
+
+            last_seq = [frame_ring.latest().seq]
+
+            def next_frame():
+                frame = frame_ring.wait_newer(last_seq[0], FRAME_TIMEOUT)
+                if frame is None:
+                    return None
+                last_seq[0] = frame.seq
+                return frame.image
+
+            result = track_and_servo(
+                next_frame,
+                run_pulse,
+                box,
+                controller=controller,
+                max_seconds=float(data.get("max_seconds", 15.0)),
+            )
+            for move in result["moves"]:
+                move["duty_cycle"] = pulse_duty(move["action"])
+            return jsonify({"status": "success", **result})
+        finally:
+            camera_stream.release()
+    except Exception as e:
+        motors.stop()
+        return jsonify({"status": "error", "message": f"Error: {str(e)}"}), 500
+
+
+@app.route("/stream", methods=["POST"])
+def stream():
+    """Start or stop continuous camera capture ({"enabled": true/false})."""
+    data = request.get_json(silent=True) or {}
+    if data.get("enabled", True):
+        started = camera_stream.start()
+        return jsonify(
+            {"status": "success" if started else "error", "streaming": started}
+        )
+    camera_stream.stop()
+    return jsonify({"status": "success", "streaming": False})
+
+
+@app.route("/sweep", methods=["POST"])
+@tracing.traced("pi_media")
+def sweep():
+    """
+    Turn a full circle in calibrated steps, grab a frame at each stop, send
+    the frames as one mosaic for analysis and turn to the heading of the tile
+    that shows the target.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        goal_description = data.get("goal", "Find the target object")
+        stops = int(data.get("stops", SWEEP_STOPS))
+        calibration = Calibration(**data.get("calibration", {}))
+        if not 2 <= stops <= 16:
+            return (
+                jsonify({"status": "error", "message": "stops must be 2-16"}),
+                400,
+            )
+        try:
+            if not camera_stream.acquire():
+                return (
+                    jsonify(
+                        {"status": "error", "message": "Camera stream has no frames"}
+                    ),
+                    500,
+                )
+
+            def grab_after(timestamp):
+                frame = frame_ring.latest()
+                while frame is None or frame.timestamp < timestamp:
+                    frame = frame_ring.wait_newer(
+                        frame.seq if frame else 0, FRAME_TIMEOUT
+                    )
+                    if frame is None:
+                        return None
+                # The sweep holds every stop's frame until the mosaic is built
+                return np.array(frame.image)
+
+            frames, headings, sweep_moves = capture_sweep(
+                grab_after,
+                run_pulse,
+                stops,
+                sweep_step_duration(stops, calibration.turn_rate),
+                calibration.turn_rate,
+            )
+            columns = min(MOSAIC_COLUMNS, stops)
+            layout = {
+                "rows": (stops + columns - 1) // columns,
+                "columns": columns,
+                "tiles": stops,
+                "border": TILE_BORDER,
+            }
+            mosaic = build_mosaic(frames, columns, TILE_WIDTH, TILE_BORDER)
+            analysis = send_sweep_to_laptop(
+                encode_bmp(mosaic),
+                goal_description,
+                layout,
+                data.get("laptop_ip", "10.33.49.88"),
+                data.get("laptop_port", 8000),
+                data.get("car_id", "car1"),
+                data.get("priority", "normal"),
+            )
+            if analysis is None:
+                return (
+                    jsonify(
+                        {
+                            "status": "error",
+                            "message": "Sweep captured but the mosaic could not be analyzed",
+                            "tile_headings": headings,
+                            "sweep_moves": sweep_moves,
+                        }
+                    ),
+                    500,
+                )
+
+            tile = parse_sweep_tile(analysis["annotation"])
+            if tile is not None and tile >= stops:
+                tile = None
+            target = (
+                parse_target_box(analysis["annotation"]) if tile is not None else None
+            )
+            heading = (
+                target_heading(headings, tile, target) if tile is not None else None
+            )
+            turn_moves = []
+            if heading is not None and data.get("turn_to_target", True):
+                turn_moves = turn_to_heading(
+                    run_pulse, headings[-1], heading, calibration.turn_rate
+                )
+            for move in sweep_moves + turn_moves:
+                move["duty_cycle"] = pulse_duty(move["action"])
+            return jsonify(
+                {
+                    "status": "success",
+                    "annotation": analysis["annotation"],
+                    "queue_wait_ms": analysis["queue_wait_ms"],
+                    "analyzer": analysis["analyzer"],
+                    "tile": tile,
+                    "target": target,
+                    "target_heading": heading,
+                    "tile_headings": headings,
+                    "sweep_moves": sweep_moves,
+                    "turn_moves": turn_moves,
+                }
+            )
+        finally:
+            camera_stream.release()
+    except Exception as e:
+        motors.stop()
+        return jsonify({"status": "error", "message": f"Error: {str(e)}"}), 500
+
+
+@app.route("/scan", methods=["POST"])
+@tracing.traced("pi_media")
+def scan():
+    """
+    Rotate slowly while the local colour detector watches streamed frames;
+    stop at the first candidate, have Gemini confirm that frame only and turn
+    back to the candidate's heading.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        goal_description = data.get("goal", "Find the target object")
+        calibration = Calibration(**data.get("calibration", {}))
+        detect = color_candidate_detector(goal_description)
+        if detect is None:
+            return (
+                jsonify(
+                    {
+                        "status": "error",
+                        "message": "Scanning needs a simple colour goal like "
+                        "'red ball'; use /sweep for other goals",
+                    }
+                ),
+                400,
+            )
+        try:
+            if not camera_stream.acquire():
+                return (
+                    jsonify(
+                        {"status": "error", "message": "Camera stream has no frames"}
+                    ),
+                    500,
+                )
+
+            last_seq = [frame_ring.latest().seq]
+
+            def next_frame():
+                frame = frame_ring.wait_newer(last_seq[0], FRAME_TIMEOUT)
+                if frame is not None:
+                    last_seq[0] = frame.seq
+                return frame
+
+            def confirm(image):
+                analysis = send_image_to_laptop(
+                    np.array(image),  # Kept as the laptop's delta reference
+                    goal_description,
+                    data.get("laptop_ip", "10.33.49.88"),
+                    data.get("laptop_port", 8000),
+                    data.get("car_id", "car1"),
+                    "urgent",  # The car is waiting, stopped, on this answer
+                    confirm=True,
+                )
+                confirmations.append(analysis["annotation"] if analysis else None)
+                if analysis is None:
+                    return None
+                if (
+                    parse_action_code(analysis["annotation"])
+                    not in TARGET_VISIBLE_CODES
+                ):
+                    return None
+                return parse_target_box(analysis["annotation"]) or {}
+
+            confirmations = []
+            result = scan_for_target(
+                motors,
+                next_frame,
+                detect,
+                confirm,
+                run_pulse,
+                calibration.turn_rate,
+                calibration.turn_duty,
+                scan_duty=float(data.get("scan_duty", SCAN_DUTY)),
+                max_angle=float(data.get("max_angle", 360.0)),
+            )
+            return jsonify(
+                {"status": "success", **result, "annotations": confirmations}
+            )
+        finally:
+            camera_stream.release()
+    except Exception as e:
+        motors.stop()
+        return jsonify({"status": "error", "message": f"Error: {str(e)}"}), 500
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics_page():
+    """Stage latency histograms in the Prometheus text format"""
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@app.route("/debug/profile", methods=["GET"])
+def debug_profile():
+    """Collapsed stacks of this process for flame graphs (see profiler)"""
+    return profiler.flask_response(request)
+
+
+@app.route("/photo", methods=["POST"])
+@tracing.traced("pi_media")
+@deadlines.bounded
+@PHOTO_SECONDS.timed
+def photo():
+    """
+    Take a photo and have the laptop analyze it.
+    Optional JSON: "force" (bool) always analyzes; "change_threshold" (0-1)
+    overrides how different the view must be from the last analyzed frame of
+    this goal, when the car has not moved since, to be analyzed again.
+    Once a target has been located, the upload is a shrunk view plus a
+    full-resolution crop around its predicted position ("roi": false sends
+    the whole frame; "calibration" predicts the motion since).
+    """
+    started = time.monotonic()
+    try:
+        data = request.get_json()
+        goal_description = data.get("goal", "Find the target object")
+        laptop_ip = data.get("laptop_ip", "10.33.49.88")  # Default laptop IP
+        laptop_port = data.get("laptop_port", 8000)  # Default laptop port
+        car_id = data.get("car_id", "car1")
+        priority = data.get("priority", "normal")  # "normal" or "urgent"
+        force = bool(data.get("force", False))
+        change_threshold = data.get("change_threshold")
+        use_roi = bool(data.get("roi", True))
+        calibration = Calibration(**data.get("calibration", {}))
+        target_height = data.get("target_height")  # metres, if the goal gave it
+
+        log.info(
+            "Photo request",
+            goal=goal_description,
+            laptop=f"{laptop_ip}:{laptop_port}",
+            car_id=car_id,
+        )
+
+        deadlines.check("capture")
+        with tracing.span("take_photo"):
+            quality = take_photo()
+        if quality is not None and not quality["ok"]:
+            recorder.analysis(
+                goal=goal_description,
+                car_id=car_id,
+                status="rejected",
+                photo_ms=round((time.monotonic() - started) * 1000.0, 1),
+                quality=quality,
+            )
+            # Not worth an upload and a Gemini call; say why instead
+            return (
+                jsonify(
+                    {
+                        "status": "error",
+                        "message": "No usable frame after "
+                        f"{quality['attempts']} bursts "
+                        f"({', '.join(quality['problems'])}); not sent to the laptop",
+                        "frame_quality": quality,
+                    }
+                ),
+                422,
+            )
+        if quality is not None:
+            frame, taken_at = last_photo["image"], last_photo["time"]
+            frame_id = recorder.frame(frame)  # last_photo's frame is never changed
+            gate = {"unchanged": False, "reason": "forced"}
+            if not force:
+                with tracing.span("scene_gate"):
+                    gate = scene_gate.check(
+                        goal_description,
+                        frame,
+                        motors.history,
+                        (
+                            float(change_threshold)
+                            if change_threshold is not None
+                            else None
+                        ),
+                    )
+            if gate["unchanged"]:
+                previous = gate.pop("analysis")
+                log.info(
+                    "Scene unchanged, reusing the analysis",
+                    difference=gate["difference"],
+                )
+                recorder.analysis(
+                    goal=goal_description,
+                    car_id=car_id,
+                    status="unchanged",
+                    photo_ms=round((time.monotonic() - started) * 1000.0, 1),
+                    frame=frame_id,
+                    annotation=previous["annotation"],
+                    analyzer=previous["analyzer"],
+                    scene_gate=gate,
+                )
+                return jsonify(
+                    {
+                        "status": "success",
+                        "message": "Scene unchanged since the last analysis; reused it",
+                        "goal": goal_description,
+                        "image_sent": False,
+                        "unchanged": True,
+                        "annotation": previous["annotation"],
+                        "queue_wait_ms": 0.0,
+                        "analyzer": previous["analyzer"],
+                        "scene_gate": gate,
+                        "frame_quality": quality,
+                    }
+                )
+
+            roi = None
+            if use_roi:
+                roi = roi_upload(
+                    goal_description,
+                    frame,
+                    taken_at,
+                    calibration,
+                    target_height,
+                )
+            if roi is not None:
+                log.info("Close-up region chosen", region=tuple(roi["region"]))
+
+            # Send image to laptop
+            analysis = send_image_to_laptop(
+                frame,
+                goal_description,
+                laptop_ip,
+                laptop_port,
+                car_id,
+                priority,
+                roi=roi,
+            )
+
+            recorder.analysis(
+                goal=goal_description,
+                car_id=car_id,
+                status="success" if analysis else "upload_failed",
+                photo_ms=round((time.monotonic() - started) * 1000.0, 1),
+                frame=frame_id,
+                roi=roi["region"] if roi is not None else None,
+                quality=quality,
+                **(analysis or {}),
+            )
+            if analysis:
+                scene_gate.record(goal_description, frame, analysis, taken_at)
+                target = parse_target_box(analysis["annotation"])
+                if target is not None:
+                    roi_targets[goal_description] = (target, taken_at)
+                else:
+                    roi_targets.pop(goal_description, None)
+                return jsonify(
+                    {
+                        "status": "success",
+                        "message": "Photo taken and sent to laptop",
+                        "goal": goal_description,
+                        "image_sent": True,
+                        "unchanged": False,
+                        "annotation": analysis["annotation"],
+                        "queue_wait_ms": analysis["queue_wait_ms"],
+                        "analyzer": analysis["analyzer"],
+                        "scene_gate": gate,
+                        "roi": roi["region"] if roi is not None else None,
+                        "upload": analysis["upload"],
+                        "frame_quality": quality,
+                    }
+                )
+            else:
+                return jsonify(
+                    {
+                        "status": "partial_success",
+                        "message": "Photo taken but failed to send to laptop",
+                        "goal": goal_description,
+                        "image_sent": False,
+                    }
+                )
+        else:
+            return jsonify({"status": "error", "message": "Failed to take photo"}), 500
+
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        return jsonify({"status": "error", "message": f"Error: {str(e)}"}), 500
+
+
+if __name__ == "__main__":
+    print("Starting Media Flask Server...")
+    os.nice(MEDIA_NICENESS)  # Motor commands first: the control service wins the CPU
+    print("Available endpoints:")
+    print("  POST /photo    - Take a photo and send to laptop")
+    print('  POST /track    - Servo on the target locally (JSON: {"box": [...]})')
+    print('  POST /stream   - Start/stop continuous capture (JSON: {"enabled": bool})')
+    print('  POST /sweep    - Look all around in one analysis (JSON: {"goal": ...})')
+    print(
+        '  POST /scan     - Rotate until the local detector sees the goal (JSON: {"goal": ...})'
+    )
+    print("  GET  /metrics  - Stage latency histograms (Prometheus text format)")
+    print("  GET  /debug/profile - Sampled stacks (?seconds=N, X-Profile-Key header)")
+    print("Motor commands go to the control service on port 5000 (via motor_ipc)")
+    print("\nServer running on http://0.0.0.0:5001")
+    app.run(host="0.0.0.0", port=5001, debug=False)
@@ -0,0 +1,352 @@
+"""
+Latency histograms for the Pi services, the analyzer laptop and the MCP server.
+
+Every histogram has a fixed set of bucket bounds (seconds) and keeps its
+counts in a flat array, so recording is one bisect and two in-place
+additions, with nothing allocated and no lock: each addition is a single
+C-level array update under the GIL, and the worst a race could do is drop
+one count. Histograms belong to labelled families:
+
+    STAGES = metrics.histogram("ht6_pi_stage_seconds", "Pi photo stages", ("stage",))
+    UPLOAD = STAGES.labels("upload")  # Resolve once, record on the hot path
+    with UPLOAD.time():
+        ...
+
+or decorate a function with @UPLOAD.timed. Counters (metrics.counter) count
+events such as work skipped, the same way, with inc().
+
+render() writes the registry in the Prometheus text format for a /metrics
+endpoint. parse() and summarize() read such a page back and turn it into
+counts, means and bucket-estimated percentiles, as the MCP metrics tool does.
+A family created with shared=True keeps its arrays in shared memory, so a
+child process (the camera capture worker) can record into it.
+"""
+
+import abc
+import array
+import functools
+import re
+import threading
+from bisect import bisect_left
+from multiprocessing.sharedctypes import RawArray
+from time import perf_counter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Upper bounds in seconds: 0.5 ms to a minute, plus +Inf
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_SAMPLE = re.compile(r"^(\w+?)(_bucket|_sum|_count|_total)(?:\{(.*)\})? (\S+)$")
+_LABEL = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+class Histogram:
+    """Counts per bucket plus the running sum of one labelled series."""
+
+    def __init__(self, bounds: Sequence[float] = DEFAULT_BUCKETS, shared=False):
+        self.bounds = tuple(bounds)
+        size = len(self.bounds) + 1  # The last bucket is +Inf
+        if shared:
+            self._counts = RawArray("Q", size)
+            self._sum = RawArray("d", 1)
+        else:
+            self._counts = array.array("Q", bytes(8 * size))
+            self._sum = array.array("d", [0.0])
+
+    def observe(self, seconds: float):
+        self._counts[bisect_left(self.bounds, seconds)] += 1
+        self._sum[0] += seconds
+
+    def time(self) -> "_Timer":
+        """Observe the duration of a with block (also when it raises)."""
+        return _Timer(self)
+
+    def timed(self, func):
+        """Decorator observing each call's duration."""
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.observe(perf_counter() - started)
+
+        return wrapper
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        """(count per bucket, sum of all observations)."""
+        return list(self._counts), self._sum[0]
+
+
+class _Timer:
+    __slots__ = ("histogram", "started")
+
+    def __init__(self, histogram: Histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(perf_counter() - self.started)
+
+
+class Counter:
+    """A count that only goes up, such as requests abandoned at a stage."""
+
+    def __init__(self, shared=False):
+        self._value = RawArray("Q", 1) if shared else array.array("Q", [0])
+
+    def inc(self, amount: int = 1):
+        self._value[0] += amount
+
+    @property
+    def value(self) -> int:
+        return self._value[0]
+
+
+class _Family(abc.ABC):
+    """Metrics of one kind sharing a name and label names, one per label values."""
+
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    @abc.abstractmethod
+    def _new_child(self):
+        """A new metric for one set of label values."""
+
+    def labels(self, *values):
+        """The metric for these label values, created on first use."""
+        values = tuple(str(v) for v in values)
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.label_names):
+                raise ValueError(f"{self.name} takes labels {self.label_names}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        for values, child in sorted(self._children.items()):
+            labels = ",".join(
+                f'{name}="{value}"' for name, value in zip(self.label_names, values)
+            )
+            lines.extend(self._render_child(child, labels))
+        return lines
+
+    @abc.abstractmethod
+    def _render_child(self, child, labels: str) -> List[str]:
+        """Exposition lines of one child, with its label pairs."""
+
+
+class HistogramFamily(_Family):
+    """Histograms sharing a name, bucket bounds and label names."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        label_names: Sequence[str] = (),
+        bounds: Sequence[float] = DEFAULT_BUCKETS,
+        shared: bool = False,
+    ):
+        super().__init__(name, help_text, label_names)
+        self.bounds = tuple(bounds)
+        self.shared = shared
+
+    def _new_child(self) -> Histogram:
+        return Histogram(self.bounds, self.shared)
+
+    def observe(self, seconds: float, *values):
+        self.labels(*values).observe(seconds)
+
+    def _render_child(self, child: Histogram, labels: str) -> List[str]:
+        lines = []
+        counts, total = child.snapshot()
+        prefix = labels + "," if labels else ""
+        cumulative = 0
+        for bound, count in zip(self.bounds + (float("inf"),), counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f'{self.name}_bucket{{{prefix}le="{le}"}} {cumulative}')
+        suffix = f"{{{labels}}}" if labels else ""
+        lines.append(f"{self.name}_sum{suffix} {total!r}")
+        lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+
+class CounterFamily(_Family):
+    """Counters sharing a name and label names (rendered as <name>_total)."""
+
+    kind = "counter"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        label_names: Sequence[str] = (),
+        shared: bool = False,
+    ):
+        super().__init__(name, help_text, label_names)
+        self.shared = shared
+
+    def _new_child(self) -> Counter:
+        return Counter(self.shared)
+
+    def inc(self, *values, amount: int = 1):
+        self.labels(*values).inc(amount)
+
+    def _render_child(self, child: Counter, labels: str) -> List[str]:
+        suffix = f"{{{labels}}}" if labels else ""
+        return [f"{self.name}_total{suffix} {child.value}"]
+
+
+class Registry:
+    def __init__(self):
+        self._families: Dict[str, _Family] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, name: str, make) -> _Family:
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = self._families[name] = make()
+            return family
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        label_names: Sequence[str] = (),
+        bounds: Sequence[float] = DEFAULT_BUCKETS,
+        shared: bool = False,
+    ) -> HistogramFamily:
+        """Register a histogram family (or return the one already registered)."""
+        return self._register(
+            name,
+            lambda: HistogramFamily(name, help_text, label_names, bounds, shared),
+        )
+
+    def counter(
+        self,
+        name: str,
+        help_text: str,
+        label_names: Sequence[str] = (),
+        shared: bool = False,
+    ) -> CounterFamily:
+        """Register a counter family (or return the one already registered)."""
+        return self._register(
+            name, lambda: CounterFamily(name, help_text, label_names, shared)
+        )
+
+    def render(self) -> str:
+        lines = []
+        for family in list(self._families.values()):
+            lines.extend(family.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+histogram = REGISTRY.histogram
+counter = REGISTRY.counter
+render = REGISTRY.render
+
+
+def parse(text: str) -> Dict[Tuple[str, Tuple[Tuple[str, str], ...]], dict]:
+    """
+    Histograms and counters from a Prometheus text page, keyed by (name,
+    labels without le): {"buckets": [(upper bound, cumulative count), ...],
+    "sum", "count"}; a counter has only "count" (its total).
+    """
+    series = {}
+    for line in text.splitlines():
+        match = _SAMPLE.match(line)
+        if match is None:
+            continue
+        name, kind, labels, value = match.groups()
+        labels = dict(_LABEL.findall(labels or ""))
+        le = labels.pop("le", None)
+        entry = series.setdefault(
+            (name, tuple(sorted(labels.items()))),
+            {"buckets": [], "sum": 0.0, "count": 0},
+        )
+        if kind == "_bucket":
+            entry["buckets"].append((float(le), float(value)))
+        elif kind == "_sum":
+            entry["sum"] = float(value)
+        else:  # _count of a histogram or _total of a counter
+            entry["count"] = int(float(value))
+    return series
+
+
+def quantile(buckets: List[Tuple[float, float]], q: float) -> Optional[float]:
+    """Estimate a quantile from cumulative buckets, interpolating within one."""
+    if not buckets or buckets[-1][1] == 0:
+        return None
+    rank = q * buckets[-1][1]
+    lower, below = 0.0, 0.0
+    for bound, cumulative in buckets:
+        if cumulative >= rank:
+            if bound == float("inf"):
+                return lower  # Above the largest bound: report that bound
+            if cumulative == below:
+                return bound
+            return lower + (bound - lower) * (rank - below) / (cumulative - below)
+        lower, below = bound, cumulative
+    return lower
+
+
+def summarize(text: str) -> Dict[str, dict]:
+    """
+    Count, mean and estimated p50/p95 (ms) per histogram series of a /metrics
+    page; just the count for a counter.
+    """
+    summary = {}
+    for (name, labels), entry in sorted(parse(text).items()):
+        if not entry["count"]:
+            continue
+        key = name + "".join(f"[{value}]" for _, value in labels)
+        if not entry["buckets"]:
+            summary[key] = {"count": entry["count"]}
+            continue
+        p50 = quantile(entry["buckets"], 0.5)
+        p95 = quantile(entry["buckets"], 0.95)
+        summary[key] = {
+            "count": entry["count"],
+            "mean_ms": round(entry["sum"] / entry["count"] * 1000.0, 2),
+            "p50_ms": round(p50 * 1000.0, 2) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000.0, 2) if p95 is not None else None,
+            "total_s": round(entry["sum"], 3),
+        }
+    return summary
@@ -0,0 +1,190 @@
+"""
+Motor commands between the Pi's two processes.
+
+The control service (flask_motor_control.py) owns the GPIO pins and the
+MotorScheduler and answers the latency-critical move and stop requests.
+The media service (media_server.py) does capture, preprocessing and
+uploads in its own process, and drives the motors for tracking, sweeps and
+scans through a MotorClient. MotorClient has the same interface as
+MotorScheduler: run, start, stop, history and last_motion_end.
+
+Calls travel over a local multiprocessing.connection socket. Each call is
+a (method, args) message, and the reply is ("ok", result) or
+("error", message). Segment times are time.monotonic() values, which both
+processes share. If the media service drops its connection, a motion it
+started and left running is stopped. The media service also runs at a
+lower CPU priority (MEDIA_NICENESS).
+
+The socket only takes connections that know its key. The control service
+makes a random key per run (make_authkey) and the media service it starts
+inherits it in MOTOR_IPC_KEY; a MotorClient refuses to start without it.
+"""
+
+import os
+import threading
+from multiprocessing.connection import AuthenticationError, Client, Listener
+from typing import List, Optional
+
+import logs
+
+MOTOR_ADDRESS = ("127.0.0.1", int(os.environ.get("MOTOR_IPC_PORT", 5002)))
+AUTHKEY_VARIABLE = "MOTOR_IPC_KEY"
+METHODS = ("run", "start", "stop", "history", "last_motion_end", "duties")
+RETRYABLE = ("stop", "history", "last_motion_end", "duties")  # Safe to resend
+# The media service lowers its CPU priority by this much so the control service
+# is scheduled first on the Pi's cores (raising it would need root)
+MEDIA_NICENESS = 10
+
+log = logs.get("motor_ipc")
+
+
+def make_authkey() -> bytes:
+    """
+    The key in MOTOR_IPC_KEY, or a new random one put there, so processes
+    started from this one (the media service) inherit it.
+    """
+    key = os.environ.get(AUTHKEY_VARIABLE)
+    if not key:
+        key = os.environ[AUTHKEY_VARIABLE] = os.urandom(16).hex()
+    return key.encode("utf-8")
+
+
+def environ_authkey() -> bytes:
+    """The key the control service passed down in MOTOR_IPC_KEY."""
+    key = os.environ.get(AUTHKEY_VARIABLE)
+    if not key:
+        raise RuntimeError(
+            f"{AUTHKEY_VARIABLE} is not set: start the media service from "
+            "flask_motor_control.py, or give both services the same key"
+        )
+    return key.encode("utf-8")
+
+
+class MotorServer:
+    """Serves a MotorScheduler to other local processes, one thread per connection."""
+
+    def __init__(
+        self,
+        motors,
+        duties: dict,
+        authkey: bytes,
+        address=MOTOR_ADDRESS,
+    ):
+        """
+        Args:
+            motors: The MotorScheduler that owns the pins
+            duties: Duty cycle of each action's pulses (the control service's speeds)
+            authkey: Shared secret clients must know (see make_authkey)
+        """
+        self.motors = motors
+        self.duties = dict(duties)
+        self.listener = Listener(address, authkey=authkey)
+        self.address = self.listener.address
+
+    def start(self):
+        threading.Thread(target=self._accept, name="motor-ipc", daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try:
+                conn = self.listener.accept()
+            except AuthenticationError:
+                log.warning("Motor IPC rejected a client with the wrong key")
+                continue
+            except OSError:
+                return  # Listener closed
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        started = None  # Last motion this client started and has not stopped
+        try:
+            while True:
+                try:
+                    method, args = conn.recv()
+                except (EOFError, OSError):
+                    break
+                try:
+                    if method not in METHODS:
+                        raise ValueError(f"Unknown motor method {method!r}")
+                    if method == "duties":
+                        result = self.duties
+                    else:
+                        result = getattr(self.motors, method)(*args)
+                    if method == "start":
+                        started = result
+                    elif method == "stop":
+                        started = None
+                    reply = ("ok", result)
+                except Exception as e:
+                    reply = ("error", f"{type(e).__name__}: {e}")
+                try:
+                    conn.send(reply)
+                except OSError:
+                    break  # Client died while its pulse ran
+        finally:
+            conn.close()
+            if started is not None and self.motors.stop_segment(started):
+                log.warning("Motor IPC client went away mid-motion, stopped the motors")
+
+    def close(self):
+        self.listener.close()
+
+
+class MotorClient:
+    """MotorScheduler's interface, forwarded to the control service's MotorServer."""
+
+    def __init__(self, address=MOTOR_ADDRESS, authkey: Optional[bytes] = None):
+        self.address = address
+        self.authkey = authkey if authkey is not None else environ_authkey()
+        self._idle = []  # Pooled connections; one per concurrent caller
+        self._lock = threading.Lock()
+        self._duties = None
+
+    def _call(self, method: str, *args):
+        for attempt in range(2):
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                conn = Client(self.address, authkey=self.authkey)
+            try:
+                conn.send((method, args))
+                status, result = conn.recv()
+            except (EOFError, OSError):
+                # Control service restarted; a pulse may already have run, so
+                # only resend calls that are safe to repeat
+                conn.close()
+                if attempt or method not in RETRYABLE:
+                    raise
+                continue
+            with self._lock:
+                self._idle.append(conn)
+            if status != "ok":
+                raise RuntimeError(f"Motor {method} failed: {result}")
+            return result
+
+    def run(self, action: str, duration: float, duty: float) -> float:
+        return self._call("run", action, duration, duty)
+
+    def start(self, action: str, duty: float, max_duration: float) -> dict:
+        return self._call("start", action, duty, max_duration)
+
+    def stop(self) -> Optional[dict]:
+        return self._call("stop")
+
+    def history(self, since: Optional[float] = None) -> List[dict]:
+        return self._call("history", since)
+
+    def last_motion_end(self) -> Optional[float]:
+        return self._call("last_motion_end")
+
+    def duties(self) -> dict:
+        """Duty cycle of each action's pulses (fixed, fetched once)."""
+        if self._duties is None:
+            self._duties = self._call("duties")
+        return self._duties
+
+    def close(self):
+        with self._lock:
+            for conn in self._idle:
+                conn.close()
+            self._idle.clear()
@@ -0,0 +1,148 @@
+"""
+Motor scheduler for the Pi.
+
+All motor commands go through one MotorScheduler, which serializes them,
+records every motion segment (action, duty cycle, start and end time) and
+can start a motion without blocking: the caller stops it when it likes,
+and a watchdog stops it anyway after max_duration so a lost caller cannot
+leave the car spinning. The history lets other code ask "what was the car
+doing when this frame was taken?".
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Callable, List, Optional
+
+import logs
+import metrics
+
+WATCHDOG_SLACK = 0.5  # seconds a blocking pulse may overrun before the watchdog fires
+HISTORY_LENGTH = 64
+log = logs.get("motor_scheduler")
+
+PULSE_SECONDS = metrics.histogram(
+    "ht6_motor_pulse_seconds",
+    "Motor pulses: requested duration and actual on-time",
+    ("action", "duration"),
+)
+
+
+class MotorScheduler:
+    def __init__(
+        self,
+        drive: Callable[[str, float], None],
+        halt: Callable[[], None],
+        clock: Callable[[], float] = time.monotonic,
+        on_segment: Optional[Callable[[dict], None]] = None,
+    ):
+        """
+        Args:
+            drive: Sets the motor pins for an action at a duty cycle and returns at once
+            halt: Stops all motors
+            on_segment: Called with each finished segment, under the scheduler's
+                lock, so it must return at once (like FlightRecorder.motor)
+        """
+        self.drive = drive
+        self.halt = halt
+        self.clock = clock
+        self.on_segment = on_segment
+        self._lock = threading.RLock()
+        self._current: Optional[dict] = None
+        self._watchdog: Optional[threading.Timer] = None
+        self._stopped = threading.Event()  # Set when the current motion ends
+        self._history = deque(maxlen=HISTORY_LENGTH)
+
+    @property
+    def moving(self) -> bool:
+        return self._current is not None
+
+    def start(self, action: str, duty: float, max_duration: float) -> dict:
+        """Start a motion and return at once; returns its (open) segment."""
+        with self._lock:
+            self.stop()
+            segment = {
+                "action": action,
+                "duty": duty,
+                "start": self.clock(),
+                "end": None,
+            }
+            self.drive(action, duty)
+            self._current = segment
+            self._stopped = threading.Event()
+            self._watchdog = threading.Timer(
+                max_duration, self._expire, args=(segment,)
+            )
+            self._watchdog.daemon = True
+            self._watchdog.start()
+            return segment
+
+    def stop(self) -> Optional[dict]:
+        """Stop the motors; returns the segment that was running, if any."""
+        with self._lock:
+            self.halt()
+            if self._watchdog is not None:
+                self._watchdog.cancel()
+                self._watchdog = None
+            segment, self._current = self._current, None
+            if segment is not None:
+                segment["end"] = self.clock()
+                self._history.append(segment)
+                self._stopped.set()
+                if self.on_segment is not None:
+                    self.on_segment(dict(segment))
+            return segment
+
+    def run(self, action: str, duration: float, duty: float) -> float:
+        """Blocking pulse; returns the actual on-time (shorter if stopped early)."""
+        with self._lock:
+            segment = self.start(action, duty, duration + WATCHDOG_SLACK)
+            segment["requested"] = duration
+            stopped = self._stopped
+        stopped.wait(duration)  # Returns early if someone else stops the car
+        with self._lock:
+            if self._current is segment:
+                self.stop()
+        actual = segment["end"] - segment["start"]
+        PULSE_SECONDS.observe(duration, action, "requested")
+        PULSE_SECONDS.observe(actual, action, "actual")
+        return actual
+
+    def stop_segment(self, segment: dict) -> bool:
+        """Stop the motors only if segment (a copy is fine) is still running."""
+        with self._lock:
+            current = self._current
+            if current is None or (current["action"], current["start"]) != (
+                segment["action"],
+                segment["start"],
+            ):
+                return False
+            self.stop()
+            return True
+
+    def _expire(self, segment: dict):
+        with self._lock:
+            if self._current is segment:
+                log.warning(
+                    "Motor watchdog stopped a segment", action=segment["action"]
+                )
+                self.stop()
+
+    def history(self, since: Optional[float] = None) -> List[dict]:
+        """Finished segments (oldest first) plus the running one, as copies."""
+        with self._lock:
+            segments = list(self._history)
+            if self._current is not None:
+                segments.append(self._current)
+            return [
+                dict(s)
+                for s in segments
+                if since is None or s["end"] is None or s["end"] >= since
+            ]
+
+    def last_motion_end(self) -> Optional[float]:
+        """When the car last stopped moving; now if it is moving, None if never."""
+        with self._lock:
+            if self._current is not None:
+                return self.clock()
+            return self._history[-1]["end"] if self._history else None
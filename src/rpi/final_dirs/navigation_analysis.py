@@ -0,0 +1,113 @@
+"""
+Parsing helpers for the analyzer's free-text responses.
+The first line of a Gemini response carries one of the action codes below.
+"""
+
+import re
+from typing import Optional
+
+ACTION_CODES = [
+    "GOAL_ACHIEVED",
+    "MOVE_LEFT",
+    "MOVE_RIGHT",
+    "MOVE_FORWARD",
+    "MOVE_BACKWARD",
+    "TURN_RIGHT",
+    "TURN_LEFT",
+    "NOT_FOUND",
+]
+TARGET_VISIBLE_CODES = {
+    "GOAL_ACHIEVED",
+    "MOVE_LEFT",
+    "MOVE_RIGHT",
+    "MOVE_FORWARD",
+    "MOVE_BACKWARD",
+}
+
+_CODE_PATTERN = re.compile(r"\b(" + "|".join(ACTION_CODES) + r")\b")
+
+
+def parse_action_code(analysis: Optional[str]) -> Optional[str]:
+    """Return the first action code mentioned in an analysis, or None."""
+    if not analysis:
+        return None
+    match = _CODE_PATTERN.search(analysis)
+    return match.group(1) if match else None
+
+
+_BOX_PATTERN = re.compile(
+    r"BOX:\s*\[?\s*(-?[\d.]+)\s*,\s*(-?[\d.]+)\s*,\s*(-?[\d.]+)\s*,\s*(-?[\d.]+)"
+)
+
+
+def parse_target_box(analysis: Optional[str]) -> Optional[dict]:
+    """
+    Parse the "BOX: [ymin, xmin, ymax, xmax]" line (0-1000 scale) of an analysis.
+
+    Returns:
+        Dict with the box normalized to 0-1, the target's horizontal offset
+        from the frame centre (-1 = left edge, +1 = right edge) and its
+        apparent size (box height as a fraction of the frame height), or None.
+    """
+    if not analysis:
+        return None
+    match = _BOX_PATTERN.search(analysis)
+    if not match:
+        return None
+    ymin, xmin, ymax, xmax = (
+        min(max(float(v) / 1000.0, 0.0), 1.0) for v in match.groups()
+    )
+    if ymax <= ymin or xmax <= xmin:
+        return None
+    return {
+        "box": [round(ymin, 4), round(xmin, 4), round(ymax, 4), round(xmax, 4)],
+        "offset": round((xmin + xmax) - 1.0, 4),
+        "size": round(ymax - ymin, 4),
+    }
+
+
+_CROP_BOX_PATTERN = re.compile(r"CROP_" + _BOX_PATTERN.pattern + r"\s*\]?")
+
+
+def crop_box_to_frame(box, region) -> list:
+    """
+    Map a 0-1 box inside a crop to 0-1 frame coordinates; region is the
+    crop's own (ymin, xmin, ymax, xmax) box in the frame.
+    """
+    top, left, bottom, right = region
+    height, width = bottom - top, right - left
+    return [
+        top + box[0] * height,
+        left + box[1] * width,
+        top + box[2] * height,
+        left + box[3] * width,
+    ]
+
+
+def crop_analysis_to_frame(analysis: str, region) -> str:
+    """
+    Rewrite an analysis' "CROP_BOX: [...]" line (0-1000 within the crop) as a
+    "BOX: [...]" line in frame coordinates, so it parses like any other analysis.
+    """
+
+    def to_frame(match):
+        box = [min(max(float(v) / 1000.0, 0.0), 1.0) for v in match.groups()]
+        ymin, xmin, ymax, xmax = (
+            int(round(v * 1000)) for v in crop_box_to_frame(box, region)
+        )
+        return f"BOX: [{ymin}, {xmin}, {ymax}, {xmax}]"
+
+    return _CROP_BOX_PATTERN.sub(to_frame, analysis)
+
+
+_TILE_PATTERN = re.compile(r"TILE:\s*(\d+|NONE)", re.IGNORECASE)
+
+
+def parse_sweep_tile(analysis: Optional[str]) -> Optional[int]:
+    """Return the tile index from a sweep analysis' "TILE: <n>" line, or None."""
+    if not analysis:
+        return None
+    match = _TILE_PATTERN.search(analysis)
+    if not match or match.group(1).upper() == "NONE":
+        return None
+    return int(match.group(1))
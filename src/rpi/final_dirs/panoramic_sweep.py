@@ -0,0 +1,96 @@
+"""
+Panoramic sweep: look all the way around with one analysis.
+
+The car turns in calibrated steps, grabs a frame at every stop and the
+frames are tiled into one mosaic, so a single analysis says which tile (and
+so which heading) shows the target, instead of one photo + analysis round
+trip per step. The car then turns straight back to that heading.
+"""
+
+import time
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+from heading_controller import offset_to_bearing
+from pose_tracker import wrap_degrees
+
+SWEEP_STOPS = 8
+MOSAIC_COLUMNS = 4
+TILE_WIDTH = 160  # pixels per tile in the mosaic
+TILE_BORDER = 4
+SETTLE_TIME = 0.15  # seconds after a turn before a frame counts (motion blur)
+
+
+def sweep_step_duration(stops: int, turn_rate: float) -> float:
+    """Turn duration that splits a full circle into `stops` equal steps."""
+    return 360.0 / stops / turn_rate
+
+
+def capture_sweep(
+    grab_after: Callable[[float], Optional[np.ndarray]],
+    execute: Callable[[str, float], float],
+    stops: int,
+    step_duration: float,
+    turn_rate: float,
+    direction: str = "left",
+    clock: Callable[[], float] = time.monotonic,
+) -> Tuple[List[np.ndarray], List[float], List[dict]]:
+    """
+    Grab a frame, turn one step, and repeat.
+
+    Args:
+        grab_after: Returns the first frame captured after the given clock time
+        execute: Runs a motor pulse (action, duration) and returns its actual on-time
+        stops: Number of frames to capture
+        step_duration: Turn duration between frames, seconds
+        turn_rate: Calibrated degrees per second of turning
+
+    Returns:
+        (frames, headings, moves): headings in degrees relative to the start
+        (left positive), and the executed turns with their actual on-times.
+    """
+    sign = 1.0 if direction == "left" else -1.0
+    frames, headings, moves = [], [], []
+    heading = 0.0
+    settled_at = clock()
+    for stop in range(stops):
+        frame = grab_after(settled_at)
+        if frame is None:
+            raise RuntimeError(f"No camera frame at sweep stop {stop}")
+        frames.append(frame)
+        headings.append(round(heading, 1))
+        if stop == stops - 1:
+            break
+        actual = execute(direction, step_duration)
+        moves.append(
+            {"action": direction, "duration": round(step_duration, 3), "actual": actual}
+        )
+        heading = wrap_degrees(heading + sign * actual * turn_rate)
+        settled_at = clock() + SETTLE_TIME
+    return frames, headings, moves
+
+
+def target_heading(
+    headings: List[float], tile: int, target: Optional[dict] = None
+) -> float:
+    """Heading of the target: its tile's heading plus its bearing inside the tile."""
+    bearing = offset_to_bearing(target["offset"]) if target else 0.0
+    return wrap_degrees(headings[tile] + bearing)
+
+
+def turn_to_heading(
+    execute: Callable[[str, float], float],
+    current: float,
+    goal: float,
+    turn_rate: float,
+    min_pulse: float = 0.03,
+) -> List[dict]:
+    """Turn the short way round from the current to the goal heading."""
+    angle = wrap_degrees(goal - current)
+    duration = abs(angle) / turn_rate
+    if duration < min_pulse:
+        return []
+    action = "left" if angle > 0 else "right"
+    actual = execute(action, duration)
+    return [{"action": action, "duration": round(duration, 3), "actual": actual}]
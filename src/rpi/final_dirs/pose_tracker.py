@@ -0,0 +1,209 @@
+"""
+Dead-reckoning pose estimate for one car.
+
+Integrates every executed motor command into x/y/heading using the car's
+calibrated duration-to-motion model, with variances that grow per command,
+and pulls the estimate back in when an analysis gives a fix on the target.
+
+Frame: the car starts at (0, 0) facing heading 0; x points ahead, y to the
+left, heading is in degrees counter-clockwise (a left turn increases it).
+"""
+
+import math
+import threading
+import time
+from typing import Optional
+
+from car_registry import Calibration
+from navigation_analysis import parse_action_code
+
+CAMERA_HFOV_DEG = 62.2  # Horizontal field of view of the Pi camera
+CAMERA_VFOV_DEG = 48.8  # Vertical field of view of the Pi camera
+DEFAULT_TARGET_DISTANCE = 1.5  # metres, assumed when a fix has no range
+GOAL_REACH_DISTANCE = 0.2  # metres between car and target at GOAL_ACHIEVED
+CODE_BEARING_SIGMA = 12.0  # degrees, accuracy of a bearing taken from a code
+
+# Approximate target bearing implied by each action code (left is positive)
+ACTION_BEARINGS = {
+    "GOAL_ACHIEVED": 0.0,
+    "MOVE_FORWARD": 0.0,
+    "MOVE_BACKWARD": 0.0,
+    "MOVE_LEFT": CAMERA_HFOV_DEG * 0.375,  # Centre of the left 25% of the frame
+    "MOVE_RIGHT": -CAMERA_HFOV_DEG * 0.375,
+}
+
+
+def wrap_degrees(angle: float) -> float:
+    """Wrap an angle into [-180, 180)."""
+    return (angle + 180.0) % 360.0 - 180.0
+
+
+class PoseTracker:
+    def __init__(self, calibration: Optional[Calibration] = None):
+        self.calibration = calibration or Calibration()
+        self._lock = threading.RLock()
+        self.reset()
+
+    def reset(self, x: float = 0.0, y: float = 0.0, heading: float = 0.0):
+        """Start a fresh frame at the given pose with zero uncertainty."""
+        with self._lock:
+            self.x, self.y, self.heading = x, y, heading
+            self.var_xy = 0.0  # m^2, isotropic position variance
+            self.var_heading = 0.0  # deg^2
+            self.target = None  # (x, y) estimate of the target, if seen
+            self.var_target = 0.0
+            self.odometry = 0.0  # metres driven since reset
+            self.commands = 0
+            self.last_fix = None
+            self.updated_at = time.time()
+
+    def apply_command(
+        self, direction: str, duration: float, duty_cycle: Optional[float] = None
+    ) -> dict:
+        """
+        Integrate one executed motor command.
+
+        Args:
+            direction: "forward", "backward", "left" or "right"
+            duration: Actual motor on-time in seconds
+            duty_cycle: PWM duty the command ran at (defaults to the calibrated one)
+        """
+        cal = self.calibration
+        with self._lock:
+            if direction in ("forward", "backward"):
+                scale = (duty_cycle or cal.forward_duty) / cal.forward_duty
+                if direction == "forward":
+                    distance = cal.forward_speed * scale * duration
+                else:
+                    distance = -cal.backward_speed * scale * duration
+                self._translate(distance)
+            elif direction in ("left", "right"):
+                scale = (duty_cycle or cal.turn_duty) / cal.turn_duty
+                angle = cal.turn_rate * scale * duration
+                if direction == "right":
+                    angle = -angle
+                self._rotate(angle)
+            else:
+                raise ValueError(f"Unknown direction '{direction}'")
+            self.commands += 1
+            self.updated_at = time.time()
+        return self.to_dict()
+
+    def _translate(self, distance: float):
+        cal = self.calibration
+        # Drive along the mean of the start and end heading so drift bends the path
+        drift = cal.drift_rate * abs(distance)
+        mid = math.radians(self.heading + drift / 2.0)
+        self.x += distance * math.cos(mid)
+        self.y += distance * math.sin(mid)
+        self.heading = wrap_degrees(self.heading + drift)
+        self.odometry += abs(distance)
+
+        sigma_d = cal.distance_noise * abs(distance)
+        var_h_rad = math.radians(math.sqrt(self.var_heading)) ** 2
+        self.var_xy += sigma_d**2 + distance**2 * var_h_rad
+        self.var_heading += (0.5 * drift + 1.0) ** 2 * abs(distance)
+
+    def _rotate(self, angle: float):
+        self.heading = wrap_degrees(self.heading + angle)
+        self.var_heading += (self.calibration.turn_noise * angle) ** 2
+
+    def observe_target(
+        self,
+        bearing: float,
+        distance: Optional[float] = None,
+        bearing_sigma: float = CODE_BEARING_SIGMA,
+        distance_sigma: Optional[float] = None,
+    ) -> dict:
+        """
+        Correct the pose from a fix on the (static) target.
+
+        Args:
+            bearing: Target bearing relative to the car's heading, degrees (left +)
+            distance: Target range in metres, if known
+        """
+        if distance is None:
+            distance = DEFAULT_TARGET_DISTANCE
+            distance_sigma = distance_sigma or DEFAULT_TARGET_DISTANCE
+        distance_sigma = distance_sigma or 0.25 * distance
+
+        with self._lock:
+            if self.target is None:
+                world = math.radians(self.heading + bearing)
+                self.target = (
+                    self.x + distance * math.cos(world),
+                    self.y + distance * math.sin(world),
+                )
+                self.var_target = self.var_xy + distance_sigma**2
+            else:
+                # Heading: the known target predicts a bearing; blend towards it
+                tx, ty = self.target
+                predicted_world = math.degrees(math.atan2(ty - self.y, tx - self.x))
+                heading_meas = wrap_degrees(predicted_world - bearing)
+                gain = self.var_heading / (self.var_heading + bearing_sigma**2)
+                self.heading = wrap_degrees(
+                    self.heading + gain * wrap_degrees(heading_meas - self.heading)
+                )
+                self.var_heading *= 1.0 - gain
+
+                # Position: split the disagreement between car and target estimates
+                world = math.radians(self.heading + bearing)
+                seen_x = self.x + distance * math.cos(world)
+                seen_y = self.y + distance * math.sin(world)
+                var_seen = self.var_xy + distance_sigma**2
+                pose_share = self.var_xy / (
+                    self.var_xy + self.var_target + distance_sigma**2
+                )
+                self.x += pose_share * (tx - seen_x)
+                self.y += pose_share * (ty - seen_y)
+                self.var_xy *= 1.0 - pose_share
+                target_gain = self.var_target / (self.var_target + var_seen)
+                self.target = (
+                    tx + target_gain * (seen_x - tx),
+                    ty + target_gain * (seen_y - ty),
+                )
+                self.var_target *= 1.0 - target_gain
+            self.last_fix = {
+                "bearing": round(bearing, 1),
+                "distance": round(distance, 3),
+                "time": time.time(),
+            }
+        return self.to_dict()
+
+    def observe_analysis(self, analysis: Optional[str]) -> Optional[dict]:
+        """Apply the target fix implied by an analysis' action code, if any."""
+        code = parse_action_code(analysis)
+        if code not in ACTION_BEARINGS:
+            return None
+        if code == "GOAL_ACHIEVED":
+            return self.observe_target(0.0, GOAL_REACH_DISTANCE, distance_sigma=0.1)
+        return self.observe_target(ACTION_BEARINGS[code])
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return self._snapshot()
+
+    def _snapshot(self) -> dict:
+        pose = {
+            "x": round(self.x, 3),
+            "y": round(self.y, 3),
+            "heading": round(self.heading, 1),
+            "sigma_xy": round(math.sqrt(self.var_xy), 3),
+            "sigma_heading": round(math.sqrt(self.var_heading), 1),
+            "odometry": round(self.odometry, 3),
+            "commands_since_reset": self.commands,
+            "target": None,
+        }
+        if self.target is not None:
+            tx, ty = self.target
+            dx, dy = tx - self.x, ty - self.y
+            pose["target"] = {
+                "x": round(tx, 3),
+                "y": round(ty, 3),
+                "sigma": round(math.sqrt(self.var_target), 3),
+                "distance": round(math.hypot(dx, dy), 3),
+                "bearing": round(
+                    wrap_degrees(math.degrees(math.atan2(dy, dx)) - self.heading), 1
+                ),
+            }
+        return pose
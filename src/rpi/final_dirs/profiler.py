@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Sampling profiler for the Pi services, the analyzer laptop and the MCP server.
+
+A Sampler thread reads every other thread's Python stack (sys._current_frames)
+a fixed number of times per second. Nothing is instrumented, so the cost is
+that thread's own work: about 30us per sample for a dozen threads on a
+laptop (a few times that on the Pi), and nothing while no one is profiling. Stacks come out
+collapsed, one line per distinct stack with its sample count, root first and
+prefixed with the thread name, as flamegraph.pl and speedscope read them:
+
+    Thread-12 (process_request_thread);socketserver.py:process_request_thread;...;media_server.py:photo 37
+
+Each Flask server serves GET /debug/profile?seconds=N (see flask_response);
+the MCP tool profile_service fetches it for a car. The caller must send the
+shared key from PROFILE_KEY in the X-Profile-Key header, and without a key
+configured the endpoint stays off. With PROFILE_RING_HZ set, a low-rate
+Sampler runs all the time and keeps the last RING_SECONDS, so
+/debug/profile?recent=1 shows what a process was doing during a slow step
+that has already finished. From a shell:
+
+    PROFILE_KEY=... python -m profiler http://10.33.35.1:5001 --seconds 10 > media.folded
+    PROFILE_KEY=... python -m profiler http://10.33.35.1:5001 --recent --top 15
+
+Only Python frames are seen: time in C code (a BMP encode in numpy, a
+socket send) is charged to the Python function that called it. Threads
+blocked in a wait are left out unless idle=1 (see IDLE_FRAMES).
+"""
+
+import argparse
+import hmac
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from typing import Dict, List, Optional, Tuple
+
+PROFILE_KEY = os.environ.get("PROFILE_KEY", "")  # Empty: /debug/profile is off
+KEY_HEADER = "X-Profile-Key"
+DEFAULT_HZ = 100.0  # Samples per second for an on-demand profile
+MAX_HZ = 1000.0
+DEFAULT_SECONDS = 5.0
+MAX_SECONDS = 60.0
+RING_HZ = float(os.environ.get("PROFILE_RING_HZ", "0"))  # 0: no always-on sampling
+RING_SECONDS = 60.0  # How far back the always-on ring reaches
+MAX_DEPTH = 64  # Frames kept per stack, counted from the root
+# Leaf frames of a thread that is waiting rather than working
+IDLE_FRAMES = frozenset(
+    (
+        "threading.py:wait",
+        "threading.py:_wait_for_tstate_lock",
+        "selectors.py:select",
+        "socketserver.py:serve_forever",
+        "socket.py:accept",
+        "queue.py:get",
+        "connection.py:_recv",
+        "connection.py:poll",
+        "connection.py:accept",
+        "socket.py:readinto",  # Waiting for a request or response body
+        "shared_frames.py:wait_newer",  # Polls for the next camera frame
+        "profiler.py:profile",  # The thread waiting for an on-demand profile
+    )
+)
+
+_labels: Dict[object, str] = {}  # Code object -> "file.py:function"
+_thread_names: Dict[int, str] = {}
+
+
+def _label(code) -> str:
+    label = _labels.get(code)
+    if label is None:
+        label = f"{os.path.basename(code.co_filename)}:{code.co_name}"
+        _labels[code] = label
+    return label
+
+
+def _thread_name(ident: int) -> str:
+    name = _thread_names.get(ident)
+    if name is None:
+        _thread_names.clear()  # Threads come and go; refresh the whole table
+        _thread_names.update((t.ident, t.name) for t in threading.enumerate())
+        name = _thread_names.get(ident, f"thread-{ident}")
+    return name
+
+
+def sample_stacks(skip: Tuple[int, ...] = ()) -> List[str]:
+    """The collapsed stack of every thread but those in `skip` (idents), right now."""
+    stacks = []
+    for ident, frame in sys._current_frames().items():
+        if ident in skip:
+            continue
+        names = []
+        while frame is not None:
+            names.append(_label(frame.f_code))
+            frame = frame.f_back
+        names.append(_thread_name(ident))
+        names.reverse()
+        stacks.append(";".join(names[:MAX_DEPTH]))
+    return stacks
+
+
+def is_idle(stack: str) -> bool:
+    return stack.rpartition(";")[2] in IDLE_FRAMES
+
+
+class Sampler:
+    """A thread sampling all stacks `hz` times a second, keeping `window` seconds."""
+
+    def __init__(
+        self,
+        hz: float = DEFAULT_HZ,
+        window: float = MAX_SECONDS,
+        skip: Tuple[int, ...] = (),
+    ):
+        self.hz = hz
+        self.skip = skip  # Threads not sampled (besides the sampler itself)
+        self.samples = deque(maxlen=int(hz * window) + 1)  # (monotonic, stacks)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> "Sampler":
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        skip = self.skip + (threading.get_ident(),)
+        interval = 1.0 / self.hz
+        due = time.monotonic()
+        while True:
+            due += interval
+            if self._stop.wait(max(0.0, due - time.monotonic())):
+                return
+            self.samples.append((time.monotonic(), sample_stacks(skip)))
+
+    def collapsed(self, since: Optional[float] = None, idle: bool = False) -> Counter:
+        """Stack -> sample count over the samples taken after `since` (monotonic)."""
+        counts = Counter()
+        for taken, stacks in list(self.samples):
+            if since is not None and taken < since:
+                continue
+            counts.update(s for s in stacks if idle or not is_idle(s))
+        return counts
+
+    def count(self, since: Optional[float] = None) -> int:
+        return sum(
+            1 for taken, _ in list(self.samples) if since is None or taken >= since
+        )
+
+
+def profile(
+    seconds: float, hz: float = DEFAULT_HZ, idle: bool = False
+) -> Tuple[Counter, int]:
+    """Sample the other threads for `seconds`; (collapsed stacks, samples taken)."""
+    sampler = Sampler(hz, seconds, skip=(threading.get_ident(),)).start()
+    time.sleep(seconds)
+    sampler.stop()
+    return sampler.collapsed(idle=idle), sampler.count()
+
+
+def format_collapsed(counts: Counter, limit: Optional[int] = None) -> str:
+    """flamegraph.pl input: "stack count" lines, most samples first."""
+    return "".join(f"{stack} {n}\n" for stack, n in counts.most_common(limit))
+
+
+def parse_collapsed(text: str) -> Counter:
+    counts = Counter()
+    for line in text.splitlines():
+        stack, _, n = line.rpartition(" ")
+        if stack and n.isdigit():
+            counts[stack] += int(n)
+    return counts
+
+
+def top(counts: Counter, limit: int = 10) -> List[dict]:
+    """The functions most samples were in (self time), with their share."""
+    leaves = Counter()
+    for stack, n in counts.items():
+        leaves[stack.rpartition(";")[2]] += n
+    total = sum(leaves.values()) or 1
+    return [
+        {"frame": frame, "samples": n, "percent": round(100.0 * n / total, 1)}
+        for frame, n in leaves.most_common(limit)
+    ]
+
+
+ring = Sampler(RING_HZ, RING_SECONDS).start() if RING_HZ > 0 else None
+_busy = threading.Lock()  # One on-demand profile per process at a time
+
+
+def flask_response(request):
+    """
+    The /debug/profile view of a Flask server:
+    ?seconds=N (default 5, at most 60) &hz=H (default 100) &idle=1, or
+    ?recent=1[&seconds=N] for the last N seconds of the always-on ring.
+    """
+    from flask import Response, jsonify
+
+    if not PROFILE_KEY:
+        message = "Profiling is off; start the server with PROFILE_KEY set"
+        return jsonify({"status": "error", "message": message}), 403
+    if not hmac.compare_digest(
+        request.headers.get(KEY_HEADER, "").encode("utf-8"),
+        PROFILE_KEY.encode("utf-8"),
+    ):
+        return (
+            jsonify({"status": "error", "message": f"Missing or wrong {KEY_HEADER}"}),
+            401,
+        )
+    try:
+        recent = request.args.get("recent", "0") not in ("0", "false", "")
+        idle = request.args.get("idle", "0") not in ("0", "false", "")
+        seconds = float(
+            request.args.get("seconds", RING_SECONDS if recent else DEFAULT_SECONDS)
+        )
+        hz = float(request.args.get("hz", DEFAULT_HZ))
+    except ValueError as e:
+        return jsonify({"status": "error", "message": f"Bad parameter: {e}"}), 400
+    seconds = min(max(seconds, 0.1), MAX_SECONDS)
+
+    if recent:
+        if ring is None:
+            message = "No always-on sampling; start the server with PROFILE_RING_HZ set"
+            return jsonify({"status": "error", "message": message}), 404
+        since = time.monotonic() - seconds
+        counts, samples, hz = ring.collapsed(since, idle), ring.count(since), ring.hz
+    else:
+        if not _busy.acquire(blocking=False):
+            message = "A profile is already running in this process"
+            return jsonify({"status": "error", "message": message}), 429
+        try:
+            counts, samples = profile(seconds, min(max(hz, 1.0), MAX_HZ), idle)
+        finally:
+            _busy.release()
+    headers = {
+        "X-Profile-Samples": str(samples),
+        "X-Profile-Seconds": f"{seconds:g}",
+        "X-Profile-Hz": f"{hz:g}",
+    }
+    return Response(format_collapsed(counts), mimetype="text/plain", headers=headers)
+
+
+def main():
+    import requests
+
+    parser = argparse.ArgumentParser(
+        description="Fetch collapsed stacks from a server's /debug/profile."
+    )
+    parser.add_argument("url", help="Server base URL, e.g. http://10.33.35.1:5000")
+    parser.add_argument("--seconds", type=float)
+    parser.add_argument("--hz", type=float, default=DEFAULT_HZ)
+    parser.add_argument("--recent", action="store_true", help="The always-on ring")
+    parser.add_argument("--idle", action="store_true", help="Keep waiting threads")
+    parser.add_argument("--top", type=int, help="Print the N hottest functions instead")
+    args = parser.parse_args()
+
+    params = {"hz": args.hz, "recent": int(args.recent), "idle": int(args.idle)}
+    if args.seconds is not None:
+        params["seconds"] = args.seconds
+    response = requests.get(
+        f"{args.url.rstrip('/')}/debug/profile",
+        params=params,
+        headers={KEY_HEADER: PROFILE_KEY},
+        timeout=(args.seconds or MAX_SECONDS) + 10,
+    )
+    if not response.ok:
+        parser.exit(1, f"{response.status_code}: {response.text}\n")
+    if args.top is None:
+        sys.stdout.write(response.text)
+        return
+    print(f"{response.headers.get('X-Profile-Samples')} samples")
+    for entry in top(parse_collapsed(response.text), args.top):
+        print(f"{entry['percent']:5.1f}%  {entry['samples']:6d}  {entry['frame']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Region-of-interest uploads: a small full view plus a full-resolution crop.
+
+Shrinking the whole frame saves bytes and image tokens but loses small,
+distant targets. When the last analysis of a goal located the target, the
+next upload is instead the frame shrunk to OVERVIEW_WIDTH plus an unscaled
+crop around where the target should be now: its last box moved by the turns
+and drives the motor scheduler has run since, padded by how uncertain that
+prediction is. The analyzer answers in full-frame coordinates either way.
+"""
+
+import math
+from typing import List, Optional
+
+import numpy as np
+
+from car_registry import Calibration
+from heading_controller import (
+    bearing_to_offset,
+    offset_to_bearing,
+    resolve_target_height,
+    size_to_distance,
+)
+from image_utils import downscale
+from pose_tracker import CAMERA_HFOV_DEG
+
+OVERVIEW_WIDTH = 320  # pixels; the shrunk full view sent with the crop
+ROI_MARGIN = 1.0  # box sizes of context kept on each side of the predicted box
+ROI_MIN_SIZE = 0.15  # fraction of the frame; smallest crop side
+ROI_MAX_SIZE = 0.5  # fraction of the frame; larger crops save too little
+ROI_MAX_AGE = 20.0  # seconds; older target fixes are not worth predicting from
+
+
+def predict_box(
+    target: dict,
+    segments: List[dict],
+    since: float,
+    now: float,
+    calibration: Calibration,
+    target_height: Optional[float] = None,
+) -> Optional[dict]:
+    """
+    Move a target box (a parse_target_box() result from a frame taken at
+    `since`) by the motor segments run between `since` and `now`. Forward
+    motion scales the box by the range, from target_height (metres, see
+    resolve_target_height).
+
+    Returns:
+        Dict with the predicted "box" (0-1) and its horizontal "uncertainty"
+        in degrees, or None if the target should have left the view
+    """
+    ymin, xmin, ymax, xmax = target["box"]
+    bearing = offset_to_bearing(target["offset"])
+    size, half_width = ymax - ymin, (xmax - xmin) / 2.0
+    distance = size_to_distance(size, resolve_target_height(target_height)[0])
+    uncertainty = 0.0
+    for segment in segments:
+        end = segment["end"] if segment["end"] is not None else now
+        on_time = max(0.0, min(end, now) - max(segment["start"], since))
+        action = segment["action"]
+        if action in ("left", "right"):
+            angle = calibration.turn_rate * segment["duty"] / calibration.turn_duty
+            angle *= on_time
+            # Turning left moves the target right in the frame (bearing is left positive)
+            bearing += -angle if action == "left" else angle
+            uncertainty += calibration.turn_noise * angle
+        elif action in ("forward", "backward"):
+            speed = (
+                calibration.forward_speed
+                if action == "forward"
+                else -calibration.backward_speed
+            )
+            travel = speed * segment["duty"] / calibration.forward_duty * on_time
+            closer = max(distance - travel, 0.05)
+            size *= distance / closer
+            half_width *= distance / closer
+            distance = closer
+            uncertainty += abs(calibration.drift_rate * travel)
+    if abs(bearing) >= CAMERA_HFOV_DEG / 2.0:
+        return None
+    centre_x = (bearing_to_offset(bearing) + 1.0) / 2.0
+    centre_y = (ymin + ymax) / 2.0
+    box = [
+        centre_y - size / 2.0,
+        centre_x - half_width,
+        centre_y + size / 2.0,
+        centre_x + half_width,
+    ]
+    return {
+        "box": [round(v, 4) for v in box],
+        "uncertainty": round(uncertainty, 1),
+    }
+
+
+def _span(centre: float, side: float) -> tuple:
+    # Shift rather than shrink a span that sticks out of the frame
+    start = min(max(centre - side / 2.0, 0.0), 1.0 - side)
+    return start, start + side
+
+
+def roi_region(box: List[float], uncertainty: float = 0.0) -> Optional[List[float]]:
+    """
+    Crop (ymin, xmin, ymax, xmax, 0-1) around a predicted box, or None if it
+    would cover so much of the frame that a plain upload is as good.
+    """
+    height, width = box[2] - box[0], box[3] - box[1]
+    side_y = max(height * (1.0 + 2.0 * ROI_MARGIN), ROI_MIN_SIZE)
+    side_x = max(
+        width * (1.0 + 2.0 * ROI_MARGIN) + 2.0 * uncertainty / CAMERA_HFOV_DEG,
+        ROI_MIN_SIZE,
+    )
+    if max(side_x, side_y) > ROI_MAX_SIZE:
+        return None
+    top, bottom = _span((box[0] + box[2]) / 2.0, side_y)
+    left, right = _span((box[1] + box[3]) / 2.0, side_x)
+    return [top, left, bottom, right]
+
+
+def plan_roi(
+    target: dict,
+    seen_at: float,
+    taken_at: float,
+    segments: List[dict],
+    calibration: Calibration,
+    target_height: Optional[float] = None,
+) -> Optional[List[float]]:
+    """Crop region for a frame taken at taken_at, or None to send the plain frame."""
+    if taken_at - seen_at > ROI_MAX_AGE:
+        return None
+    predicted = predict_box(
+        target, segments, seen_at, taken_at, calibration, target_height
+    )
+    if predicted is None:
+        return None
+    return roi_region(predicted["box"], predicted["uncertainty"])
+
+
+def make_roi_upload(image: np.ndarray, region: List[float]) -> dict:
+    """
+    Split a frame into the shrunk overview and the full-resolution crop.
+
+    Returns:
+        Dict with "overview", "crop" (RGB arrays) and the crop's exact
+        "region" after rounding to pixels (0-1, ymin, xmin, ymax, xmax)
+    """
+    height, width = image.shape[:2]
+    top, bottom = int(region[0] * height), int(math.ceil(region[2] * height))
+    left, right = int(region[1] * width), int(math.ceil(region[3] * width))
+    return {
+        "overview": downscale(image, max(1, width // OVERVIEW_WIDTH)),
+        "crop": np.ascontiguousarray(image[top:bottom, left:right]),
+        "region": [
+            round(top / height, 4),
+            round(left / width, 4),
+            round(bottom / height, 4),
+            round(right / width, 4),
+        ],
+    }
@@ -0,0 +1,225 @@
+"""
+Scan-while-rotating target acquisition.
+
+The car turns slowly and continuously under the motor scheduler while
+streamed frames go through the local colour detector. The moment a frame
+shows a candidate the motors stop; the frame's timestamp, measured from the
+start of the rotation, gives the heading it was taken at. Only that frame
+is sent for confirmation (Gemini), and the car turns back to the candidate's
+heading. A rejected candidate is skipped and the scan carries on.
+"""
+
+import time
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from analyzer_cascade import ColorBlobDetector, parse_color_goal
+from frame_buffer import Frame
+from heading_controller import offset_to_bearing
+from motor_scheduler import MotorScheduler
+from navigation_analysis import TARGET_VISIBLE_CODES, parse_action_code
+from navigation_analysis import parse_target_box
+from panoramic_sweep import turn_to_heading
+from pose_tracker import CAMERA_HFOV_DEG, wrap_degrees
+
+SCAN_DUTY = 30  # PWM duty while scanning; slower than turn_duty to limit blur
+SCAN_CONFIDENCE = 0.75  # Local detector confidence that stops the rotation
+MAX_CANDIDATES = 3  # Confirmations before giving up on the scan
+SKIP_WIDTH = CAMERA_HFOV_DEG / 2.0  # Rejected candidates mask this many degrees
+
+
+def color_candidate_detector(
+    goal: str, detector: Optional[ColorBlobDetector] = None
+) -> Optional[Callable[[np.ndarray], Optional[dict]]]:
+    """
+    A frame -> candidate function for simple colour goals, or None if the goal
+    is not one the colour detector can judge.
+    """
+    parsed = parse_color_goal(goal)
+    if parsed is None:
+        return None
+    detector = detector or ColorBlobDetector()
+
+    def detect(image: np.ndarray) -> Optional[dict]:
+        result = detector.detect(image, *parsed)
+        if parse_action_code(result.text) not in TARGET_VISIBLE_CODES:
+            return None
+        return {
+            "target": parse_target_box(result.text),
+            "confidence": result.confidence,
+        }
+
+    return detect
+
+
+def scan_rotate(
+    motors: MotorScheduler,
+    next_frame: Callable[[], Optional[Frame]],
+    detect: Callable[[np.ndarray], Optional[dict]],
+    scan_rate: float,
+    direction: str = "left",
+    scan_duty: float = SCAN_DUTY,
+    max_angle: float = 360.0,
+    skip: List[float] = (),
+    clock: Callable[[], float] = time.monotonic,
+) -> dict:
+    """
+    Rotate until the detector reports a candidate or max_angle is covered.
+
+    Args:
+        next_frame: Returns the next streamed Frame (seq, timestamp, image) or None
+        detect: Returns {"target", "confidence"} for a frame showing a candidate
+        scan_rate: Degrees per second at scan_duty
+        skip: Headings (relative to this scan's start) of rejected candidates
+
+    Returns:
+        Dict with "reason" ("candidate", "full_circle", "no_frames"), frames
+        examined, the executed rotation segment, the angle actually turned and,
+        for a candidate, its frame, timestamp and heading.
+    """
+    sign = 1.0 if direction == "left" else -1.0
+    segment = motors.start(direction, scan_duty, max_angle / scan_rate + 1.0)
+    start = segment["start"]
+    frames, candidate, reason = 0, None, "full_circle"
+    try:
+        while (clock() - start) * scan_rate < max_angle:
+            frame = next_frame()
+            if frame is None:
+                reason = "no_frames"
+                break
+            if frame.timestamp <= start:
+                continue  # Taken before the rotation started
+            frames += 1
+            found = detect(frame.image)
+            if not found or found["confidence"] < SCAN_CONFIDENCE:
+                continue
+            heading = sign * scan_rate * (frame.timestamp - start)
+            heading = wrap_degrees(
+                heading + offset_to_bearing(found["target"]["offset"])
+            )
+            if any(abs(wrap_degrees(heading - h)) < SKIP_WIDTH for h in skip):
+                continue
+            candidate = {
+                "frame": frame,
+                "latency": clock() - frame.timestamp,
+                "heading": round(heading, 1),
+                "target": found["target"],
+                "confidence": round(found["confidence"], 3),
+            }
+            reason = "candidate"
+            break
+    finally:
+        segment = motors.stop() or segment
+    rotated = sign * scan_rate * (segment["end"] - segment["start"])
+    return {
+        "reason": reason,
+        "frames": frames,
+        "rotated": round(rotated, 1),
+        "segment": segment,
+        "candidate": candidate,
+    }
+
+
+def scan_for_target(
+    motors: MotorScheduler,
+    next_frame: Callable[[], Optional[Frame]],
+    detect: Callable[[np.ndarray], Optional[dict]],
+    confirm: Callable[[np.ndarray], Optional[dict]],
+    execute: Callable[[str, float], float],
+    turn_rate: float,
+    turn_duty: float,
+    direction: str = "left",
+    scan_duty: float = SCAN_DUTY,
+    max_angle: float = 360.0,
+    clock: Callable[[], float] = time.monotonic,
+) -> dict:
+    """
+    Scan, confirm candidates one at a time and turn to the confirmed one.
+
+    Args:
+        confirm: Sends a candidate frame for analysis; returns the confirmed
+            target (a parse_target_box() result, or {} without a box) or None
+        execute: Runs a blocking turn pulse at the calibrated turn duty
+        turn_rate, turn_duty: Calibrated turn rate (deg/s) at turn_duty
+
+    Returns:
+        Dict with "found", the final "reason", candidates checked, the
+        executed rotations/turns ({"action", "actual", "duty_cycle"}) and
+        the confirmed heading relative to the start.
+    """
+    scan_rate = turn_rate * scan_duty / turn_duty
+    heading = 0.0  # Relative to where the scan started
+    skip, moves, checked = [], [], []
+    frames = 0
+    started = clock()
+    result = {"reason": "full_circle"}
+    while len(checked) < MAX_CANDIDATES and abs(heading) < max_angle:
+        result = scan_rotate(
+            motors,
+            next_frame,
+            detect,
+            scan_rate,
+            direction,
+            scan_duty,
+            max_angle - abs(heading),
+            [wrap_degrees(h - heading) for h in skip],
+            clock,
+        )
+        segment = result["segment"]
+        moves.append(
+            {
+                "action": segment["action"],
+                "actual": segment["end"] - segment["start"],
+                "duty_cycle": scan_duty,
+            }
+        )
+        frames += result["frames"]
+        candidate = result["candidate"]
+        if candidate is None:
+            heading += result["rotated"]
+            break
+        candidate_heading = wrap_degrees(heading + candidate["heading"])
+        heading += result["rotated"]
+        time_to_candidate = candidate["frame"].timestamp - started
+        confirmed = confirm(candidate["frame"].image)
+        checked.append(
+            {
+                "heading": round(candidate_heading, 1),
+                "confidence": candidate["confidence"],
+                "confirmed": confirmed is not None,
+            }
+        )
+        if confirmed is None:
+            skip.append(candidate_heading)
+            continue
+        if confirmed.get("offset") is not None:
+            # The analyzer's box is more accurate than the local one
+            frame_heading = candidate_heading - offset_to_bearing(
+                candidate["target"]["offset"]
+            )
+            candidate_heading = wrap_degrees(
+                frame_heading + offset_to_bearing(confirmed["offset"])
+            )
+        for move in turn_to_heading(execute, heading, candidate_heading, turn_rate):
+            move["duty_cycle"] = turn_duty
+            moves.append(move)
+        return {
+            "found": True,
+            "reason": "confirmed",
+            "heading": round(candidate_heading, 1),
+            "target": confirmed or candidate["target"],
+            "time_to_candidate": round(time_to_candidate, 3),
+            "frames": frames,
+            "candidates": checked,
+            "moves": moves,
+        }
+    return {
+        "found": False,
+        "reason": "rejected" if checked else result["reason"],
+        "heading": None,
+        "target": None,
+        "frames": frames,
+        "candidates": checked,
+        "moves": moves,
+    }
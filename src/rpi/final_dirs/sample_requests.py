@@ -1,8 +1,12 @@
+import os
 import requests
 import time
 
 # Base URL for the motor control API
-BASE_URL = "http://10.33.35.1:5000"
+BASE_URL = os.environ.get("PI_URL", "http://10.33.35.1:5000")
+# Photos are served by the media service
+MEDIA_URL = os.environ.get("MEDIA_URL", "http://10.33.35.1:5001")
+LAPTOP_IP = os.environ.get("LAPTOP_IP", "10.33.49.88")  # Analyzer laptop
 
 
 def test_forward():
@@ -70,10 +74,10 @@ def test_photo():
     print("Testing photo capture...")
     try:
         response = requests.post(
-            f"{BASE_URL}/photo",
+            f"{MEDIA_URL}/photo",
             json={
                 "goal": "to find a keychain object on the ground and move towards it from the given objects in front",
-                "laptop_ip": "10.33.49.88",  # Replace with your laptop's IP
+                "laptop_ip": LAPTOP_IP,
                 "laptop_port": 8000,
             },
         )
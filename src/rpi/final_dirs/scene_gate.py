@@ -0,0 +1,126 @@
+"""
+Scene-change gate for photo requests on the Pi.
+
+If the car has not moved since the last analysis for the same goal, and a
+tiny thumbnail of the new frame barely differs from the one that was
+analyzed, the previous analysis is returned at once (marked "unchanged")
+instead of uploading the frame and paying for another Gemini call.
+"""
+
+import threading
+import time
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from image_utils import downscale, to_gray
+
+CHANGE_THRESHOLD = 0.02  # Mean absolute thumbnail difference, 0-1
+MIN_MOTION = 0.05  # seconds of motor on-time that always means a new view
+THUMB_WIDTH = 32  # pixels
+
+
+def thumbnail(image: np.ndarray) -> np.ndarray:
+    """Small grey version of a frame, values 0-1."""
+    factor = max(1, image.shape[1] // THUMB_WIDTH)
+    return downscale(to_gray(image), factor) / 255.0
+
+
+def scene_difference(a: np.ndarray, b: np.ndarray) -> float:
+    """Mean absolute difference of two thumbnails (1.0 if their sizes differ)."""
+    if a.shape != b.shape:
+        return 1.0
+    return float(np.abs(a - b).mean())
+
+
+def motion_since(segments: List[dict], since: float, now: float) -> float:
+    """Motor on-time (seconds) of motion segments after `since`."""
+    total = 0.0
+    for segment in segments:
+        end = segment["end"] if segment["end"] is not None else now
+        total += max(0.0, end - max(segment["start"], since))
+    return total
+
+
+class SceneGate:
+    def __init__(
+        self,
+        threshold: float = CHANGE_THRESHOLD,
+        min_motion: float = MIN_MOTION,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.threshold = threshold
+        self.min_motion = min_motion
+        self.clock = clock
+        self._last = {}  # goal -> (thumbnail, analysis, time)
+        self._lock = threading.Lock()
+        self.reused = 0
+
+    def check(
+        self,
+        goal: str,
+        image: np.ndarray,
+        history: Callable[[float], List[dict]],
+        threshold: Optional[float] = None,
+    ) -> dict:
+        """
+        Decide whether a new frame needs analyzing.
+
+        Args:
+            history: Returns motor segments since a given time (MotorScheduler.history)
+            threshold: Per-request difference threshold (default: the gate's)
+
+        Returns:
+            Dict with "unchanged", why ("reason"), the difference and motion
+            measured, and for unchanged scenes the previous "analysis" and its "age"
+        """
+        with self._lock:
+            last = self._last.get(goal)
+        if last is None:
+            return {"unchanged": False, "reason": "no_previous"}
+        thumb, analysis, analyzed_at = last
+        now = self.clock()
+        # A real move since the last analysis means a new view; skip the diff
+        motion = motion_since(history(analyzed_at), analyzed_at, now)
+        if motion >= self.min_motion:
+            return {"unchanged": False, "reason": "moved", "motion": round(motion, 3)}
+        difference = scene_difference(thumbnail(image), thumb)
+        limit = self.threshold if threshold is None else threshold
+        info = {
+            "motion": round(motion, 3),
+            "difference": round(difference, 4),
+            "threshold": limit,
+        }
+        if difference >= limit:
+            return {"unchanged": False, "reason": "changed", **info}
+        with self._lock:
+            self.reused += 1
+        return {
+            "unchanged": True,
+            "reason": "unchanged",
+            **info,
+            "analysis": analysis,
+            "age": round(now - analyzed_at, 2),
+        }
+
+    def record(
+        self,
+        goal: str,
+        image: np.ndarray,
+        analysis: dict,
+        taken_at: Optional[float] = None,
+    ):
+        """
+        Remember the frame and analysis for the next check with this goal;
+        taken_at is when the frame was captured (motion after it counts).
+        """
+        taken_at = self.clock() if taken_at is None else taken_at
+        with self._lock:
+            self._last[goal] = (thumbnail(image), analysis, taken_at)
+
+    def forget(self, goal: Optional[str] = None):
+        with self._lock:
+            if goal is None:
+                self._last.clear()
+            else:
+                self._last.pop(goal, None)
@@ -0,0 +1,152 @@
+"""
+Coverage-driven search planner for when the target is not in view.
+
+Keeps an angular coverage histogram per visited position cell, filled in
+from the pose estimate every time a photo is analyzed. When asked for the
+next move it scores every candidate turn or forward move by how much unseen
+view it would reveal per second of motion plus photo time, and returns the
+best one instead of blindly turning left.
+"""
+
+import math
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from car_registry import Calibration
+from pose_tracker import CAMERA_HFOV_DEG, wrap_degrees
+
+BIN_DEGREES = 5.0  # Width of one coverage bin
+CELL_SIZE = 0.75  # metres; views from the same cell count as the same place
+COVERAGE_RADIUS = 1.5  # metres; views from nearby cells partly cover this one
+PHOTO_COST = 8.0  # seconds for one photo + analysis round trip
+# Candidate move durations; shorter ones are dropped below min_duration
+FORWARD_STEP_DURATIONS = (1.1, 2.2)
+TURN_STEP_DURATIONS = (0.2, 0.25, 0.3, 0.4, 0.5, 0.6, 0.8, 1.0)
+
+
+class SearchPlanner:
+    def __init__(
+        self,
+        calibration: Optional[Calibration] = None,
+        fov: float = CAMERA_HFOV_DEG,
+        photo_cost: float = PHOTO_COST,
+        min_duration: float = 0.2,
+    ):
+        self.calibration = calibration or Calibration()
+        self.fov = fov
+        self.photo_cost = photo_cost
+        self.min_duration = min_duration
+        self.bins = int(round(360.0 / BIN_DEGREES))
+        self._cells: Dict[Tuple[int, int], np.ndarray] = {}
+        self._lock = threading.Lock()
+        self.photos = 0
+
+    def reset(self):
+        with self._lock:
+            self._cells.clear()
+            self.photos = 0
+
+    def _cell(self, x: float, y: float) -> Tuple[int, int]:
+        return (int(math.floor(x / CELL_SIZE)), int(math.floor(y / CELL_SIZE)))
+
+    def _view_mask(self, heading: float, sigma_heading: float = 0.0) -> np.ndarray:
+        """Weight in [0, 1] of each bin inside the camera's view at heading."""
+        centres = (np.arange(self.bins) + 0.5) * BIN_DEGREES
+        offset = np.abs((centres - heading + 180.0) % 360.0 - 180.0)
+        half = self.fov / 2.0
+        # Heading uncertainty blurs the view edges instead of trusting them fully
+        soft = max(sigma_heading, BIN_DEGREES / 2.0)
+        return np.clip((half + soft - offset) / (2.0 * soft), 0.0, 1.0)
+
+    def coverage_at(self, x: float, y: float) -> np.ndarray:
+        """Coverage histogram seen from (x, y), including nearby cells' views."""
+        total = np.zeros(self.bins)
+        cx, cy = self._cell(x, y)
+        reach = int(math.ceil(COVERAGE_RADIUS / CELL_SIZE))
+        for (i, j), hist in self._cells.items():
+            if abs(i - cx) > reach or abs(j - cy) > reach:
+                continue
+            dist = math.hypot(i - cx, j - cy) * CELL_SIZE
+            weight = max(0.0, 1.0 - dist / COVERAGE_RADIUS)
+            if weight > 0.0:
+                total = np.maximum(total, hist * weight)
+        return total
+
+    def record_observation(self, pose: dict):
+        """Mark the view from a pose (PoseTracker.to_dict()) as searched."""
+        mask = self._view_mask(pose["heading"] % 360.0, pose.get("sigma_heading", 0.0))
+        with self._lock:
+            key = self._cell(pose["x"], pose["y"])
+            hist = self._cells.setdefault(key, np.zeros(self.bins))
+            np.maximum(hist, mask, out=hist)
+            self.photos += 1
+
+    def _candidates(self, pose: dict) -> List[dict]:
+        cal = self.calibration
+        candidates = []
+        turns = [d for d in TURN_STEP_DURATIONS if d >= self.min_duration]
+        for duration in turns or [self.min_duration]:
+            angle = cal.turn_rate * duration
+            for direction, sign in (("left", 1.0), ("right", -1.0)):
+                candidates.append(
+                    {
+                        "action": direction,
+                        "duration": duration,
+                        "x": pose["x"],
+                        "y": pose["y"],
+                        "heading": wrap_degrees(pose["heading"] + sign * angle),
+                    }
+                )
+        for duration in FORWARD_STEP_DURATIONS:
+            duration = max(duration, self.min_duration)
+            distance = cal.forward_speed * duration
+            rad = math.radians(pose["heading"])
+            candidates.append(
+                {
+                    "action": "forward",
+                    "duration": duration,
+                    "x": pose["x"] + distance * math.cos(rad),
+                    "y": pose["y"] + distance * math.sin(rad),
+                    "heading": pose["heading"],
+                }
+            )
+        return candidates
+
+    def next_action(self, pose: dict) -> dict:
+        """
+        Pick the move that reveals the most unseen view per second.
+
+        Returns:
+            Dict with "action" ("left", "right" or "forward"), "duration" in
+            seconds, the unseen degrees it is expected to reveal and the score.
+        """
+        with self._lock:
+            here = self.coverage_at(pose["x"], pose["y"])
+            best = None
+            for cand in self._candidates(pose):
+                coverage = here
+                if cand["action"] == "forward":
+                    coverage = self.coverage_at(cand["x"], cand["y"])
+                mask = self._view_mask(
+                    cand["heading"] % 360.0, pose.get("sigma_heading", 0.0)
+                )
+                gain = float(np.sum(mask * (1.0 - coverage))) * BIN_DEGREES
+                cost = cand["duration"] + self.photo_cost
+                score = gain / cost
+                if best is None or score > best["score"]:
+                    best = {
+                        "action": cand["action"],
+                        "duration": cand["duration"],
+                        "expected_new_degrees": round(gain, 1),
+                        "score": score,
+                    }
+            best["score"] = round(best["score"], 3)
+            best["searched_fraction"] = round(float(np.mean(here)), 3)
+            best["photos"] = self.photos
+            return best
+
+    def searched_fraction(self, pose: dict) -> float:
+        with self._lock:
+            return float(np.mean(self.coverage_at(pose["x"], pose["y"])))
@@ -0,0 +1,396 @@
+"""
+Frame ring in shared memory, written by a separate capture process and read
+zero-copy by the Flask server and the local detectors.
+
+CaptureProcess runs the viewfinder and the screenshot loop in its own
+process, so a crash or hang there cannot take the motor control server
+down, and the screenshot tool writes into a RAM-backed directory instead
+of the server's working directory.
+
+Layout of the multiprocessing.shared_memory block:
+- control: capacity, slot size in bytes, latest published sequence number,
+  capture error count
+- per slot: a version counter, the frame's sequence number, height, width,
+  and its timestamp
+- the slots' pixel data, RGB uint8, each starting on a 64-byte boundary
+
+There is one writer. It makes a slot's version odd, writes the frame,
+makes the version even again, and only then publishes the sequence
+number. Readers take no locks (seqlock protocol). A reader reads the
+version, then the slot's metadata, then the version again. It retries if
+the two differ or the version is odd.
+
+Readers get a read-only NumPy view of the slot, not a copy. The writer
+reuses that slot after `capacity - 1` newer frames. A consumer that keeps
+a frame longer must copy it, or check intact() once it is done with it.
+"""
+
+import multiprocessing
+import os
+import subprocess
+import tempfile
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from frame_buffer import (
+    CAMERA_STARTUP_DELAY,
+    GRAB_LOG_WINDOW,
+    Frame,
+    screenshot_grabber,
+)
+from image_utils import downscale
+import logs
+
+SLOT_BYTES = 1280 * 960 * 3  # Largest frame a slot holds; bigger ones are halved
+POLL_INTERVAL = 0.005  # seconds between checks while waiting for a new frame
+READ_RETRIES = 100
+# RAM-backed scratch directory for the screenshot tool (/dev/shmem on QNX)
+CAPTURE_DIR = next(
+    (d for d in ("/dev/shmem", "/dev/shm") if os.path.isdir(d)), tempfile.gettempdir()
+)
+
+log = logs.get("capture")
+# A stopped camera fails every grab, ten times a second: one line per window
+grab_log = logs.get("capture.grab")
+grab_log.logger.addFilter(logs.RateLimit(limit=1, window=GRAB_LOG_WINDOW))
+
+_CAPACITY, _SLOT_BYTES, _LATEST, _ERRORS = range(4)
+_VERSION, _SEQ, _HEIGHT, _WIDTH = range(4)
+
+
+def _align(offset: int) -> int:
+    return (offset + 63) & ~63
+
+
+class SharedFrameRing:
+    """FrameRing interface (push, latest, wait_newer, frames) over shared memory."""
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool):
+        self.shm = shm
+        self.owner = owner
+        buf = shm.buf
+        self._control = np.ndarray((4,), dtype=np.uint64, buffer=buf)
+        self.capacity = int(self._control[_CAPACITY])
+        self.slot_bytes = int(self._control[_SLOT_BYTES])
+        offset = self._control.nbytes
+        self._meta = np.ndarray(
+            (self.capacity, 4), dtype=np.uint64, buffer=buf, offset=offset
+        )
+        offset += self._meta.nbytes
+        self._times = np.ndarray(
+            (self.capacity,), dtype=np.float64, buffer=buf, offset=offset
+        )
+        offset = _align(offset + self._times.nbytes)
+        self._stride = _align(self.slot_bytes)
+        self._data = np.ndarray(
+            (self.capacity, self._stride), dtype=np.uint8, buffer=buf, offset=offset
+        )
+
+    @staticmethod
+    def _size(capacity: int, slot_bytes: int) -> int:
+        header = 4 * 8 + capacity * 4 * 8 + capacity * 8
+        return _align(header) + capacity * _align(slot_bytes)
+
+    @classmethod
+    def create(cls, capacity: int = 8, slot_bytes: int = SLOT_BYTES):
+        """Allocate a new ring (the creating process unlinks it in close())."""
+        shm = shared_memory.SharedMemory(
+            create=True, size=cls._size(capacity, slot_bytes)
+        )
+        control = np.ndarray((4,), dtype=np.uint64, buffer=shm.buf)
+        control[:] = (capacity, slot_bytes, 0, 0)
+        del control
+        ring = cls(shm, owner=True)
+        ring._meta[:] = 0
+        return ring
+
+    @classmethod
+    def attach(cls, name: str):
+        """Open a ring created by another process."""
+        shm = shared_memory.SharedMemory(name=name)
+        if multiprocessing.get_start_method() != "fork":
+            # Only the creator may unlink it; stop this process' own resource
+            # tracker from doing so (forked children share the creator's)
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return cls(shm, owner=False)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    @property
+    def errors(self) -> int:
+        return int(self._control[_ERRORS])
+
+    def count_error(self):
+        self._control[_ERRORS] += 1
+
+    def push(self, image: np.ndarray, timestamp: Optional[float] = None) -> Frame:
+        """Write a frame (single writer only) and publish it."""
+        while image.nbytes > self.slot_bytes:
+            image = downscale(image, 2)
+        seq = int(self._control[_LATEST]) + 1
+        slot = (seq - 1) % self.capacity
+        height, width = image.shape[:2]
+        meta = self._meta[slot]
+        meta[_VERSION] += 1  # Odd: being written
+        meta[_SEQ], meta[_HEIGHT], meta[_WIDTH] = seq, height, width
+        self._times[slot] = timestamp or time.monotonic()
+        self._data[slot, : image.nbytes] = np.ascontiguousarray(image).reshape(-1)
+        meta[_VERSION] += 1  # Even: complete
+        self._control[_LATEST] = seq
+        return Frame(seq, float(self._times[slot]), self._view(slot, height, width))
+
+    def _view(self, slot: int, height: int, width: int) -> np.ndarray:
+        image = self._data[slot, : height * width * 3].reshape(height, width, 3)
+        image.flags.writeable = False
+        return image
+
+    def _read(self, seq: int) -> Optional[Frame]:
+        slot = (seq - 1) % self.capacity
+        meta = self._meta[slot]
+        for _ in range(READ_RETRIES):
+            version = int(meta[_VERSION])
+            if not version & 1:
+                frame_seq, height, width = (int(v) for v in meta[_SEQ:])
+                timestamp = float(self._times[slot])
+                if int(meta[_VERSION]) == version:
+                    if frame_seq != seq:
+                        return None  # Already overwritten by a newer frame
+                    return Frame(seq, timestamp, self._view(slot, height, width))
+            time.sleep(0)
+        return None
+
+    def intact(self, frame: Frame) -> bool:
+        """True while the frame's slot has not been reused (its view is still valid)."""
+        meta = self._meta[(frame.seq - 1) % self.capacity]
+        return not int(meta[_VERSION]) & 1 and int(meta[_SEQ]) == frame.seq
+
+    def latest(self) -> Optional[Frame]:
+        for _ in range(READ_RETRIES):
+            seq = int(self._control[_LATEST])
+            if seq == 0:
+                return None
+            frame = self._read(seq)
+            if frame is not None:
+                return frame
+        return None
+
+    def wait_newer(self, seq: int, timeout: float) -> Optional[Frame]:
+        """Poll until a frame newer than seq is published; None on timeout."""
+        deadline = time.monotonic() + timeout
+        while int(self._control[_LATEST]) <= seq:
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(POLL_INTERVAL)
+        return self.latest()
+
+    def frames(self) -> List[Frame]:
+        """All frames still in the ring, oldest first."""
+        latest = int(self._control[_LATEST])
+        frames = []
+        for seq in range(max(1, latest - self.capacity + 1), latest + 1):
+            frame = self._read(seq)
+            if frame is not None:
+                frames.append(frame)
+        return frames
+
+    def close(self):
+        # Views into the buffer must go before the mapping can be closed
+        self._control = self._meta = self._times = self._data = None
+        try:
+            self.shm.close()
+        except BufferError:
+            pass  # A caller still holds a frame view; the mapping goes at exit
+        if self.owner:
+            self.shm.unlink()
+
+
+def _capture_main(
+    ring_name: str,
+    stop,
+    grabber: Callable[..., Optional[np.ndarray]],
+    interval: float,
+    start_viewfinder: bool,
+    grab_seconds=None,
+):
+    """Body of the capture process: grab frames into the ring until stopped."""
+    logs.setup("pi-capture")
+    ring = SharedFrameRing.attach(ring_name)
+    viewfinder = None
+    try:
+        if start_viewfinder:
+            log.info("Opening camera application for streaming")
+            viewfinder = subprocess.Popen(
+                ["camera_example3_viewfinder"],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            time.sleep(CAMERA_STARTUP_DELAY)
+        while not stop.is_set():
+            started = time.monotonic()
+            try:
+                image = grabber()
+            except Exception as e:
+                grab_log.warning("Frame grab failed", error=str(e))
+                image = None
+            if image is None:
+                ring.count_error()
+                stop.wait(0.1)
+                continue
+            finished = time.monotonic()
+            if grab_seconds is not None:
+                grab_seconds.observe(finished - started)
+            # Timestamp the middle of the grab, closest to the exposure
+            ring.push(image, (started + finished) / 2.0)
+            if interval:
+                stop.wait(interval)
+    finally:
+        if viewfinder is not None and viewfinder.poll() is None:
+            log.info("Closing camera application")
+            viewfinder.terminate()
+            try:
+                viewfinder.wait(timeout=2)
+            except subprocess.TimeoutExpired:
+                viewfinder.kill()
+        ring.close()
+        logs.stop()  # The process ends with os._exit: no atexit handlers
+
+
+def ram_screenshot_grabber() -> Optional[np.ndarray]:
+    """screenshot_grabber run in CAPTURE_DIR, keeping the file off the SD card."""
+    return screenshot_grabber(
+        os.path.join(CAPTURE_DIR, "screenshot.bmp"), cwd=CAPTURE_DIR
+    )
+
+
+class CaptureProcess:
+    """
+    CameraStream's interface (start, stop, running) with the capture loop in
+    a child process writing into a SharedFrameRing.
+
+    start() keeps capturing until stop(). A request that only needs frames
+    for a while uses acquire() and release() instead: capture stops at the
+    last release() unless start() was called too, and a stop() waits for
+    the last release(). Starting and stopping are locked, so there is never
+    more than one writer on the ring.
+    """
+
+    def __init__(
+        self,
+        ring: SharedFrameRing,
+        grabber: Callable[[], Optional[np.ndarray]] = ram_screenshot_grabber,
+        interval: float = 0.0,
+        start_viewfinder: bool = True,
+        stage_seconds=None,
+    ):
+        """
+        stage_seconds: optional metrics family labelled by stage, created with
+        shared=True; gets "camera_start" and the worker's "screenshot" times
+        """
+        self.ring = ring
+        self.grabber = grabber
+        self.interval = interval  # Extra pause between grabs, seconds
+        self.start_viewfinder = start_viewfinder
+        self.restarts = 0
+        self._start_seconds = self._grab_seconds = None
+        if stage_seconds is not None:
+            # Resolved here so the shared arrays exist before the worker forks
+            self._start_seconds = stage_seconds.labels("camera_start")
+            self._grab_seconds = stage_seconds.labels("screenshot")
+        self._process = None
+        self._stop = None
+        self._lock = threading.Lock()
+        self._users = 0  # acquire() calls not released yet
+        self._held = False  # start() called and no stop() since
+
+    @property
+    def running(self) -> bool:
+        return self._process is not None and self._process.is_alive()
+
+    @property
+    def errors(self) -> int:
+        return self.ring.errors
+
+    def start(self, wait_for_frame: float = 10.0) -> bool:
+        """
+        Start capturing until stop() (idempotent; a crashed capture process is
+        restarted); wait until the first frame is in.
+        """
+        with self._lock:
+            self._held = True
+            launched = self._launch()
+        return self._wait_started(launched, wait_for_frame)
+
+    def acquire(self, wait_for_frame: float = 10.0) -> bool:
+        """Like start(), for one user; call release() when done, even on failure."""
+        with self._lock:
+            self._users += 1
+            launched = self._launch()
+        return self._wait_started(launched, wait_for_frame)
+
+    def release(self):
+        with self._lock:
+            self._users = max(0, self._users - 1)
+            if not self._users and not self._held:
+                self._shutdown()
+
+    def stop(self):
+        """Stop capturing now, or at the last release() if acquired."""
+        with self._lock:
+            self._held = False
+            if not self._users:
+                self._shutdown()
+
+    def _launch(self) -> Optional[float]:
+        """Spawn the capture process unless it runs (lock held); its start time."""
+        if self.running:
+            return None
+        launched = time.perf_counter()
+        if self._process is not None:
+            log.warning(
+                "Capture process exited, restarting", exitcode=self._process.exitcode
+            )
+            self.restarts += 1
+        # A fresh event each time: one a killed worker was waiting on can hang set()
+        self._stop = multiprocessing.Event()
+        self._process = multiprocessing.Process(
+            target=_capture_main,
+            args=(
+                self.ring.name,
+                self._stop,
+                self.grabber,
+                self.interval,
+                self.start_viewfinder,
+                self._grab_seconds,
+            ),
+            name="camera-capture",
+            daemon=True,
+        )
+        self._process.start()
+        return launched
+
+    def _wait_started(self, launched: Optional[float], wait_for_frame: float) -> bool:
+        latest = self.ring.latest()
+        started = (
+            self.ring.wait_newer(latest.seq if latest else 0, wait_for_frame)
+            is not None
+        )
+        if started and launched is not None and self._start_seconds is not None:
+            self._start_seconds.observe(time.perf_counter() - launched)
+        return started
+
+    def _shutdown(self):
+        if self._process is None:
+            return
+        self._stop.set()
+        self._process.join(timeout=5)
+        if self._process.is_alive():
+            log.warning("Capture process did not stop, terminating it")
+            self._process.terminate()
+            self._process.join(timeout=2)
+        self._process = None
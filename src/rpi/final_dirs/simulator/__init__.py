@@ -0,0 +1,7 @@
+"""
+Hardware-free stand-ins for the car, its camera and the analyzer.
+
+world and render model the car and its camera view for the benchmarks;
+hardware, analyzer and stack run the real Pi and laptop services on them
+(python -m simulator), and replay re-runs recorded missions.
+"""
@@ -0,0 +1,56 @@
+"""
+Serve the simulated car stack until interrupted:
+
+    python -m simulator [--target 2.0 0.3] [--latency 1.5] [--error-rate 0.1]
+    CARS_CONFIG=simulator/cars.json python mcp_server.py
+
+The MCP server's tools then drive the simulated car, camera and analyzer.
+"""
+
+import argparse
+import time
+
+from simulator.analyzer import StubGemini
+from simulator.stack import CONTROL_PORT, DEFAULT_TARGET, LAPTOP_PORT, SimulatedStack
+from simulator.world import World
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve the Pi and laptop services on simulated hardware."
+    )
+    parser.add_argument(
+        "--target", type=float, nargs=2, metavar=("X", "Y"), help="Metres"
+    )
+    parser.add_argument(
+        "--random-target", type=int, metavar="SEED", help="Random target position"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=1.5, help="Gemini seconds")
+    parser.add_argument("--jitter", type=float, default=0.3)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--host", default="127.0.0.1")
+    args = parser.parse_args()
+
+    if args.random_target is not None:
+        world = World.random(args.random_target)
+    else:
+        world = World(*(args.target or DEFAULT_TARGET), seed=args.seed)
+    analyzer = StubGemini(args.latency, args.jitter, args.error_rate, args.seed)
+    stack = SimulatedStack(world, analyzer, host=args.host).start()
+    state = stack.state()
+    print(
+        f"Simulated car at http://{args.host}:{CONTROL_PORT} (media on the next "
+        f"port), analyzer at {args.host}:{LAPTOP_PORT}; target {state['target']}, "
+        f"{state['target_distance']}m away"
+    )
+    print("Use it from the MCP server with CARS_CONFIG=simulator/cars.json")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        stack.stop()
+
+
+if __name__ == "__main__":
+    main()
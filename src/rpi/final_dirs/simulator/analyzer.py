@@ -0,0 +1,116 @@
+"""
+Stub Gemini for the laptop server: configurable latency and error rate,
+answers read off the rendered frames.
+
+StubGemini replaces laptop_server.client. The laptop's own prompt building,
+deadlines, timeouts and error handling still run. The stub looks for the
+simulator's red target with the colour detector the cascade uses and
+answers in the format the prompt asks for: action code, explanation and
+BOX line for a frame (or a view plus close-up), TILE line for a sweep
+mosaic. Latencies and failures come from a seeded RNG, so a run is
+repeatable.
+"""
+
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+from typing import List, Optional, Tuple
+
+import deadlines
+from analyzer_cascade import ColorBlobDetector, SweepColorLocator
+from panoramic_sweep import TILE_BORDER
+
+TARGET_GOAL = "red target"  # What the simulator's target looks like
+_TILES = re.compile(r"mosaic of (\d+) camera views")
+_GRID = re.compile(r"arranged in (\d+) rows of (\d+) tiles")
+
+
+class StubGeminiError(Exception):
+    """A failed call, as the Gemini client raises for 429/503 replies."""
+
+
+class StubGemini:
+    """Stands in for genai.Client(): client.models.generate_content(...)."""
+
+    def __init__(
+        self,
+        latency: float = 1.5,
+        jitter: float = 0.3,
+        error_rate: float = 0.0,
+        seed: int = 0,
+    ):
+        """
+        Args:
+            latency: Mean seconds per call
+            jitter: 1-sigma spread of the latency, seconds
+            error_rate: Fraction of calls that fail (0-1)
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.models = self
+        self.detector = ColorBlobDetector()
+        self.sweep_locator = SweepColorLocator(self.detector)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = self.errors = self.timeouts = 0
+
+    def stats(self) -> dict:
+        return {"calls": self.calls, "errors": self.errors, "timeouts": self.timeouts}
+
+    def generate_content(self, model: str, contents: list, config=None):
+        images, prompt = _split_contents(contents)
+        with self._lock:
+            self.calls += 1
+            delay = max(0.0, self._rng.gauss(self.latency, self.jitter))
+            fail = self._rng.random() < self.error_rate
+        timeout = getattr(getattr(config, "http_options", None), "timeout", None)
+        left = deadlines.remaining()
+        if timeout is None and left is not None:
+            # No google-genai to build a config: the call's deadline still applies
+            timeout = max(0.0, left) * 1000.0
+        if timeout is not None and delay > timeout / 1000.0:
+            time.sleep(timeout / 1000.0)
+            with self._lock:
+                self.timeouts += 1
+            raise TimeoutError("Stub Gemini request timed out")
+        time.sleep(delay)
+        if fail:
+            with self._lock:
+                self.errors += 1
+            raise StubGeminiError("503 UNAVAILABLE. The model is overloaded (stub).")
+        return SimpleNamespace(text=self.answer(images, prompt))
+
+    def answer(self, images: List[bytes], prompt: str) -> str:
+        if not images:
+            return "NOT_FOUND\nNo image was sent."
+        tiles, grid = _TILES.search(prompt), _GRID.search(prompt)
+        if tiles and grid:
+            layout = {
+                "tiles": int(tiles.group(1)),
+                "rows": int(grid.group(1)),
+                "columns": int(grid.group(2)),
+                "border": TILE_BORDER,
+            }
+            result = self.sweep_locator(images[0], TARGET_GOAL, layout)
+        else:
+            # A view plus close-up is answered from the view (a BOX line)
+            result = self.detector(images[0], TARGET_GOAL)
+        if result is None:
+            return "NOT_FOUND\nThe image could not be read."
+        return result.text
+
+
+def _split_contents(contents: list) -> Tuple[List[bytes], Optional[str]]:
+    """(image bytes, prompt) from generate_content's contents list."""
+    images, prompt = [], ""
+    for part in contents:
+        if isinstance(part, str):
+            prompt = part
+        elif isinstance(part, (bytes, bytearray)):
+            images.append(bytes(part))
+        else:  # types.Part.from_bytes(...)
+            images.append(part.inline_data.data)
+    return images, prompt
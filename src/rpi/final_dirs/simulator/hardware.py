@@ -0,0 +1,218 @@
+"""
+Simulated car hardware: the rpi_gpio module and the camera, driving a World.
+
+SimCar integrates the car's motion over real time. Motion starts when the
+direction pins and PWM duty say the motors run, and ends when they stop.
+Camera frames are rendered from the pose at the moment they are grabbed,
+so frames taken while the car turns show the turn, as on the real car.
+The media service grabs them in its capture process through SimCamera,
+which renders from the pose the SimCar publishes into shared memory.
+
+SimGPIO stands in for the QNX rpi_gpio module. Install it as
+sys.modules["rpi_gpio"] before flask_motor_control is imported, and the
+real motor code, including the scheduler, its watchdog and the motor IPC,
+drives the simulated car.
+"""
+
+import multiprocessing
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+
+from simulator.render import FrameRenderer
+from simulator.world import World
+
+# flask_motor_control's wiring: direction pins IN1-IN4, PWM enable pins
+DIRECTION_PINS = (17, 27, 23, 24)
+ENABLE_PINS = (22, 25)
+# Direction pin levels -> motion, as the L298N bridge turns the wheels
+PIN_MOTIONS = {
+    (1, 0, 0, 1): "forward",
+    (0, 1, 1, 0): "backward",
+    (0, 1, 0, 1): "right",
+    (1, 0, 1, 0): "left",
+}
+
+
+class SimCamera:
+    """
+    The SimCar's camera as a CaptureProcess grabber. The capture process
+    does not see the World move, so the car publishes its pose and target
+    here and each grab renders a World at the last published pose.
+    """
+
+    def __init__(self, renderer: FrameRenderer):
+        self.renderer = renderer
+        self._pose = multiprocessing.Array("d", 5)  # x, y, heading, target x, y
+        self._frames = multiprocessing.Value("q", 0)
+
+    def publish(self, world: World):
+        with self._pose.get_lock():
+            self._pose[:] = [world.x, world.y, world.heading, *world.target]
+
+    @property
+    def frames(self) -> int:
+        return self._frames.value
+
+    def reset_frames(self):
+        with self._frames.get_lock():
+            self._frames.value = 0
+
+    def __call__(self) -> np.ndarray:
+        with self._pose.get_lock():
+            x, y, heading, target_x, target_y = self._pose[:]
+        world = World(target_x, target_y)
+        world.x, world.y, world.heading = x, y, heading
+        with self._frames.get_lock():
+            self._frames.value += 1
+        return self.renderer.render(world)
+
+
+class SimCar:
+    """A World whose car moves while the (simulated) motors run."""
+
+    def __init__(
+        self,
+        world: World,
+        renderer: Optional[FrameRenderer] = None,
+        clock=time.monotonic,
+    ):
+        self.renderer = renderer or FrameRenderer()
+        self.camera = SimCamera(self.renderer)
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._motion = None  # (direction, duty, since) while the motors run
+        self.commands = 0  # Motions started
+        self.frames = 0  # Frames rendered
+        self.reset(world)
+
+    def reset(self, world: World):
+        """Put a new world in place (the motors are considered stopped)."""
+        # Timing noise comes from the real scheduler here, not from the model
+        world.timing_jitter = 0.0
+        with self._lock:
+            self.world = world
+            self._motion = None
+            self.commands = 0
+            self.frames = 0
+            self.camera.reset_frames()
+            self.camera.publish(world)
+
+    def _advance(self, now: float):
+        if self._motion is not None:
+            direction, duty, since = self._motion
+            if now > since:
+                self.world.execute(direction, now - since, duty)
+                self.camera.publish(self.world)
+            self._motion = (direction, duty, now)
+
+    def advance(self):
+        """Move the car up to now (and publish the pose to the camera)."""
+        with self._lock:
+            self._advance(self.clock())
+
+    def set_motion(self, direction: Optional[str], duty: float):
+        """The motors now run this way (None: stopped)."""
+        with self._lock:
+            now = self.clock()
+            self._advance(now)
+            if direction is None or duty <= 0:
+                self._motion = None
+            elif self._motion is None or self._motion[:2] != (direction, duty):
+                if self._motion is None or self._motion[0] != direction:
+                    self.commands += 1
+                self._motion = (direction, duty, now)
+
+    @property
+    def moving(self) -> bool:
+        return self._motion is not None
+
+    def grab(self) -> np.ndarray:
+        """Camera frame of the car's current view, rendered in this process."""
+        with self._lock:
+            self._advance(self.clock())
+            self.frames += 1
+            return self.renderer.render(self.world)
+
+    def state(self) -> dict:
+        """True pose and target, for checking how a mission went."""
+        with self._lock:
+            self._advance(self.clock())
+            world = self.world
+            return {
+                "x": round(world.x, 3),
+                "y": round(world.y, 3),
+                "heading": round(world.heading, 1),
+                "target": [round(v, 3) for v in world.target],
+                "target_distance": round(world.target_distance(), 3),
+                "target_bearing": round(world.target_bearing(), 1),
+                "target_visible": world.target_visible(),
+                "moving": self._motion is not None,
+                "commands": self.commands,
+                "frames": self.frames + self.camera.frames,
+            }
+
+
+class _SimPWM:
+    def __init__(self, gpio: "SimGPIO", pin: int, frequency: float):
+        self.gpio = gpio
+        self.pin = pin
+        self.frequency = frequency
+
+    def start(self, duty: float):
+        self.ChangeDutyCycle(duty)
+
+    def ChangeDutyCycle(self, duty: float):
+        self.gpio._duty[self.pin] = float(duty)
+        self.gpio._update()
+
+    def stop(self):
+        self.ChangeDutyCycle(0.0)
+
+
+class SimGPIO:
+    """The parts of rpi_gpio the motor service uses, moving a SimCar."""
+
+    BCM = 11
+    BOARD = 10
+    OUT = 0
+    IN = 1
+    LOW = 0
+    HIGH = 1
+
+    def __init__(self, car: SimCar):
+        self.car = car
+        self._levels = {}
+        self._duty = {}
+
+    def setmode(self, mode):
+        pass
+
+    def setwarnings(self, enabled):
+        pass
+
+    def setup(self, pin, direction, initial=LOW):
+        self._levels[pin] = initial
+
+    def output(self, pin, level):
+        self._levels[pin] = 1 if level else 0
+        self._update()
+
+    def input(self, pin):
+        return self._levels.get(pin, 0)
+
+    def PWM(self, pin, frequency):
+        return _SimPWM(self, pin, frequency)
+
+    def cleanup(self, *pins):
+        self._levels.clear()
+        self._duty.clear()
+        self._update()
+
+    def _update(self):
+        levels = tuple(self._levels.get(pin, 0) for pin in DIRECTION_PINS)
+        duty = min(self._duty.get(pin, 0.0) for pin in ENABLE_PINS)
+        # Half-set pins (while the direction changes) count as stopped
+        self.car.set_motion(PIN_MOTIONS.get(levels), duty)
@@ -0,0 +1,73 @@
+"""
+Synthetic camera frames for a simulated World.
+
+The background is locked to world bearings (coloured vertical bands above a
+floor gradient), so turning the car shifts the scene the way a real camera
+view shifts, and the target is drawn as a red block at its projected box.
+"""
+
+import math
+from typing import Optional
+
+import numpy as np
+
+from pose_tracker import CAMERA_HFOV_DEG
+from simulator.world import World
+
+FRAME_WIDTH = 320
+FRAME_HEIGHT = 240
+HORIZON = 0.6  # Fraction of the frame height where the floor starts
+TEXTURE_STEPS = 720  # Background bands per full turn
+TARGET_COLOR = (200, 30, 30)
+
+
+class FrameRenderer:
+    def __init__(
+        self,
+        width: int = FRAME_WIDTH,
+        height: int = FRAME_HEIGHT,
+        seed: int = 0,
+        sensor_noise: float = 3.0,
+    ):
+        self.width = width
+        self.height = height
+        self.sensor_noise = sensor_noise
+        self.rng = np.random.default_rng(seed)
+        # Muted (never red-dominant) bands so the target stays distinguishable
+        bands = self.rng.integers(40, 170, size=(TEXTURE_STEPS, 3)).astype(np.float32)
+        bands[:, 0] = np.minimum(bands[:, 0], bands[:, 1] + 20)
+        kernel = np.ones(5) / 5.0
+        for c in range(3):
+            bands[:, c] = np.convolve(np.tile(bands[:, c], 3), kernel, "same")[
+                TEXTURE_STEPS : 2 * TEXTURE_STEPS
+            ]
+        self.bands = bands
+        floor = np.linspace(90, 140, height - int(height * HORIZON), dtype=np.float32)
+        self.floor = np.repeat(floor[:, None, None], 3, axis=2)
+
+    def render(self, world: World, noise: Optional[float] = None) -> np.ndarray:
+        """Render the car's current view as an (H, W, 3) uint8 RGB frame."""
+        half = math.tan(math.radians(CAMERA_HFOV_DEG / 2.0))
+        columns = np.linspace(-half, half, self.width)
+        # Column bearings (left positive) -> world angles -> texture bands
+        angles = world.heading - np.degrees(np.arctan(columns))
+        index = ((angles % 360.0) / 360.0 * TEXTURE_STEPS).astype(np.intp)
+        horizon = int(self.height * HORIZON)
+        frame = np.empty((self.height, self.width, 3), dtype=np.float32)
+        frame[:horizon] = self.bands[index][None, :, :]
+        frame[horizon:] = self.floor
+
+        if abs(world.target_bearing()) < 90.0:
+            ymin, xmin, ymax, xmax = world.target_box(noisy=False)
+            top, bottom = int(ymin * self.height), int(math.ceil(ymax * self.height))
+            left, right = int(xmin * self.width), int(math.ceil(xmax * self.width))
+            if bottom > top and right > left:
+                frame[top:bottom, left:right] = TARGET_COLOR
+                # A lighter stripe gives the block some texture to correlate on
+                stripe = top + (bottom - top) // 3
+                frame[top:stripe, left:right] = (235, 120, 110)
+
+        sigma = self.sensor_noise if noise is None else noise
+        if sigma:
+            frame += self.rng.normal(0.0, sigma, frame.shape).astype(np.float32)
+        return np.clip(frame, 0, 255).astype(np.uint8)
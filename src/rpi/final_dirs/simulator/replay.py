@@ -0,0 +1,244 @@
+"""
+Replay a recorded mission against a car: the real one or the simulator.
+
+A mission is rebuilt from flight recorder files (see flight_recorder): the
+motor segments of the Pi's control service and the photos of its media
+service, in the order and with the pauses between them they were
+recorded with. Replaying sends the same moves and photo requests again,
+then compares the timings and outcomes with the recording:
+
+    python -m simulator.replay flight_logs/pi-*.flt [--speed 2] [--car car2]
+    python -m simulator.replay flight_logs/pi-*.flt --sim --target 2.0 0.3
+
+--sim serves the simulated stack in this process first (and points the
+replay at it); otherwise the car comes from the car registry (CARS_CONFIG).
+Motions the media service made itself (tracking, sweeps, scans) replay as
+plain moves.
+"""
+
+import argparse
+import math
+import statistics
+import time
+from collections import namedtuple
+from typing import Dict, List, Optional
+
+import requests
+
+from flight_recorder import FlightLog
+
+# start/end: recorded wall-clock times; recorded: the motor segment or analysis
+Step = namedtuple("Step", ["kind", "start", "end", "recorded"])
+Result = namedtuple("Result", ["step", "seconds", "ok", "reply"])
+
+MOVE_TIMEOUT = 10  # seconds
+PHOTO_TIMEOUT = 30
+
+
+def load_mission(paths: List[str]) -> List[Step]:
+    """The moves and photos in a set of flight recorder files, in time order."""
+    steps = []
+    for path in paths:
+        log = FlightLog(path)
+        try:
+            for record in log.records("motor"):
+                segment = record.data
+                if math.isnan(segment["actual"]):
+                    continue  # Still running when the recorder stopped
+                # Recorded when the segment ended
+                steps.append(
+                    Step(
+                        "move",
+                        record.wall_time - segment["actual"],
+                        record.wall_time,
+                        segment,
+                    )
+                )
+            for record in log.records("analysis"):
+                analysis = record.data
+                if "phase" in analysis:
+                    continue  # The laptop's side of a photo
+                seconds = analysis.get("photo_ms", 0.0) / 1000.0
+                steps.append(
+                    Step(
+                        "photo", record.wall_time - seconds, record.wall_time, analysis
+                    )
+                )
+        finally:
+            log.close()
+    return sorted(steps, key=lambda step: step.start)
+
+
+def replay(
+    steps: List[Step],
+    pi_url: str,
+    media_url: str,
+    laptop_ip: str,
+    laptop_port: int,
+    car_id: str,
+    speed: float = 1.0,
+    session: Optional[requests.Session] = None,
+) -> List[Result]:
+    """
+    Send each step again, keeping the recorded start times (divided by
+    speed; 0 sends each step as soon as the one before has finished).
+    """
+    session = session or requests.Session()
+    results = []
+    started = time.monotonic()
+    for step in steps:
+        if speed:
+            due = started + (step.start - steps[0].start) / speed
+            time.sleep(max(0.0, due - time.monotonic()))
+        sent = time.monotonic()
+        try:
+            if step.kind == "move":
+                segment = step.recorded
+                duration = segment["requested"]
+                if math.isnan(duration):
+                    duration = segment["actual"]
+                response = session.post(
+                    f"{pi_url}/{segment['action']}",
+                    json={"duration": duration},
+                    timeout=MOVE_TIMEOUT,
+                )
+            else:
+                response = session.post(
+                    f"{media_url}/photo",
+                    json={
+                        "goal": step.recorded.get("goal", "Find the target object"),
+                        "laptop_ip": laptop_ip,
+                        "laptop_port": laptop_port,
+                        "car_id": car_id,
+                    },
+                    timeout=PHOTO_TIMEOUT,
+                )
+            reply = response.json()
+            ok = response.ok
+        except (requests.RequestException, ValueError) as e:
+            reply, ok = {"status": "error", "message": str(e)}, False
+        results.append(Result(step, time.monotonic() - sent, ok, reply))
+    return results
+
+
+def compare(results: List[Result]) -> List[str]:
+    """Report lines: latency per kind, motor timing and photo outcomes."""
+    lines = []
+    for kind in ("move", "photo"):
+        done = [r for r in results if r.step.kind == kind]
+        if not done:
+            continue
+        ms = sorted(r.seconds * 1000.0 for r in done)
+        failed = sum(not r.ok for r in done)
+        lines.append(
+            f"{kind:<6} {len(done):4d} sent, {failed} failed, latency "
+            f"p50 {ms[len(ms) // 2]:.0f}ms, p95 {ms[int(len(ms) * 0.95)]:.0f}ms"
+        )
+    moves = [r for r in results if r.step.kind == "move" and r.ok]
+    if moves:
+        recorded = [
+            r.step.recorded["actual"] - r.step.recorded["requested"]
+            for r in moves
+            if not math.isnan(r.step.recorded["requested"])
+        ]
+        replayed = [
+            r.reply["actual_duration"] - r.reply["duration"]
+            for r in moves
+            if "actual_duration" in r.reply
+        ]
+        if recorded and replayed:
+            lines.append(
+                f"motor on-time vs requested: recorded "
+                f"{statistics.mean(recorded) * 1000:+.1f}ms, replayed "
+                f"{statistics.mean(replayed) * 1000:+.1f}ms"
+            )
+    photos = [r for r in results if r.step.kind == "photo"]
+    if photos:
+        outcomes: Dict[str, int] = {}
+        for r in photos:
+            key = f"{r.step.recorded.get('status')} -> {_photo_status(r.reply)}"
+            outcomes[key] = outcomes.get(key, 0) + 1
+        recorded_ms = [r.step.recorded.get("photo_ms", 0.0) for r in photos]
+        lines.append(
+            f"photo time: recorded mean {statistics.mean(recorded_ms):.0f}ms, "
+            f"replayed {statistics.mean(r.seconds for r in photos) * 1000:.0f}ms"
+        )
+        lines.append(
+            "photo outcomes (recorded -> replayed): "
+            + ", ".join(f"{k} x{n}" for k, n in sorted(outcomes.items()))
+        )
+    return lines
+
+
+def _photo_status(reply: dict) -> str:
+    """A /photo reply in the flight recorder's status terms."""
+    if reply.get("unchanged"):
+        return "unchanged"
+    if reply.get("status") == "partial_success":
+        return "upload_failed"
+    if reply.get("frame_quality") and not reply["frame_quality"].get("ok", True):
+        return "rejected"
+    return reply.get("status", "error")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Replay a recorded mission from flight recorder files."
+    )
+    parser.add_argument("files", nargs="+", help="pi-control and pi-media .flt files")
+    parser.add_argument("--car", help="Car ID in the registry (default car)")
+    parser.add_argument(
+        "--speed", type=float, default=1.0, help="Time scale; 0: no pauses"
+    )
+    parser.add_argument("--sim", action="store_true", help="Replay on the simulator")
+    parser.add_argument("--target", type=float, nargs=2, metavar=("X", "Y"))
+    parser.add_argument("--latency", type=float, default=1.5, help="--sim Gemini")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    steps = load_mission(args.files)
+    if not steps:
+        parser.exit(1, "No motor segments or photos in these files\n")
+    print(
+        f"Mission: {sum(s.kind == 'move' for s in steps)} moves, "
+        f"{sum(s.kind == 'photo' for s in steps)} photos over "
+        f"{steps[-1].end - steps[0].start:.1f}s"
+    )
+
+    stack = None
+    if args.sim:
+        from car_registry import DEFAULT_CAR_ID, MEDIA_PORT
+        from simulator.analyzer import StubGemini
+        from simulator.stack import (
+            CONTROL_PORT,
+            DEFAULT_TARGET,
+            LAPTOP_PORT,
+            SimulatedStack,
+        )
+        from simulator.world import World
+
+        stack = SimulatedStack(
+            World(*(args.target or DEFAULT_TARGET)),
+            StubGemini(args.latency, error_rate=args.error_rate),
+        ).start()
+        pi_url = f"http://{stack.host}:{CONTROL_PORT}"
+        media_url = f"http://{stack.host}:{MEDIA_PORT}"
+        laptop_ip, laptop_port, car_id = stack.host, LAPTOP_PORT, DEFAULT_CAR_ID
+    else:
+        from car_registry import load_registry
+
+        car = load_registry().get(args.car)
+        pi_url, media_url = car.pi_url, car.media_url
+        laptop_ip, laptop_port, car_id = car.laptop_ip, car.laptop_port, car.car_id
+    try:
+        results = replay(
+            steps, pi_url, media_url, laptop_ip, laptop_port, car_id, args.speed
+        )
+    finally:
+        if stack is not None:
+            stack.stop()
+    print("\n".join(compare(results)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+The whole car stack on one Linux box: the Pi's control and media services
+and the laptop analyzer, on simulated hardware and a stub Gemini.
+
+The real server modules are imported and served on their usual ports, so
+mcp_server.py, the example scripts and the benchmarks talk to them over
+HTTP unchanged (see cars.json). Only the edges are replaced:
+- rpi_gpio is a SimGPIO that moves the SimCar's World
+- the media service's capture process grabs from a SimCamera, which
+  renders the World at the pose a publisher thread here keeps current
+- laptop_server.client is a StubGemini, so google-genai and an API key are
+  not needed
+
+The control service also serves GET /sim/state (true pose and target,
+analyzer calls) and POST /sim/reset ({"target": [x, y], "seed": n}).
+"""
+
+import os
+import sys
+import threading
+from typing import Optional
+
+from werkzeug.serving import make_server
+
+from car_registry import MEDIA_PORT
+from simulator.analyzer import StubGemini
+from simulator.hardware import SimCar, SimGPIO
+from simulator.world import World
+
+CONTROL_PORT = 5000
+LAPTOP_PORT = 8000
+FRAME_INTERVAL = 0.05  # Seconds between rendered frames (about the Pi's grab rate)
+POSE_INTERVAL = 0.01  # Seconds between pose updates for the capture process
+DEFAULT_TARGET = (2.0, 0.3)  # Metres ahead and to the left of the car
+# Car registry for the MCP server (CARS_CONFIG) pointing at the simulator
+CARS_CONFIG = os.path.join(os.path.dirname(__file__), "cars.json")
+
+_active = None  # The running SimulatedStack, for the /sim routes
+
+
+class SimulatedStack:
+    """Control, media and laptop services on a SimCar and a StubGemini."""
+
+    def __init__(
+        self,
+        world: Optional[World] = None,
+        analyzer: Optional[StubGemini] = None,
+        host: str = "127.0.0.1",
+        frame_interval: float = FRAME_INTERVAL,
+    ):
+        self.car = SimCar(world or World(*DEFAULT_TARGET))
+        self.analyzer = analyzer or StubGemini()
+        self.host = host
+        self.frame_interval = frame_interval
+        self.control = self.media = self.laptop = None  # The server modules
+        self._servers = []
+        self._stopped = threading.Event()
+
+    def start(self):
+        """Import the services onto the simulated hardware and serve them."""
+        global _active
+        gpio = sys.modules.get("rpi_gpio")
+        if isinstance(gpio, SimGPIO):
+            gpio.car = self.car  # The services are already imported
+        else:
+            sys.modules["rpi_gpio"] = SimGPIO(self.car)
+        import flask_motor_control
+        import laptop_server
+        import media_server
+
+        self.control, self.media, self.laptop = (
+            flask_motor_control,
+            media_server,
+            laptop_server,
+        )
+        # The real CaptureProcess and SharedFrameRing, grabbing rendered frames
+        camera = media_server.camera_stream
+        camera.stop()
+        camera.grabber = self.car.camera
+        camera.interval = self.frame_interval
+        camera.start_viewfinder = False
+        laptop_server.client = self.analyzer
+        if "sim_state" not in flask_motor_control.app.view_functions:
+            app = flask_motor_control.app
+            app.add_url_rule("/sim/state", "sim_state", _sim_state)
+            app.add_url_rule("/sim/reset", "sim_reset", _sim_reset, methods=["POST"])
+        _active = self
+
+        self._stopped.clear()
+        threading.Thread(
+            target=self._publish_pose, name="sim-pose", daemon=True
+        ).start()
+        for app, port in (
+            (flask_motor_control.app, CONTROL_PORT),
+            (media_server.app, MEDIA_PORT),
+            (laptop_server.app, LAPTOP_PORT),
+        ):
+            server = make_server(self.host, port, app, threaded=True)
+            threading.Thread(
+                target=server.serve_forever, name=f"sim-{port}", daemon=True
+            ).start()
+            self._servers.append(server)
+        return self
+
+    def _publish_pose(self):
+        # The car only integrates its motion when asked; keep the camera's copy fresh
+        while not self._stopped.wait(POSE_INTERVAL):
+            self.car.advance()
+
+    def reset(self, world: World):
+        """A new mission: stop the motors, forget the last goal's photos."""
+        from scene_gate import SceneGate
+
+        self.control.motors.stop()
+        self.media.camera_stream.stop()
+        self.car.reset(world)
+        self.media.scene_gate = SceneGate()
+        self.media.roi_targets.clear()
+        self.media.last_photo.update(image=None, time=0.0)
+
+    def state(self) -> dict:
+        return {**self.car.state(), "analyzer": self.analyzer.stats()}
+
+    def stop(self):
+        self._stopped.set()
+        for server in self._servers:
+            server.shutdown()
+        self._servers = []
+        if self.media is not None:
+            self.media.camera_stream.stop()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+def _sim_state():
+    from flask import jsonify
+
+    return jsonify(_active.state())
+
+
+def _sim_reset():
+    from flask import jsonify, request
+
+    data = request.get_json(silent=True) or {}
+    target = data.get("target", DEFAULT_TARGET)
+    _active.reset(World(float(target[0]), float(target[1]), seed=data.get("seed", 0)))
+    return jsonify(_active.state())
@@ -0,0 +1,152 @@
+"""
+2D world model of one car and one target, used to benchmark navigation
+strategies without hardware or Gemini quota.
+
+The true car motion follows the same calibration the pose tracker assumes,
+plus per-command noise and heading drift, so estimated and true poses
+diverge the way they do on the floor.
+"""
+
+import math
+import random
+from typing import Optional
+
+from car_registry import Calibration
+from pose_tracker import CAMERA_HFOV_DEG, CAMERA_VFOV_DEG, wrap_degrees
+
+VISIBLE_RANGE = 4.0  # metres beyond which the camera cannot make out the target
+GOAL_DISTANCE = 0.35  # metres at which the analyzer reports GOAL_ACHIEVED
+TOO_CLOSE_DISTANCE = 0.15
+PHOTO_TIME = 8.0  # seconds per photo + analysis (camera sleeps + Gemini)
+TARGET_HEIGHT = 0.1  # metres
+TARGET_WIDTH = 0.1  # metres
+
+
+class World:
+    def __init__(
+        self,
+        target_x: float,
+        target_y: float,
+        calibration: Optional[Calibration] = None,
+        seed: int = 0,
+        motion_noise: float = 0.1,
+        drift_rate: float = 2.0,
+        timing_jitter: float = 0.02,
+        photo_time: float = PHOTO_TIME,
+        box_noise: float = 0.01,
+    ):
+        self.calibration = calibration or Calibration()
+        self.rng = random.Random(seed)
+        self.target = (target_x, target_y)
+        self.x, self.y, self.heading = 0.0, 0.0, 0.0
+        self.motion_noise = motion_noise
+        self.drift_rate = drift_rate  # true drift, unknown to the tracker
+        self.timing_jitter = timing_jitter
+        self.photo_time = photo_time
+        self.box_noise = box_noise  # 1-sigma error of reported box edges (0-1 scale)
+        self.clock = 0.0  # simulated seconds spent moving and photographing
+        self.commands = 0
+        self.photos = 0
+
+    @classmethod
+    def random(
+        cls, seed: int, min_range: float = 1.0, max_range: float = 5.0, **kwargs
+    ):
+        """A world with the target at a random bearing and range from the car."""
+        rng = random.Random(seed)
+        bearing = math.radians(rng.uniform(-180.0, 180.0))
+        distance = rng.uniform(min_range, max_range)
+        return cls(
+            distance * math.cos(bearing),
+            distance * math.sin(bearing),
+            seed=seed,
+            **kwargs,
+        )
+
+    def execute(
+        self, direction: str, duration: float, duty_cycle: Optional[float] = None
+    ) -> float:
+        """Run one motor command on the true car; return the actual on-time."""
+        cal = self.calibration
+        actual = max(0.0, duration + self.rng.gauss(0.0, self.timing_jitter))
+        noise = 1.0 + self.rng.gauss(0.0, self.motion_noise)
+        if direction in ("forward", "backward"):
+            scale = (duty_cycle or cal.forward_duty) / cal.forward_duty
+            speed = cal.forward_speed if direction == "forward" else -cal.backward_speed
+            distance = speed * scale * actual * noise
+            drift = self.drift_rate * abs(distance)
+            mid = math.radians(self.heading + drift / 2.0)
+            self.x += distance * math.cos(mid)
+            self.y += distance * math.sin(mid)
+            self.heading = wrap_degrees(self.heading + drift)
+        elif direction in ("left", "right"):
+            scale = (duty_cycle or cal.turn_duty) / cal.turn_duty
+            angle = cal.turn_rate * scale * actual * noise
+            self.heading = wrap_degrees(
+                self.heading + (angle if direction == "left" else -angle)
+            )
+        elif direction != "stop":
+            raise ValueError(f"Unknown direction '{direction}'")
+        self.clock += actual
+        self.commands += 1
+        return actual
+
+    def target_distance(self) -> float:
+        return math.hypot(self.target[0] - self.x, self.target[1] - self.y)
+
+    def target_bearing(self) -> float:
+        """Bearing of the target relative to the car's heading (left positive)."""
+        dx, dy = self.target[0] - self.x, self.target[1] - self.y
+        return wrap_degrees(math.degrees(math.atan2(dy, dx)) - self.heading)
+
+    def target_visible(self) -> bool:
+        return (
+            abs(self.target_bearing()) <= CAMERA_HFOV_DEG / 2.0
+            and self.target_distance() <= VISIBLE_RANGE
+        )
+
+    def analyze(self) -> str:
+        """Take a photo and answer the way the Gemini prompt asks it to."""
+        self.clock += self.photo_time
+        self.photos += 1
+        if not self.target_visible():
+            code = self.rng.choice(["NOT_FOUND", "TURN_LEFT", "TURN_RIGHT"])
+            return f"{code}\nTarget is not visible in the frame."
+
+        box = self.target_box()
+        offset = (box[1] + box[3]) - 1.0
+        distance = self.target_distance()
+        if distance <= TOO_CLOSE_DISTANCE:
+            code = "MOVE_BACKWARD"
+        elif distance <= GOAL_DISTANCE and abs(offset) < 0.5:
+            code = "GOAL_ACHIEVED"
+        elif offset < -0.5:
+            code = "MOVE_LEFT"
+        elif offset > 0.5:
+            code = "MOVE_RIGHT"
+        else:
+            code = "MOVE_FORWARD"
+        ymin, xmin, ymax, xmax = (round(v * 1000) for v in box)
+        return (
+            f"{code}\nTarget seen about {distance:.1f}m away.\n"
+            f"BOX: [{ymin}, {xmin}, {ymax}, {xmax}]"
+        )
+
+    def target_box(self, noisy: bool = True) -> tuple:
+        """Pinhole projection of the target as (ymin, xmin, ymax, xmax) in 0-1."""
+        distance = max(self.target_distance(), 0.05)
+        tan_h = math.tan(math.radians(CAMERA_HFOV_DEG / 2.0))
+        tan_v = math.tan(math.radians(CAMERA_VFOV_DEG / 2.0))
+        centre_x = 0.5 - math.tan(math.radians(self.target_bearing())) / (2.0 * tan_h)
+        half_w = TARGET_WIDTH / (4.0 * distance * tan_h)
+        height = TARGET_HEIGHT / (2.0 * distance * tan_v)
+        noise = [
+            self.rng.gauss(0.0, self.box_noise) if noisy else 0.0 for _ in range(4)
+        ]
+        box = (
+            0.6 - height / 2.0 + noise[0],
+            centre_x - half_w + noise[1],
+            0.6 + height / 2.0 + noise[2],
+            centre_x + half_w + noise[3],
+        )
+        return tuple(min(max(v, 0.0), 1.0) for v in box)
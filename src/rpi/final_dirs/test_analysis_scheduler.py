@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Tests for the laptop's analysis scheduler: priorities, weighted fair queueing
+across cars, superseded frames and error propagation
+"""
+
+import contextvars
+import threading
+
+import pytest
+
+from analysis_scheduler import AnalysisScheduler, JobSuperseded
+
+WAIT = 5.0
+
+
+class Recorder:
+    """A handler that records the order it ran jobs in, held until released."""
+
+    def __init__(self):
+        self.order = []
+        self.gate = threading.Event()
+        self.started = threading.Event()
+
+    def __call__(self, name):
+        if name == "blocker":
+            self.started.set()
+            assert self.gate.wait(WAIT)
+        else:
+            self.order.append(name)
+        return name
+
+
+def blocked_scheduler(**kwargs):
+    """A one-worker scheduler busy with a blocker job, so later jobs queue."""
+    recorder = Recorder()
+    scheduler = AnalysisScheduler(recorder, **kwargs)
+    blocker = scheduler.submit("blocker-car", "normal", "blocker")
+    assert recorder.started.wait(WAIT)
+    return scheduler, recorder, blocker
+
+
+def run_queued(scheduler, recorder, blocker, jobs):
+    recorder.gate.set()
+    blocker.wait(WAIT)
+    for job in jobs:
+        try:
+            job.wait(WAIT)
+        except JobSuperseded:
+            pass
+    return recorder.order
+
+
+def test_result_round_trip():
+    scheduler = AnalysisScheduler(lambda a, b: a + b)
+    job = scheduler.submit("car1", "normal", 2, 3)
+    assert job.wait(WAIT) == 5
+    assert job.run_time >= 0.0 and job.queue_wait >= 0.0
+    assert scheduler.stats["completed"] == 1
+
+
+def test_handler_error_raised_in_waiter():
+    def fail(_):
+        raise RuntimeError("Gemini down")
+
+    scheduler = AnalysisScheduler(fail)
+    with pytest.raises(RuntimeError, match="Gemini down"):
+        scheduler.submit("car1", "normal", None).wait(WAIT)
+    assert scheduler.stats["failed"] == 1
+
+
+def test_urgent_before_normal():
+    scheduler, recorder, blocker = blocked_scheduler()
+    jobs = [
+        scheduler.submit("car1", "normal", "n1"),
+        scheduler.submit("car2", "normal", "n2"),
+        scheduler.submit("car3", "urgent", "u3"),
+    ]
+    assert run_queued(scheduler, recorder, blocker, jobs) == ["u3", "n1", "n2"]
+
+
+def test_unknown_priority_counts_as_normal():
+    scheduler, recorder, blocker = blocked_scheduler()
+    jobs = [
+        scheduler.submit("car1", "whenever", "x1"),
+        scheduler.submit("car2", "urgent", "u2"),
+    ]
+    assert jobs[0].priority == "normal"
+    assert run_queued(scheduler, recorder, blocker, jobs) == ["u2", "x1"]
+
+
+def test_newer_frame_supersedes_queued_one():
+    scheduler, recorder, blocker = blocked_scheduler()
+    old = scheduler.submit("car1", "normal", "old")
+    new = scheduler.submit("car1", "normal", "new")
+    with pytest.raises(JobSuperseded):
+        old.wait(WAIT)
+    assert scheduler.queue_depth() == 1
+    assert run_queued(scheduler, recorder, blocker, [new]) == ["new"]
+    assert scheduler.stats["superseded"] == 1
+
+
+def test_superseding_frame_keeps_urgency():
+    scheduler, recorder, blocker = blocked_scheduler()
+    scheduler.submit("car1", "urgent", "old")
+    other = scheduler.submit("car2", "normal", "other")
+    replacement = scheduler.submit("car1", "normal", "new")
+    assert replacement.priority == "urgent"
+    order = run_queued(scheduler, recorder, blocker, [other, replacement])
+    assert order == ["new", "other"]
+
+
+def block(scheduler, recorder):
+    """Occupy the worker of a running scheduler with a blocker job."""
+    recorder.gate.clear()
+    recorder.started.clear()
+    blocker = scheduler.submit("blocker-car", "normal", "blocker")
+    assert recorder.started.wait(WAIT)
+    return blocker
+
+
+def test_fair_share_between_cars():
+    """A car that just had several analyses waits behind one that had none"""
+    recorder = Recorder()
+    recorder.gate.set()
+    scheduler = AnalysisScheduler(recorder)
+    for i in range(3):
+        scheduler.submit("chatty", "normal", f"c{i}").wait(WAIT)
+    blocker = block(scheduler, recorder)
+    jobs = [
+        scheduler.submit("chatty", "normal", "c3"),
+        scheduler.submit("quiet", "normal", "q0"),
+    ]
+    order = run_queued(scheduler, recorder, blocker, jobs)
+    assert order == ["c0", "c1", "c2", "q0", "c3"]
+
+
+@pytest.mark.parametrize("weight, expected", [(1.0, ["s2", "f2"]), (2.0, ["f2", "s2"])])
+def test_weighted_share(weight, expected):
+    """After equal service, a weight-2 car is owed more and goes first"""
+    recorder = Recorder()
+    recorder.gate.set()
+    scheduler = AnalysisScheduler(recorder, weights={"fast": weight})
+    for i in range(2):
+        scheduler.submit("fast", "normal", f"f{i}").wait(WAIT)
+        scheduler.submit("slow", "normal", f"s{i}").wait(WAIT)
+    blocker = block(scheduler, recorder)
+    jobs = [
+        scheduler.submit("slow", "normal", "s2"),
+        scheduler.submit("fast", "normal", "f2"),
+    ]
+    assert run_queued(scheduler, recorder, blocker, jobs)[-2:] == expected
+
+
+def test_jobs_run_in_submitters_context():
+    current = contextvars.ContextVar("current", default=None)
+    scheduler = AnalysisScheduler(lambda: current.get())
+    current.set("request-42")
+    assert scheduler.submit("car1", "normal").wait(WAIT) == "request-42"
+
+
+def test_wait_timeout():
+    scheduler, recorder, blocker = blocked_scheduler()
+    job = scheduler.submit("car1", "normal", "late")
+    with pytest.raises(TimeoutError):
+        job.wait(0.01)
+    run_queued(scheduler, recorder, blocker, [job])
+
+
+def test_other_kinds_are_not_superseded():
+    """A plain frame does not cancel the same car's queued sweep or confirm"""
+    scheduler, recorder, blocker = blocked_scheduler()
+    jobs = [
+        scheduler.submit("car1", "normal", "sweep", kind="sweep"),
+        scheduler.submit("car1", "normal", "confirm", kind="confirm"),
+        scheduler.submit("car1", "normal", "frame", kind="frame"),
+    ]
+    assert scheduler.queue_depth() == 3
+    assert run_queued(scheduler, recorder, blocker, jobs) == [
+        "sweep",
+        "confirm",
+        "frame",
+    ]
+    assert scheduler.stats["superseded"] == 0
+
+
+def test_superseded_frames_are_not_charged():
+    """A car whose queued frames kept being replaced paid for one analysis"""
+    scheduler, recorder, blocker = blocked_scheduler()
+    jobs = [scheduler.submit("other", "normal", "o0")]
+    for i in range(4):
+        jobs.append(scheduler.submit("busy", "normal", f"b{i}"))
+    assert run_queued(scheduler, recorder, blocker, jobs) == ["o0", "b3"]
+    blocker = block(scheduler, recorder)
+    jobs = [
+        scheduler.submit("busy", "normal", "b4"),
+        scheduler.submit("other", "normal", "o1"),
+    ]
+    assert run_queued(scheduler, recorder, blocker, jobs)[-2:] == ["b4", "o1"]
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Tests for the delta-encoded frame uploads (XORed tiles, zlib, CRC checks)
+"""
+
+import numpy as np
+import pytest
+
+import frame_codec
+from frame_codec import (
+    DeltaEncoder,
+    FrameMismatch,
+    decode_delta,
+    encode_delta,
+    frame_crc,
+)
+
+
+def random_frame(seed=0, height=48, width=64):
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+
+
+def test_round_trip_reconstructs_changed_tiles():
+    """Changed tiles arrive exactly; the receiver's frame matches the sender's"""
+    reference = random_frame(0)
+    frame = reference.copy()
+    frame[:16, :16] = 255 - frame[:16, :16]
+    data, reconstruction, changed = encode_delta(frame, reference)
+    decoded = decode_delta(data, reference)
+    assert np.array_equal(decoded, reconstruction)
+    assert np.array_equal(decoded, frame)
+    assert changed == pytest.approx(1 / 12)  # One of 3 x 4 tiles
+
+
+def test_identical_frames_send_no_tiles():
+    reference = random_frame(1)
+    data, reconstruction, changed = encode_delta(reference.copy(), reference)
+    assert changed == 0.0
+    assert np.array_equal(decode_delta(data, reference), reference)
+
+
+def test_noise_within_tolerance_keeps_reference_pixels():
+    """Sensor noise is not sent; both sides keep the reference tile"""
+    reference = np.full((32, 32, 3), 100, dtype=np.uint8)
+    frame = reference + np.uint8(2)
+    data, reconstruction, changed = encode_delta(frame, reference)
+    assert changed == 0.0
+    assert np.array_equal(reconstruction, reference)
+    assert np.array_equal(decode_delta(data, reference), reference)
+
+
+def test_single_large_pixel_change_is_sent():
+    """One pixel beyond PIXEL_TOLERANCE changes its tile despite a low mean"""
+    reference = np.full((32, 32, 3), 100, dtype=np.uint8)
+    frame = reference.copy()
+    frame[5, 5] = 100 + frame_codec.PIXEL_TOLERANCE + 10
+    data, reconstruction, changed = encode_delta(frame, reference)
+    assert changed == 0.25
+    assert np.array_equal(decode_delta(data, reference), frame)
+
+
+def test_frame_size_not_a_multiple_of_tile():
+    """Edge tiles are padded for encoding and cropped again on decoding"""
+    reference = random_frame(2, 37, 53)
+    frame = random_frame(3, 37, 53)
+    data, reconstruction, _ = encode_delta(frame, reference)
+    decoded = decode_delta(data, reference)
+    assert decoded.shape == (37, 53, 3)
+    assert np.array_equal(decoded, frame)
+
+
+def test_wrong_reference_rejected():
+    reference = random_frame(4)
+    data, _, _ = encode_delta(random_frame(5), reference)
+    with pytest.raises(FrameMismatch):
+        decode_delta(data, random_frame(6))
+    with pytest.raises(FrameMismatch):
+        decode_delta(data, None)
+    with pytest.raises(FrameMismatch):
+        decode_delta(data, random_frame(4, 32, 32))
+
+
+def test_truncated_and_corrupted_deltas_rejected():
+    reference = random_frame(7)
+    frame = reference.copy()
+    frame[20:30, 20:30] = 0
+    data, _, _ = encode_delta(frame, reference)
+    with pytest.raises(FrameMismatch):
+        decode_delta(data[:10], reference)
+    with pytest.raises(FrameMismatch):
+        decode_delta(b"XXXX" + data[4:], reference)
+    with pytest.raises(FrameMismatch):
+        decode_delta(data[:-4], reference)
+    corrupted = bytearray(data)
+    corrupted[-1] ^= 0xFF
+    with pytest.raises(FrameMismatch):
+        decode_delta(bytes(corrupted), reference)
+
+
+def test_frame_crc_depends_on_pixels():
+    frame = random_frame(8)
+    other = frame.copy()
+    other[0, 0, 0] ^= 1
+    assert frame_crc(frame) == frame_crc(frame.copy())
+    assert frame_crc(frame) != frame_crc(other)
+
+
+def test_encoder_keyframe_then_deltas_then_interval():
+    """Keyframe first, deltas after each commit, a keyframe after the interval"""
+    encoder = DeltaEncoder(keyframe_interval=2)
+    frame = random_frame(9)
+    assert encoder.encode(frame) is None
+    encoder.commit()
+    laptop = frame
+    for _ in range(2):
+        moved = laptop.copy()
+        moved[:16] = 0
+        data = encoder.encode(moved)
+        assert data is not None
+        laptop = decode_delta(data, laptop)
+        encoder.commit()
+    assert encoder.encode(laptop) is None
+
+
+def test_encoder_uncommitted_delta_does_not_move_reference():
+    """Without commit() the next delta is still made against the old reference"""
+    encoder = DeltaEncoder()
+    frame = random_frame(10)
+    encoder.encode(frame)
+    encoder.commit()
+    changed = frame.copy()
+    changed[:16, :16] = 0
+    encoder.encode(changed)  # Lost on the way: no commit
+    again = encoder.encode(changed)
+    assert np.array_equal(decode_delta(again, frame), changed)
+
+
+def test_encoder_keyframe_on_size_change_reset_and_big_change():
+    encoder = DeltaEncoder()
+    frame = random_frame(11)
+    encoder.encode(frame)
+    encoder.commit()
+    assert encoder.encode(random_frame(12, 32, 32)) is None  # Other size
+    assert encoder.encode(random_frame(13)) is None  # Most tiles changed
+    encoder.reset()
+    assert encoder.encode(frame) is None
+
+
+def test_encoder_commits_in_flight_uploads_by_frame_id():
+    """Committing a frame drops older pending ones; a late commit changes nothing"""
+    encoder = DeltaEncoder()
+    frame = random_frame(14)
+    encoder.encode(frame, 1)
+    encoder.commit(1)
+    first = frame.copy()
+    first[:16, :16] = 0
+    second = frame.copy()
+    second[16:32, :16] = 0
+    encoder.encode(first, 2)
+    encoder.encode(second, 3)
+    encoder.commit(3)
+    encoder.commit(2)  # Its answer came back last
+    changed = second.copy()
+    changed[32:, :16] = 0
+    data = encoder.encode(changed, 4)
+    assert np.array_equal(decode_delta(data, second), changed)
+
+
+def test_encoder_forgets_uploads_that_never_finish():
+    encoder = DeltaEncoder()
+    for frame_id in range(frame_codec.MAX_PENDING + 3):
+        encoder.encode(random_frame(15), frame_id)
+    assert len(encoder._pending) == frame_codec.MAX_PENDING
+    encoder.commit(0)  # Forgotten
+    assert encoder.encode(random_frame(15), 99) is None
@@ -4,12 +4,14 @@ Test script for the Autonomous RC Car MCP Server
 Tests all movement functions and photo analysis capabilities
 """
 
+import os
 import requests
 import time
 import json
 
 # Test configuration
-BASE_URL = "http://10.33.35.1:5000"  # Flask server
+BASE_URL = os.environ.get("PI_URL", "http://10.33.35.1:5000")  # Flask server
+LAPTOP_IP = os.environ.get("LAPTOP_IP", "10.33.49.88")  # Analyzer laptop
 MCP_SERVER_URL = "http://localhost:8000"  # MCP server (if running as HTTP)
 
 
@@ -53,7 +55,7 @@ def test_photo_endpoint():
     try:
         payload = {
             "goal": "Find a red ball on the ground",
-            "laptop_ip": "10.33.49.88",
+            "laptop_ip": LAPTOP_IP,
             "laptop_port": 8000,
         }
 
@@ -104,7 +106,7 @@ def test_autonomous_navigation_simulation():
     # Step 1: Take initial photo
     print("\nStep 1: Taking initial photo...")
     try:
-        payload = {"goal": goal, "laptop_ip": "10.33.49.88", "laptop_port": 8000}
+        payload = {"goal": goal, "laptop_ip": LAPTOP_IP, "laptop_port": 8000}
         response = requests.post(f"{BASE_URL}/photo", json=payload, timeout=15)
         print(f"Photo analysis: {response.json()}")
     except Exception as e:
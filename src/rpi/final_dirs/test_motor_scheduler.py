@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Tests for the motor scheduler: segments, the watchdog, stop_segment and history
+"""
+
+import threading
+import time
+
+import pytest
+
+import motor_scheduler
+from motor_scheduler import MotorScheduler
+
+
+class Pins:
+    """Records drive/halt calls in place of the GPIO pins."""
+
+    def __init__(self):
+        self.calls = []
+        self.halted = threading.Event()
+
+    def drive(self, action, duty):
+        self.calls.append(("drive", action, duty))
+        self.halted.clear()
+
+    def halt(self):
+        self.calls.append(("halt",))
+        self.halted.set()
+
+
+@pytest.fixture
+def pins():
+    return Pins()
+
+
+@pytest.fixture
+def motors(pins):
+    motors = MotorScheduler(pins.drive, pins.halt)
+    yield motors
+    motors.stop()
+
+
+def test_start_and_stop_record_segment(pins, motors):
+    segment = motors.start("forward", 40.0, 5.0)
+    assert motors.moving
+    assert segment["end"] is None
+    assert ("drive", "forward", 40.0) in pins.calls
+    stopped = motors.stop()
+    assert stopped is segment
+    assert not motors.moving
+    assert segment["end"] >= segment["start"]
+    assert pins.calls[-1] == ("halt",)
+    assert motors.stop() is None
+
+
+def test_new_start_ends_running_segment(motors):
+    first = motors.start("left", 30.0, 5.0)
+    second = motors.start("right", 30.0, 5.0)
+    assert first["end"] is not None
+    assert [s["action"] for s in motors.history()] == ["left", "right"]
+    assert motors.history()[-1]["end"] is None
+    assert second["end"] is None
+
+
+def test_watchdog_stops_forgotten_motion(pins, motors):
+    """A motion nobody stops is halted after max_duration"""
+    segment = motors.start("forward", 40.0, 0.05)
+    assert pins.halted.wait(5.0)
+    deadline = time.monotonic() + 5.0
+    while motors.moving and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not motors.moving
+    assert segment["end"] is not None
+
+
+def test_watchdog_leaves_later_segment_alone(motors):
+    """An expired timer for an old segment does not stop the current one"""
+    old = motors.start("forward", 40.0, 5.0)
+    current = motors.start("left", 30.0, 5.0)
+    motors._expire(old)
+    assert motors.moving
+    assert current["end"] is None
+
+
+def test_stop_segment_only_stops_its_own_motion(motors):
+    first = dict(motors.start("forward", 40.0, 5.0))  # A copy, like a client's
+    assert motors.stop_segment(first)
+    assert not motors.moving
+    assert not motors.stop_segment(first)  # Already stopped
+    motors.start("forward", 40.0, 5.0)
+    assert not motors.stop_segment(first)  # A newer motion keeps running
+    assert motors.moving
+
+
+def test_run_blocks_for_duration(motors):
+    actual = motors.run("forward", 0.05, 40.0)
+    assert actual == pytest.approx(0.05, abs=0.04)
+    assert not motors.moving
+    assert motors.history()[-1]["requested"] == 0.05
+
+
+def test_run_returns_early_when_stopped(motors):
+    """Another caller's stop() cuts a blocking pulse short"""
+    threading.Timer(0.05, motors.stop).start()
+    actual = motors.run("forward", 5.0, 40.0)
+    assert actual < 1.0
+    assert not motors.moving
+
+
+def test_on_segment_gets_finished_copies(pins):
+    finished = []
+    motors = MotorScheduler(pins.drive, pins.halt, on_segment=finished.append)
+    segment = motors.start("right", 30.0, 5.0)
+    motors.stop()
+    assert finished == [segment]
+    assert finished[0] is not segment
+
+
+def test_history_since_and_last_motion_end(pins):
+    now = [0.0]
+    motors = MotorScheduler(pins.drive, pins.halt, clock=lambda: now[0])
+    assert motors.last_motion_end() is None
+    motors.start("forward", 40.0, 5.0)
+    now[0] = 1.0
+    motors.stop()
+    now[0] = 2.0
+    motors.start("left", 30.0, 5.0)
+    assert motors.last_motion_end() == 2.0  # Moving: now
+    now[0] = 3.0
+    motors.stop()
+    assert motors.last_motion_end() == 3.0
+    assert [s["action"] for s in motors.history(since=1.5)] == ["left"]
+    assert len(motors.history()) == 2
+
+
+def test_history_is_bounded(motors):
+    for _ in range(motor_scheduler.HISTORY_LENGTH + 5):
+        motors.start("forward", 40.0, 5.0)
+    motors.stop()
+    assert len(motors.history()) == motor_scheduler.HISTORY_LENGTH
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Tests for the dead-reckoning pose tracker: motion model, uncertainty growth
+and target fixes
+"""
+
+import math
+
+import pytest
+
+from car_registry import Calibration
+from pose_tracker import (
+    ACTION_BEARINGS,
+    DEFAULT_TARGET_DISTANCE,
+    GOAL_REACH_DISTANCE,
+    PoseTracker,
+    wrap_degrees,
+)
+
+
+@pytest.fixture
+def tracker():
+    return PoseTracker(Calibration())
+
+
+def test_wrap_degrees():
+    assert wrap_degrees(0.0) == 0.0
+    assert wrap_degrees(190.0) == -170.0
+    assert wrap_degrees(-190.0) == 170.0
+    assert wrap_degrees(180.0) == -180.0
+    assert wrap_degrees(720.0 + 45.0) == 45.0
+
+
+def test_forward_and_backward(tracker):
+    """Distance is calibrated speed x on-time, scaled by the duty cycle"""
+    pose = tracker.apply_command("forward", 2.0)
+    assert pose["x"] == pytest.approx(0.7)
+    assert pose["y"] == 0.0
+    assert pose["odometry"] == pytest.approx(0.7)
+    pose = tracker.apply_command("forward", 1.0, duty_cycle=50.0)  # Double speed
+    assert pose["x"] == pytest.approx(1.4)
+    pose = tracker.apply_command("backward", 1.0)
+    assert pose["x"] == pytest.approx(1.05)
+    assert pose["odometry"] == pytest.approx(1.75)
+    assert pose["commands_since_reset"] == 3
+
+
+def test_turns_are_left_positive_and_wrap(tracker):
+    assert tracker.apply_command("left", 0.2)["heading"] == pytest.approx(50.0)
+    assert tracker.apply_command("right", 0.4)["heading"] == pytest.approx(-50.0)
+    pose = tracker.apply_command("right", 0.6)
+    assert pose["heading"] == pytest.approx(160.0)  # -200 wrapped
+
+
+def test_drive_after_turn_follows_heading(tracker):
+    tracker.apply_command("left", 90.0 / 250.0)
+    pose = tracker.apply_command("forward", 1.0)
+    assert pose["x"] == pytest.approx(0.0, abs=1e-3)
+    assert pose["y"] == pytest.approx(0.35)
+
+
+def test_drift_bends_the_path():
+    tracker = PoseTracker(Calibration(drift_rate=10.0))
+    pose = tracker.apply_command("forward", 1.0)
+    assert pose["heading"] == pytest.approx(3.5)
+    assert pose["y"] > 0.0
+
+
+def test_uncertainty_grows_with_motion(tracker):
+    before = tracker.to_dict()
+    assert before["sigma_xy"] == 0.0 and before["sigma_heading"] == 0.0
+    tracker.apply_command("left", 0.2)
+    turned = tracker.var_heading
+    assert math.sqrt(turned) == pytest.approx(10.0)  # 0.2 x 50 degrees
+    tracker.apply_command("forward", 2.0)
+    assert tracker.to_dict()["sigma_xy"] > 0.0
+    assert tracker.var_heading > turned
+
+
+def test_unknown_direction(tracker):
+    with pytest.raises(ValueError):
+        tracker.apply_command("sideways", 1.0)
+    assert tracker.to_dict()["commands_since_reset"] == 0
+
+
+def test_first_fix_places_target(tracker):
+    pose = tracker.observe_target(90.0, 2.0)
+    assert pose["target"]["x"] == pytest.approx(0.0, abs=1e-3)
+    assert pose["target"]["y"] == pytest.approx(2.0)
+    assert pose["target"]["distance"] == pytest.approx(2.0)
+    assert pose["target"]["bearing"] == pytest.approx(90.0)
+    assert pose["target"]["sigma"] == pytest.approx(0.5)  # 25% of the range
+
+
+def test_fix_without_range_assumes_default(tracker):
+    pose = tracker.observe_target(0.0)
+    assert pose["target"]["x"] == pytest.approx(DEFAULT_TARGET_DISTANCE)
+    assert pose["target"]["sigma"] == pytest.approx(DEFAULT_TARGET_DISTANCE)
+
+
+def test_distance_sigma_sets_target_uncertainty(tracker):
+    pose = tracker.observe_target(0.0, 2.0, distance_sigma=1.2)
+    assert pose["target"]["sigma"] == pytest.approx(1.2)
+
+
+def test_repeated_fix_corrects_heading_and_shrinks_variance(tracker):
+    """The target's bearing pulls an uncertain heading back to the truth"""
+    tracker.observe_target(0.0, 2.0)
+    tracker.apply_command("left", 0.2)  # Believed +50 degrees, sigma 10
+    sigma_before = tracker.to_dict()["sigma_heading"]
+    # The car really turned 40 degrees: the target shows 40 degrees right
+    pose = tracker.observe_target(-40.0, 2.0, bearing_sigma=3.0)
+    assert 40.0 < pose["heading"] < 45.0
+    assert pose["sigma_heading"] < sigma_before
+
+
+def test_fix_moves_position_towards_target_evidence(tracker):
+    tracker.observe_target(0.0, 2.0, distance_sigma=0.05)
+    tracker.apply_command("forward", 2.0)  # Believed 0.7m
+    sigma_before = tracker.to_dict()["sigma_xy"]
+    # The target is really 1.2m away: the car only covered 0.8m
+    pose = tracker.observe_target(0.0, 1.2, bearing_sigma=3.0, distance_sigma=0.05)
+    assert 0.7 < pose["x"] <= 0.8
+    assert pose["sigma_xy"] < sigma_before
+
+
+def test_observe_analysis_codes(tracker):
+    assert tracker.observe_analysis("NOT_FOUND\nnothing") is None
+    assert tracker.observe_analysis(None) is None
+    pose = tracker.observe_analysis("MOVE_LEFT\nTarget on the left")
+    assert pose["target"]["bearing"] == pytest.approx(
+        ACTION_BEARINGS["MOVE_LEFT"], abs=0.05
+    )
+    fresh = PoseTracker()
+    pose = fresh.observe_analysis("GOAL_ACHIEVED\nThere")
+    assert pose["target"]["distance"] == pytest.approx(GOAL_REACH_DISTANCE)
+
+
+def test_reset(tracker):
+    tracker.apply_command("forward", 1.0)
+    tracker.observe_target(0.0, 1.0)
+    tracker.reset(1.0, 2.0, 30.0)
+    pose = tracker.to_dict()
+    assert (pose["x"], pose["y"], pose["heading"]) == (1.0, 2.0, 30.0)
+    assert pose["target"] is None
+    assert pose["sigma_xy"] == 0.0 and pose["odometry"] == 0.0
+    assert math.isclose(tracker.var_heading, 0.0)
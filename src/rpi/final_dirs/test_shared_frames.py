@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared-memory frame ring and the capture process around it
+"""
+
+import json
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import logs
+import shared_frames
+from shared_frames import CaptureProcess, SharedFrameRing
+
+
+@pytest.fixture
+def ring():
+    ring = SharedFrameRing.create(capacity=4, slot_bytes=64 * 48 * 3)
+    yield ring
+    ring.close()
+
+
+def frame(value, height=48, width=64):
+    return np.full((height, width, 3), value, dtype=np.uint8)
+
+
+def test_empty_ring():
+    """An empty ring has no latest frame and times out waiting"""
+    ring = SharedFrameRing.create(capacity=2, slot_bytes=300)
+    try:
+        assert ring.latest() is None
+        assert ring.frames() == []
+        assert ring.wait_newer(0, 0.02) is None
+    finally:
+        ring.close()
+
+
+def test_push_latest_round_trip(ring):
+    """A pushed frame reads back with its pixels, sequence number and time"""
+    image = np.arange(48 * 64 * 3, dtype=np.uint32).astype(np.uint8)
+    image = image.reshape(48, 64, 3)
+    ring.push(image, timestamp=12.5)
+    latest = ring.latest()
+    assert latest.seq == 1
+    assert latest.timestamp == 12.5
+    assert np.array_equal(latest.image, image)
+    assert not latest.image.flags.writeable
+
+
+def test_other_shapes_and_oversized_frames(ring):
+    """Smaller frames keep their shape; ones larger than a slot are halved"""
+    ring.push(frame(1, 10, 20))
+    assert ring.latest().image.shape == (10, 20, 3)
+    ring.push(frame(2, 96, 128))
+    assert ring.latest().image.shape == (48, 64, 3)
+
+
+def test_wraparound_keeps_last_capacity_frames(ring):
+    """After more pushes than slots, only the newest `capacity` frames remain"""
+    for value in range(1, 11):
+        ring.push(frame(value))
+    frames = ring.frames()
+    assert [f.seq for f in frames] == [7, 8, 9, 10]
+    assert [int(f.image[0, 0, 0]) for f in frames] == [7, 8, 9, 10]
+
+
+def test_intact_until_slot_reused(ring):
+    """A frame view stays intact until the writer comes round to its slot"""
+    first = ring.push(frame(1))
+    for value in range(2, 5):
+        ring.push(frame(value))
+    assert ring.intact(first)
+    ring.push(frame(5))
+    assert not ring.intact(first)
+    assert ring._read(first.seq) is None
+
+
+def test_torn_slot_not_returned(ring):
+    """A slot with an odd version (mid-write) is not handed to readers"""
+    ring.push(frame(1))
+    ring._meta[0][shared_frames._VERSION] += 1
+    assert ring.latest() is None
+    ring._meta[0][shared_frames._VERSION] += 1
+    assert ring.latest().seq == 1
+
+
+def test_attach_sees_frames_of_creator(ring):
+    """A second mapping of the same block reads the creator's frames"""
+    reader = SharedFrameRing.attach(ring.name)
+    try:
+        ring.push(frame(9))
+        assert reader.capacity == ring.capacity
+        assert int(reader.latest().image[0, 0, 0]) == 9
+    finally:
+        reader.close()
+
+
+def test_concurrent_reader_never_sees_torn_frame(ring):
+    """Every frame a reader gets while the writer runs is a single push"""
+    done = threading.Event()
+
+    def write():
+        for value in range(2000):
+            ring.push(frame(value % 256))
+        done.set()
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    checked = 0
+    while not done.is_set():
+        latest = ring.latest()
+        if latest is None:
+            continue
+        pixels = np.array(latest.image)
+        if ring.intact(latest):
+            assert (pixels == pixels[0, 0, 0]).all()
+            checked += 1
+    writer.join()
+    assert checked > 0
+
+
+def grab_gray():
+    time.sleep(0.005)
+    return frame(128)
+
+
+def test_capture_process_concurrent_start_single_writer(ring):
+    """Concurrent starts spawn one capture process"""
+    capture = CaptureProcess(ring, grabber=grab_gray, start_viewfinder=False)
+    spawned = []
+    original = capture._launch
+
+    def launch():
+        launched = original()
+        if launched is not None:
+            spawned.append(capture._process)
+        return launched
+
+    capture._launch = launch
+    try:
+        threads = [
+            threading.Thread(target=capture.acquire, args=(5.0,)) for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(spawned) == 1
+        assert capture.running
+    finally:
+        for _ in range(8):
+            capture.release()
+    assert not capture.running
+
+
+def test_capture_process_release_keeps_started_stream(ring):
+    """release() leaves capture running for start(), and stop() waits for users"""
+    capture = CaptureProcess(ring, grabber=grab_gray, start_viewfinder=False)
+    try:
+        assert capture.start(5.0)
+        assert capture.acquire(5.0)
+        capture.release()
+        assert capture.running
+
+        assert capture.acquire(5.0)
+        capture.stop()
+        assert capture.running  # A photo is still using it
+        capture.release()
+        assert not capture.running
+    finally:
+        capture.stop()
+
+
+def fail_grab():
+    raise OSError("camera gone")
+
+
+def test_capture_process_logs_grab_failures_rate_limited(ring, tmp_path, monkeypatch):
+    """A failing camera logs one line per window to the capture process's log"""
+    monkeypatch.setattr(logs, "LOG_DIR", str(tmp_path))
+    capture = CaptureProcess(ring, grabber=fail_grab, start_viewfinder=False)
+    assert not capture.start(0.5)  # Five failed grabs or so
+    capture.stop()
+    lines = [
+        json.loads(line)
+        for line in (tmp_path / "pi-capture.log").read_text().splitlines()
+    ]
+    failures = [line for line in lines if line["message"] == "Frame grab failed"]
+    assert len(failures) == 1
+    assert failures[0]["error"] == "camera gone"
+    assert ring.errors >= 2
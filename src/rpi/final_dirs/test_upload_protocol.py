@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Tests for the binary frame upload header, streaming helpers and goal interning
+"""
+
+import io
+import struct
+
+import pytest
+
+import upload_protocol
+from upload_protocol import (
+    FLAG_CONFIRM,
+    FLAG_URGENT,
+    HEADER_SIZE,
+    GoalTable,
+    UploadLink,
+    iter_chunks,
+    pack_header,
+    parse_header,
+    read_exact,
+)
+
+
+def header(**overrides):
+    fields = dict(
+        car_id="car1",
+        frame_id=7,
+        timestamp=1234.5,
+        width=640,
+        height=480,
+        pixel_format="rgb24",
+        goal_id=3,
+        goal=b"Find a red ball",
+        payload_length=640 * 480 * 3,
+    )
+    fields.update(overrides)
+    return pack_header(**fields)
+
+
+def test_header_round_trip():
+    """Every field comes back as it was packed, the goal text follows the header"""
+    data = header(urgent=True)
+    parsed = parse_header(data)
+    assert parsed.car_id == "car1"
+    assert parsed.frame_id == 7
+    assert parsed.timestamp == 1234.5
+    assert (parsed.width, parsed.height) == (640, 480)
+    assert parsed.pixel_format == "rgb24"
+    assert parsed.goal_id == 3
+    assert parsed.goal_length == len(b"Find a red ball")
+    assert parsed.payload_length == 640 * 480 * 3
+    assert parsed.flags == FLAG_URGENT
+    assert data[HEADER_SIZE:] == b"Find a red ball"
+
+
+def test_flags_and_formats():
+    assert parse_header(header()).flags == 0
+    assert parse_header(header(confirm=True)).flags == FLAG_CONFIRM
+    both = parse_header(header(urgent=True, confirm=True)).flags
+    assert both == FLAG_URGENT | FLAG_CONFIRM
+    for name in upload_protocol.PIXEL_FORMATS:
+        assert parse_header(header(pixel_format=name)).pixel_format == name
+
+
+def test_known_goal_sends_no_text():
+    data = header(goal=b"")
+    assert len(data) == HEADER_SIZE
+    assert parse_header(data).goal_length == 0
+
+
+def test_long_car_id_truncated_to_field():
+    parsed = parse_header(header(car_id="a-very-long-car-identifier"))
+    assert parsed.car_id == "a-very-long-car-"
+
+
+def test_bad_headers_rejected():
+    data = bytearray(header())
+    with pytest.raises(ValueError):
+        parse_header(b"XXXX" + bytes(data[4:]))
+    wrong_version = bytearray(data)
+    wrong_version[4] = upload_protocol.VERSION + 1
+    with pytest.raises(ValueError):
+        parse_header(bytes(wrong_version))
+    with pytest.raises(ValueError):
+        parse_header(header(payload_length=upload_protocol.MAX_PAYLOAD + 1))
+    unknown_format = bytearray(data)
+    offset = struct.calcsize("<4sBB16sIdHH")
+    unknown_format[offset] = 99
+    with pytest.raises(ValueError):
+        parse_header(bytes(unknown_format))
+    with pytest.raises(struct.error):
+        parse_header(bytes(data[: HEADER_SIZE - 1]))
+
+
+class Trickle(io.RawIOBase):
+    """A stream handing out at most a few bytes per read, like a slow socket."""
+
+    def __init__(self, data, step=3):
+        self.data = io.BytesIO(data)
+        self.step = step
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        chunk = self.data.read(min(self.step, len(buffer)))
+        buffer[: len(chunk)] = chunk
+        return len(chunk)
+
+
+class ReadOnly:
+    """A stream with read() only."""
+
+    def __init__(self, data):
+        self.data = io.BytesIO(data)
+
+    def read(self, size):
+        return self.data.read(min(size, 5))
+
+
+def test_read_exact_over_short_reads():
+    data = bytes(range(256)) * 4
+    assert read_exact(Trickle(data), len(data)) == data
+    assert read_exact(ReadOnly(data), 100) == data[:100]
+    assert read_exact(io.BytesIO(b""), 0) == b""
+
+
+def test_read_exact_truncated():
+    with pytest.raises(ValueError, match="truncated"):
+        read_exact(io.BytesIO(b"abc"), 10)
+
+
+def test_iter_chunks_streams_header_then_payload():
+    head = header()
+    payload = bytes(range(256)) * 1000
+    chunks = list(iter_chunks(head, payload, chunk_size=4096))
+    assert chunks[0] == head
+    assert all(len(c) <= 4096 for c in chunks[1:])
+    assert b"".join(bytes(c) for c in chunks) == head + payload
+    assert list(iter_chunks(head, b"")) == [head]
+
+
+def test_goal_table_interning():
+    """A goal's text goes out until the laptop confirms it, and again after forget()"""
+    goals = GoalTable()
+    first = goals.lookup("red ball")
+    assert first == (1, b"red ball")
+    assert goals.lookup("red ball") == (1, b"red ball")
+    goals.confirm("red ball")
+    assert goals.lookup("red ball") == (1, b"")
+    assert goals.lookup("blue cup") == (2, b"blue cup")
+    goals.forget()
+    assert goals.lookup("red ball") == (1, b"red ball")
+
+
+def test_frame_ids_wrap():
+    link = UploadLink()
+    assert link.next_frame_id() == 1
+    link.frame_id = 0xFFFFFFFF
+    assert link.next_frame_id() == 0
+
+
+def test_multibyte_car_id_cut_on_character_boundary():
+    parsed = parse_header(header(car_id="cars-éééééé"))  # 17 bytes in UTF-8
+    assert parsed.car_id == "cars-ééééé"
+
+
+def test_goal_too_long_for_length_field():
+    with pytest.raises(ValueError, match="Goal"):
+        header(goal=b"x" * (upload_protocol.MAX_GOAL_BYTES + 1))
+    longest = header(goal=b"x" * upload_protocol.MAX_GOAL_BYTES)
+    assert parse_header(longest).goal_length == upload_protocol.MAX_GOAL_BYTES
@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+End-to-end request tracing from an MCP tool call to the Gemini response.
+
+The MCP server starts a trace per photo, with a fresh trace ID, and sends
+the ID and its span's ID along in the X-Trace-Id and X-Parent-Span-Id
+headers. Each service that gets those headers (see traced) records its own
+spans under that parent and returns them in the X-Trace-Spans response
+header. Spans are timed with time.monotonic(), relative to the start of
+that service's request span.
+
+Monotonic clocks on different machines are not comparable. A caller
+therefore places a remote service's spans inside its own span around the
+HTTP call, with the network time split evenly before and after them. The
+media service does this for the laptop's spans and the MCP server for the
+media service's, so the MCP server ends up with the whole tree. It appends
+the tree to a local JSON-lines file (TRACE_FILE), and no collector is
+needed. Show a waterfall with:
+
+    python -m tracing              # the latest trace
+    python -m tracing <trace ID>   # or a given one; --list shows them all
+
+In code:
+
+    with tracing.span("encode", bytes=len(payload)):
+        ...
+
+tracing.span is a no-op outside a trace, so instrumented code costs about
+a context-variable lookup when nobody is tracing.
+"""
+
+import argparse
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+TRACE_HEADER = "X-Trace-Id"
+PARENT_HEADER = "X-Parent-Span-Id"
+SPANS_HEADER = "X-Trace-Spans"
+TRACE_FILE = os.environ.get("TRACE_FILE", "traces.jsonl")
+TRACE_FILE_MAX_BYTES = 5 * 1024 * 1024  # Rotated to <file>.1 beyond this
+ENABLED = os.environ.get("TRACING", "1") != "0"  # Whether the MCP server starts traces
+
+_current = contextvars.ContextVar("ht6_span", default=None)
+# Called with each finished Trace a traced view served (e.g. FlightRecorder.spans)
+on_finish = []
+_file_lock = threading.Lock()
+
+
+def _new_id(size: int = 8) -> str:
+    return os.urandom(size).hex()
+
+
+class Trace:
+    """The spans of one request, as seen by one process."""
+
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.spans: List["Span"] = []  # In start order; the first is the root
+
+    @property
+    def root(self) -> "Span":
+        return self.spans[0]
+
+    def export(self) -> List[dict]:
+        """Finished spans with times in ms from the root's start."""
+        origin = self.root.start
+        return [
+            {
+                "id": s.span_id,
+                "parent": s.parent_id,
+                "name": s.name,
+                "process": s.process,
+                "start_ms": round((s.start - origin) * 1000.0, 3),
+                "duration_ms": round(s.duration * 1000.0, 3),
+                **({"attrs": s.attrs} if s.attrs else {}),
+            }
+            for s in list(self.spans)
+            if s.end is not None
+        ]
+
+
+class Span:
+    """A timed step; use as a context manager to make it the current span."""
+
+    __slots__ = (
+        "trace",
+        "span_id",
+        "parent_id",
+        "name",
+        "process",
+        "attrs",
+        "start",
+        "end",
+        "_token",
+    )
+
+    def __init__(self, trace, name, parent_id, process, attrs, start=None, end=None):
+        self.trace = trace
+        self.span_id = _new_id(4)
+        self.parent_id = parent_id
+        self.name = name
+        self.process = process
+        self.attrs = attrs
+        self.start = start
+        self.end = end
+        trace.spans.append(self)
+
+    @property
+    def duration(self) -> float:
+        return (self.end if self.end is not None else time.monotonic()) - self.start
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self.start = time.monotonic()
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end = time.monotonic()
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        _current.reset(self._token)
+
+    def adopt(self, headers):
+        """
+        Add the spans a remote service returned in its response headers,
+        centred in this (finished) span around the call to it.
+        """
+        raw = headers.get(SPANS_HEADER)
+        if not raw:
+            return
+        try:
+            spans = json.loads(raw)
+        except ValueError:
+            return
+        roots = [s for s in spans if s.get("parent") == self.span_id]
+        if not roots:
+            return
+        root = roots[0]
+        slack = max(0.0, self.duration - root["duration_ms"] / 1000.0)
+        offset = self.start + slack / 2.0 - root["start_ms"] / 1000.0
+        for s in spans:
+            start = offset + s["start_ms"] / 1000.0
+            remote = Span(
+                self.trace,
+                s["name"],
+                s["parent"],
+                s["process"],
+                s.get("attrs", {}),
+                start,
+                start + s["duration_ms"] / 1000.0,
+            )
+            remote.span_id = s["id"]
+
+
+class _NoSpan:
+    """Stands in for a span outside a trace; every operation does nothing."""
+
+    __slots__ = ()
+    span_id = None
+    trace = None
+
+    def set(self, **attrs):
+        pass
+
+    def adopt(self, headers):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+
+NO_SPAN = _NoSpan()
+
+
+def current() -> Optional[Span]:
+    return _current.get()
+
+
+def start_trace(
+    name: str,
+    process: str,
+    trace_id: Optional[str] = None,
+    parent_id: Optional[str] = None,
+    **attrs,
+):
+    """
+    Root span of this process' part of a trace: a new trace (if tracing is
+    enabled), or the one a caller's headers named (trace_id, parent_id).
+    """
+    if trace_id is None:
+        if not ENABLED:
+            return NO_SPAN
+        trace_id = _new_id()
+    return Span(Trace(trace_id), name, parent_id, process, attrs)
+
+
+def span(name: str, **attrs):
+    """A child of the current span, or NO_SPAN outside a trace."""
+    parent = _current.get()
+    if parent is None:
+        return NO_SPAN
+    return Span(parent.trace, name, parent.span_id, parent.process, attrs)
+
+
+def record(name: str, start: float, end: float, **attrs):
+    """Add a finished child of the current span with monotonic start and end."""
+    parent = _current.get()
+    if parent is not None:
+        Span(parent.trace, name, parent.span_id, parent.process, attrs, start, end)
+
+
+def inject(headers: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """headers plus the ones that continue the current trace in the callee."""
+    headers = dict(headers or {})
+    parent = _current.get()
+    if parent is not None:
+        headers[TRACE_HEADER] = parent.trace.trace_id
+        headers[PARENT_HEADER] = parent.span_id
+    return headers
+
+
+def traced(process: str):
+    """
+    Flask view decorator: when the request carries a trace ID, record the
+    view as a span of that trace and return its spans in X-Trace-Spans.
+    """
+
+    def decorate(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            from flask import make_response, request
+
+            trace_id = request.headers.get(TRACE_HEADER)
+            if not trace_id:
+                return view(*args, **kwargs)
+            root = start_trace(
+                request.path.strip("/") or view.__name__,
+                process,
+                trace_id,
+                request.headers.get(PARENT_HEADER),
+            )
+            with root:
+                response = make_response(view(*args, **kwargs))
+            root.set(status=response.status_code)
+            response.headers[SPANS_HEADER] = json.dumps(
+                root.trace.export(), separators=(",", ":")
+            )
+            for hook in on_finish:
+                hook(root.trace)
+            return response
+
+        return wrapper
+
+    return decorate
+
+
+def save(trace: Trace, path: str = TRACE_FILE) -> str:
+    """Append a finished trace to the trace file as one JSON line."""
+    root = trace.root
+    line = json.dumps(
+        {
+            "trace_id": trace.trace_id,
+            "name": root.name,
+            "recorded_at": time.time(),
+            "duration_ms": round(root.duration * 1000.0, 3),
+            "spans": trace.export(),
+        },
+        separators=(",", ":"),
+    )
+    with _file_lock:
+        try:
+            if os.path.getsize(path) > TRACE_FILE_MAX_BYTES:
+                os.replace(path, path + ".1")
+        except OSError:
+            pass
+        with open(path, "a") as f:
+            f.write(line + "\n")
+    return path
+
+
+def load(path: str = TRACE_FILE) -> List[dict]:
+    traces = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                traces.append(json.loads(line))
+    return traces
+
+
+def waterfall(trace: dict, width: int = 40) -> List[str]:
+    """Text waterfall of a saved trace: one bar per span, children indented."""
+    spans = trace["spans"]
+    children: Dict[Optional[str], List[dict]] = {}
+    ids = {s["id"] for s in spans}
+    for s in spans:
+        parent = s["parent"] if s["parent"] in ids else None
+        children.setdefault(parent, []).append(s)
+    total = max((s["start_ms"] + s["duration_ms"] for s in spans), default=0.0)
+    scale = width / total if total else 0.0
+    lines = [f"trace {trace['trace_id']}  {trace['name']}  {total:.1f}ms"]
+
+    def walk(parent, depth):
+        for s in sorted(children.get(parent, []), key=lambda s: s["start_ms"]):
+            begin = min(width - 1, int(s["start_ms"] * scale))
+            length = max(1, int(round(s["duration_ms"] * scale)))
+            bar = " " * begin + "#" * min(length, width - begin)
+            label = "  " * depth + s["name"]
+            lines.append(
+                f"{s['process']:<9} {label:<28} |{bar:<{width}}| "
+                f"{s['duration_ms']:8.1f}ms"
+            )
+            walk(s["id"], depth + 1)
+
+    walk(None, 0)
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Show a waterfall of a saved trace (the latest by default)."
+    )
+    parser.add_argument("trace_id", nargs="?", help="Trace ID or a prefix of it")
+    parser.add_argument("--file", default=TRACE_FILE)
+    parser.add_argument("--list", action="store_true", help="List saved traces")
+    parser.add_argument("--width", type=int, default=40)
+    args = parser.parse_args()
+
+    try:
+        traces = load(args.file)
+    except FileNotFoundError:
+        parser.exit(1, f"No trace file at {args.file}\n")
+    if args.list:
+        for t in traces:
+            when = time.strftime("%H:%M:%S", time.localtime(t["recorded_at"]))
+            print(f"{t['trace_id']}  {when}  {t['duration_ms']:8.1f}ms  {t['name']}")
+        return
+    if args.trace_id:
+        traces = [t for t in traces if t["trace_id"].startswith(args.trace_id)]
+    if not traces:
+        parser.exit(1, "No matching trace\n")
+    print("\n".join(waterfall(traces[-1], args.width)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Binary frame uploads from the Pi to the laptop's /upload_frame endpoint.
+
+A request body is a fixed little-endian header, the goal text (only the
+first time a goal ID is used on a link) and the image payload:
+
+    magic "HT6F", version, flags (urgent, confirm), car ID (16 bytes),
+    frame ID, capture timestamp, width, height, pixel format, goal ID,
+    goal text length, payload length
+
+The laptop reads it straight into preallocated buffers, with no multipart
+parsing or temp-file spooling, and the Pi can stream it chunked. Goals are
+interned per car: after the laptop has seen a goal ID with its text, later
+frames send only the ID. A laptop that does not know an ID (e.g. after a
+restart) answers 412 with "goal_required" and the Pi resends the text.
+"""
+
+import struct
+import threading
+from collections import namedtuple
+from typing import Iterator, Optional
+
+from frame_codec import DeltaEncoder
+
+MAGIC = b"HT6F"
+VERSION = 1
+FLAG_URGENT = 0x01
+FLAG_CONFIRM = 0x02
+PIXEL_FORMATS = {"rgb24": 1, "bmp": 2, "delta": 3}  # delta: a frame_codec delta
+CHUNK_SIZE = 64 * 1024  # bytes per chunk when streaming an upload
+MAX_PAYLOAD = 32 * 1024 * 1024
+CAR_ID_BYTES = 16  # Longer car IDs are cut, on a character boundary
+MAX_GOAL_BYTES = 0xFFFF  # The goal length field is a uint16
+
+_HEADER = struct.Struct("<4sBB16sIdHHBIHI")
+HEADER_SIZE = _HEADER.size
+
+FrameHeader = namedtuple(
+    "FrameHeader",
+    [
+        "flags",
+        "car_id",
+        "frame_id",
+        "timestamp",
+        "width",
+        "height",
+        "pixel_format",
+        "goal_id",
+        "goal_length",
+        "payload_length",
+    ],
+)
+
+
+def pack_header(
+    car_id: str,
+    frame_id: int,
+    timestamp: float,
+    width: int,
+    height: int,
+    pixel_format: str,
+    goal_id: int,
+    goal: bytes,
+    payload_length: int,
+    urgent: bool = False,
+    confirm: bool = False,
+) -> bytes:
+    """Header plus goal text (pass b"" once the laptop knows the goal ID)."""
+    if len(goal) > MAX_GOAL_BYTES:
+        raise ValueError(f"Goal of {len(goal)} bytes is longer than {MAX_GOAL_BYTES}")
+    # Dropping a character cut in half keeps the field valid UTF-8
+    car_id_bytes = car_id.encode("utf-8")[:CAR_ID_BYTES]
+    car_id_bytes = car_id_bytes.decode("utf-8", "ignore").encode("utf-8")
+    flags = (FLAG_URGENT if urgent else 0) | (FLAG_CONFIRM if confirm else 0)
+    return (
+        _HEADER.pack(
+            MAGIC,
+            VERSION,
+            flags,
+            car_id_bytes,
+            frame_id,
+            timestamp,
+            width,
+            height,
+            PIXEL_FORMATS[pixel_format],
+            goal_id,
+            len(goal),
+            payload_length,
+        )
+        + goal
+    )
+
+
+def parse_header(data) -> FrameHeader:
+    magic, version, *fields = _HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a version 1 frame upload")
+    header = FrameHeader(*fields)
+    if header.payload_length > MAX_PAYLOAD:
+        raise ValueError(f"Payload of {header.payload_length} bytes is too large")
+    formats = {code: name for name, code in PIXEL_FORMATS.items()}
+    if header.pixel_format not in formats:
+        raise ValueError(f"Unknown pixel format {header.pixel_format}")
+    return header._replace(
+        car_id=header.car_id.rstrip(b"\0").decode("utf-8"),
+        pixel_format=formats[header.pixel_format],
+    )
+
+
+def read_exact(stream, size: int) -> bytearray:
+    """Read exactly size bytes into a new buffer (readinto, no intermediate copies)."""
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    done = 0
+    while done < size:
+        if hasattr(stream, "readinto"):
+            count = stream.readinto(view[done:])
+        else:
+            chunk = stream.read(size - done)
+            count = len(chunk)
+            view[done : done + count] = chunk
+        if not count:
+            raise ValueError(f"Upload truncated after {done} of {size} bytes")
+        done += count
+    return buffer
+
+
+def iter_chunks(header: bytes, payload, chunk_size: int = CHUNK_SIZE) -> Iterator:
+    """Body of a streamed (chunked) upload, slicing the payload without copying it."""
+    yield header
+    view = memoryview(payload)
+    for start in range(0, len(view), chunk_size):
+        yield view[start : start + chunk_size]
+
+
+class GoalTable:
+    """The Pi's side of goal interning: goal -> ID, and which IDs the laptop knows."""
+
+    def __init__(self):
+        self._ids = {}
+        self._known = set()
+
+    def lookup(self, goal: str):
+        """(goal ID, goal text to send: b"" if the laptop already knows it)."""
+        goal_id = self._ids.setdefault(goal, len(self._ids) + 1)
+        return goal_id, b"" if goal_id in self._known else goal.encode("utf-8")
+
+    def confirm(self, goal: str):
+        self._known.add(self._ids[goal])
+
+    def forget(self):
+        self._known.clear()
+
+
+class UploadLink:
+    """State of one car -> laptop link: delta reference, goal IDs, frame IDs."""
+
+    def __init__(self, encoder: Optional[DeltaEncoder] = None):
+        self.encoder = encoder or DeltaEncoder()
+        self.goals = GoalTable()
+        self.frame_id = 0
+        self.lock = threading.Lock()  # Guards encoder, goals and IDs, not uploads
+
+    def next_frame_id(self) -> int:
+        self.frame_id = (self.frame_id + 1) & 0xFFFFFFFF
+        return self.frame_id
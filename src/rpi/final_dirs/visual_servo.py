@@ -0,0 +1,113 @@
+"""
+Visual servoing loop: steer on locally tracked frames between Gemini calls.
+
+Starting from the box Gemini returned, the tracker follows the target frame
+by frame and the heading controller issues small turn/forward pulses at
+camera frame rate. The loop hands back to Gemini only when tracking
+confidence drops, the target reaches the frame edge, or it looks close
+enough (or the car has driven most of the distance Gemini's box implied)
+that the goal may have been reached.
+"""
+
+import time
+from typing import Callable, Optional, Sequence
+
+import numpy as np
+
+from heading_controller import HeadingController
+from visual_tracker import TemplateTracker
+
+MAX_FORWARD_STEP = 0.3  # seconds of forward motion per frame
+FORWARD_BUDGET = 0.8  # Drive at most this share of Gemini's range estimate
+EDGE_MARGIN = 0.03  # Boxes touching the frame edge may be cut off; re-check
+
+
+def track_and_servo(
+    next_frame: Callable[[], Optional[np.ndarray]],
+    execute: Callable[[str, float], float],
+    box: Sequence[float],
+    controller: Optional[HeadingController] = None,
+    tracker: Optional[TemplateTracker] = None,
+    max_seconds: float = 15.0,
+    max_frames: int = 150,
+    clock: Callable[[], float] = time.monotonic,
+) -> dict:
+    """
+    Follow and approach the target until Gemini is needed again.
+
+    Args:
+        next_frame: Returns the next camera frame (RGB array), or None if none came
+        execute: Runs one motor pulse (action, duration) and returns its actual on-time
+        box: Target box (ymin, xmin, ymax, xmax) in 0-1 from the last analysis
+        max_seconds, max_frames: Budget before handing back regardless
+
+    Returns:
+        Dict with "reason" ("lost", "arrived", "distance", "settled", "edge",
+        "no_frames", "budget"),
+        frames processed, the motor pulses executed and the last tracked target.
+    """
+    controller = controller or HeadingController()
+    tracker = tracker or TemplateTracker()
+    start = clock()
+    moves = []
+
+    frame = next_frame()
+    if frame is None:
+        return {"reason": "no_frames", "frames": 0, "moves": moves, "target": None}
+    tracker.init(frame, box)
+    target = tracker.result()
+    frames = 1
+    reason = "budget"
+    # Trust the tracked size only so far: it lags as the target grows
+    remaining = controller.estimate(target)["distance"] - controller.gains.goal_distance
+    forward_budget = max(0.0, remaining) * FORWARD_BUDGET
+    driven = 0.0
+
+    while frames < max_frames and clock() - start < max_seconds:
+        control = controller.command(target)
+        if control["arrived"]:
+            reason = "arrived"
+            break
+        if driven >= forward_budget:
+            reason = "distance"
+            break
+        if not control["moves"]:
+            # Centred and as close as the local estimate can tell: let Gemini judge
+            reason = "settled"
+            break
+        for move in control["moves"]:
+            duration = move["duration"]
+            if move["action"] == "forward":
+                speed = controller.calibration.forward_speed
+                duration = min(
+                    duration, MAX_FORWARD_STEP, (forward_budget - driven) / speed
+                )
+            actual = execute(move["action"], duration)
+            if move["action"] == "forward":
+                driven += actual * controller.calibration.forward_speed
+            moves.append(
+                {"action": move["action"], "duration": duration, "actual": actual}
+            )
+
+        frame = next_frame()
+        if frame is None:
+            reason = "no_frames"
+            break
+        frames += 1
+        target = tracker.update(frame)
+        if not target["tracking"]:
+            reason = "lost"
+            break
+        ymin, xmin, ymax, xmax = target["box"]
+        if xmin <= EDGE_MARGIN or xmax >= 1.0 - EDGE_MARGIN:
+            reason = "edge"
+            break
+
+    return {
+        "reason": reason,
+        "frames": frames,
+        "seconds": round(clock() - start, 3),
+        "driven": round(driven, 3),
+        "moves": moves,
+        "target": target,
+    }
@@ -0,0 +1,178 @@
+"""
+Local target tracker between Gemini calls.
+
+Once the analyzer has boxed the target, TemplateTracker follows that patch
+across later frames with normalized cross-correlation (NumPy only), on a
+downscaled luma + colour-opponent image and in a window around the last
+position, so a red target does not lock onto a grey edge of similar shape. It
+also tries slightly larger/smaller templates so it keeps up as the car
+approaches. A low correlation peak means tracking is lost and Gemini
+should look again.
+"""
+
+from typing import Optional, Sequence
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from image_utils import downscale, resize_nearest
+
+TRACK_DOWNSCALE = 2  # Track on a half resolution frame
+MIN_TEMPLATE = 5  # pixels (after downscaling)
+MAX_TEMPLATE = 24  # Big targets are tracked at a coarser scale to stay fast
+MIN_SEARCH = 0.12  # Search at least this fraction of the frame around the target
+TEMPLATE_UPDATE_CONFIDENCE = 0.93
+
+
+def _integral(image: np.ndarray) -> np.ndarray:
+    out = np.zeros((image.shape[0] + 1, image.shape[1] + 1), dtype=np.float64)
+    np.cumsum(np.cumsum(image, axis=0), axis=1, out=out[1:, 1:])
+    return out
+
+
+def _window_sums(integral: np.ndarray, h: int, w: int) -> np.ndarray:
+    return integral[h:, w:] - integral[:-h, w:] - integral[h:, :-w] + integral[:-h, :-w]
+
+
+def ncc_map(search: np.ndarray, template: np.ndarray) -> np.ndarray:
+    """
+    Normalized cross-correlation of template at every position in search.
+    Both are (H, W, C); channels are pooled into one correlation score.
+    """
+    h, w = template.shape[:2]
+    t = template - template.mean(axis=(0, 1))
+    t_norm = np.sqrt(np.sum(t * t))
+    out_shape = (search.shape[0] - h + 1, search.shape[1] - w + 1)
+    if t_norm < 1e-6:
+        return np.zeros(out_shape)
+    n = h * w
+    numerator = np.zeros(out_shape)
+    variance = np.zeros(out_shape)
+    for c in range(search.shape[2]):
+        channel = search[:, :, c]
+        windows = sliding_window_view(channel, (h, w))
+        numerator += np.einsum("ijkl,kl->ij", windows, t[:, :, c], optimize=True)
+        sums = _window_sums(_integral(channel), h, w)
+        sq_sums = _window_sums(_integral(channel * channel), h, w)
+        variance += sq_sums - sums * sums / n
+    return numerator / (np.sqrt(np.maximum(variance, 1e-6)) * t_norm)
+
+
+def tracking_features(image: np.ndarray) -> np.ndarray:
+    """Luma plus red-green and blue-yellow opponent channels, float32."""
+    rgb = image.astype(np.float32)
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    luma = r * 0.299 + g * 0.587 + b * 0.114
+    return np.stack([luma, r - g, b - (r + g) * 0.5], axis=-1)
+
+
+class TemplateTracker:
+    def __init__(
+        self,
+        search_margin: float = 1.0,
+        min_confidence: float = 0.85,
+        scales: Sequence[float] = (0.92, 1.0, 1.08),
+        learn_rate: float = 0.15,
+        downscale_factor: int = TRACK_DOWNSCALE,
+    ):
+        self.search_margin = search_margin  # Search window padding, in template sizes
+        self.min_confidence = min_confidence
+        self.scales = scales
+        self.learn_rate = learn_rate
+        self.base_factor = downscale_factor
+        self.factor = downscale_factor
+        self.template: Optional[np.ndarray] = None
+        self.position = None  # (top, left) of the target in the small frame
+        self.frame_shape = None
+        self.confidence = 0.0
+
+    def _prepare(self, image: np.ndarray) -> np.ndarray:
+        return downscale(tracking_features(image), self.factor)
+
+    def init(self, image: np.ndarray, box: Sequence[float]):
+        """Start tracking box = (ymin, xmin, ymax, xmax), normalized to 0-1."""
+        longest = max(box[2] - box[0], box[3] - box[1])
+        pixels = longest * max(image.shape[:2]) / self.base_factor
+        self.factor = self.base_factor * max(1, int(np.ceil(pixels / MAX_TEMPLATE)))
+        small = self._prepare(image)
+        height, width = small.shape[:2]
+        top = int(round(box[0] * height))
+        left = int(round(box[1] * width))
+        bottom = max(int(round(box[2] * height)), top + MIN_TEMPLATE)
+        right = max(int(round(box[3] * width)), left + MIN_TEMPLATE)
+        bottom, right = min(bottom, height), min(right, width)
+        top, left = min(top, bottom - MIN_TEMPLATE), min(left, right - MIN_TEMPLATE)
+        self.template = small[top:bottom, left:right].copy()
+        self.position = (top, left)
+        self.frame_shape = small.shape[:2]
+        self.confidence = 1.0
+
+    @property
+    def tracking(self) -> bool:
+        return self.template is not None and self.confidence >= self.min_confidence
+
+    def update(self, image: np.ndarray) -> dict:
+        """Locate the target in a new frame; returns box, offset, size, confidence."""
+        if self.template is None:
+            raise RuntimeError("Tracker not initialised; call init() with a box first")
+        small = self._prepare(image)
+        height, width = small.shape[:2]
+        best = (-1.0, None, None)
+        for scale in self.scales:
+            th = max(MIN_TEMPLATE, int(round(self.template.shape[0] * scale)))
+            tw = max(MIN_TEMPLATE, int(round(self.template.shape[1] * scale)))
+            if th >= height or tw >= width:
+                continue
+            template = (
+                self.template if scale == 1.0 else resize_nearest(self.template, th, tw)
+            )
+            pad_y = int(max(th * self.search_margin, height * MIN_SEARCH)) + 1
+            pad_x = int(max(tw * self.search_margin, width * MIN_SEARCH)) + 1
+            # Keep the centre where it was while the template grows or shrinks
+            cy = self.position[0] + self.template.shape[0] / 2.0
+            cx = self.position[1] + self.template.shape[1] / 2.0
+            y0 = max(0, int(cy - th / 2.0) - pad_y)
+            x0 = max(0, int(cx - tw / 2.0) - pad_x)
+            y1 = min(height, int(cy + th / 2.0) + pad_y)
+            x1 = min(width, int(cx + tw / 2.0) + pad_x)
+            if y1 - y0 < th or x1 - x0 < tw:
+                continue
+            scores = ncc_map(small[y0:y1, x0:x1], template)
+            iy, ix = np.unravel_index(np.argmax(scores), scores.shape)
+            if scores[iy, ix] > best[0]:
+                best = (float(scores[iy, ix]), (y0 + iy, x0 + ix), (th, tw))
+
+        score, position, size = best
+        self.confidence = max(score, 0.0)
+        if position is not None:
+            self.position = position
+            patch = small[
+                position[0] : position[0] + size[0], position[1] : position[1] + size[1]
+            ]
+            # Only learn from confident matches so the template cannot drift
+            if self.confidence >= max(self.min_confidence, TEMPLATE_UPDATE_CONFIDENCE):
+                if size == self.template.shape[:2]:
+                    self.template = (
+                        1.0 - self.learn_rate
+                    ) * self.template + self.learn_rate * patch
+                else:
+                    self.template = patch.copy()
+        return self.result()
+
+    def result(self) -> dict:
+        height, width = self.frame_shape
+        th, tw = self.template.shape[:2]
+        top, left = self.position
+        box = [
+            float(top) / height,
+            float(left) / width,
+            float(top + th) / height,
+            float(left + tw) / width,
+        ]
+        return {
+            "box": [round(v, 4) for v in box],
+            "offset": round(box[1] + box[3] - 1.0, 4),
+            "size": round(box[2] - box[0], 4),
+            "confidence": round(float(self.confidence), 3),
+            "tracking": self.tracking,
+        }